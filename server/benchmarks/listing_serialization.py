@@ -0,0 +1,122 @@
+"""
+Time to build and serialize a directory listing, before and after the fast path.
+
+Usage:
+    python -m benchmarks.listing_serialization [--sizes 1000 10000 50000] [--repeat 5]
+
+Both paths go through FastAPI with the storage backend stubbed out, so the
+figures cover building the models from listed objects and writing the response.
+"""
+
+import argparse
+import mimetypes
+import os
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from minio.datatypes import Object
+from src.main import app
+from src.models.file import (
+    Directory,
+    DirectoryListing,
+    DirectoryListingPage,
+    File,
+    directory_listing_from_object,
+)
+from src.repositories.files.fastapi import get_file_repository
+
+EXTENSIONS = [".txt", ".pdf", ".png", ".csv", ".json", ".tar.gz", ".mp4", ""]
+
+
+def make_objects(count: int) -> list[Object]:
+    last_modified = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    return [
+        (
+            Object(
+                "benchmark",
+                f"some/path/file-{i}{EXTENSIONS[i % len(EXTENSIONS)]}",
+                last_modified + timedelta(seconds=i),
+                size=i,
+            )
+            if i % 10
+            else Object("benchmark", f"some/path/dir-{i}/")
+        )
+        for i in range(count)
+    ]
+
+
+def baseline_directory_listing_from_object(obj: Object) -> DirectoryListing:
+    # The model building path before the fast path
+    if obj.object_name.endswith("/"):
+        return Directory(
+            name=os.path.basename(obj.object_name[:-1]),
+            path=obj.object_name[:-1],
+        )
+
+    return File(
+        name=obj.object_name,
+        content_type=obj.content_type
+        or mimetypes.guess_file_type(obj.object_name)[0]
+        or "application/octet-stream",
+        size=obj.size,
+        last_modified=obj.last_modified,
+        basename=os.path.basename(obj.object_name),
+        path=os.path.split(obj.object_name)[0],
+    )
+
+
+def baseline_client(objects: list[Object]) -> TestClient:
+    # The serialization path before the fast path, validated against the
+    # response model by FastAPI
+    baseline = FastAPI()
+
+    @baseline.get("/workspaces/{workspace_id}/stat/{path:path}")
+    async def stat(workspace_id: str, path: str) -> list[DirectoryListing]:
+        return [baseline_directory_listing_from_object(obj) for obj in objects]
+
+    return TestClient(baseline)
+
+
+def fast_path_client(objects: list[Object]) -> TestClient:
+    class StubFileRepository:
+        async def stat(self, workspace_id, path=None, limit=None, start_after=None):
+            return DirectoryListingPage(
+                [directory_listing_from_object(obj) for obj in objects]
+            )
+
+    app.dependency_overrides[get_file_repository] = lambda: StubFileRepository()
+    return TestClient(app)
+
+
+def measure(client: TestClient, repeat: int) -> tuple[float, int]:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.get("/workspaces/benchmark/stat/some/path")
+        timings.append(time.perf_counter() - start)
+        response.raise_for_status()
+    return statistics.median(timings) * 1000, len(response.content)
+
+
+def main(sizes: list[int], repeat: int) -> None:
+    print(f"{'entries':>10} {'path':>10} {'median ms':>10} {'bytes':>12}")
+    for size in sizes:
+        objects = make_objects(size)
+        for name, client in (
+            ("baseline", baseline_client(objects)),
+            ("fast", fast_path_client(objects)),
+        ):
+            elapsed, length = measure(client, repeat)
+            print(f"{size:>10} {name:>10} {elapsed:>10.1f} {length:>12}")
+    app.dependency_overrides = {}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    main(args.sizes, args.repeat)
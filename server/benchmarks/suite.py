@@ -0,0 +1,286 @@
+"""
+Throughput, latency and memory of the API routes against an in-memory backend.
+
+Usage:
+    python -m benchmarks.suite [--scenarios stat download upload delete_directory copy]
+        [--concurrency 1 8 32] [--sizes 4 1024] [--entries 1000] [--requests 200]
+        [--latency 0.005] [--output results.json] [--baseline benchmarks/baselines/suite.json]
+
+Requests go through the FastAPI app in process, with the storage backend
+replaced by `InMemoryFileRepository`, which waits `--latency` seconds on every
+call to stand in for the round trip to a remote backend. Sizes are in KiB and
+apply to the download, upload and copy scenarios. The stat and
+delete_directory scenarios use directories of `--entries` objects.
+
+Results are written as JSON with `--output`. With `--baseline`, each result is
+compared to the matching baseline result, and the run fails if throughput
+drops, or p99 latency or peak RSS grows, by more than `--tolerance`. Compare baselines
+recorded on the same machine.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import platform
+import resource
+import statistics
+import sys
+import time
+from dataclasses import asdict, dataclass
+from typing import Awaitable, Callable, Optional
+
+from httpx import ASGITransport, AsyncClient, Response
+from src.main import app
+from src.repositories.files.fastapi import get_file_repository
+from src.repositories.files.memory import InMemoryFileRepository, InMemoryStore
+
+KIB = 1024
+MIB = 1024 * 1024
+
+WORKSPACE = "benchmark"
+
+SCENARIOS = ["stat", "download", "upload", "delete_directory", "copy"]
+
+# Scenarios that move objects of a given size, rather than list or delete many
+SIZED_SCENARIOS = {"download", "upload", "copy"}
+
+
+@dataclass
+class Result:
+    scenario: str
+    size_kib: Optional[int]
+    concurrency: int
+    requests: int
+    throughput: float
+    p50_ms: float
+    p99_ms: float
+    peak_rss_mib: float
+
+
+def reset_peak_rss() -> None:
+    # Resets the high water mark reported in /proc/self/status, where supported
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+    except OSError:
+        pass
+
+
+def peak_rss_mib() -> float:
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * KIB / MIB
+    except OSError:
+        pass
+    # Peak for the life of the process, in KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / MIB if sys.platform == "darwin" else peak * KIB / MIB
+
+
+def prepare(
+    scenario: str, store: InMemoryStore, size: int, entries: int, requests: int
+) -> Callable[[AsyncClient, int], Awaitable[Response]]:
+    """Fill the store for a scenario, and return the request it makes
+
+    Args:
+        scenario: The name of the scenario.
+        store: The store the app is served from.
+        size: The size of each object, in bytes.
+        entries: The number of objects in a listed or deleted directory.
+        requests: The number of requests that will be made.
+
+    Returns:
+        A function making the i-th request of the scenario.
+    """
+    match scenario:
+        case "stat":
+            for i in range(entries):
+                store.put(WORKSPACE, f"stat/file-{i}.txt", b"")
+            return lambda client, i: client.get(f"/workspaces/{WORKSPACE}/stat/stat")
+        case "download":
+            store.put(WORKSPACE, "download/file.bin", bytes(size))
+            return lambda client, i: client.get(
+                f"/workspaces/{WORKSPACE}/download/download/file.bin"
+            )
+        case "upload":
+            content = bytes(size)
+            return lambda client, i: client.post(
+                f"/workspaces/{WORKSPACE}/upload/upload",
+                files=[("files", (f"file-{i}.bin", content))],
+            )
+        case "delete_directory":
+            for i in range(requests):
+                for j in range(entries):
+                    store.put(WORKSPACE, f"delete/{i}/file-{j}.txt", b"")
+            return lambda client, i: client.delete(
+                f"/workspaces/{WORKSPACE}/directory/delete/{i}"
+            )
+        case "copy":
+            store.put(WORKSPACE, "copy/file.bin", bytes(size))
+            return lambda client, i: client.put(
+                f"/workspaces/{WORKSPACE}/cp/copy/file.bin",
+                params={"target_path": f"copy/file-{i}.bin"},
+            )
+    raise ValueError(f"Unknown scenario {scenario}")
+
+
+async def run(
+    scenario: str,
+    size_kib: Optional[int],
+    concurrency: int,
+    entries: int,
+    requests: int,
+    latency: float,
+) -> Result:
+    store = InMemoryStore()
+    logger = logging.getLogger("benchmark")
+    app.dependency_overrides[get_file_repository] = lambda: InMemoryFileRepository(
+        store, logger, latency=latency
+    )
+    request = prepare(scenario, store, (size_kib or 0) * KIB, entries, requests)
+    latencies = []
+    indexes = itertools.count()
+
+    async def worker(client: AsyncClient) -> None:
+        while (i := next(indexes)) < requests:
+            start = time.perf_counter()
+            response = await request(client, i)
+            latencies.append(time.perf_counter() - start)
+            response.raise_for_status()
+
+    reset_peak_rss()
+    try:
+        async with AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://benchmark"
+        ) as client:
+            start = time.perf_counter()
+            async with asyncio.TaskGroup() as tasks:
+                for _ in range(concurrency):
+                    tasks.create_task(worker(client))
+            elapsed = time.perf_counter() - start
+    finally:
+        app.dependency_overrides = {}
+
+    percentiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    return Result(
+        scenario=scenario,
+        size_kib=size_kib,
+        concurrency=concurrency,
+        requests=requests,
+        throughput=requests / elapsed,
+        p50_ms=percentiles[49] * 1000,
+        p99_ms=percentiles[98] * 1000,
+        peak_rss_mib=peak_rss_mib(),
+    )
+
+
+def compare(
+    results: list[Result], baseline: dict, tolerance: float
+) -> list[tuple[Result, Optional[dict], bool]]:
+    """Match each result to its baseline, and flag regressions
+
+    Args:
+        results: The results of this run.
+        baseline: A previous run, as written with `--output`.
+        tolerance: The fraction throughput may drop, or p99 latency and peak
+            RSS grow, by.
+
+    Returns:
+        Each result, its baseline result if there is one, and whether it regressed.
+    """
+    key = lambda result: (result["scenario"], result["size_kib"], result["concurrency"])
+    previous = {key(result): result for result in baseline["results"]}
+    compared = []
+    for result in results:
+        before = previous.get(key(asdict(result)))
+        regressed = before is not None and (
+            result.throughput < before["throughput"] * (1 - tolerance)
+            or result.p99_ms > before["p99_ms"] * (1 + tolerance)
+            or result.peak_rss_mib > before["peak_rss_mib"] * (1 + tolerance)
+        )
+        compared.append((result, before, regressed))
+    return compared
+
+
+async def main(args: argparse.Namespace) -> int:
+    # Keep per-request logging out of the measurements
+    logging.getLogger("benchmark").setLevel(logging.WARNING)
+    results = []
+    print(
+        f"{'scenario':>16} {'KiB':>6} {'conc':>5} {'req/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'peak MiB':>9}"
+    )
+    for scenario in args.scenarios:
+        sizes = args.sizes if scenario in SIZED_SCENARIOS else [None]
+        for size_kib, concurrency in itertools.product(sizes, args.concurrency):
+            result = await run(
+                scenario,
+                size_kib,
+                concurrency,
+                args.entries,
+                args.requests,
+                args.latency,
+            )
+            results.append(result)
+            print(
+                f"{scenario:>16} {size_kib or '-':>6} {concurrency:>5} {result.throughput:>10.1f} {result.p50_ms:>8.2f} {result.p99_ms:>8.2f} {result.peak_rss_mib:>9.1f}"
+            )
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(
+                {
+                    "environment": {
+                        "python": platform.python_version(),
+                        "platform": platform.platform(),
+                    },
+                    "parameters": {
+                        "entries": args.entries,
+                        "requests": args.requests,
+                        "latency": args.latency,
+                    },
+                    "results": [asdict(result) for result in results],
+                },
+                output,
+                indent=2,
+            )
+            output.write("\n")
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline) as baseline_file:
+        baseline = json.load(baseline_file)
+    print(f"\ncompared to {args.baseline}")
+    print(
+        f"{'scenario':>16} {'KiB':>6} {'conc':>5} {'req/s':>10} {'p99 ms':>10} {'peak MiB':>10}"
+    )
+    regressions = 0
+    for result, before, regressed in compare(results, baseline, args.tolerance):
+        if before is None:
+            continue
+        regressions += regressed
+        print(
+            f"{result.scenario:>16} {result.size_kib or '-':>6} {result.concurrency:>5} "
+            f"{result.throughput / before['throughput'] - 1:>+10.1%} "
+            f"{result.p99_ms / before['p99_ms'] - 1:>+10.1%} "
+            f"{result.peak_rss_mib / before['peak_rss_mib'] - 1:>+10.1%}"
+            f"{'  REGRESSED' if regressed else ''}"
+        )
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[4, 1024])
+    parser.add_argument("--entries", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.005)
+    parser.add_argument("--output")
+    parser.add_argument("--baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    sys.exit(asyncio.run(main(parser.parse_args())))
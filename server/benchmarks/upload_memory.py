@@ -0,0 +1,103 @@
+"""
+Peak memory of a single upload, buffered in full versus streamed in parts.
+
+Usage:
+    python -m benchmarks.upload_memory [--sizes 64 256] [--part-size 16] [--parallelism 4]
+
+Sizes are in MiB. The storage backend is a stand-in that discards what it is
+sent, so the figures only reflect what the API process holds in memory.
+"""
+
+import argparse
+import asyncio
+import io
+import logging
+import time
+import tracemalloc
+
+from fastapi import UploadFile
+from src.repositories.files.minio import MinioFileRepository
+
+MIB = 1024 * 1024
+
+
+class ZeroStream(io.RawIOBase):
+    def __init__(self, size: int):
+        self.remaining = size
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        size = self.remaining if size < 0 else min(size, self.remaining)
+        self.remaining -= size
+        return bytes(size)
+
+
+class DiscardingClient:
+    def put_object(self, bucket_name, object_name, data, length, **kwargs):
+        while data.read(MIB):
+            pass
+
+    def _create_multipart_upload(self, bucket_name, object_name, headers):
+        return "upload-id"
+
+    def _upload_part(self, bucket_name, object_name, data, headers, upload_id, n):
+        return f"etag-{n}"
+
+    def _complete_multipart_upload(self, bucket_name, object_name, upload_id, parts):
+        pass
+
+    def _abort_multipart_upload(self, bucket_name, object_name, upload_id):
+        pass
+
+
+async def buffered_upload(client: DiscardingClient, file: UploadFile) -> None:
+    # The upload path before streaming multipart uploads
+    file_stream = io.BytesIO(await file.read())
+    client.put_object("benchmark", file.filename, file_stream, length=-1)
+
+
+async def streamed_upload(repository: MinioFileRepository, file: UploadFile) -> None:
+    await repository.upload_file("benchmark", [file])
+
+
+async def measure(upload, target, size: int) -> tuple[float, float]:
+    file = UploadFile(ZeroStream(size), filename="benchmark.bin")
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        await upload(target, file)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / MIB, elapsed
+
+
+async def main(sizes: list[int], part_size: int, parallelism: int) -> None:
+    client = DiscardingClient()
+    repository = MinioFileRepository(
+        client,
+        logging.getLogger("benchmark"),
+        upload_part_size=part_size * MIB,
+        upload_parallelism=parallelism,
+    )
+    print(f"part size {part_size} MiB, parallelism {parallelism}")
+    print(f"{'size':>10} {'path':>10} {'peak MiB':>10} {'seconds':>10}")
+    for size in sizes:
+        for name, upload, target in (
+            ("buffered", buffered_upload, client),
+            ("streamed", streamed_upload, repository),
+        ):
+            peak, elapsed = await measure(upload, target, size * MIB)
+            print(f"{size:>6} MiB {name:>10} {peak:>10.1f} {elapsed:>10.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[64, 256, 1024])
+    parser.add_argument("--part-size", type=int, default=16)
+    parser.add_argument("--parallelism", type=int, default=4)
+    args = parser.parse_args()
+    asyncio.run(main(args.sizes, args.part_size, args.parallelism))
@@ -0,0 +1,372 @@
+import asyncio
+import mimetypes
+import posixpath
+import zlib
+from collections import OrderedDict
+from typing import Optional, Protocol
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.configuration import CompressionConfiguration
+
+try:
+    import zstandard
+except ImportError:  # Optional, only gzip is offered without it
+    zstandard = None
+
+# Chunks at least this large are compressed off the event loop
+THREAD_CHUNK_SIZE = 64 * 1024
+
+# Chunks read from a file handed over with the pathsend extension
+FILE_CHUNK_SIZE = 256 * 1024
+
+VariantKey = tuple[str, str, str]
+
+
+class Compressor(Protocol):
+    def compress(self, data: bytes) -> bytes: ...
+
+    def sync(self) -> bytes:
+        """Ends the current block, so that all data so far can be decompressed"""
+        ...
+
+    def flush(self) -> bytes:
+        """Ends the stream"""
+        ...
+
+
+class _GzipCompressor:
+    def __init__(self, level: int):
+        # wbits of 31 writes a gzip header and trailer around the deflate stream
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def sync(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _ZstdCompressor:
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def sync(self) -> bytes:
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+
+def parse_accept_encoding(header: str) -> dict[str, float]:
+    """The quality of each coding in an Accept-Encoding header
+
+    Args:
+        header: The value of the header.
+
+    Returns:
+        The quality of each coding named, lowercased.
+    """
+    qualities = {}
+    for item in header.split(","):
+        coding, *params = [part.strip() for part in item.split(";")]
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.lower()] = quality
+    return qualities
+
+
+def negotiate_encoding(header: Optional[str], encodings: list[str]) -> Optional[str]:
+    """Choose the coding to compress a response with
+
+    Args:
+        header: The value of the Accept-Encoding header, if any.
+        encodings: The codings on offer, most preferred first.
+
+    Returns:
+        The acceptable coding of highest quality, ties going to the earlier
+        coding, or None to send the response as it is.
+    """
+    if not header:
+        return None
+    qualities = parse_accept_encoding(header)
+    default = qualities.get("*", 0.0)
+    best, best_quality = None, 0.0
+    for encoding in encodings:
+        quality = qualities.get(encoding, default)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def is_compressible(content_type: Optional[str], allowed: list[str]) -> bool:
+    """Whether a content type is on the allowlist
+
+    Entries ending in `/` match a top-level type, as `text/`, entries starting
+    with `+` match a structured syntax suffix, as `+json`, and other entries
+    match the media type exactly.
+    """
+    if not content_type:
+        return False
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    for entry in allowed:
+        if entry.endswith("/"):
+            if media_type.startswith(entry):
+                return True
+        elif entry.startswith("+"):
+            if media_type.endswith(entry):
+                return True
+        elif media_type == entry:
+            return True
+    return False
+
+
+class CompressedVariants:
+    """
+    A byte bounded LRU cache in memory of compressed responses, keyed by request
+    target, entity tag and coding, so that a hot file is compressed once per
+    version rather than on every request.
+
+    The entity tag is only known once the response starts, so a hit saves the
+    compression but not the read: the body is still read from the storage
+    backend, and discarded.
+    """
+
+    def __init__(self, max_bytes: int, max_file_size: int):
+        self.max_bytes = max_bytes
+        self.max_file_size = max_file_size
+        self.bytes = 0
+        self._entries: OrderedDict[VariantKey, bytes] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def cacheable(self, size: Optional[int]) -> bool:
+        return size is not None and size <= self.max_file_size
+
+    def get(self, key: VariantKey) -> Optional[bytes]:
+        body = self._entries.get(key)
+        if body is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return body
+
+    def put(self, key: VariantKey, body: bytes) -> None:
+        if len(body) > self.max_bytes:
+            return
+        if (older := self._entries.pop(key, None)) is not None:
+            self.bytes -= len(older)
+        self._entries[key] = body
+        self.bytes += len(body)
+        while self.bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.bytes -= len(evicted)
+
+
+class Compression:
+    """The compression settings of the application, and its cache of variants"""
+
+    def __init__(self, configuration: CompressionConfiguration):
+        self.configuration = configuration
+        self.encodings = ["zstd", "gzip"] if zstandard is not None else ["gzip"]
+        self.variants = (
+            CompressedVariants(
+                configuration.cache_max_bytes, configuration.cache_max_file_size
+            )
+            if configuration.cache_max_bytes > 0
+            else None
+        )
+
+    def compressor(self, encoding: str) -> Compressor:
+        if encoding == "zstd":
+            return _ZstdCompressor(self.configuration.zstd_level)
+        return _GzipCompressor(self.configuration.gzip_level)
+
+
+def _read_chunk(file_path: str, offset: int) -> bytes:
+    with open(file_path, "rb") as file:
+        file.seek(offset)
+        return file.read(FILE_CHUNK_SIZE)
+
+
+class _CompressingSender:
+    """Compresses the response of a single request, if it turns out to be
+    compressible, as it is sent"""
+
+    def __init__(
+        self,
+        compression: Compression,
+        encoding: Optional[str],
+        scope: Scope,
+        send: Send,
+    ):
+        self.compression = compression
+        self.encoding = encoding
+        self.scope = scope
+        self.send = send
+        self.compressor: Optional[Compressor] = None
+        self.streamed = False
+        self.key: Optional[VariantKey] = None
+        self.cached: Optional[list[bytes]] = None
+        self.served = False
+
+    def _compressible(self, status: int, headers: Headers) -> bool:
+        configuration = self.compression.configuration
+        if (
+            status != 200
+            or "content-encoding" in headers
+            or "content-range" in headers
+            or "no-transform" in headers.get("cache-control", "").lower()
+            or not is_compressible(
+                headers.get("content-type"), configuration.content_types
+            )
+        ):
+            return False
+        # Files named as compressed may still be typed by their inner content,
+        # as text/plain for `.txt.gz`
+        suffix = posixpath.splitext(self.scope["path"])[1]
+        if suffix in mimetypes.encodings_map:
+            return False
+        content_length = headers.get("content-length")
+        return content_length is None or int(content_length) >= configuration.min_size
+
+    async def _compress(self, data: bytes) -> bytes:
+        if len(data) >= THREAD_CHUNK_SIZE:
+            return await asyncio.to_thread(self.compressor.compress, data)
+        return self.compressor.compress(data)
+
+    async def _send_body(self, body: bytes, more_body: bool) -> None:
+        if self.cached is not None:
+            self.cached.append(body)
+        await self.send(
+            {"type": "http.response.body", "body": body, "more_body": more_body}
+        )
+
+    async def __call__(self, message: Message) -> None:
+        if self.served:
+            # The compressed body came from the cache, the rest is not needed
+            return
+        match message["type"]:
+            case "http.response.start":
+                await self._start(message)
+            case "http.response.body" if self.compressor is not None:
+                compressed = await self._compress(message.get("body", b""))
+                more_body = message.get("more_body", False)
+                if not more_body:
+                    compressed += self.compressor.flush()
+                elif self.streamed:
+                    # Without a length the body may be a stream of events, as
+                    # NDJSON progress, which the client needs as they come
+                    compressed += self.compressor.sync()
+                if compressed or not more_body:
+                    await self._send_body(compressed, more_body)
+                if not more_body and self.cached is not None:
+                    self.compression.variants.put(self.key, b"".join(self.cached))
+            case "http.response.pathsend" if self.compressor is not None:
+                offset = 0
+                while chunk := await asyncio.to_thread(
+                    _read_chunk, message["path"], offset
+                ):
+                    offset += len(chunk)
+                    await self(
+                        {"type": "http.response.body", "body": chunk, "more_body": True}
+                    )
+                await self({"type": "http.response.body", "body": b""})
+            case _:
+                await self.send(message)
+
+    async def _start(self, message: Message) -> None:
+        headers = MutableHeaders(scope=message)
+        if self.encoding is None or not self._compressible(message["status"], headers):
+            content_type = headers.get("content-type")
+            if message["status"] == 304 and content_type is None:
+                # Carries the Vary of the response it revalidates, whose type
+                # is guessed from the path, listings have no extension
+                content_type = (
+                    mimetypes.guess_type(self.scope["path"])[0] or "application/json"
+                )
+            if is_compressible(
+                content_type, self.compression.configuration.content_types
+            ):
+                headers.add_vary_header("Accept-Encoding")
+            await self.send(message)
+            return
+
+        etag = headers.get("etag")
+        content_length = headers.get("content-length")
+        variants = self.compression.variants
+        if (
+            variants is not None
+            and etag is not None
+            and not etag.startswith("W/")
+            and variants.cacheable(
+                int(content_length) if content_length is not None else None
+            )
+        ):
+            target = self.scope["path"]
+            if self.scope.get("query_string"):
+                target += "?" + self.scope["query_string"].decode("latin-1")
+            self.key = (target, etag, self.encoding)
+        del headers["content-length"]
+        headers["content-encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        if etag is not None and not etag.startswith("W/"):
+            # The compressed bytes differ, but they represent the same content
+            headers["etag"] = f"W/{etag}"
+
+        if self.key is not None and (body := variants.get(self.key)) is not None:
+            headers["content-length"] = str(len(body))
+            await self.send(message)
+            await self.send({"type": "http.response.body", "body": body})
+            self.served = True
+            return
+        if self.key is not None:
+            self.cached = []
+        self.compressor = self.compression.compressor(self.encoding)
+        self.streamed = content_length is None
+        await self.send(message)
+
+
+class CompressionMiddleware:
+    """
+    Compresses responses with gzip, or zstd when it is installed, as negotiated
+    by the Accept-Encoding header, for the content types on the allowlist.
+    Bodies are compressed as they are streamed, so a large download is never
+    held in memory, and each chunk of a body sent without a Content-Length is
+    flushed, so that it can be decompressed as soon as it arrives. Reads its
+    configuration from `app.state.compression`, and is disabled when there is
+    none.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] != "GET":
+            return await self.app(scope, receive, send)
+        compression = getattr(scope["app"].state, "compression", None)
+        if compression is None:
+            return await self.app(scope, receive, send)
+        # Without an acceptable coding, responses are only marked as negotiable
+        encoding = negotiate_encoding(
+            Headers(scope=scope).get("accept-encoding"), compression.encodings
+        )
+        await self.app(
+            scope, receive, _CompressingSender(compression, encoding, scope, send)
+        )
@@ -1,10 +1,12 @@
 from pydantic import BaseModel, ConfigDict, Field, SecretStr
 from enum import Enum
-from typing import Annotated, Literal, Union
+from typing import Annotated, Literal, Optional, Union
 from functools import lru_cache
 import toml
 from fastapi import Depends
 
+from src.models.batch import MAX_BATCH_OPERATIONS
+
 
 def to_kebab(snake: str) -> str:
     """Convert a snake_case string to kebab-case
@@ -20,27 +22,195 @@ def to_kebab(snake: str) -> str:
 
 class StorageBackendProvider(str, Enum):
     MINIO = "minio"
+    LOCAL = "local"
+    MEMORY = "memory"
 
 
-class MinioStorageBackendConfiguration(BaseModel):
+class BaseStorageBackendConfiguration(BaseModel):
     model_config = ConfigDict(
         alias_generator=to_kebab,
         populate_by_name=True,
     )
+
+    max_workers: int = Field(default=16, gt=0)
+    download_chunk_size: int = Field(default=256 * 1024, gt=0)
+    upload_concurrency: int = Field(default=8, gt=0)
+    copy_concurrency: int = Field(default=8, gt=0)
+
+
+class MinioStorageBackendConfiguration(BaseStorageBackendConfiguration):
     provider: Literal[StorageBackendProvider.MINIO] = StorageBackendProvider.MINIO
 
     endpoint: str
     access_key: SecretStr | None = None
     secret_key: SecretStr | None = None
     secure: bool = True
+    # Skips looking up the region of each bucket, and is needed to sign URLs for
+    # a public endpoint
+    region: str | None = None
+    # Host clients reach the storage at, when presigned URLs must not point at
+    # the endpoint this service uses
+    public_endpoint: str | None = None
+    max_connections: int = Field(default=16, gt=0)
+    # S3 requires every part but the last to be between 5 MiB and 5 GiB
+    upload_part_size: int = Field(
+        default=16 * 1024 * 1024, ge=5 * 1024 * 1024, le=5 * 1024 * 1024 * 1024
+    )
+    upload_parallelism: int = Field(default=4, gt=0)
+    delete_concurrency: int = Field(default=4, gt=0)
+
+
+class LocalStorageBackendConfiguration(BaseStorageBackendConfiguration):
+    provider: Literal[StorageBackendProvider.LOCAL] = StorageBackendProvider.LOCAL
+
+    root: str
+
+
+class MemoryStorageBackendConfiguration(BaseStorageBackendConfiguration):
+    provider: Literal[StorageBackendProvider.MEMORY] = StorageBackendProvider.MEMORY
+
+    # Seconds every call to the store waits, standing in for a remote backend
+    latency_seconds: float = Field(default=0.0, ge=0)
 
 
 StorageBackendConfiguration = Annotated[
-    Union[MinioStorageBackendConfiguration],
+    Union[
+        MinioStorageBackendConfiguration,
+        LocalStorageBackendConfiguration,
+        MemoryStorageBackendConfiguration,
+    ],
     Field(discriminator="provider"),
 ]
 
 
+class ListingCacheConfiguration(BaseModel):
+    model_config = ConfigDict(
+        alias_generator=to_kebab,
+        populate_by_name=True,
+    )
+
+    enabled: bool = False
+    max_entries: int = Field(default=1024, gt=0)
+    ttl_seconds: float = Field(default=5.0, gt=0)
+
+
+class DownloadCacheConfiguration(BaseModel):
+    model_config = ConfigDict(
+        alias_generator=to_kebab,
+        populate_by_name=True,
+    )
+
+    enabled: bool = False
+    directory: str = "download-cache"
+    max_bytes: int = Field(default=1024 * 1024 * 1024, gt=0)
+    max_file_size: int = Field(default=64 * 1024 * 1024, gt=0)
+
+
+class MetadataIndexConfiguration(BaseModel):
+    model_config = ConfigDict(
+        alias_generator=to_kebab,
+        populate_by_name=True,
+    )
+
+    enabled: bool = False
+    directory: str = "metadata-index"
+    reconcile_interval_seconds: float = Field(default=3600.0, gt=0)
+    search_workers: int = Field(default=4, gt=0)
+    refresh_concurrency: int = Field(default=8, gt=0)
+
+
+class DedupConfiguration(BaseModel):
+    model_config = ConfigDict(
+        alias_generator=to_kebab,
+        populate_by_name=True,
+    )
+
+    enabled: bool = False
+    database: str = "content-index.sqlite3"
+    min_size: int = Field(default=1024 * 1024, ge=0)
+
+
+class CompressionConfiguration(BaseModel):
+    model_config = ConfigDict(
+        alias_generator=to_kebab,
+        populate_by_name=True,
+    )
+
+    enabled: bool = False
+    min_size: int = Field(default=1024, ge=0)
+    content_types: list[str] = [
+        "text/",
+        "application/json",
+        "application/xml",
+        "application/javascript",
+        "application/x-ndjson",
+        "application/yaml",
+        "+json",
+        "+xml",
+    ]
+    gzip_level: int = Field(default=6, ge=1, le=9)
+    zstd_level: int = Field(default=3, ge=1, le=22)
+    cache_max_bytes: int = Field(default=64 * 1024 * 1024, ge=0)
+    cache_max_file_size: int = Field(default=1024 * 1024, ge=0)
+
+
+class ThumbnailConfiguration(BaseModel):
+    model_config = ConfigDict(
+        alias_generator=to_kebab,
+        populate_by_name=True,
+    )
+
+    enabled: bool = False
+    workspace: str = "thumbnails"
+    sizes: list[int] = [64, 128, 256, 512]
+    format: Literal["WEBP", "JPEG", "PNG"] = "WEBP"
+    max_source_size: int = Field(default=64 * 1024 * 1024, gt=0)
+    workers: Optional[int] = Field(default=None, gt=0)
+
+
+class UploadSessionConfiguration(BaseModel):
+    model_config = ConfigDict(
+        alias_generator=to_kebab,
+        populate_by_name=True,
+    )
+
+    max_part_size: int = Field(default=64 * 1024 * 1024, gt=0)
+    max_age_seconds: float = Field(default=24 * 3600.0, gt=0)
+    cleanup_interval_seconds: float = Field(default=3600.0, gt=0)
+
+
+class ArchiveConfiguration(BaseModel):
+    model_config = ConfigDict(
+        alias_generator=to_kebab,
+        populate_by_name=True,
+    )
+
+    read_ahead_files: int = Field(default=4, gt=0)
+    read_ahead_bytes: int = Field(default=32 * 1024 * 1024, gt=0)
+
+
+class BatchConfiguration(BaseModel):
+    model_config = ConfigDict(
+        alias_generator=to_kebab,
+        populate_by_name=True,
+    )
+
+    max_operations: int = Field(default=1000, gt=0, le=MAX_BATCH_OPERATIONS)
+    concurrency: int = Field(default=16, gt=0)
+
+
+class ProfilingConfiguration(BaseModel):
+    model_config = ConfigDict(
+        alias_generator=to_kebab,
+        populate_by_name=True,
+    )
+
+    sample_rate: float = Field(default=0.0, ge=0, le=1)
+    secret: SecretStr | None = None
+    directory: str = "profiles"
+    interval_seconds: float = Field(default=0.005, gt=0)
+
+
 class Configuration(BaseModel):
     model_config = ConfigDict(
         alias_generator=to_kebab,
@@ -48,6 +218,16 @@ class Configuration(BaseModel):
     )
 
     storage_backend: StorageBackendConfiguration
+    listing_cache: ListingCacheConfiguration = ListingCacheConfiguration()
+    download_cache: DownloadCacheConfiguration = DownloadCacheConfiguration()
+    metadata_index: MetadataIndexConfiguration = MetadataIndexConfiguration()
+    dedup: DedupConfiguration = DedupConfiguration()
+    compression: CompressionConfiguration = CompressionConfiguration()
+    thumbnails: ThumbnailConfiguration = ThumbnailConfiguration()
+    upload_sessions: UploadSessionConfiguration = UploadSessionConfiguration()
+    archive: ArchiveConfiguration = ArchiveConfiguration()
+    batch: BatchConfiguration = BatchConfiguration()
+    profiling: ProfilingConfiguration = ProfilingConfiguration()
 
 
 @lru_cache
@@ -1,12 +1,133 @@
+import asyncio
+import os
+import shutil
+import tempfile
+from contextlib import asynccontextmanager
+
 from fastapi import (
     FastAPI,
     status,
 )
 from fastapi.middleware.cors import CORSMiddleware
 
-from src.routes.file import router as file_router
+from src.configuration import get_configuration
+from src.compression import Compression, CompressionMiddleware
+from src.metrics import MetricsMiddleware
+from src.profiling import PROFILE_ID_HEADER, ProfilingMiddleware
+from src.repositories.files.cache import ListingCache
+from src.repositories.files.dedup import ContentIndex
+from src.repositories.files.download_cache import DownloadCache
+from src.repositories.files.fastapi import (
+    create_file_repository,
+    storage_backend_lifespan,
+)
+from src.repositories.files.index import MetadataIndex, reconcile_periodically
+from src.repositories.files.thumbnails import Thumbnails, create_render_executor
+from src.repositories.files.uploads import abort_stale_uploads_periodically
+from src.repositories.logger import logger
+from src.routes.batch import router as batch_router
+from src.routes.file import NEXT_PAGE_HEADER, router as file_router
+from src.routes.metrics import router as metrics_router
+from src.routes.search import router as search_router
+from src.routes.storage import router as storage_router
+from src.routes.thumbnail import router as thumbnail_router
+from src.routes.upload import router as upload_router
+
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    configuration = get_configuration()
+    app.state.listing_cache = (
+        ListingCache(
+            configuration.listing_cache.max_entries,
+            configuration.listing_cache.ttl_seconds,
+        )
+        if configuration.listing_cache.enabled
+        else None
+    )
+    app.state.compression = (
+        Compression(configuration.compression)
+        if configuration.compression.enabled
+        else None
+    )
+    profiling = configuration.profiling
+    app.state.profiling = (
+        profiling if profiling.sample_rate > 0 or profiling.secret is not None else None
+    )
+    download_cache = configuration.download_cache
+    app.state.download_cache = None
+    if download_cache.enabled:
+        os.makedirs(download_cache.directory, exist_ok=True)
+        app.state.download_cache = DownloadCache(
+            tempfile.mkdtemp(prefix=f"{os.getpid()}-", dir=download_cache.directory),
+            download_cache.max_bytes,
+            download_cache.max_file_size,
+        )
+    metadata_index = configuration.metadata_index
+    app.state.metadata_index = None
+    if metadata_index.enabled:
+        os.makedirs(metadata_index.directory, exist_ok=True)
+        app.state.metadata_index = MetadataIndex(
+            metadata_index.directory,
+            logger,
+            metadata_index.search_workers,
+            metadata_index.refresh_concurrency,
+        )
+    app.state.content_index = None
+    if configuration.dedup.enabled:
+        os.makedirs(
+            os.path.dirname(os.path.abspath(configuration.dedup.database)),
+            exist_ok=True,
+        )
+        app.state.content_index = ContentIndex(configuration.dedup.database)
+    thumbnails = configuration.thumbnails
+    app.state.thumbnails = None
+    if thumbnails.enabled:
+        app.state.thumbnails = Thumbnails(
+            create_render_executor(thumbnails.workers),
+            thumbnails.workspace,
+            logger,
+            thumbnails.format,
+        )
+    try:
+        async with storage_backend_lifespan(app, configuration.storage_backend):
+            upload_cleanup = asyncio.create_task(
+                abort_stale_uploads_periodically(
+                    lambda: create_file_repository(app, configuration, logger),
+                    configuration.upload_sessions.cleanup_interval_seconds,
+                    configuration.upload_sessions.max_age_seconds,
+                    logger,
+                )
+            )
+            reconciliation = None
+            if app.state.metadata_index is not None:
+                reconciliation = asyncio.create_task(
+                    reconcile_periodically(
+                        app.state.metadata_index,
+                        lambda: create_file_repository(app, configuration, logger),
+                        metadata_index.reconcile_interval_seconds,
+                    )
+                )
+            try:
+                yield
+            finally:
+                upload_cleanup.cancel()
+                if reconciliation is not None:
+                    reconciliation.cancel()
+    finally:
+        if app.state.thumbnails is not None:
+            await asyncio.to_thread(app.state.thumbnails.executor.shutdown)
+        if app.state.content_index is not None:
+            await asyncio.to_thread(app.state.content_index.close)
+        if app.state.metadata_index is not None:
+            await asyncio.to_thread(app.state.metadata_index.close)
+        if app.state.download_cache is not None:
+            await asyncio.to_thread(
+                shutil.rmtree, app.state.download_cache.directory, ignore_errors=True
+            )
+
+
+app = FastAPI(lifespan=lifespan)
 
 
 app.add_middleware(
@@ -18,10 +139,21 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", NEXT_PAGE_HEADER, PROFILE_ID_HEADER],
 )
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 
 app.include_router(file_router)
+app.include_router(upload_router)
+app.include_router(thumbnail_router)
+app.include_router(batch_router)
+app.include_router(search_router)
+app.include_router(storage_router)
+app.include_router(metrics_router)
+
 
 @app.get(
     "/ready",
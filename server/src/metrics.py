@@ -0,0 +1,101 @@
+import time
+
+from prometheus_client import Counter, Gauge, Histogram
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+REQUEST_DURATION = Histogram(
+    "filemanager_http_request_duration_seconds",
+    "Time taken to respond to a request, including streaming the body",
+    ["method", "route", "status"],
+)
+
+REQUESTS_IN_FLIGHT = Gauge(
+    "filemanager_http_requests_in_flight",
+    "Requests being handled",
+    ["method"],
+    multiprocess_mode="livesum",
+)
+
+STORAGE_OPERATION_DURATION = Histogram(
+    "filemanager_storage_operation_duration_seconds",
+    "Time taken by a file repository operation on the storage backend",
+    ["backend", "operation", "outcome"],
+)
+
+STORAGE_BYTES_RECEIVED = Counter(
+    "filemanager_storage_bytes_received",
+    "Bytes uploaded to the storage backend",
+    ["workspace"],
+)
+
+STORAGE_BYTES_SENT = Counter(
+    "filemanager_storage_bytes_sent",
+    "Bytes of downloads served from the storage backend",
+    ["workspace"],
+)
+
+DOWNLOAD_CACHE_LOOKUPS = Counter(
+    "filemanager_download_cache_lookups",
+    "Downloads looked up in the local disk cache",
+    ["result"],
+)
+
+DOWNLOAD_CACHE_BYTES_SAVED = Counter(
+    "filemanager_download_cache_bytes_saved",
+    "Bytes of downloads served from the local disk cache instead of the storage backend",
+)
+
+DOWNLOAD_CACHE_BYTES = Gauge(
+    "filemanager_download_cache_bytes",
+    "Bytes of files held in the local disk cache",
+    multiprocess_mode="livesum",
+)
+
+DEDUP_LOOKUPS = Counter(
+    "filemanager_dedup_lookups",
+    "Uploads looked up in the content index by the digest of their content",
+    ["result"],
+)
+
+DEDUP_BYTES_SAVED = Counter(
+    "filemanager_dedup_bytes_saved",
+    "Bytes of uploads copied from a file with the same content instead of written",
+)
+
+
+class MetricsMiddleware:
+    """
+    Records the latency of every request by route template, and the number of
+    requests being handled.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        method = scope["method"]
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        in_flight = REQUESTS_IN_FLIGHT.labels(method)
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            in_flight.dec()
+            # Set by the router once the request is matched to a route
+            route = scope.get("route")
+            REQUEST_DURATION.labels(
+                method,
+                route.path if route is not None else "<unmatched>",
+                str(status_code),
+            ).observe(time.perf_counter() - start)
@@ -0,0 +1,66 @@
+from enum import Enum
+from typing import Annotated, Literal, Optional, Union
+
+from pydantic import BaseModel, ConfigDict, Field
+from pydantic.alias_generators import to_camel
+
+
+class BatchOperationType(str, Enum):
+    DELETE = "delete"
+    COPY = "copy"
+    MOVE = "move"
+
+
+class DeleteOperation(BaseModel):
+    model_config = ConfigDict(alias_generator=to_camel, populate_by_name=True)
+    op: Literal[BatchOperationType.DELETE]
+
+    path: str
+
+
+class CopyOperation(BaseModel):
+    model_config = ConfigDict(alias_generator=to_camel, populate_by_name=True)
+    op: Literal[BatchOperationType.COPY]
+
+    path: str
+    target_path: str
+    target_workspace_id: Optional[str] = None
+
+
+class MoveOperation(BaseModel):
+    model_config = ConfigDict(alias_generator=to_camel, populate_by_name=True)
+    op: Literal[BatchOperationType.MOVE]
+
+    path: str
+    target_path: str
+    target_workspace_id: Optional[str] = None
+
+
+BatchOperation = Annotated[
+    Union[DeleteOperation, CopyOperation, MoveOperation],
+    Field(discriminator="op"),
+]
+
+
+# The most operations a batch may hold, whatever the configured limit, so that
+# a larger body is rejected as it is validated
+MAX_BATCH_OPERATIONS = 10000
+
+
+class BatchRequest(BaseModel):
+    operations: list[BatchOperation] = Field(max_length=MAX_BATCH_OPERATIONS)
+
+
+class BatchOperationStatus(str, Enum):
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+class BatchOperationResult(BaseModel):
+    model_config = ConfigDict(alias_generator=to_camel, populate_by_name=True)
+
+    op: BatchOperationType
+    path: str
+    status: BatchOperationStatus
+    status_code: int
+    detail: Optional[str] = None
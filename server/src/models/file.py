@@ -1,11 +1,31 @@
-from pydantic import BaseModel, ConfigDict, Field
+from pydantic import (
+    BaseModel,
+    ConfigDict,
+    Field,
+    SerializerFunctionWrapHandler,
+    model_serializer,
+)
+from pydantic_core import to_json
 from pydantic.alias_generators import to_camel
+from dataclasses import dataclass, field
+import hashlib
 from datetime import datetime
+from functools import lru_cache
 from minio.datatypes import Object
 import mimetypes
 from enum import Enum
-from typing import Annotated, Literal, Union
-import os
+from typing import (
+    Annotated,
+    AsyncIterator,
+    Callable,
+    Iterator,
+    Literal,
+    NamedTuple,
+    NotRequired,
+    Optional,
+    TypedDict,
+    Union,
+)
 
 
 class DirectoryListingType(str, Enum):
@@ -31,6 +51,18 @@ class Directory(BaseModel):
 
     name: str
     path: str
+    # Total size and number of the files within, when requested
+    size: Optional[int] = None
+    count: Optional[int] = None
+
+    @model_serializer(mode="wrap")
+    def _omit_missing_totals(self, handler: SerializerFunctionWrapHandler) -> dict:
+        # Listings without totals keep their original shape
+        data = handler(self)
+        for key in ("size", "count"):
+            if data.get(key, 0) is None:
+                del data[key]
+        return data
 
 
 DirectoryListing = Annotated[
@@ -39,20 +71,285 @@ DirectoryListing = Annotated[
 ]
 
 
-def directory_listing_from_object(obj: Object) -> DirectoryListing:
+class DirectoryUsage(BaseModel):
+    model_config = ConfigDict(alias_generator=to_camel, populate_by_name=True)
+
+    path: str
+    size: int = 0
+    count: int = 0
+    directories: list[Directory] = []
+
+
+class PresignMethod(str, Enum):
+    GET = "GET"
+    PUT = "PUT"
+
+
+class PresignedUrl(BaseModel):
+    model_config = ConfigDict(alias_generator=to_camel, populate_by_name=True)
+
+    method: PresignMethod
+    url: str
+    expires_at: datetime
+
+
+class UploadStatus(str, Enum):
+    UPLOADED = "uploaded"
+    FAILED = "failed"
+
+
+class UploadResult(BaseModel):
+    model_config = ConfigDict(alias_generator=to_camel, populate_by_name=True)
+
+    name: str
+    filename: str
+    status: UploadStatus
+    size: Optional[int] = None
+    detail: Optional[str] = None
+
+
+class UploadSession(BaseModel):
+    """A multipart upload in progress, to which parts are sent one at a time"""
+
+    model_config = ConfigDict(alias_generator=to_camel, populate_by_name=True)
+
+    upload_id: str
+    name: str
+    initiated: datetime
+
+
+class UploadPart(BaseModel):
+    model_config = ConfigDict(alias_generator=to_camel, populate_by_name=True)
+
+    part_number: int
+    etag: str
+    size: Optional[int] = None
+    last_modified: Optional[datetime] = None
+
+
+class CompletedPart(BaseModel):
+    model_config = ConfigDict(alias_generator=to_camel, populate_by_name=True)
+
+    part_number: int
+    etag: str
+
+
+class CompleteUploadRequest(BaseModel):
+    model_config = ConfigDict(alias_generator=to_camel, populate_by_name=True)
+
+    parts: Optional[list[CompletedPart]] = None
+
+
+class DeleteFailure(BaseModel):
+    model_config = ConfigDict(alias_generator=to_camel, populate_by_name=True)
+
+    name: str
+    code: str
+    message: Optional[str] = None
+
+
+class DeleteResult(BaseModel):
+    model_config = ConfigDict(alias_generator=to_camel, populate_by_name=True)
+
+    deleted: int = 0
+    failed: int = 0
+    failures: list[DeleteFailure] = []
+
+
+class TransferFailure(BaseModel):
+    model_config = ConfigDict(alias_generator=to_camel, populate_by_name=True)
+
+    name: str
+    detail: str
+
+
+class TransferResult(BaseModel):
+    model_config = ConfigDict(alias_generator=to_camel, populate_by_name=True)
+
+    copied: int = 0
+    bytes_copied: int = 0
+    deleted: int = 0
+    failed: int = 0
+    failures: list[TransferFailure] = []
+    done: bool = False
+
+
+class ByteRange(NamedTuple):
+    """
+    A single range from a `Range: bytes=...` header, both ends inclusive.
+
+    `start` is None for a suffix range, in which case `end` is the number of
+    bytes to return from the end of the file. `end` is None for an open range.
+    """
+
+    start: Optional[int]
+    end: Optional[int]
+
+
+@dataclass
+class FileDownload:
+    filename: str
+    content_type: str
+    content: AsyncIterator[bytes]
+    content_length: int
+    size: int
+    content_range: Optional[tuple[int, int]] = None
+    etag: Optional[str] = None
+    last_modified: Optional[datetime] = None
+    release: Callable[[], None] = field(default=lambda: None)
+    # Set when the content is a file on local disk, which can be sent as is
+    file_path: Optional[str] = None
+
+
+@dataclass
+class ObjectMetadata:
+    """A file found by walking a directory"""
+
+    name: str
+    size: int
+    last_modified: datetime
+    etag: Optional[str] = None
+    content_type: Optional[str] = None
+
+
+@dataclass
+class FileMetadata:
+    filename: str
+    content_type: str
+    size: int
+    etag: Optional[str] = None
+    last_modified: Optional[datetime] = None
+
+
+@lru_cache(maxsize=4096)
+def _content_type_for_suffixes(suffixes: str) -> str:
+    return mimetypes.guess_file_type(f"file{suffixes}")[0] or "application/octet-stream"
+
+
+def guess_content_type(name: str) -> str:
+    """Guess the content type of a file from its name
+
+    Guesses are memoised per extension. Only the last two suffixes can change the
+    guess (as in `.tar.gz`), so they are used as the key.
+
+    Args:
+        name: The name or path of the file.
+
+    Returns:
+        The guessed content type, or application/octet-stream.
+    """
+    basename = name[name.rfind("/") + 1 :]
+    suffixes = basename.split(".")[1:][-2:]
+    return _content_type_for_suffixes("".join(f".{suffix}" for suffix in suffixes))
+
+
+class FileEntry(TypedDict):
+    """A `File` listing in the shape it is serialized in, built without validation"""
+
+    type: Literal["file"]
+    name: str
+    basename: str
+    path: str
+    contentType: str
+    size: int
+    lastModified: datetime
+
+
+class DirectoryEntry(TypedDict):
+    """A `Directory` listing in the shape it is serialized in, built without validation"""
+
+    type: Literal["directory"]
+    name: str
+    path: str
+    size: NotRequired[int]
+    count: NotRequired[int]
+
+
+DirectoryListingEntry = Union[FileEntry, DirectoryEntry]
+
+
+@dataclass
+class DirectoryListingPage:
+    entries: list[DirectoryListingEntry]
+    next_start_after: Optional[str] = None
+
+
+def file_entry(
+    name: str,
+    size: int,
+    last_modified: datetime,
+    content_type: Optional[str] = None,
+) -> FileEntry:
+    separator = name.rfind("/")
+    return {
+        "type": "file",
+        "name": name,
+        "basename": name[separator + 1 :],
+        "path": name[:separator] if separator >= 0 else "",
+        "contentType": content_type or guess_content_type(name),
+        "size": size,
+        "lastModified": last_modified,
+    }
+
+
+def directory_entry(path: str) -> DirectoryEntry:
+    return {
+        "type": "directory",
+        "name": path[path.rfind("/") + 1 :],
+        "path": path,
+    }
+
+
+def directory_listing_from_object(obj: Object) -> DirectoryListingEntry:
     if obj.object_name.endswith("/"):
-        return Directory(
-            name=os.path.basename(obj.object_name[:-1]),
-            path=obj.object_name[:-1],
-        )
-
-    return File(
-        name=obj.object_name,
-        content_type=obj.content_type
-        or mimetypes.guess_file_type(obj.object_name)[0]
-        or "application/octet-stream",
-        size=obj.size,
-        last_modified=obj.last_modified,
-        basename=os.path.basename(obj.object_name),
-        path=os.path.split(obj.object_name)[0],
+        return directory_entry(obj.object_name[:-1])
+
+    return file_entry(
+        obj.object_name, obj.size, obj.last_modified, content_type=obj.content_type
     )
+
+
+def directory_listing_json(
+    entries: list[DirectoryListingEntry], batch_size: int = 1000
+) -> Iterator[bytes]:
+    """Serialize directory listings to a JSON array, a batch of entries at a time
+
+    Entries are already in the `DirectoryListing` shape, so they are written by
+    pydantic-core without being validated again, and the array can be streamed
+    without building the whole document.
+
+    Args:
+        entries: The entries to serialize.
+        batch_size: The number of entries in each chunk.
+
+    Returns:
+        The chunks of the JSON array.
+    """
+    yield b"["
+    for start in range(0, len(entries), batch_size):
+        if start:
+            yield b","
+        # Strip the brackets of each batch, they are part of the outer array
+        yield to_json(entries[start : start + batch_size])[1:-1]
+    yield b"]"
+
+
+def directory_listing_etag(page: DirectoryListingPage, batch_size: int = 1000) -> str:
+    """An entity tag for a page of directory listings
+
+    The tag is a hash of the page as `directory_listing_json` serializes it, so it
+    is strong. The hash is computed a batch at a time, so the whole document is
+    still never held in memory.
+
+    Args:
+        page: The page of entries.
+        batch_size: The number of entries serialized at a time.
+
+    Returns:
+        The quoted entity tag.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for start in range(0, len(page.entries), batch_size):
+        digest.update(to_json(page.entries[start : start + batch_size]))
+    digest.update((page.next_start_after or "").encode())
+    return f'"{digest.hexdigest()}"'
@@ -0,0 +1,57 @@
+from pydantic import BaseModel, ConfigDict
+from pydantic.alias_generators import to_camel
+
+
+class ConnectionPoolHostStats(BaseModel):
+    model_config = ConfigDict(alias_generator=to_camel, populate_by_name=True)
+
+    host: str
+    port: int | None
+    scheme: str
+    in_use: int
+    idle: int
+    connections_opened: int
+    requests: int
+
+
+class ConnectionPoolStats(BaseModel):
+    model_config = ConfigDict(alias_generator=to_camel, populate_by_name=True)
+
+    max_connections_per_host: int
+    hosts: list[ConnectionPoolHostStats]
+
+
+class ListingCacheStats(BaseModel):
+    model_config = ConfigDict(alias_generator=to_camel, populate_by_name=True)
+
+    entries: int
+    max_entries: int
+    hits: int
+    misses: int
+    evictions: int
+    expirations: int
+    invalidations: int
+
+
+class DownloadCacheStats(BaseModel):
+    model_config = ConfigDict(alias_generator=to_camel, populate_by_name=True)
+
+    entries: int
+    bytes: int
+    max_bytes: int
+    hits: int
+    misses: int
+    hit_rate: float
+    bytes_saved: int
+    evictions: int
+    invalidations: int
+
+
+class DedupStats(BaseModel):
+    model_config = ConfigDict(alias_generator=to_camel, populate_by_name=True)
+
+    entries: int
+    hits: int
+    misses: int
+    hit_rate: float
+    bytes_saved: int
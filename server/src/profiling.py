@@ -0,0 +1,298 @@
+import asyncio
+import contextvars
+import hmac
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from types import FrameType
+from typing import Callable, Iterator, Optional, TypeVar
+
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+T = TypeVar("T")
+
+PROFILE_HEADER = "X-Profile"
+
+PROFILE_ID_HEADER = "X-Profile-Id"
+
+PHASES = ["backend", "model_building", "serialization", "other"]
+
+_EXHAUSTED = object()
+
+# Functions whose samples count as serialization wherever they are called from
+SERIALIZATION_FUNCTIONS = {
+    "directory_listing_json",
+    "jsonable_encoder",
+    "model_dump",
+    "model_dump_json",
+    "render",
+    "_prepare_response_content",
+}
+
+# Files whose samples count as waiting on the storage backend: the repositories
+# that talk to it, and the client libraries they use. The wrappers around them,
+# as the archive writer or the caches, do the work of this service
+BACKEND_FILES = tuple(
+    os.path.join("repositories", "files", name)
+    for name in ("minio.py", "local.py", "memory.py")
+)
+BACKEND_PACKAGES = ("minio", "urllib3")
+
+
+@dataclass
+class RequestProfile:
+    """
+    Stack samples and phase timings of a single request.
+
+    Samples are taken by a background thread from the event loop thread, while a
+    task of the request is running, and from any storage backend thread running a
+    call made by the request.
+    """
+
+    loop: asyncio.AbstractEventLoop
+    loop_thread: int
+    interval: float
+    id: str = field(default_factory=lambda: uuid.uuid4().hex[:16])
+    # Microseconds sampled in each stack, and seconds sampled in each phase
+    stacks: Counter = field(default_factory=Counter)
+    phase_seconds: Counter = field(default_factory=Counter)
+    # Wall time the request spent waiting on the storage backend
+    backend_seconds: float = 0.0
+    # Threads doing work for the request, other than the event loop thread
+    threads: dict[int, str] = field(default_factory=dict)
+    stopped: threading.Event = field(default_factory=threading.Event)
+
+    def run_sampler(self) -> None:
+        last = time.perf_counter()
+        while not self.stopped.wait(self.interval):
+            frames = sys._current_frames()
+            # The sampler only runs when it gets the GIL, so each sample stands
+            # for the time since the last one rather than the interval
+            now = time.perf_counter()
+            elapsed, last = now - last, now
+            task = asyncio.current_task(self.loop)
+            if (
+                task is not None
+                and task.get_context().get(active_profile) is self
+                and self.loop_thread in frames
+            ):
+                self._record(frames[self.loop_thread], "event-loop", elapsed)
+            for thread_id, thread in list(self.threads.items()):
+                if thread_id in frames:
+                    self._record(frames[thread_id], thread, elapsed)
+
+    def _record(self, frame: Optional[FrameType], thread: str, elapsed: float) -> None:
+        stack = []
+        phase = None
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_qualname} ({os.path.basename(code.co_filename)})")
+            if phase is None:
+                phase = classify(code.co_qualname, code.co_filename)
+            frame = frame.f_back
+        stack.append(thread)
+        self.stacks[";".join(reversed(stack))] += max(round(elapsed * 1_000_000), 1)
+        self.phase_seconds[phase or "other"] += elapsed
+
+    def summary(self, scope: Scope, status_code: int, duration: float) -> dict:
+        route = scope.get("route")
+        return {
+            "id": self.id,
+            "method": scope["method"],
+            "path": scope["path"],
+            "route": route.path if route is not None else None,
+            "status": status_code,
+            "duration_seconds": duration,
+            "backend_wait_seconds": self.backend_seconds,
+            "interval_seconds": self.interval,
+            "phase_seconds": {phase: self.phase_seconds[phase] for phase in PHASES},
+        }
+
+    def write(self, directory: str, summary: dict) -> None:
+        """Write the profile as folded stacks, as read by flamegraph.pl and
+        speedscope, weighted in microseconds, and its phase breakdown as JSON
+
+        Args:
+            directory: The directory to write the profile to.
+            summary: The phase breakdown of the request.
+        """
+        os.makedirs(directory, exist_ok=True)
+        name = os.path.join(
+            directory,
+            f"{time.strftime('%Y%m%dT%H%M%S')}-{summary['method'].lower()}-{self.id}",
+        )
+        with open(f"{name}.folded", "w") as folded:
+            for stack, count in self.stacks.most_common():
+                folded.write(f"{stack} {count}\n")
+        with open(f"{name}.json", "w") as breakdown:
+            json.dump(summary, breakdown, indent=2)
+
+
+active_profile: contextvars.ContextVar[Optional[RequestProfile]] = (
+    contextvars.ContextVar("active_profile", default=None)
+)
+
+
+def classify(qualname: str, filename: str) -> Optional[str]:
+    """The phase a frame belongs to, if it marks one
+
+    Args:
+        qualname: The qualified name of the function.
+        filename: The file the function is defined in.
+
+    Returns:
+        The phase, or None if the frame does not mark one.
+    """
+    name = qualname.rsplit(".", 1)[-1]
+    if name in SERIALIZATION_FUNCTIONS or f"{os.sep}json{os.sep}" in filename:
+        return "serialization"
+    if f"{os.sep}pydantic{os.sep}" in filename or name == "serialize_response":
+        return "model_building"
+    if filename.endswith(BACKEND_FILES) or any(
+        f"{os.sep}{package}{os.sep}" in filename for package in BACKEND_PACKAGES
+    ):
+        return "backend"
+    return None
+
+
+@contextmanager
+def backend_phase() -> Iterator[None]:
+    """Count the time in the block as waiting on the storage backend, if the
+    request is being profiled"""
+    profile = active_profile.get()
+    if profile is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.backend_seconds += time.perf_counter() - start
+
+
+@contextmanager
+def _attributed(profile: RequestProfile, thread: str) -> Iterator[None]:
+    thread_id = threading.get_ident()
+    profile.threads[thread_id] = thread
+    try:
+        yield
+    finally:
+        profile.threads.pop(thread_id, None)
+
+
+def bind(func: Callable[[], T]) -> Callable[[], T]:
+    """Attribute samples of the thread that runs `func` to the profiled request
+
+    Args:
+        func: The blocking call about to be handed to an executor.
+
+    Returns:
+        `func` itself when the request is not being profiled.
+    """
+    profile = active_profile.get()
+    if profile is None:
+        return func
+
+    def run() -> T:
+        with _attributed(profile, "storage-backend"):
+            return func()
+
+    return run
+
+
+def bind_iterator(iterator: Iterator[T]) -> Iterator[T]:
+    """Attribute samples of the threads that advance `iterator` to the profiled
+    request, as when a response body is iterated in the thread pool
+
+    Args:
+        iterator: The iterator about to be handed to a response.
+
+    Returns:
+        `iterator` itself when the request is not being profiled.
+    """
+    profile = active_profile.get()
+    if profile is None:
+        return iterator
+
+    def run() -> Iterator[T]:
+        while True:
+            with _attributed(profile, "worker"):
+                item = next(iterator, _EXHAUSTED)
+            if item is _EXHAUSTED:
+                return
+            yield item
+
+    return run()
+
+
+class ProfilingMiddleware:
+    """
+    Profiles a sampled fraction of requests, and requests sent with the admin
+    secret in the `X-Profile` header. Reads its configuration from
+    `app.state.profiling`, and is disabled when there is none.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    def _should_profile(self, scope: Scope) -> bool:
+        configuration = getattr(scope["app"].state, "profiling", None)
+        if configuration is None:
+            return False
+        if configuration.secret is not None:
+            header = Headers(scope=scope).get(PROFILE_HEADER)
+            if header is not None and hmac.compare_digest(
+                header.encode(), configuration.secret.get_secret_value().encode()
+            ):
+                return True
+        return random.random() < configuration.sample_rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self._should_profile(scope):
+            return await self.app(scope, receive, send)
+
+        configuration = scope["app"].state.profiling
+        profile = RequestProfile(
+            loop=asyncio.get_running_loop(),
+            loop_thread=threading.get_ident(),
+            interval=configuration.interval_seconds,
+        )
+        status_code = 500
+
+        async def send_with_profile_id(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message.setdefault("headers", [])
+                message["headers"] = [
+                    *message["headers"],
+                    (PROFILE_ID_HEADER.lower().encode(), profile.id.encode()),
+                ]
+            await send(message)
+
+        sampler = threading.Thread(
+            target=profile.run_sampler, name="request-profiler", daemon=True
+        )
+        token = active_profile.set(profile)
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            duration = time.perf_counter() - start
+            profile.stopped.set()
+            active_profile.reset(token)
+            await asyncio.to_thread(sampler.join)
+            await asyncio.to_thread(
+                profile.write,
+                configuration.directory,
+                profile.summary(scope, status_code, duration),
+            )
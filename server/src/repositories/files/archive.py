@@ -0,0 +1,181 @@
+import asyncio
+import zipfile
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import AsyncIterator, Optional, Union
+
+from src.models.file import FileDownload
+from src.repositories.files.base import FileRepository
+
+# The earliest time a ZIP entry can carry
+ZIP_EPOCH = datetime(1980, 1, 1, tzinfo=timezone.utc)
+
+
+class _Sink:
+    """An unseekable file an archive is written to, drained after every write"""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+@dataclass
+class _Prefetch:
+    """A file of the archive being downloaded ahead of being written
+
+    Its queue holds the opened download, then its chunks, then None, or the error
+    that stopped the download.
+    """
+
+    name: str
+    items: asyncio.Queue[Union[FileDownload, bytes, Exception, None]] = field(
+        default_factory=asyncio.Queue
+    )
+    buffered: int = 0
+    writing: bool = False
+
+
+class _ReadAhead:
+    """The bytes downloaded but not yet written, shared by the files in flight"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.used = 0
+        self._changed = asyncio.Condition()
+
+    async def acquire(self, prefetch: _Prefetch, size: int) -> None:
+        async with self._changed:
+            # The file being written may always hold a chunk, so the files after
+            # it can't starve it of the budget
+            await self._changed.wait_for(
+                lambda: self.used + size <= self.max_bytes
+                or (prefetch.writing and prefetch.buffered == 0)
+            )
+            self.used += size
+            prefetch.buffered += size
+
+    async def release(self, prefetch: _Prefetch, size: int) -> None:
+        async with self._changed:
+            self.used -= size
+            prefetch.buffered -= size
+            self._changed.notify_all()
+
+    async def start_writing(self, prefetch: _Prefetch) -> None:
+        async with self._changed:
+            prefetch.writing = True
+            self._changed.notify_all()
+
+
+def zip_date_time(value: Optional[datetime]) -> tuple[int, int, int, int, int, int]:
+    value = max(value or datetime.now(timezone.utc), ZIP_EPOCH)
+    return value.astimezone(timezone.utc).timetuple()[:6]
+
+
+async def zip_directory(
+    repository: FileRepository,
+    workspace_id: str,
+    path: Optional[str] = None,
+    read_ahead_files: int = 4,
+    read_ahead_bytes: int = 32 * 1024 * 1024,
+) -> AsyncIterator[bytes]:
+    """Stream the files within a directory as a ZIP archive
+
+    The next `read_ahead_files` files are downloaded while a file is written, so
+    the archive is not held up by the round trip to open each of them. The
+    chunks downloaded ahead are bounded by `read_ahead_bytes` across all of the
+    files, so memory stays flat however large the directory is. Entries are
+    stored uncompressed with their sizes after their content, and ZIP64 is used
+    for the files too large for plain ZIP.
+
+    Args:
+        repository: The repository to read the files from.
+        workspace_id: The ID of the workspace.
+        path: The path of the directory. Defaults to the workspace root.
+        read_ahead_files: The number of files downloaded ahead of the one written.
+        read_ahead_bytes: The most bytes downloaded ahead of the archive.
+
+    Returns:
+        The chunks of the archive. The first chunk is only produced once the
+        first file is open, so a missing workspace raises before it.
+    """
+    path = (path or "").strip("/")
+    prefix = f"{path}/" if path else ""
+    read_ahead = _ReadAhead(read_ahead_bytes)
+    pending: asyncio.Queue[Union[_Prefetch, Exception, None]] = asyncio.Queue(
+        maxsize=read_ahead_files
+    )
+    tasks: set[asyncio.Task] = set()
+
+    async def download(prefetch: _Prefetch, name: str) -> None:
+        try:
+            opened = await repository.download_file(workspace_id, name)
+        except Exception as error:
+            prefetch.items.put_nowait(error)
+            return
+        prefetch.items.put_nowait(opened)
+        try:
+            async for chunk in opened.content:
+                await read_ahead.acquire(prefetch, len(chunk))
+                prefetch.items.put_nowait(chunk)
+        except Exception as error:
+            prefetch.items.put_nowait(error)
+            return
+        finally:
+            opened.release()
+        prefetch.items.put_nowait(None)
+
+    async def walk() -> None:
+        try:
+            async for batch in repository.walk(workspace_id, path or None):
+                for file in batch:
+                    prefetch = _Prefetch(file.name[len(prefix) :])
+                    # Waits while `read_ahead_files` files are ahead of the writer
+                    await pending.put(prefetch)
+                    task = asyncio.create_task(download(prefetch, file.name))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+        except Exception as error:
+            await pending.put(error)
+            return
+        await pending.put(None)
+
+    walker = asyncio.create_task(walk())
+    sink = _Sink()
+    try:
+        with zipfile.ZipFile(sink, "w", allowZip64=True) as archive:
+            while (prefetch := await pending.get()) is not None:
+                if isinstance(prefetch, Exception):
+                    raise prefetch
+                opened = await prefetch.items.get()
+                if isinstance(opened, Exception):
+                    raise opened
+                await read_ahead.start_writing(prefetch)
+                info = zipfile.ZipInfo(
+                    prefetch.name, date_time=zip_date_time(opened.last_modified)
+                )
+                # Known up front, so ZIP64 is only used for the files that need it
+                info.file_size = opened.size
+                with archive.open(info, "w") as entry:
+                    while (chunk := await prefetch.items.get()) is not None:
+                        if isinstance(chunk, Exception):
+                            raise chunk
+                        entry.write(chunk)
+                        await read_ahead.release(prefetch, len(chunk))
+                        yield sink.take()
+                yield sink.take()
+        yield sink.take()
+    finally:
+        walker.cancel()
+        for task in list(tasks):
+            task.cancel()
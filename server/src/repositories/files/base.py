@@ -1,18 +1,59 @@
 from abc import ABC, abstractmethod
-from typing import Optional
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Callable, Optional
 
 from fastapi import UploadFile  # TODO: Remove FastAPI dependency
-from src.models.file import DirectoryListing
+from src.models.file import (
+    ByteRange,
+    CompletedPart,
+    DeleteResult,
+    DirectoryListingPage,
+    FileDownload,
+    FileMetadata,
+    ObjectMetadata,
+    PresignMethod,
+    PresignedUrl,
+    TransferResult,
+    UploadPart,
+    UploadResult,
+    UploadSession,
+)
 
 
 class FileRepository(ABC):
     @abstractmethod
     async def stat(
-        self, workspace_id: str, path: Optional[str] = None
-    ) -> list[DirectoryListing]: ...
+        self,
+        workspace_id: str,
+        path: Optional[str] = None,
+        limit: Optional[int] = None,
+        start_after: Optional[str] = None,
+    ) -> DirectoryListingPage: ...
 
     @abstractmethod
-    async def download_file(self, workspace_id: str, path: str) -> bytes: ...
+    async def download_file(
+        self,
+        workspace_id: str,
+        path: str,
+        byte_range: Optional[ByteRange] = None,
+    ) -> FileDownload: ...
+
+    @abstractmethod
+    async def head_file(self, workspace_id: str, path: str) -> FileMetadata: ...
+
+    @abstractmethod
+    async def presign_url(
+        self,
+        workspace_id: str,
+        path: str,
+        method: PresignMethod,
+        expires: timedelta,
+    ) -> PresignedUrl: ...
+
+    @abstractmethod
+    def walk(
+        self, workspace_id: str, path: Optional[str] = None
+    ) -> AsyncIterator[list[ObjectMetadata]]: ...
 
     @abstractmethod
     async def upload_file(
@@ -20,13 +61,55 @@ class FileRepository(ABC):
         workspace_id: str,
         files: list[UploadFile],
         path: Optional[str] = "",
+    ) -> list[UploadResult]: ...
+
+    @abstractmethod
+    async def create_upload(
+        self, workspace_id: str, path: str, content_type: Optional[str] = None
+    ) -> UploadSession: ...
+
+    @abstractmethod
+    async def upload_part(
+        self,
+        workspace_id: str,
+        path: str,
+        upload_id: str,
+        part_number: int,
+        data: bytes,
+    ) -> UploadPart: ...
+
+    @abstractmethod
+    async def list_parts(
+        self, workspace_id: str, path: str, upload_id: str
+    ) -> list[UploadPart]: ...
+
+    @abstractmethod
+    async def complete_upload(
+        self,
+        workspace_id: str,
+        path: str,
+        upload_id: str,
+        parts: Optional[list[CompletedPart]] = None,
+    ) -> UploadResult: ...
+
+    @abstractmethod
+    async def abort_upload(
+        self, workspace_id: str, path: str, upload_id: str
     ) -> None: ...
 
+    @abstractmethod
+    async def list_uploads(
+        self, workspace_id: str, prefix: Optional[str] = None
+    ) -> list[UploadSession]: ...
+
+    @abstractmethod
+    async def abort_stale_uploads(self, initiated_before: datetime) -> int: ...
+
     @abstractmethod
     async def create_directory(self, workspace_id: str, path: str) -> None: ...
 
     @abstractmethod
-    async def delete_directory(self, workspace_id: str, path: str) -> None: ...
+    async def delete_directory(self, workspace_id: str, path: str) -> DeleteResult: ...
 
     @abstractmethod
     async def delete_file(self, workspace_id: str, path: str) -> None: ...
@@ -48,3 +131,23 @@ class FileRepository(ABC):
         target_path: str,
         target_workspace_id: Optional[str] = None,
     ) -> None: ...
+
+    @abstractmethod
+    async def copy_directory(
+        self,
+        workspace_id: str,
+        path: str,
+        target_path: str,
+        target_workspace_id: Optional[str] = None,
+        progress: Optional[Callable[[TransferResult], None]] = None,
+    ) -> TransferResult: ...
+
+    @abstractmethod
+    async def move_directory(
+        self,
+        workspace_id: str,
+        path: str,
+        target_path: str,
+        target_workspace_id: Optional[str] = None,
+        progress: Optional[Callable[[TransferResult], None]] = None,
+    ) -> TransferResult: ...
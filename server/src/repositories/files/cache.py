@@ -0,0 +1,320 @@
+import posixpath
+import time
+from collections import OrderedDict
+from typing import Callable, Literal, Optional, Union
+
+from fastapi import UploadFile  # TODO: Remove FastAPI dependency
+from src.models.file import (
+    CompletedPart,
+    DeleteResult,
+    DirectoryListingPage,
+    DirectoryUsage,
+    TransferResult,
+    UploadResult,
+)
+from src.models.storage import ListingCacheStats
+from src.repositories.files.base import FileRepository
+from src.repositories.files.forwarding import ForwardingFileRepository
+
+ListingKey = tuple[str, str, Optional[int], Optional[str]]
+
+# The totals of a directory, as `directory_usage` adds them up, share the
+# invalidation of its listings
+UsageKey = tuple[str, str, Literal["usage"]]
+
+CacheKey = Union[ListingKey, UsageKey]
+
+
+def normalize_path(path: Optional[str]) -> str:
+    """Normalise a directory path so that equivalent paths share cache entries
+
+    Args:
+        path: The directory path, None or empty for the workspace root.
+
+    Returns:
+        The path without leading or trailing slashes.
+    """
+    return (path or "").strip("/")
+
+
+def parent_directories(path: str) -> list[str]:
+    """List the directories that contain a path, up to the workspace root
+
+    Args:
+        path: The path of a file or directory within a workspace.
+
+    Returns:
+        The parent directory first, and the workspace root ("") last.
+    """
+    parents = []
+    path = normalize_path(path)
+    while path:
+        path = posixpath.dirname(path)
+        parents.append(path)
+    return parents
+
+
+class ListingCache:
+    """
+    A size bounded LRU cache of directory listings, and of the totals of the
+    files within directories, each kept for at most `ttl` seconds. The totals of
+    a directory are dropped along with its listings, which every write below it
+    drops.
+
+    Listings are shared by every request in the process. A listing fetched while
+    any invalidation happened is not stored, so a slow listing that raced a write
+    can't put stale entries back.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.epoch = 0
+        self._entries: OrderedDict[
+            CacheKey, tuple[float, Union[DirectoryListingPage, DirectoryUsage]]
+        ] = OrderedDict()
+        self._directories: dict[tuple[str, str], set[CacheKey]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(
+        self, key: CacheKey
+    ) -> Optional[Union[DirectoryListingPage, DirectoryUsage]]:
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(
+        self,
+        key: CacheKey,
+        page: Union[DirectoryListingPage, DirectoryUsage],
+        epoch: int,
+    ) -> None:
+        if epoch != self.epoch:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, page)
+        self._entries.move_to_end(key)
+        self._directories.setdefault(key[:2], set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def get_usage(self, workspace_id: str, path: str) -> Optional[DirectoryUsage]:
+        return self.get((workspace_id, normalize_path(path), "usage"))
+
+    def put_usage(
+        self, workspace_id: str, path: str, usage: DirectoryUsage, epoch: int
+    ) -> None:
+        self.put((workspace_id, normalize_path(path), "usage"), usage, epoch)
+
+    def invalidate(self, workspace_id: str, path: str, recursive: bool = False) -> None:
+        """Drop every cached page of a directory listing
+
+        Args:
+            workspace_id: The ID of the workspace containing the directory.
+            path: The path of the directory, "" for the workspace root.
+            recursive: Whether to drop the listings of its subdirectories too.
+        """
+        self.epoch += 1
+        path = normalize_path(path)
+        directories = [(workspace_id, path)]
+        if recursive:
+            prefix = f"{path}/" if path else ""
+            directories += [
+                directory
+                for directory in self._directories
+                if directory[0] == workspace_id and directory[1].startswith(prefix)
+            ]
+        for directory in directories:
+            for key in self._directories.get(directory, set()).copy():
+                self._remove(key)
+                self.invalidations += 1
+
+    def invalidate_parents(self, workspace_id: str, path: str) -> None:
+        """Drop the listings a file or directory appears in
+
+        Creating or removing an object can also create or remove the implicit
+        directories above it, so every parent up to the workspace root is dropped.
+
+        Args:
+            workspace_id: The ID of the workspace containing the path.
+            path: The path of the file or directory that changed.
+        """
+        for parent in parent_directories(path):
+            self.invalidate(workspace_id, parent)
+
+    def stats(self) -> ListingCacheStats:
+        return ListingCacheStats(
+            entries=len(self._entries),
+            max_entries=self.max_entries,
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.evictions,
+            expirations=self.expirations,
+            invalidations=self.invalidations,
+        )
+
+    def _remove(self, key: CacheKey) -> None:
+        del self._entries[key]
+        keys = self._directories[key[:2]]
+        keys.discard(key)
+        if not keys:
+            del self._directories[key[:2]]
+
+
+class CachingFileRepository(ForwardingFileRepository):
+    """
+    Serves directory listings from a `ListingCache`, and drops the affected
+    listings whenever a write goes through this repository.
+    """
+
+    def __init__(self, repository: FileRepository, cache: ListingCache):
+        super().__init__(repository)
+        self.cache = cache
+
+    async def stat(
+        self,
+        workspace_id: str,
+        path: Optional[str] = None,
+        limit: Optional[int] = None,
+        start_after: Optional[str] = None,
+    ) -> DirectoryListingPage:
+        key = (workspace_id, normalize_path(path), limit, start_after)
+        if (page := self.cache.get(key)) is not None:
+            return page
+        epoch = self.cache.epoch
+        page = await self.repository.stat(
+            workspace_id, path, limit=limit, start_after=start_after
+        )
+        self.cache.put(key, page, epoch)
+        return page
+
+    async def upload_file(
+        self,
+        workspace_id: str,
+        files: list[UploadFile],
+        path: Optional[str] = "",
+    ) -> list[UploadResult]:
+        try:
+            results = await self.repository.upload_file(workspace_id, files, path)
+        finally:
+            # Any of the files may have been written before a failure
+            for file in files:
+                self.cache.invalidate_parents(
+                    workspace_id, posixpath.join(path or "", file.filename or "")
+                )
+        return results
+
+    async def complete_upload(
+        self,
+        workspace_id: str,
+        path: str,
+        upload_id: str,
+        parts: Optional[list[CompletedPart]] = None,
+    ) -> UploadResult:
+        try:
+            return await self.repository.complete_upload(
+                workspace_id, path, upload_id, parts
+            )
+        finally:
+            self.cache.invalidate_parents(workspace_id, path)
+
+    async def create_directory(self, workspace_id: str, path: str) -> None:
+        try:
+            return await self.repository.create_directory(workspace_id, path)
+        finally:
+            self.cache.invalidate(workspace_id, path)
+            self.cache.invalidate_parents(workspace_id, path)
+
+    async def delete_directory(self, workspace_id: str, path: str) -> DeleteResult:
+        try:
+            return await self.repository.delete_directory(workspace_id, path)
+        finally:
+            self.cache.invalidate(workspace_id, path, recursive=True)
+            self.cache.invalidate_parents(workspace_id, path)
+
+    async def delete_file(self, workspace_id: str, path: str) -> None:
+        try:
+            return await self.repository.delete_file(workspace_id, path)
+        finally:
+            self.cache.invalidate_parents(workspace_id, path)
+
+    async def copy_file(
+        self,
+        workspace_id: str,
+        path: str,
+        target_path: str,
+        target_workspace_id: Optional[str] = None,
+    ) -> None:
+        try:
+            return await self.repository.copy_file(
+                workspace_id, path, target_path, target_workspace_id
+            )
+        finally:
+            self.cache.invalidate_parents(
+                target_workspace_id or workspace_id, target_path
+            )
+
+    async def move_file(
+        self,
+        workspace_id: str,
+        path: str,
+        target_path: str,
+        target_workspace_id: Optional[str] = None,
+    ) -> None:
+        try:
+            return await self.repository.move_file(
+                workspace_id, path, target_path, target_workspace_id
+            )
+        finally:
+            self.cache.invalidate_parents(workspace_id, path)
+            self.cache.invalidate_parents(
+                target_workspace_id or workspace_id, target_path
+            )
+
+    async def copy_directory(
+        self,
+        workspace_id: str,
+        path: str,
+        target_path: str,
+        target_workspace_id: Optional[str] = None,
+        progress: Optional[Callable[[TransferResult], None]] = None,
+    ) -> TransferResult:
+        try:
+            return await self.repository.copy_directory(
+                workspace_id, path, target_path, target_workspace_id, progress
+            )
+        finally:
+            target_workspace_id = target_workspace_id or workspace_id
+            self.cache.invalidate(target_workspace_id, target_path, recursive=True)
+            self.cache.invalidate_parents(target_workspace_id, target_path)
+
+    async def move_directory(
+        self,
+        workspace_id: str,
+        path: str,
+        target_path: str,
+        target_workspace_id: Optional[str] = None,
+        progress: Optional[Callable[[TransferResult], None]] = None,
+    ) -> TransferResult:
+        try:
+            return await self.repository.move_directory(
+                workspace_id, path, target_path, target_workspace_id, progress
+            )
+        finally:
+            self.cache.invalidate(workspace_id, path, recursive=True)
+            self.cache.invalidate_parents(workspace_id, path)
+            target_workspace_id = target_workspace_id or workspace_id
+            self.cache.invalidate(target_workspace_id, target_path, recursive=True)
+            self.cache.invalidate_parents(target_workspace_id, target_path)
@@ -0,0 +1,363 @@
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, BinaryIO, Callable, Optional, TypeVar
+
+from fastapi import UploadFile  # TODO: Remove FastAPI dependency
+from src.metrics import DEDUP_BYTES_SAVED, DEDUP_LOOKUPS
+from src.models.file import UploadResult, UploadStatus
+from src.models.storage import DedupStats
+from src.repositories.files.base import FileRepository
+from src.repositories.files.cache import normalize_path
+from src.repositories.files.forwarding import ForwardingFileRepository
+
+T = TypeVar("T")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS contents (
+    workspace_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    digest BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    etag TEXT NOT NULL,
+    content_type TEXT,
+    PRIMARY KEY (workspace_id, name)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS contents_by_digest ON contents (digest, size);
+"""
+
+# Files with the same content tried before an upload is written after all
+MAX_CANDIDATES = 8
+
+
+@dataclass
+class StoredContent:
+    """A file recorded in the content index, as it was when it was recorded"""
+
+    workspace_id: str
+    name: str
+    etag: str
+    content_type: Optional[str] = None
+
+
+def file_size(file: BinaryIO) -> int:
+    """The size of a seekable file, which is left at its start. Blocking."""
+    size = file.seek(0, os.SEEK_END)
+    file.seek(0)
+    return size
+
+
+def hash_file(file: BinaryIO) -> bytes:
+    """The SHA-256 digest of a seekable file, which is left at its start. Blocking."""
+    file.seek(0)
+    digest = hashlib.file_digest(file, "sha256").digest()
+    file.seek(0)
+    return digest
+
+
+class ContentIndex:
+    """
+    An SQLite database of the files uploaded through this service, by the digest
+    of their content.
+
+    Entries are never trusted on their own: a file is only copied from once its
+    entity tag is checked to be the one it was recorded with, and entries for
+    files that were since replaced or removed are dropped as they are found.
+
+    The database is in WAL mode and written by a single thread per process, so
+    the worker processes of a deployment can share it.
+    """
+
+    def __init__(self, database: str):
+        self.database = database
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="content-index"
+        )
+        self._connection: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+
+    def close(self) -> None:
+        """Wait for pending calls, and close the database. Blocking."""
+        self._executor.shutdown(wait=True)
+        if self._connection is not None:
+            self._connection.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the database on the index thread. Blocking."""
+        if self._connection is None:
+            connection = sqlite3.connect(
+                self.database, timeout=30, check_same_thread=False
+            )
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA synchronous = NORMAL")
+            connection.executescript(SCHEMA)
+            self._connection = connection
+        return self._connection
+
+    async def _run(self, func: Callable[..., T], /, *args: Any) -> T:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    def _lookup(self, digest: bytes, size: int) -> list[StoredContent]:
+        rows = self._connect().execute(
+            "SELECT workspace_id, name, etag, content_type FROM contents"
+            " WHERE digest = ? AND size = ? LIMIT ?",
+            (digest, size, MAX_CANDIDATES),
+        )
+        return [StoredContent(*row) for row in rows]
+
+    async def lookup(self, digest: bytes, size: int) -> list[StoredContent]:
+        """Find the files recorded with some content
+
+        Args:
+            digest: The SHA-256 digest of the content.
+            size: The size of the content.
+
+        Returns:
+            Up to `MAX_CANDIDATES` files, which may have changed since.
+        """
+        return await self._run(self._lookup, digest, size)
+
+    def _record(self, digest: bytes, size: int, content: StoredContent) -> None:
+        connection = self._connect()
+        with connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO contents"
+                " (workspace_id, name, digest, size, etag, content_type)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    content.workspace_id,
+                    normalize_path(content.name),
+                    digest,
+                    size,
+                    content.etag,
+                    content.content_type,
+                ),
+            )
+
+    async def record(self, digest: bytes, size: int, content: StoredContent) -> None:
+        """Record the content of a file, in place of what it held before"""
+        await self._run(self._record, digest, size, content)
+
+    def _forget(self, workspace_id: str, name: str) -> None:
+        connection = self._connect()
+        with connection:
+            connection.execute(
+                "DELETE FROM contents WHERE workspace_id = ? AND name = ?",
+                (workspace_id, normalize_path(name)),
+            )
+
+    async def forget(self, workspace_id: str, name: str) -> None:
+        """Drop a file found to no longer hold the content it was recorded with"""
+        await self._run(self._forget, workspace_id, name)
+
+    def hit(self, size: int) -> None:
+        with self._lock:
+            self.hits += 1
+            self.bytes_saved += size
+        DEDUP_LOOKUPS.labels("hit").inc()
+        DEDUP_BYTES_SAVED.inc(size)
+
+    def miss(self) -> None:
+        with self._lock:
+            self.misses += 1
+        DEDUP_LOOKUPS.labels("miss").inc()
+
+    def _entries(self) -> int:
+        return self._connect().execute("SELECT count(*) FROM contents").fetchone()[0]
+
+    async def stats(self) -> DedupStats:
+        """The size of the index, and the uploads deduplicated by this process"""
+        lookups = self.hits + self.misses
+        return DedupStats(
+            entries=await self._run(self._entries),
+            hits=self.hits,
+            misses=self.misses,
+            hit_rate=self.hits / lookups if lookups else 0.0,
+            bytes_saved=self.bytes_saved,
+        )
+
+
+class DeduplicatingFileRepository(ForwardingFileRepository):
+    """
+    Stores an uploaded file that has the same content as a file already in
+    storage as a server-side copy of that file, rather than writing its bytes
+    again.
+
+    Uploads are spooled to local disk before they reach the repository, so each
+    one is hashed from there and looked up in the `ContentIndex`. Files smaller
+    than `min_size` are written as they are, the lookup would cost more than it
+    saves. Deduplication never fails an upload, any error falls back to writing
+    the file.
+    """
+
+    def __init__(
+        self,
+        repository: FileRepository,
+        index: ContentIndex,
+        logger: logging.Logger,
+        executor: Optional[Executor] = None,
+        min_size: int = 1024 * 1024,
+    ):
+        super().__init__(repository)
+        self.index = index
+        self.logger = logger
+        self.executor = executor
+        self.min_size = min_size
+
+    async def _run(self, func: Callable[..., T], /, *args: Any) -> T:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+
+    async def _copy_stored(
+        self,
+        workspace_id: str,
+        name: str,
+        digest: bytes,
+        size: int,
+        content_type: Optional[str],
+    ) -> bool:
+        """Copy a file with the same content to `name`, if one is still stored
+
+        Returns:
+            Whether the file now holds the content.
+        """
+        for stored in await self.index.lookup(digest, size):
+            if content_type is not None and stored.content_type != content_type:
+                # A copy keeps the content type of the file it is copied from
+                continue
+            try:
+                metadata = await self.repository.head_file(
+                    stored.workspace_id, stored.name
+                )
+            except Exception:
+                metadata = None
+            if metadata is None or (metadata.etag, metadata.size) != (
+                stored.etag,
+                size,
+            ):
+                await self.index.forget(stored.workspace_id, stored.name)
+                continue
+            if (stored.workspace_id, stored.name) == (
+                workspace_id,
+                normalize_path(name),
+            ):
+                # Uploaded again over itself, there is nothing to write
+                return True
+            await self.repository.copy_file(
+                stored.workspace_id, stored.name, name, workspace_id
+            )
+            # The source may have been replaced since it was checked
+            copied = await self.repository.head_file(workspace_id, name)
+            if copied.size != size:
+                return False
+            if copied.etag is not None:
+                await self.index.record(
+                    digest,
+                    size,
+                    StoredContent(workspace_id, name, copied.etag, copied.content_type),
+                )
+            return True
+        return False
+
+    async def _record_upload(
+        self, workspace_id: str, name: str, digest: bytes, size: int
+    ) -> None:
+        try:
+            # The write doesn't return the entity tag the file was stored with
+            metadata = await self.repository.head_file(workspace_id, name)
+            if metadata.etag is not None and metadata.size == size:
+                await self.index.record(
+                    digest,
+                    size,
+                    StoredContent(
+                        workspace_id, name, metadata.etag, metadata.content_type
+                    ),
+                )
+        except Exception as error:
+            self.logger.warning(
+                f"Failed to record the content of {workspace_id}/{name}: {error}"
+            )
+
+    async def upload_file(
+        self,
+        workspace_id: str,
+        files: list[UploadFile],
+        path: Optional[str] = "",
+    ) -> list[UploadResult]:
+        """
+        Asynchronously uploads files to a specified workspace, copying the files
+        whose content is already stored instead of writing them.
+
+        Args:
+          workspace_id (str): The ID of the workspace where the files will be uploaded.
+          files (list[UploadFile]): A list of files to be uploaded.
+          path (Optional[str], optional): The path within the workspace where the files will be uploaded. Defaults to "".
+
+        Returns:
+          list[UploadResult]: The outcome of each upload, in the order the files were given.
+
+        Logs:
+          Info: Logs the filename, size, and upload path for each copied file.
+          Warning: Logs the upload path and error when deduplication fails.
+        """
+        results: list[Optional[UploadResult]] = [None] * len(files)
+        digests: list[Optional[tuple[bytes, int]]] = [None] * len(files)
+
+        async def deduplicate(index: int, file: UploadFile) -> None:
+            upload_path = os.path.join(path, file.filename) if path else file.filename
+            try:
+                size = file.size
+                if size is None:
+                    size = await self._run(file_size, file.file)
+                if size < self.min_size:
+                    return
+                digest = await self._run(hash_file, file.file)
+                digests[index] = (digest, size)
+                copied = await self._copy_stored(
+                    workspace_id, upload_path, digest, size, file.content_type
+                )
+            except Exception as error:
+                self.logger.warning(
+                    f"Failed to deduplicate {workspace_id}/{upload_path}: {error}"
+                )
+                await self._run(file.file.seek, 0)
+                return
+            if not copied:
+                self.index.miss()
+                return
+            self.index.hit(size)
+            self.logger.info(
+                f"UPLOADED {file.filename} as a copy of the same content to {workspace_id}/{upload_path}"
+            )
+            results[index] = UploadResult(
+                name=upload_path,
+                filename=file.filename,
+                status=UploadStatus.UPLOADED,
+                size=size,
+            )
+
+        await asyncio.gather(*(deduplicate(i, file) for i, file in enumerate(files)))
+
+        remaining = [i for i, result in enumerate(results) if result is None]
+        if remaining:
+            uploaded = await self.repository.upload_file(
+                workspace_id, [files[i] for i in remaining], path
+            )
+            records = []
+            for i, result in zip(remaining, uploaded):
+                results[i] = result
+                if result.status == UploadStatus.UPLOADED and digests[i] is not None:
+                    records.append(
+                        self._record_upload(workspace_id, result.name, *digests[i])
+                    )
+            await asyncio.gather(*records)
+        return results
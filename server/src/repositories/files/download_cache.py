@@ -0,0 +1,495 @@
+import asyncio
+import dataclasses
+import functools
+import hashlib
+import itertools
+import os
+import posixpath
+from collections import OrderedDict
+from concurrent.futures import Executor
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Optional, TypeVar
+
+from fastapi import UploadFile  # TODO: Remove FastAPI dependency
+from src.metrics import (
+    DOWNLOAD_CACHE_BYTES,
+    DOWNLOAD_CACHE_BYTES_SAVED,
+    DOWNLOAD_CACHE_LOOKUPS,
+)
+from src.models.file import (
+    ByteRange,
+    CompletedPart,
+    DeleteResult,
+    FileDownload,
+    TransferResult,
+    UploadResult,
+)
+from src.models.storage import DownloadCacheStats
+from src.repositories.files.base import FileRepository
+from src.repositories.files.cache import normalize_path
+from src.repositories.files.forwarding import ForwardingFileRepository
+
+T = TypeVar("T")
+
+DownloadKey = tuple[str, str, str]
+
+
+@dataclass
+class CachedFile:
+    file_path: str
+    size: int
+    content_type: str
+    last_modified: Optional[datetime] = None
+
+
+def remove_files(file_paths: list[str]) -> None:
+    """Remove cached files, ignoring any that are already gone. Blocking."""
+    for file_path in file_paths:
+        try:
+            os.unlink(file_path)
+        except FileNotFoundError:
+            pass
+
+
+def write_all(fd: int, data: bytes) -> None:
+    """Write all of `data` to a file descriptor. Blocking."""
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view) :]
+
+
+class DownloadCache:
+    """
+    A byte bounded LRU cache of downloaded files on local disk, keyed by
+    workspace, path and entity tag.
+
+    A file is only ever served under the entity tag it was downloaded with, so a
+    file replaced by another process or another replica misses rather than being
+    served stale. Writes through this process drop the cached copies of the files
+    they touch, so their space is freed early.
+
+    The cache index lives in memory, so `directory` must belong to this process.
+    Methods that drop files return their paths, for the caller to remove off the
+    event loop.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, max_file_size: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_file_size = min(max_file_size, max_bytes)
+        self.bytes = 0
+        self._entries: OrderedDict[DownloadKey, CachedFile] = OrderedDict()
+        self._paths: dict[tuple[str, str], set[DownloadKey]] = {}
+        # Keys of files being written, which are not cached a second time
+        self._filling: set[DownloadKey] = set()
+        self._files = itertools.count()
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def cacheable(self, size: int) -> bool:
+        return size <= self.max_file_size
+
+    def get(self, key: DownloadKey) -> Optional[CachedFile]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            DOWNLOAD_CACHE_LOOKUPS.labels("miss").inc()
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        DOWNLOAD_CACHE_LOOKUPS.labels("hit").inc()
+        return entry
+
+    def served(self, size: int) -> None:
+        """Count bytes sent from the cache rather than the storage backend"""
+        self.bytes_saved += size
+        DOWNLOAD_CACHE_BYTES_SAVED.inc(size)
+
+    def reserve(self, key: DownloadKey) -> Optional[str]:
+        """Claim the file a download is written to while it is streamed
+
+        Args:
+            key: The workspace, path and entity tag of the download.
+
+        Returns:
+            The path to write the file to, or None if it is already cached or being
+            written.
+        """
+        if key in self._entries or key in self._filling:
+            return None
+        self._filling.add(key)
+        # Numbered, so that a file evicted while it is still being read is never
+        # truncated by the next download of the same version
+        name = hashlib.sha256("\0".join(key).encode()).hexdigest()
+        return os.path.join(self.directory, f"{name}-{next(self._files)}")
+
+    def abandon(self, key: DownloadKey) -> None:
+        self._filling.discard(key)
+
+    def put(self, key: DownloadKey, entry: CachedFile) -> list[str]:
+        """Add a fully written file in place of any older version, evicting the
+        least recently used files to make room for it
+
+        Returns:
+            The paths of the replaced and evicted files.
+        """
+        self._filling.discard(key)
+        # Older versions of the file are never served again
+        evicted = [
+            self._remove(older) for older in self._paths.get(key[:2], set()).copy()
+        ]
+        self._entries[key] = entry
+        self._paths.setdefault(key[:2], set()).add(key)
+        self.bytes += entry.size
+        while self.bytes > self.max_bytes:
+            evicted.append(self._remove(next(iter(self._entries))))
+            self.evictions += 1
+        DOWNLOAD_CACHE_BYTES.set(self.bytes)
+        return evicted
+
+    def discard(self, key: DownloadKey) -> list[str]:
+        """Drop a file that could not be read back"""
+        if key not in self._entries:
+            return []
+        return [self._remove(key)]
+
+    def invalidate(
+        self, workspace_id: str, path: str, recursive: bool = False
+    ) -> list[str]:
+        """Drop the cached copies of a file, under any entity tag
+
+        Args:
+            workspace_id: The ID of the workspace containing the file.
+            path: The path of the file, or of a directory when recursive.
+            recursive: Whether to drop every file under the path too.
+
+        Returns:
+            The paths of the dropped files.
+        """
+        path = normalize_path(path)
+        files = [(workspace_id, path)]
+        if recursive:
+            prefix = f"{path}/" if path else ""
+            files += [
+                file
+                for file in self._paths
+                if file[0] == workspace_id and file[1].startswith(prefix)
+            ]
+        removed = []
+        for file in files:
+            for key in self._paths.get(file, set()).copy():
+                removed.append(self._remove(key))
+                self.invalidations += 1
+        return removed
+
+    def stats(self) -> DownloadCacheStats:
+        lookups = self.hits + self.misses
+        return DownloadCacheStats(
+            entries=len(self._entries),
+            bytes=self.bytes,
+            max_bytes=self.max_bytes,
+            hits=self.hits,
+            misses=self.misses,
+            hit_rate=self.hits / lookups if lookups else 0.0,
+            bytes_saved=self.bytes_saved,
+            evictions=self.evictions,
+            invalidations=self.invalidations,
+        )
+
+    def _remove(self, key: DownloadKey) -> str:
+        entry = self._entries.pop(key)
+        self.bytes -= entry.size
+        DOWNLOAD_CACHE_BYTES.set(self.bytes)
+        keys = self._paths[key[:2]]
+        keys.discard(key)
+        if not keys:
+            del self._paths[key[:2]]
+        return entry.file_path
+
+
+class DownloadCachingFileRepository(ForwardingFileRepository):
+    """
+    Serves downloads from a `DownloadCache` on local disk, and fills the cache as
+    whole files are streamed from the storage backend.
+
+    Every download first looks up the current entity tag of the file, a metadata
+    call, so a hit costs that call instead of the transfer. Range requests are
+    served from the cache when the file is there, but do not fill it.
+    """
+
+    def __init__(
+        self,
+        repository: FileRepository,
+        cache: DownloadCache,
+        executor: Optional[Executor] = None,
+        download_chunk_size: int = 256 * 1024,
+    ):
+        super().__init__(repository)
+        self.cache = cache
+        self.executor = executor
+        self.download_chunk_size = download_chunk_size
+
+    async def _run(self, func: Callable[..., T], /, *args: Any) -> T:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+
+    def _remove_files(self, file_paths: list[str]) -> None:
+        # Not awaited, so that files are removed even when the request is cancelled
+        if file_paths:
+            asyncio.get_running_loop().run_in_executor(
+                self.executor, remove_files, file_paths
+            )
+
+    async def download_file(
+        self,
+        workspace_id: str,
+        path: str,
+        byte_range: Optional[ByteRange] = None,
+    ) -> FileDownload:
+        """
+        Asynchronously opens a file in a specified workspace for streaming, from
+        the download cache when it holds the current version of the file.
+
+        Args:
+          workspace_id (str): The ID of the workspace containing the file.
+          path (str): The path of the file within the workspace.
+          byte_range (Optional[ByteRange], optional): The range of bytes to download. Defaults to the whole file.
+
+        Returns:
+          FileDownload: The file metadata and a stream of its content.
+
+        Raises:
+          HTTPException: If the byte range cannot be satisfied.
+          S3Error: If the file is not found in the specified workspace.
+        """
+        metadata = await self.repository.head_file(workspace_id, path)
+        if metadata.etag is None or not self.cache.cacheable(metadata.size):
+            return await self.repository.download_file(workspace_id, path, byte_range)
+
+        key = (workspace_id, normalize_path(path), metadata.etag)
+        if (entry := self.cache.get(key)) is not None:
+            download = await self._open_cached(key, entry, metadata.etag, byte_range)
+            if download is not None:
+                return download
+
+        download = await self.repository.download_file(workspace_id, path, byte_range)
+        if byte_range is not None or download.etag != metadata.etag:
+            return download
+        file_path = self.cache.reserve(key)
+        if file_path is None:
+            return download
+        return dataclasses.replace(
+            download, content=self._fill(key, file_path, download)
+        )
+
+    async def _open_cached(
+        self,
+        key: DownloadKey,
+        entry: CachedFile,
+        etag: str,
+        byte_range: Optional[ByteRange],
+    ) -> Optional[FileDownload]:
+        try:
+            fd = await self._run(os.open, entry.file_path, os.O_RDONLY)
+        except FileNotFoundError:
+            self._remove_files(self.cache.discard(key))
+            return None
+
+        size = entry.size
+        match byte_range:
+            case None:
+                start, end = 0, size - 1
+            case ByteRange(start=None, end=suffix):
+                start, end = max(size - suffix, 0), size - 1
+            case ByteRange(start=start, end=end):
+                end = size - 1 if end is None else min(end, size - 1)
+        if byte_range is not None and (start >= size or start > end):
+            os.close(fd)
+            # Let the storage backend answer the range it cannot satisfy
+            return None
+
+        @functools.cache
+        def release() -> None:
+            os.close(fd)
+
+        async def content() -> AsyncIterator[bytes]:
+            offset = start
+            try:
+                while offset <= end:
+                    chunk = await self._run(
+                        os.pread,
+                        fd,
+                        min(self.download_chunk_size, end - offset + 1),
+                        offset,
+                    )
+                    if not chunk:
+                        break
+                    offset += len(chunk)
+                    self.cache.served(len(chunk))
+                    yield chunk
+            finally:
+                release()
+
+        return FileDownload(
+            filename=os.path.basename(key[1]),
+            content_type=entry.content_type,
+            content=content(),
+            content_length=max(end - start + 1, 0),
+            size=size,
+            content_range=(start, end) if byte_range is not None else None,
+            etag=etag,
+            last_modified=entry.last_modified,
+            release=release,
+        )
+
+    async def _fill(
+        self, key: DownloadKey, file_path: str, download: FileDownload
+    ) -> AsyncIterator[bytes]:
+        """Stream a download from the storage backend, writing it to the cache"""
+        loop = asyncio.get_running_loop()
+        fd = None
+        write: Optional[asyncio.Future] = None
+        written = 0
+        complete = False
+        try:
+            fd = await self._run(
+                os.open, file_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600
+            )
+            async for chunk in download.content:
+                write = loop.run_in_executor(self.executor, write_all, fd, chunk)
+                await asyncio.shield(write)
+                written += len(chunk)
+                yield chunk
+            complete = written == download.size
+        finally:
+            if fd is not None and write is not None and not write.done():
+                # A cancelled write still runs, the descriptor must outlive it
+                write.add_done_callback(lambda _, fd=fd: os.close(fd))
+            elif fd is not None:
+                os.close(fd)
+            if complete:
+                self._remove_files(
+                    self.cache.put(
+                        key,
+                        CachedFile(
+                            file_path=file_path,
+                            size=written,
+                            content_type=download.content_type,
+                            last_modified=download.last_modified,
+                        ),
+                    )
+                )
+            else:
+                self.cache.abandon(key)
+                self._remove_files([file_path])
+
+    def _invalidate(self, workspace_id: str, path: str, recursive=False) -> None:
+        self._remove_files(self.cache.invalidate(workspace_id, path, recursive))
+
+    async def upload_file(
+        self,
+        workspace_id: str,
+        files: list[UploadFile],
+        path: Optional[str] = "",
+    ) -> list[UploadResult]:
+        try:
+            return await self.repository.upload_file(workspace_id, files, path)
+        finally:
+            for file in files:
+                self._invalidate(
+                    workspace_id, posixpath.join(path or "", file.filename or "")
+                )
+
+    async def complete_upload(
+        self,
+        workspace_id: str,
+        path: str,
+        upload_id: str,
+        parts: Optional[list[CompletedPart]] = None,
+    ) -> UploadResult:
+        try:
+            return await self.repository.complete_upload(
+                workspace_id, path, upload_id, parts
+            )
+        finally:
+            self._invalidate(workspace_id, path)
+
+    async def delete_directory(self, workspace_id: str, path: str) -> DeleteResult:
+        try:
+            return await self.repository.delete_directory(workspace_id, path)
+        finally:
+            self._invalidate(workspace_id, path, recursive=True)
+
+    async def delete_file(self, workspace_id: str, path: str) -> None:
+        try:
+            return await self.repository.delete_file(workspace_id, path)
+        finally:
+            self._invalidate(workspace_id, path)
+
+    async def copy_file(
+        self,
+        workspace_id: str,
+        path: str,
+        target_path: str,
+        target_workspace_id: Optional[str] = None,
+    ) -> None:
+        try:
+            return await self.repository.copy_file(
+                workspace_id, path, target_path, target_workspace_id
+            )
+        finally:
+            self._invalidate(target_workspace_id or workspace_id, target_path)
+
+    async def move_file(
+        self,
+        workspace_id: str,
+        path: str,
+        target_path: str,
+        target_workspace_id: Optional[str] = None,
+    ) -> None:
+        try:
+            return await self.repository.move_file(
+                workspace_id, path, target_path, target_workspace_id
+            )
+        finally:
+            self._invalidate(workspace_id, path)
+            self._invalidate(target_workspace_id or workspace_id, target_path)
+
+    async def copy_directory(
+        self,
+        workspace_id: str,
+        path: str,
+        target_path: str,
+        target_workspace_id: Optional[str] = None,
+        progress: Optional[Callable[[TransferResult], None]] = None,
+    ) -> TransferResult:
+        try:
+            return await self.repository.copy_directory(
+                workspace_id, path, target_path, target_workspace_id, progress
+            )
+        finally:
+            self._invalidate(
+                target_workspace_id or workspace_id, target_path, recursive=True
+            )
+
+    async def move_directory(
+        self,
+        workspace_id: str,
+        path: str,
+        target_path: str,
+        target_workspace_id: Optional[str] = None,
+        progress: Optional[Callable[[TransferResult], None]] = None,
+    ) -> TransferResult:
+        try:
+            return await self.repository.move_directory(
+                workspace_id, path, target_path, target_workspace_id, progress
+            )
+        finally:
+            self._invalidate(workspace_id, path, recursive=True)
+            self._invalidate(
+                target_workspace_id or workspace_id, target_path, recursive=True
+            )
@@ -1,42 +1,290 @@
-from typing import Annotated
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import timedelta
+from typing import Annotated, AsyncIterator, Optional
 
-from fastapi import Depends
+import certifi
+import urllib3
+from fastapi import Depends, FastAPI, Request
+from minio import Minio
+from src.models.storage import ConnectionPoolHostStats, ConnectionPoolStats
 from src.repositories.files.base import FileRepository
+from src.repositories.files.cache import CachingFileRepository
+from src.repositories.files.dedup import DeduplicatingFileRepository
+from src.repositories.files.download_cache import DownloadCachingFileRepository
+from src.repositories.files.index import IndexingFileRepository
+from src.repositories.files.local import LocalFileRepository
+from src.repositories.files.metrics import InstrumentedFileRepository
+from src.repositories.files.memory import InMemoryFileRepository, InMemoryStore
 from src.repositories.files.minio import MinioFileRepository
+from src.repositories.files.thumbnails import ThumbnailInvalidatingFileRepository
 from src.repositories.logger import LoggerDependency
 from src.configuration import (
+    Configuration,
     ConfigurationDependency,
+    LocalStorageBackendConfiguration,
+    MemoryStorageBackendConfiguration,
     MinioStorageBackendConfiguration,
+    StorageBackendConfiguration,
 )
 
 
-def get_file_repository(
-    configuration: ConfigurationDependency,
-    logger: LoggerDependency,
-):
+def create_minio_client(configuration: MinioStorageBackendConfiguration) -> Minio:
+    """Create a MinIO client backed by a keep-alive connection pool
+
+    Args:
+        configuration: The MinIO storage backend configuration.
+
+    Returns:
+        A MinIO client, safe to share between threads.
+    """
+    # Mirrors the MinIO client defaults, with a configurable pool size
+    timeout = timedelta(minutes=5).seconds
+    http_client = urllib3.PoolManager(
+        timeout=urllib3.Timeout(connect=timeout, read=timeout),
+        maxsize=configuration.max_connections,
+        cert_reqs="CERT_REQUIRED",
+        ca_certs=os.environ.get("SSL_CERT_FILE") or certifi.where(),
+        retries=urllib3.Retry(
+            total=5,
+            backoff_factor=0.2,
+            status_forcelist=[500, 502, 503, 504],
+        ),
+    )
+    return Minio(
+        endpoint=configuration.endpoint,
+        access_key=(
+            configuration.access_key.get_secret_value()
+            if configuration.access_key is not None
+            else None
+        ),
+        secret_key=(
+            configuration.secret_key.get_secret_value()
+            if configuration.secret_key is not None
+            else None
+        ),
+        secure=configuration.secure,
+        region=configuration.region,
+        http_client=http_client,
+    )
+
+
+def create_presign_client(
+    configuration: MinioStorageBackendConfiguration,
+) -> Optional[Minio]:
+    """Create a MinIO client that signs URLs for the public endpoint
+
+    Signing is done locally, so the client never connects to the endpoint. The
+    region is given for the same reason, defaulting to the S3 default.
+
+    Args:
+        configuration: The MinIO storage backend configuration.
+
+    Returns:
+        The client, or None to sign URLs with the client of the service.
+    """
+    if configuration.public_endpoint is None:
+        return None
+    return Minio(
+        endpoint=configuration.public_endpoint,
+        access_key=(
+            configuration.access_key.get_secret_value()
+            if configuration.access_key is not None
+            else None
+        ),
+        secret_key=(
+            configuration.secret_key.get_secret_value()
+            if configuration.secret_key is not None
+            else None
+        ),
+        secure=configuration.secure,
+        region=configuration.region or "us-east-1",
+    )
+
+
+def get_connection_pool_stats(http_client: urllib3.PoolManager) -> ConnectionPoolStats:
+    """Summarise the usage of a urllib3 pool manager
+
+    Args:
+        http_client: The pool manager to inspect.
+
+    Returns:
+        The number of in use and idle connections for each host in the pool.
+    """
+    maxsize = http_client.connection_pool_kw.get("maxsize", 1)
+    hosts = []
+    for key in list(http_client.pools.keys()):
+        pool = http_client.pools.get(key)
+        if pool is None:
+            continue
+        # The queue is pre-filled with placeholders, a connection that is
+        # checked out leaves a gap and an idle one sits in the queue
+        queued = list(pool.pool.queue) if pool.pool is not None else []
+        hosts.append(
+            ConnectionPoolHostStats(
+                host=pool.host,
+                port=pool.port,
+                scheme=pool.scheme,
+                in_use=maxsize - len(queued),
+                idle=sum(1 for conn in queued if conn is not None),
+                connections_opened=pool.num_connections,
+                requests=pool.num_requests,
+            )
+        )
+    return ConnectionPoolStats(max_connections_per_host=maxsize, hosts=hosts)
+
+
+@asynccontextmanager
+async def storage_backend_lifespan(
+    app: FastAPI,
+    configuration: StorageBackendConfiguration,
+) -> AsyncIterator[None]:
+    """Create the process-wide storage client, and close it on shutdown
+
+    Args:
+        app: The application to attach the storage client to.
+        configuration: The storage backend configuration.
+    """
+    match configuration:
+        case MinioStorageBackendConfiguration():
+            client = create_minio_client(configuration)
+            executor = ThreadPoolExecutor(
+                max_workers=configuration.max_workers,
+                thread_name_prefix="storage-backend",
+            )
+            app.state.storage_client = client
+            app.state.storage_executor = executor
+            app.state.presign_client = create_presign_client(configuration)
+            try:
+                yield
+            finally:
+                executor.shutdown(wait=True)
+                client._http.clear()
+        case LocalStorageBackendConfiguration():
+            os.makedirs(configuration.root, exist_ok=True)
+            executor = ThreadPoolExecutor(
+                max_workers=configuration.max_workers,
+                thread_name_prefix="storage-backend",
+            )
+            app.state.storage_client = None
+            app.state.storage_executor = executor
+            try:
+                yield
+            finally:
+                executor.shutdown(wait=True)
+        case MemoryStorageBackendConfiguration():
+            app.state.storage_client = None
+            app.state.storage_store = InMemoryStore()
+            yield
+        case _:
+            raise Exception("Unsupported storage backend type")
+
+
+def create_file_repository(
+    app: FastAPI, configuration: Configuration, logger: logging.Logger
+) -> FileRepository:
+    """Create a repository for the configured storage backend, with its metrics
+
+    Args:
+        app: The application holding the storage client.
+        configuration: The application configuration.
+        logger: The logger of the repository.
+
+    Returns:
+        The repository, without any of the caches in front of it.
+    """
     match configuration.storage_backend:
         case MinioStorageBackendConfiguration(
-            endpoint=endpoint,
-            access_key=access_key,
-            secret_key=secret_key,
-            secure=secure,
+            download_chunk_size=download_chunk_size,
+            upload_part_size=upload_part_size,
+            upload_parallelism=upload_parallelism,
+            upload_concurrency=upload_concurrency,
+            delete_concurrency=delete_concurrency,
+            copy_concurrency=copy_concurrency,
+        ):
+            repository = MinioFileRepository(
+                app.state.storage_client,
+                logger,
+                app.state.storage_executor,
+                download_chunk_size=download_chunk_size,
+                upload_part_size=upload_part_size,
+                upload_parallelism=upload_parallelism,
+                upload_concurrency=upload_concurrency,
+                delete_concurrency=delete_concurrency,
+                copy_concurrency=copy_concurrency,
+                presign_client=getattr(app.state, "presign_client", None),
+            )
+        case LocalStorageBackendConfiguration(
+            root=root,
+            download_chunk_size=download_chunk_size,
+            upload_concurrency=upload_concurrency,
+            copy_concurrency=copy_concurrency,
         ):
-            from minio import Minio
-
-            client = Minio(
-                endpoint=endpoint,
-                access_key=(
-                    access_key.get_secret_value() if access_key is not None else None
-                ),
-                secret_key=(
-                    secret_key.get_secret_value() if secret_key is not None else None
-                ),
-                secure=secure,
+            repository = LocalFileRepository(
+                root,
+                logger,
+                app.state.storage_executor,
+                download_chunk_size=download_chunk_size,
+                upload_concurrency=upload_concurrency,
+                copy_concurrency=copy_concurrency,
+            )
+        case MemoryStorageBackendConfiguration(
+            latency_seconds=latency_seconds,
+            download_chunk_size=download_chunk_size,
+            copy_concurrency=copy_concurrency,
+        ):
+            repository = InMemoryFileRepository(
+                app.state.storage_store,
+                logger,
+                latency=latency_seconds,
+                download_chunk_size=download_chunk_size,
+                copy_concurrency=copy_concurrency,
             )
-            return MinioFileRepository(client, logger)
         case _:
             raise Exception("Unsupported storage backend type")
 
+    repository = InstrumentedFileRepository(
+        repository, configuration.storage_backend.provider.value
+    )
+    return repository
+
+
+def get_file_repository(
+    request: Request,
+    configuration: ConfigurationDependency,
+    logger: LoggerDependency,
+):
+    repository = create_file_repository(request.app, configuration, logger)
+    if (content_index := getattr(request.app.state, "content_index", None)) is not None:
+        repository = DeduplicatingFileRepository(
+            repository,
+            content_index,
+            logger,
+            getattr(request.app.state, "storage_executor", None),
+            min_size=configuration.dedup.min_size,
+        )
+    if (
+        metadata_index := getattr(request.app.state, "metadata_index", None)
+    ) is not None:
+        repository = IndexingFileRepository(repository, metadata_index, logger)
+    if (
+        download_cache := getattr(request.app.state, "download_cache", None)
+    ) is not None:
+        repository = DownloadCachingFileRepository(
+            repository,
+            download_cache,
+            getattr(request.app.state, "storage_executor", None),
+            download_chunk_size=configuration.storage_backend.download_chunk_size,
+        )
+    if (listing_cache := getattr(request.app.state, "listing_cache", None)) is not None:
+        repository = CachingFileRepository(repository, listing_cache)
+    # Outermost, so that removing thumbnails goes through the caches
+    if (thumbnails := getattr(request.app.state, "thumbnails", None)) is not None:
+        repository = ThumbnailInvalidatingFileRepository(repository, thumbnails)
+    return repository
+
 
 FileRepositoryDependency = Annotated[
     FileRepository,
@@ -0,0 +1,175 @@
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Callable, Optional
+
+from fastapi import UploadFile  # TODO: Remove FastAPI dependency
+from src.models.file import (
+    ByteRange,
+    CompletedPart,
+    DeleteResult,
+    DirectoryListingPage,
+    FileDownload,
+    FileMetadata,
+    ObjectMetadata,
+    PresignMethod,
+    PresignedUrl,
+    TransferResult,
+    UploadPart,
+    UploadResult,
+    UploadSession,
+)
+from src.repositories.files.base import FileRepository
+
+
+class ForwardingFileRepository(FileRepository):
+    """
+    Passes every call through to another file repository.
+
+    Repositories that add behaviour on top of any storage backend (caching,
+    instrumentation, ...) extend this and override only the calls they change.
+    """
+
+    def __init__(self, repository: FileRepository):
+        self.repository = repository
+
+    async def stat(
+        self,
+        workspace_id: str,
+        path: Optional[str] = None,
+        limit: Optional[int] = None,
+        start_after: Optional[str] = None,
+    ) -> DirectoryListingPage:
+        return await self.repository.stat(
+            workspace_id, path, limit=limit, start_after=start_after
+        )
+
+    async def download_file(
+        self,
+        workspace_id: str,
+        path: str,
+        byte_range: Optional[ByteRange] = None,
+    ) -> FileDownload:
+        return await self.repository.download_file(workspace_id, path, byte_range)
+
+    async def head_file(self, workspace_id: str, path: str) -> FileMetadata:
+        return await self.repository.head_file(workspace_id, path)
+
+    async def presign_url(
+        self,
+        workspace_id: str,
+        path: str,
+        method: PresignMethod,
+        expires: timedelta,
+    ) -> PresignedUrl:
+        return await self.repository.presign_url(workspace_id, path, method, expires)
+
+    def walk(
+        self, workspace_id: str, path: Optional[str] = None
+    ) -> AsyncIterator[list[ObjectMetadata]]:
+        return self.repository.walk(workspace_id, path)
+
+    async def upload_file(
+        self,
+        workspace_id: str,
+        files: list[UploadFile],
+        path: Optional[str] = "",
+    ) -> list[UploadResult]:
+        return await self.repository.upload_file(workspace_id, files, path)
+
+    async def create_upload(
+        self, workspace_id: str, path: str, content_type: Optional[str] = None
+    ) -> UploadSession:
+        return await self.repository.create_upload(workspace_id, path, content_type)
+
+    async def upload_part(
+        self,
+        workspace_id: str,
+        path: str,
+        upload_id: str,
+        part_number: int,
+        data: bytes,
+    ) -> UploadPart:
+        return await self.repository.upload_part(
+            workspace_id, path, upload_id, part_number, data
+        )
+
+    async def list_parts(
+        self, workspace_id: str, path: str, upload_id: str
+    ) -> list[UploadPart]:
+        return await self.repository.list_parts(workspace_id, path, upload_id)
+
+    async def complete_upload(
+        self,
+        workspace_id: str,
+        path: str,
+        upload_id: str,
+        parts: Optional[list[CompletedPart]] = None,
+    ) -> UploadResult:
+        return await self.repository.complete_upload(
+            workspace_id, path, upload_id, parts
+        )
+
+    async def abort_upload(self, workspace_id: str, path: str, upload_id: str) -> None:
+        return await self.repository.abort_upload(workspace_id, path, upload_id)
+
+    async def list_uploads(
+        self, workspace_id: str, prefix: Optional[str] = None
+    ) -> list[UploadSession]:
+        return await self.repository.list_uploads(workspace_id, prefix)
+
+    async def abort_stale_uploads(self, initiated_before: datetime) -> int:
+        return await self.repository.abort_stale_uploads(initiated_before)
+
+    async def create_directory(self, workspace_id: str, path: str) -> None:
+        return await self.repository.create_directory(workspace_id, path)
+
+    async def delete_directory(self, workspace_id: str, path: str) -> DeleteResult:
+        return await self.repository.delete_directory(workspace_id, path)
+
+    async def delete_file(self, workspace_id: str, path: str) -> None:
+        return await self.repository.delete_file(workspace_id, path)
+
+    async def copy_file(
+        self,
+        workspace_id: str,
+        path: str,
+        target_path: str,
+        target_workspace_id: Optional[str] = None,
+    ) -> None:
+        return await self.repository.copy_file(
+            workspace_id, path, target_path, target_workspace_id
+        )
+
+    async def move_file(
+        self,
+        workspace_id: str,
+        path: str,
+        target_path: str,
+        target_workspace_id: Optional[str] = None,
+    ) -> None:
+        return await self.repository.move_file(
+            workspace_id, path, target_path, target_workspace_id
+        )
+
+    async def copy_directory(
+        self,
+        workspace_id: str,
+        path: str,
+        target_path: str,
+        target_workspace_id: Optional[str] = None,
+        progress: Optional[Callable[[TransferResult], None]] = None,
+    ) -> TransferResult:
+        return await self.repository.copy_directory(
+            workspace_id, path, target_path, target_workspace_id, progress
+        )
+
+    async def move_directory(
+        self,
+        workspace_id: str,
+        path: str,
+        target_path: str,
+        target_workspace_id: Optional[str] = None,
+        progress: Optional[Callable[[TransferResult], None]] = None,
+    ) -> TransferResult:
+        return await self.repository.move_directory(
+            workspace_id, path, target_path, target_workspace_id, progress
+        )
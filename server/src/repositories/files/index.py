@@ -0,0 +1,778 @@
+import asyncio
+import logging
+import os
+import posixpath
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Optional, TypeVar
+from urllib.parse import quote, unquote
+
+from fastapi import HTTPException, UploadFile  # TODO: Remove FastAPI dependency
+from minio.error import S3Error
+from src.models.file import (
+    CompletedPart,
+    DeleteResult,
+    Directory,
+    DirectoryListingPage,
+    DirectoryUsage,
+    FileMetadata,
+    ObjectMetadata,
+    TransferResult,
+    UploadResult,
+    UploadStatus,
+    file_entry,
+)
+from src.repositories.files.base import FileRepository
+from src.repositories.files.forwarding import ForwardingFileRepository
+
+T = TypeVar("T")
+
+DATABASE_SUFFIX = ".sqlite3"
+
+BUILDING_SUFFIX = ".building"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    name TEXT PRIMARY KEY,
+    extension TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_modified INTEGER NOT NULL,
+    etag TEXT,
+    content_type TEXT,
+    generation INTEGER NOT NULL
+);
+"""
+
+# Created once an index is built, which is much faster than keeping them current
+# while every file is inserted
+INDEXES = """
+CREATE INDEX IF NOT EXISTS files_extension ON files (extension, name);
+CREATE INDEX IF NOT EXISTS files_size ON files (size);
+CREATE INDEX IF NOT EXISTS files_last_modified ON files (last_modified);
+CREATE VIRTUAL TABLE IF NOT EXISTS file_names USING fts5(
+    name, content='files', content_rowid='rowid', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS files_inserted AFTER INSERT ON files BEGIN
+    INSERT INTO file_names (rowid, name) VALUES (new.rowid, new.name);
+END;
+CREATE TRIGGER IF NOT EXISTS files_deleted AFTER DELETE ON files BEGIN
+    INSERT INTO file_names (file_names, rowid, name) VALUES ('delete', old.rowid, old.name);
+END;
+"""
+
+UPSERT = """
+INSERT INTO files (name, extension, size, last_modified, etag, content_type, generation)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (name) DO UPDATE SET
+    size = excluded.size,
+    last_modified = excluded.last_modified,
+    etag = excluded.etag,
+    content_type = excluded.content_type,
+    generation = excluded.generation
+WHERE excluded.generation >= files.generation
+"""
+
+
+def extension(name: str) -> str:
+    """The lowercase extension of a file name, without the dot, or ""
+
+    Args:
+        name: The name or path of the file.
+
+    Returns:
+        The extension.
+    """
+    return posixpath.splitext(posixpath.basename(name))[1][1:].lower()
+
+
+def prefix_range(path: Optional[str]) -> Optional[tuple[str, str]]:
+    """The range of names within a directory, for an indexed comparison
+
+    Args:
+        path: The path of the directory, None or empty for the workspace root.
+
+    Returns:
+        The lowest name and the name every name within it sorts before, or None
+        for the whole workspace.
+    """
+    path = (path or "").strip("/")
+    if not path:
+        return None
+    # "0" is the character after "/"
+    return f"{path}/", f"{path}0"
+
+
+def to_milliseconds(value: datetime) -> int:
+    return int(value.timestamp() * 1000)
+
+
+async def head_files(
+    repository: FileRepository,
+    workspace_id: str,
+    names: list[str],
+    concurrency: int,
+) -> list[Optional[FileMetadata]]:
+    """Look up files, up to `concurrency` at once
+
+    Args:
+        repository: The repository holding the files.
+        workspace_id: The ID of the workspace.
+        names: The names of the files.
+        concurrency: The most lookups in flight at once.
+
+    Returns:
+        The metadata of each file, None for those that are not found.
+    """
+    slots = asyncio.Semaphore(concurrency)
+
+    async def head(name: str) -> Optional[FileMetadata]:
+        async with slots:
+            try:
+                return await repository.head_file(workspace_id, name)
+            except (S3Error, HTTPException):
+                return None
+
+    return await asyncio.gather(*(head(name) for name in names))
+
+
+class MetadataIndex:
+    """
+    An SQLite database of the files in each workspace, searched instead of
+    walking the storage backend.
+
+    Each workspace has its own database under `directory`, built by a full
+    `reconcile` the first time the workspace is searched, and only put in place
+    once the build is complete. It is kept current by `IndexingFileRepository`
+    as files are written, while it is built too, and reconciled again
+    periodically to pick up changes made around this service.
+
+    Databases are in WAL mode, so searches run on their own threads while
+    updates are written by a single thread, and worker processes can share the
+    directory.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        logger: logging.Logger,
+        search_workers: int = 4,
+        refresh_concurrency: int = 8,
+    ):
+        self.directory = directory
+        self.logger = logger
+        self.refresh_concurrency = refresh_concurrency
+        self._searches = ThreadPoolExecutor(
+            max_workers=search_workers, thread_name_prefix="metadata-index-search"
+        )
+        self._updates = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="metadata-index-update"
+        )
+        # Connections can't be shared between threads, each thread opens its own
+        self._local = threading.local()
+        self._opened: list[sqlite3.Connection] = []
+        self._opened_lock = threading.Lock()
+        self._indexed: set[str] = set()
+        self._building: dict[str, asyncio.Lock] = {}
+        # The names and directories removed or changed while an index is built
+        self._builds: dict[str, tuple[set[str], set[str]]] = {}
+
+    def close(self) -> None:
+        """Wait for pending calls, and close every database. Blocking."""
+        self._searches.shutdown(wait=True)
+        self._updates.shutdown(wait=True)
+        for connection in self._opened:
+            connection.close()
+
+    def _database(self, workspace_id: str, building: bool = False) -> str:
+        name = quote(workspace_id, safe="") + DATABASE_SUFFIX
+        if building:
+            # Built by each process on its own, and only published when complete
+            name += f".{os.getpid()}{BUILDING_SUFFIX}"
+        return os.path.join(self.directory, name)
+
+    def _connect(self, database: str) -> sqlite3.Connection:
+        """Open a database on the calling thread. Blocking."""
+        connections = self._local.__dict__.setdefault("connections", {})
+        if (connection := connections.get(database)) is not None:
+            return connection
+        connection = sqlite3.connect(database, timeout=30, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode = WAL")
+        connection.execute("PRAGMA synchronous = NORMAL")
+        connection.executescript(SCHEMA)
+        if not database.endswith(BUILDING_SUFFIX):
+            connection.executescript(INDEXES)
+        connections[database] = connection
+        with self._opened_lock:
+            self._opened.append(connection)
+        return connection
+
+    async def _search(self, func: Callable[..., T], /, *args: Any) -> T:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._searches, func, *args)
+
+    async def _update(self, func: Callable[..., T], /, *args: Any) -> T:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._updates, func, *args)
+
+    def indexed(self, workspace_id: str) -> bool:
+        """Whether a workspace has an index, built here or by another process"""
+        if workspace_id not in self._indexed and os.path.exists(
+            self._database(workspace_id)
+        ):
+            self._indexed.add(workspace_id)
+        return workspace_id in self._indexed
+
+    def tracked(self, workspace_id: str) -> bool:
+        """Whether writes to a workspace go to its index, as it has one or is
+        building one"""
+        return workspace_id in self._builds or self.indexed(workspace_id)
+
+    def _current(self, workspace_id: str) -> str:
+        """The index writes go to, decided on the update thread. Blocking.
+
+        The update thread also publishes, so a write never goes to a building
+        index that was already published.
+        """
+        database = self._database(workspace_id)
+        if os.path.exists(database):
+            return database
+        return self._database(workspace_id, building=True)
+
+    def workspaces(self) -> list[str]:
+        """The workspaces with an index. Blocking."""
+        return [
+            unquote(name.removesuffix(DATABASE_SUFFIX))
+            for name in os.listdir(self.directory)
+            if name.endswith(DATABASE_SUFFIX)
+        ]
+
+    def _upsert(
+        self, database: str, files: list[ObjectMetadata], generation: int
+    ) -> None:
+        connection = self._connect(database)
+        with connection:
+            connection.executemany(
+                UPSERT,
+                [
+                    (
+                        file.name,
+                        extension(file.name),
+                        file.size,
+                        to_milliseconds(file.last_modified),
+                        file.etag,
+                        file.content_type,
+                        generation,
+                    )
+                    for file in files
+                ],
+            )
+
+    def _delete(
+        self,
+        database: str,
+        names: list[str],
+        path: Optional[str] = None,
+        before_generation: Optional[int] = None,
+    ) -> None:
+        connection = self._connect(database)
+        with connection:
+            if names:
+                connection.executemany(
+                    "DELETE FROM files WHERE name = ?", [(name,) for name in names]
+                )
+            if path is None:
+                return
+            conditions, params = [], []
+            if (names_range := prefix_range(path)) is not None:
+                conditions.append("name >= ? AND name < ?")
+                params += names_range
+            if before_generation is not None:
+                conditions.append("generation < ?")
+                params.append(before_generation)
+            connection.execute(
+                f"DELETE FROM files WHERE {' AND '.join(conditions) or 1}", params
+            )
+
+    def _publish(self, workspace_id: str, drop: bool = False) -> None:
+        """Move a complete index in place, or drop an incomplete one"""
+        database = self._database(workspace_id, building=True)
+        connections = self._local.__dict__.setdefault("connections", {})
+        if (connection := connections.pop(database, None)) is not None:
+            if not drop:
+                connection.executescript(INDEXES)
+                connection.execute(
+                    "INSERT INTO file_names (file_names) VALUES ('rebuild')"
+                )
+                connection.commit()
+            with self._opened_lock:
+                self._opened.remove(connection)
+            # Closing the last connection folds the WAL back into the database
+            connection.close()
+        if not drop:
+            try:
+                # Unlike a rename, never replaces an index another process published
+                os.link(database, self._database(workspace_id))
+            except FileExistsError:
+                pass
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                os.unlink(database + suffix)
+            except FileNotFoundError:
+                pass
+
+    async def update(self, workspace_id: str, files: list[ObjectMetadata]) -> None:
+        if files and self.tracked(workspace_id):
+            generation = time.time_ns()
+            await self._update(
+                lambda: self._upsert(self._current(workspace_id), files, generation)
+            )
+
+    async def remove(
+        self, workspace_id: str, names: list[str], path: Optional[str] = None
+    ) -> None:
+        """Remove files, and every file within `path` if given, from the index"""
+        if not self.tracked(workspace_id):
+            return
+        if (build := self._builds.get(workspace_id)) is not None:
+            # The walk may already have listed them, they are checked again
+            # once it ends
+            build[0].update(names)
+            if path is not None:
+                build[1].add(path)
+        await self._update(
+            lambda: self._delete(self._current(workspace_id), names, path)
+        )
+
+    async def changed(
+        self, workspace_id: str, repository: FileRepository, path: str
+    ) -> None:
+        """Bring the index of a directory changed through this service in line
+
+        While the index is built, the directory is reconciled once every file
+        has been listed instead.
+        """
+        if (build := self._builds.get(workspace_id)) is not None:
+            build[1].add(path)
+        elif self.indexed(workspace_id):
+            await self.reconcile(workspace_id, repository, path)
+
+    async def _catch_up(self, workspace_id: str, repository: FileRepository) -> None:
+        """Check the files removed while an index was built against the backend
+
+        A file listed by the walk may have been removed before its batch was
+        written, and written back to the index by it.
+        """
+        names, paths = self._builds[workspace_id]
+        # Later removals can't race the walk, they are applied as they are
+        self._builds[workspace_id] = (set(), set())
+        for path in paths:
+            await self.reconcile(workspace_id, repository, path, building=True)
+        names = sorted(names)
+        files = await head_files(
+            repository, workspace_id, names, self.refresh_concurrency
+        )
+        missing = [name for name, file in zip(names, files) if file is None]
+        if missing:
+            await self._update(
+                self._delete, self._database(workspace_id, True), missing
+            )
+
+    async def reconcile(
+        self,
+        workspace_id: str,
+        repository: FileRepository,
+        path: Optional[str] = None,
+        building: bool = False,
+    ) -> int:
+        """Bring the index of a directory in line with the storage backend
+
+        Every file is listed and written to the index, then the files that were
+        not listed, and were not written while listing, are removed.
+
+        Args:
+            workspace_id: The ID of the workspace.
+            repository: The repository to list the files with.
+            path: The directory to reconcile. Defaults to the whole workspace.
+            building: Whether to write to a new index that is not published yet.
+
+        Returns:
+            The number of files listed.
+        """
+        database = self._database(workspace_id, building)
+        generation = time.time_ns()
+        listed = 0
+        async for batch in repository.walk(workspace_id, path):
+            await self._update(self._upsert, database, batch, generation)
+            listed += len(batch)
+        await self._update(self._delete, database, [], path or "", generation)
+        return listed
+
+    async def ensure(self, workspace_id: str, repository: FileRepository) -> None:
+        """Build the index of a workspace, unless it already has one"""
+        if self.indexed(workspace_id):
+            return
+        async with self._building.setdefault(workspace_id, asyncio.Lock()):
+            if self.indexed(workspace_id):
+                return
+            start = time.perf_counter()
+            self._builds[workspace_id] = (set(), set())
+            try:
+                listed = await self.reconcile(workspace_id, repository, building=True)
+                await self._catch_up(workspace_id, repository)
+            except BaseException:
+                # A partial index would silently miss files
+                self._builds.pop(workspace_id, None)
+                await self._update(self._publish, workspace_id, True)
+                raise
+            await self._update(self._publish, workspace_id)
+            self._indexed.add(workspace_id)
+            self._builds.pop(workspace_id, None)
+            self.logger.info(
+                f"Indexed {listed} file(s) in {workspace_id} in {time.perf_counter() - start:.1f}s"
+            )
+
+    async def search(
+        self,
+        workspace_id: str,
+        path: Optional[str] = None,
+        name: Optional[str] = None,
+        glob: Optional[str] = None,
+        extension: Optional[str] = None,
+        min_size: Optional[int] = None,
+        max_size: Optional[int] = None,
+        modified_after: Optional[int] = None,
+        modified_before: Optional[int] = None,
+        limit: int = 100,
+        start_after: Optional[str] = None,
+    ) -> DirectoryListingPage:
+        """Find the files of a workspace matching every given filter, by name order
+
+        Args:
+            workspace_id: The ID of the workspace.
+            path: Only files within this directory.
+            name: Only files with this text in their path, ignoring ASCII case.
+            glob: Only files whose path matches this pattern, as in SQLite GLOB.
+            extension: Only files with this extension, without the dot.
+            min_size: Only files of at least this many bytes.
+            max_size: Only files of at most this many bytes.
+            modified_after: Only files modified at or after this time, in milliseconds since the epoch.
+            modified_before: Only files modified before this time, in milliseconds since the epoch.
+            limit: The maximum number of files to return.
+            start_after: Only files named after this, as returned in `next_start_after`.
+
+        Returns:
+            DirectoryListingPage: The matching files, and where the next page starts.
+        """
+        conditions, params = [], []
+        if (names_range := prefix_range(path)) is not None:
+            conditions.append("name >= ? AND name < ?")
+            params += names_range
+        if start_after is not None:
+            conditions.append("name > ?")
+            params.append(start_after)
+        if name:
+            if any(character in name for character in "%_\\"):
+                conditions.append("instr(lower(name), lower(?)) > 0")
+                params.append(name)
+            else:
+                # Answered from the trigram index for three characters or more
+                conditions.append(
+                    "rowid IN (SELECT rowid FROM file_names WHERE name LIKE ?)"
+                )
+                params.append(f"%{name}%")
+        if glob:
+            conditions.append("name GLOB ?")
+            params.append(glob)
+        if extension:
+            conditions.append("extension = ?")
+            params.append(extension.removeprefix(".").lower())
+        for condition, value in [
+            ("size >= ?", min_size),
+            ("size <= ?", max_size),
+            ("last_modified >= ?", modified_after),
+            ("last_modified < ?", modified_before),
+        ]:
+            if value is not None:
+                conditions.append(condition)
+                params.append(value)
+        query = (
+            "SELECT name, size, last_modified, content_type FROM files"
+            f" WHERE {' AND '.join(conditions) or 1} ORDER BY name LIMIT ?"
+        )
+        params.append(limit + 1)
+
+        def run_query() -> list[tuple]:
+            connection = self._connect(self._database(workspace_id))
+            return connection.execute(query, params).fetchall()
+
+        rows = await self._search(run_query)
+        next_start_after = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_start_after = rows[-1][0]
+        return DirectoryListingPage(
+            entries=[
+                file_entry(
+                    name,
+                    size,
+                    datetime.fromtimestamp(last_modified / 1000, tz=timezone.utc),
+                    content_type=content_type,
+                )
+                for name, size, last_modified, content_type in rows
+            ],
+            next_start_after=next_start_after,
+        )
+
+    async def usage(
+        self, workspace_id: str, path: Optional[str] = None
+    ) -> DirectoryUsage:
+        """Total the size and number of the files within a directory, and within
+        each of its subdirectories
+
+        Args:
+            workspace_id: The ID of the workspace.
+            path: The path of the directory. Defaults to the workspace root.
+
+        Returns:
+            DirectoryUsage: The totals of the directory and its subdirectories.
+        """
+        path = (path or "").strip("/")
+        conditions, params = ["1"], []
+        if (names_range := prefix_range(path)) is not None:
+            conditions = ["name >= ? AND name < ?"]
+            params += names_range
+        # Offset of the name within the directory, as SQLite strings count from 1
+        start = len(path) + 2 if path else 1
+        where = " AND ".join(conditions)
+
+        def run_queries() -> tuple[tuple, list[tuple]]:
+            connection = self._connect(self._database(workspace_id))
+            total = connection.execute(
+                f"SELECT coalesce(sum(size), 0), count(*) FROM files WHERE {where}",
+                params,
+            ).fetchone()
+            # Every subdirectory is totalled in the same scan of the range
+            directories = connection.execute(
+                f"""
+                SELECT substr(name, ?, instr(substr(name, ?), '/') - 1) AS directory,
+                    sum(size), count(*)
+                FROM files
+                WHERE {where} AND instr(substr(name, ?), '/') > 0
+                GROUP BY directory ORDER BY directory
+                """,
+                [start, start, *params, start],
+            ).fetchall()
+            return total, directories
+
+        (size, count), directories = await self._search(run_queries)
+        return DirectoryUsage(
+            path=path,
+            size=size,
+            count=count,
+            directories=[
+                Directory(
+                    name=name,
+                    path=f"{path}/{name}" if path else name,
+                    size=directory_size,
+                    count=directory_count,
+                )
+                for name, directory_size, directory_count in directories
+            ],
+        )
+
+
+async def reconcile_periodically(
+    index: MetadataIndex,
+    repository: Callable[[], FileRepository],
+    interval: float,
+) -> None:
+    """Reconcile the index of every indexed workspace, every `interval` seconds
+
+    Args:
+        index: The metadata index.
+        repository: Creates the repository to list the files with.
+        interval: Seconds between the end of one pass and the start of the next.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        for workspace_id in await asyncio.to_thread(index.workspaces):
+            try:
+                listed = await index.reconcile(workspace_id, repository())
+            except Exception as error:
+                index.logger.warning(
+                    f"Failed to reconcile the metadata index of {workspace_id}: {error}"
+                )
+            else:
+                index.logger.info(
+                    f"Reconciled the metadata index of {workspace_id}, {listed} file(s)"
+                )
+
+
+class IndexingFileRepository(ForwardingFileRepository):
+    """
+    Keeps the `MetadataIndex` of a workspace current as files are written
+    through this repository.
+
+    Updating the index never fails a write, the files are left for the next
+    reconciliation instead.
+    """
+
+    def __init__(
+        self, repository: FileRepository, index: MetadataIndex, logger: logging.Logger
+    ):
+        super().__init__(repository)
+        self.index = index
+        self.logger = logger
+
+    async def _index(self, workspace_id: str, update: Awaitable[None]) -> None:
+        try:
+            await update
+        except Exception as error:
+            self.logger.warning(
+                f"Failed to update the metadata index of {workspace_id}: {error}"
+            )
+
+    async def _refresh(self, workspace_id: str, names: list[str]) -> None:
+        # Written files are looked up again for the fields the write doesn't return
+        if not self.index.tracked(workspace_id):
+            return
+        files = []
+        for name, metadata in zip(
+            names,
+            await head_files(
+                self.repository,
+                workspace_id,
+                names,
+                self.index.refresh_concurrency,
+            ),
+        ):
+            if metadata is None:
+                # Already moved or deleted again
+                continue
+            files.append(
+                ObjectMetadata(
+                    name=name,
+                    size=metadata.size,
+                    last_modified=metadata.last_modified or datetime.now(timezone.utc),
+                    etag=metadata.etag,
+                    content_type=metadata.content_type,
+                )
+            )
+        await self.index.update(workspace_id, files)
+
+    async def _reconcile(self, workspace_id: str, path: str) -> None:
+        await self.index.changed(workspace_id, self.repository, path)
+
+    async def upload_file(
+        self,
+        workspace_id: str,
+        files: list[UploadFile],
+        path: Optional[str] = "",
+    ) -> list[UploadResult]:
+        results = await self.repository.upload_file(workspace_id, files, path)
+        await self._index(
+            workspace_id,
+            self._refresh(
+                workspace_id,
+                [
+                    result.name
+                    for result in results
+                    if result.status == UploadStatus.UPLOADED
+                ],
+            ),
+        )
+        return results
+
+    async def complete_upload(
+        self,
+        workspace_id: str,
+        path: str,
+        upload_id: str,
+        parts: Optional[list[CompletedPart]] = None,
+    ) -> UploadResult:
+        result = await self.repository.complete_upload(
+            workspace_id, path, upload_id, parts
+        )
+        await self._index(workspace_id, self._refresh(workspace_id, [result.name]))
+        return result
+
+    async def delete_directory(self, workspace_id: str, path: str) -> DeleteResult:
+        result = await self.repository.delete_directory(workspace_id, path)
+        await self._index(workspace_id, self.index.remove(workspace_id, [], path))
+        return result
+
+    async def delete_file(self, workspace_id: str, path: str) -> None:
+        await self.repository.delete_file(workspace_id, path)
+        await self._index(workspace_id, self.index.remove(workspace_id, [path]))
+
+    async def copy_file(
+        self,
+        workspace_id: str,
+        path: str,
+        target_path: str,
+        target_workspace_id: Optional[str] = None,
+    ) -> None:
+        await self.repository.copy_file(
+            workspace_id, path, target_path, target_workspace_id
+        )
+        target_workspace_id = target_workspace_id or workspace_id
+        await self._index(
+            target_workspace_id, self._refresh(target_workspace_id, [target_path])
+        )
+
+    async def move_file(
+        self,
+        workspace_id: str,
+        path: str,
+        target_path: str,
+        target_workspace_id: Optional[str] = None,
+    ) -> None:
+        await self.repository.move_file(
+            workspace_id, path, target_path, target_workspace_id
+        )
+        await self._index(workspace_id, self.index.remove(workspace_id, [path]))
+        target_workspace_id = target_workspace_id or workspace_id
+        await self._index(
+            target_workspace_id, self._refresh(target_workspace_id, [target_path])
+        )
+
+    async def copy_directory(
+        self,
+        workspace_id: str,
+        path: str,
+        target_path: str,
+        target_workspace_id: Optional[str] = None,
+        progress: Optional[Callable[[TransferResult], None]] = None,
+    ) -> TransferResult:
+        try:
+            return await self.repository.copy_directory(
+                workspace_id, path, target_path, target_workspace_id, progress
+            )
+        finally:
+            # Some of the files may have been copied before a failure
+            target_workspace_id = target_workspace_id or workspace_id
+            await self._index(
+                target_workspace_id, self._reconcile(target_workspace_id, target_path)
+            )
+
+    async def move_directory(
+        self,
+        workspace_id: str,
+        path: str,
+        target_path: str,
+        target_workspace_id: Optional[str] = None,
+        progress: Optional[Callable[[TransferResult], None]] = None,
+    ) -> TransferResult:
+        try:
+            return await self.repository.move_directory(
+                workspace_id, path, target_path, target_workspace_id, progress
+            )
+        finally:
+            await self._index(workspace_id, self._reconcile(workspace_id, path))
+            target_workspace_id = target_workspace_id or workspace_id
+            await self._index(
+                target_workspace_id, self._reconcile(target_workspace_id, target_path)
+            )
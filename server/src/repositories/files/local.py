@@ -0,0 +1,1185 @@
+import asyncio
+import errno
+import functools
+import itertools
+import json
+import logging
+import os
+import re
+import secrets
+import shutil
+import tempfile
+from concurrent.futures import Executor
+from datetime import datetime, timedelta, timezone
+from stat import S_IMODE, S_ISREG
+from typing import Any, AsyncIterator, BinaryIO, Callable, Iterator, Optional, TypeVar
+
+import humanize
+from fastapi import HTTPException, UploadFile, status  # TODO: Remove FastAPI dependency
+from src.models.file import (
+    ByteRange,
+    CompletedPart,
+    DeleteFailure,
+    DeleteResult,
+    DirectoryListingPage,
+    FileDownload,
+    FileMetadata,
+    ObjectMetadata,
+    PresignMethod,
+    PresignedUrl,
+    TransferFailure,
+    TransferResult,
+    UploadPart,
+    UploadResult,
+    UploadSession,
+    UploadStatus,
+    directory_entry,
+    file_entry,
+    guess_content_type,
+)
+from src import profiling
+from src.repositories.files.base import FileRepository
+from src.repositories.files.uploads import select_parts
+
+T = TypeVar("T")
+
+# Files are written next to their target under this prefix, then renamed into
+# place, so a partial write is never visible under the target name
+PARTIAL_PREFIX = ".partial-"
+
+# Parts of multipart uploads are kept under this directory of the root, one
+# directory per upload, until they are joined into the file
+UPLOADS_DIRECTORY = PARTIAL_PREFIX + "uploads"
+
+UPLOAD_SESSION_FILE = "session.json"
+
+UPLOAD_ID_PATTERN = re.compile(r"[0-9a-f]{32}")
+
+# Number of files taken from a directory walk at a time
+WALK_BATCH_SIZE = 1000
+
+
+def _file_mode() -> int:
+    # The umask can only be read by setting it, so it is read once, on import
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+# The mode of new files, as open() would create them rather than mkstemp
+FILE_MODE = _file_mode()
+
+
+def last_modified(stat_result: os.stat_result) -> datetime:
+    """The modification time of a file, to the second as sent in HTTP headers
+
+    Args:
+        stat_result: The status of the file.
+
+    Returns:
+        The modification time in UTC.
+    """
+    return datetime.fromtimestamp(int(stat_result.st_mtime), tz=timezone.utc)
+
+
+def entity_tag(stat_result: os.stat_result) -> str:
+    """A strong entity tag that changes whenever the file is replaced or written
+
+    Args:
+        stat_result: The status of the file.
+
+    Returns:
+        The quoted entity tag.
+    """
+    return (
+        f'"{stat_result.st_ino:x}-{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+    )
+
+
+class LocalFileRepository(FileRepository):
+    def __init__(
+        self,
+        root: str,
+        logger: logging.Logger,
+        executor: Optional[Executor] = None,
+        download_chunk_size: int = 256 * 1024,
+        upload_concurrency: int = 8,
+        copy_concurrency: int = 8,
+    ):
+        self.logger = logger
+        self.root = root
+        self.executor = executor
+        self.download_chunk_size = download_chunk_size
+        self.upload_concurrency = upload_concurrency
+        self.copy_concurrency = copy_concurrency
+
+    async def _run(self, func: Callable[..., T], /, *args: Any, **kwargs: Any) -> T:
+        """
+        Runs a blocking filesystem call on the repository executor so that the
+        event loop is free to serve other requests while the call is in flight.
+
+        Args:
+          func (Callable): The blocking function to call.
+          *args: Positional arguments passed to the function.
+          **kwargs: Keyword arguments passed to the function.
+
+        Returns:
+          The return value of the function.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, profiling.bind(functools.partial(func, *args, **kwargs))
+        )
+
+    def _workspace(self, workspace_id: str) -> str:
+        """
+        Resolves the directory of a workspace. Blocking.
+
+        Raises:
+          HTTPException: If the workspace is not found.
+        """
+        directory = os.path.join(self.root, workspace_id)
+        if (
+            workspace_id in ("", ".", "..")
+            or "/" in workspace_id
+            or workspace_id.startswith(PARTIAL_PREFIX)
+            or not os.path.isdir(directory)
+        ):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"404_NOT_FOUND: workspace {workspace_id} not found",
+            )
+        return directory
+
+    def _resolve(self, workspace_id: str, path: Optional[str]) -> str:
+        """
+        Resolves a path within a workspace to a path on disk. Blocking.
+
+        Raises:
+          HTTPException: If the workspace is not found, or the path leaves it.
+        """
+        parts = [part for part in (path or "").split("/") if part not in ("", ".")]
+        if ".." in parts:
+            raise self._not_found(workspace_id, path)
+        return os.path.join(self._workspace(workspace_id), *parts)
+
+    def _not_found(self, workspace_id: str, path: str) -> HTTPException:
+        return HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"404_NOT_FOUND: {path} not found in {workspace_id}",
+        )
+
+    async def stat(
+        self,
+        workspace_id: str,
+        path: Optional[str] = None,
+        limit: Optional[int] = None,
+        start_after: Optional[str] = None,
+    ) -> DirectoryListingPage:
+        """
+        Asynchronously retrieves one page of the files and directories directly
+        within a path of a specified workspace.
+
+        Entries are named and ordered as the object storage backends list them, so
+        pages can be requested the same way. Only the entries on the requested page
+        are stat'ed.
+
+        Args:
+          workspace_id (str): The ID of the workspace.
+          path (Optional[str], optional): The path within the workspace. Defaults to "".
+          limit (Optional[int], optional): The maximum number of entries to return. Defaults to all of them.
+          start_after (Optional[str], optional): Only return entries after this name, as returned in `next_start_after`.
+
+        Returns:
+          DirectoryListingPage: The entries in the directory, and where the next page starts.
+
+        Raises:
+          HTTPException: If the workspace is not found.
+        """
+        prefix = f"{path}/" if path else ""
+
+        def list_page() -> DirectoryListingPage:
+            try:
+                with os.scandir(self._resolve(workspace_id, path)) as entries:
+                    names = sorted(
+                        (
+                            (
+                                prefix + entry.name + ("/" if entry.is_dir() else ""),
+                                entry,
+                            )
+                            for entry in entries
+                            if not entry.name.startswith(PARTIAL_PREFIX)
+                        ),
+                        key=lambda item: item[0],
+                    )
+            except (FileNotFoundError, NotADirectoryError):
+                names = []
+            if start_after is not None:
+                names = [(name, entry) for name, entry in names if name > start_after]
+            next_start_after = None
+            if limit is not None and len(names) > limit:
+                names = names[:limit]
+                next_start_after = names[-1][0]
+
+            page = []
+            for name, entry in names:
+                if name.endswith("/"):
+                    page.append(directory_entry(name[:-1]))
+                    continue
+                try:
+                    stat_result = entry.stat()
+                except FileNotFoundError:
+                    continue
+                page.append(
+                    file_entry(name, stat_result.st_size, last_modified(stat_result))
+                )
+            return DirectoryListingPage(entries=page, next_start_after=next_start_after)
+
+        return await self._run(list_page)
+
+    async def download_file(
+        self,
+        workspace_id: str,
+        path: str,
+        byte_range: Optional[ByteRange] = None,
+    ) -> FileDownload:
+        """
+        Asynchronously opens a file in a specified workspace for streaming.
+
+        The download carries the path of the file on disk, so it can be handed to
+        the server to send without reading it through Python. Otherwise the file is
+        read in chunks of `download_chunk_size` bytes as the content is iterated.
+
+        Args:
+          workspace_id (str): The ID of the workspace containing the file.
+          path (str): The path of the file within the workspace.
+          byte_range (Optional[ByteRange], optional): The range of bytes to download. Defaults to the whole file.
+
+        Returns:
+          FileDownload: The file metadata and a stream of its content.
+
+        Raises:
+          HTTPException: If the file is not found, or the byte range cannot be satisfied.
+        """
+
+        def open_file() -> tuple[str, int, os.stat_result]:
+            file_path = os.path.abspath(self._resolve(workspace_id, path))
+            try:
+                fd = os.open(file_path, os.O_RDONLY)
+            except (FileNotFoundError, IsADirectoryError, NotADirectoryError):
+                raise self._not_found(workspace_id, path)
+            stat_result = os.fstat(fd)
+            # Directories open for reading too
+            if not S_ISREG(stat_result.st_mode):
+                os.close(fd)
+                raise self._not_found(workspace_id, path)
+            return file_path, fd, stat_result
+
+        file_path, fd, stat_result = await self._run(open_file)
+        size = stat_result.st_size
+        match byte_range:
+            case None:
+                start, end = 0, size - 1
+            case ByteRange(start=None, end=suffix):
+                start, end = max(size - suffix, 0), size - 1
+            case ByteRange(start=start, end=end):
+                end = size - 1 if end is None else min(end, size - 1)
+        if byte_range is not None and (start >= size or (start > end)):
+            os.close(fd)
+            raise HTTPException(
+                status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                detail=f"416_REQUESTED_RANGE_NOT_SATISFIABLE: {path} in {workspace_id}",
+                headers={"Content-Range": f"bytes */{size}"},
+            )
+
+        @functools.cache
+        def release() -> None:
+            os.close(fd)
+
+        async def content() -> AsyncIterator[bytes]:
+            offset = start
+            try:
+                while offset <= end:
+                    chunk = await self._run(
+                        os.pread,
+                        fd,
+                        min(self.download_chunk_size, end - offset + 1),
+                        offset,
+                    )
+                    if not chunk:
+                        break
+                    offset += len(chunk)
+                    yield chunk
+            finally:
+                release()
+
+        return FileDownload(
+            filename=os.path.basename(path),
+            content_type=guess_content_type(path),
+            content=content(),
+            content_length=max(end - start + 1, 0),
+            size=size,
+            content_range=(start, end) if byte_range is not None else None,
+            etag=entity_tag(stat_result),
+            last_modified=last_modified(stat_result),
+            release=release,
+            file_path=file_path,
+        )
+
+    async def head_file(self, workspace_id: str, path: str) -> FileMetadata:
+        """
+        Asynchronously retrieves the metadata of a file, without opening it.
+
+        Args:
+          workspace_id (str): The ID of the workspace containing the file.
+          path (str): The path of the file within the workspace.
+
+        Returns:
+          FileMetadata: The size, content type and validators of the file.
+
+        Raises:
+          HTTPException: If the file is not found.
+        """
+
+        def stat_file() -> os.stat_result:
+            try:
+                stat_result = os.stat(self._resolve(workspace_id, path))
+            except (FileNotFoundError, NotADirectoryError):
+                raise self._not_found(workspace_id, path)
+            if not S_ISREG(stat_result.st_mode):
+                raise self._not_found(workspace_id, path)
+            return stat_result
+
+        stat_result = await self._run(stat_file)
+        return FileMetadata(
+            filename=os.path.basename(path),
+            content_type=guess_content_type(path),
+            size=stat_result.st_size,
+            etag=entity_tag(stat_result),
+            last_modified=last_modified(stat_result),
+        )
+
+    async def presign_url(
+        self,
+        workspace_id: str,
+        path: str,
+        method: PresignMethod,
+        expires: timedelta,
+    ) -> PresignedUrl:
+        """
+        Presigned URLs are not supported, every file is served by this service.
+
+        Raises:
+          HTTPException: Always.
+        """
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="501_NOT_IMPLEMENTED: the local storage backend does not support presigned URLs",
+        )
+
+    async def walk(
+        self, workspace_id: str, path: Optional[str] = None
+    ) -> AsyncIterator[list[ObjectMetadata]]:
+        """
+        Asynchronously lists every file within a path of a workspace, in batches.
+
+        Args:
+          workspace_id (str): The ID of the workspace.
+          path (Optional[str], optional): The path within the workspace. Defaults to "".
+
+        Returns:
+          AsyncIterator[list[ObjectMetadata]]: Batches of up to `WALK_BATCH_SIZE` files.
+
+        Raises:
+          HTTPException: If the workspace is not found.
+        """
+        directory = await self._run(self._resolve, workspace_id, path)
+        prefix = f"{path}/" if path else ""
+        batches = itertools.batched(self._walk_files(directory), WALK_BATCH_SIZE)
+        while (batch := await self._run(next, batches, None)) is not None:
+            yield [
+                ObjectMetadata(
+                    name=prefix + name.replace(os.sep, "/"),
+                    size=stat_result.st_size,
+                    last_modified=last_modified(stat_result),
+                    etag=entity_tag(stat_result),
+                    content_type=guess_content_type(name),
+                )
+                for name, stat_result in batch
+            ]
+
+    async def upload_file(
+        self,
+        workspace_id: str,
+        files: list[UploadFile],
+        path: Optional[str] = "",
+    ) -> list[UploadResult]:
+        """
+        Asynchronously uploads files to a specified workspace.
+
+        Each file is streamed to a temporary file next to its target and renamed
+        into place once complete. Up to `upload_concurrency` files are written at
+        once, and a file that fails to upload does not stop the other uploads.
+
+        Args:
+          workspace_id (str): The ID of the workspace where the files will be uploaded.
+          files (list[UploadFile]): A list of files to be uploaded.
+          path (Optional[str], optional): The path within the workspace where the files will be uploaded. Defaults to "".
+
+        Returns:
+          list[UploadResult]: The outcome of each upload, in the order the files were given.
+
+        Logs:
+          Info: Logs the filename, size, and upload path for each uploaded file.
+          Warning: Logs the filename, upload path and error for each failed upload.
+        """
+        slots = asyncio.Semaphore(self.upload_concurrency)
+
+        async def upload(file: UploadFile) -> UploadResult:
+            upload_path = os.path.join(path, file.filename) if path else file.filename
+            async with slots:
+                try:
+                    size = await self._run(
+                        self._write_file, workspace_id, upload_path, file.file
+                    )
+                except Exception as error:
+                    self.logger.warning(
+                        f"FAILED to upload {file.filename} to {workspace_id}/{upload_path}: {error}"
+                    )
+                    return UploadResult(
+                        name=upload_path,
+                        filename=file.filename,
+                        status=UploadStatus.FAILED,
+                        detail=str(error),
+                    )
+
+            self.logger.info(
+                f"UPLOADED {file.filename} ({humanize.naturalsize(size)}) to {workspace_id}/{upload_path}"
+            )
+            return UploadResult(
+                name=upload_path,
+                filename=file.filename,
+                status=UploadStatus.UPLOADED,
+                size=size,
+            )
+
+        return await asyncio.gather(*(upload(file) for file in files))
+
+    def _replace_with(self, target: str, write: Callable[[str], None]) -> None:
+        """
+        Writes a file to a temporary path beside the target, then atomically
+        renames it over the target. Blocking.
+
+        The file keeps the mode of the file it replaces, and new files get the
+        mode the umask allows rather than the owner-only mode of `mkstemp`.
+        """
+        directory = os.path.dirname(target)
+        os.makedirs(directory, exist_ok=True)
+        try:
+            mode = S_IMODE(os.stat(target).st_mode)
+        except FileNotFoundError:
+            mode = FILE_MODE
+        fd, partial = tempfile.mkstemp(prefix=PARTIAL_PREFIX, dir=directory)
+        try:
+            os.fchmod(fd, mode)
+        finally:
+            os.close(fd)
+        try:
+            write(partial)
+            os.replace(partial, target)
+        except BaseException:
+            os.unlink(partial)
+            raise
+
+    def _write_file(self, workspace_id: str, path: str, stream: BinaryIO) -> int:
+        """
+        Streams a file object to a path within the workspace. Blocking.
+
+        Returns:
+          int: The number of bytes written.
+        """
+        size = 0
+
+        def write(partial: str) -> None:
+            nonlocal size
+            with open(partial, "wb") as file:
+                while chunk := stream.read(self.download_chunk_size):
+                    size += file.write(chunk)
+
+        self._replace_with(self._resolve(workspace_id, path), write)
+        return size
+
+    def _upload_directory(self, workspace_id: str, path: str, upload_id: str) -> str:
+        """
+        Resolves the directory of a multipart upload of a file. Blocking.
+
+        Returns:
+          str: The directory the parts of the upload are kept in.
+
+        Raises:
+          HTTPException: If the upload of this file is not found.
+        """
+        directory = os.path.join(self.root, UPLOADS_DIRECTORY, upload_id)
+        try:
+            if not UPLOAD_ID_PATTERN.fullmatch(upload_id):
+                raise FileNotFoundError(upload_id)
+            with open(os.path.join(directory, UPLOAD_SESSION_FILE)) as file:
+                session = json.load(file)
+        except (FileNotFoundError, ValueError):
+            session = None
+        if session is None or (session["workspaceId"], session["name"]) != (
+            workspace_id,
+            path,
+        ):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"404_NOT_FOUND: upload {upload_id} of {path} not found in {workspace_id}",
+            )
+        return directory
+
+    def _upload_sessions(self) -> Iterator[tuple[str, Optional[dict]]]:
+        """
+        Lazily yields the directory and session of every multipart upload, the
+        session being None while it is written. Blocking.
+        """
+        try:
+            entries = list(os.scandir(os.path.join(self.root, UPLOADS_DIRECTORY)))
+        except FileNotFoundError:
+            return
+        for entry in entries:
+            try:
+                with open(os.path.join(entry.path, UPLOAD_SESSION_FILE)) as file:
+                    yield entry.path, json.load(file)
+            except (FileNotFoundError, NotADirectoryError, ValueError):
+                yield entry.path, None
+
+    async def create_upload(
+        self, workspace_id: str, path: str, content_type: Optional[str] = None
+    ) -> UploadSession:
+        """
+        Asynchronously starts a multipart upload of a file. Parts can then be sent
+        in any order, in parallel, and again if they fail.
+
+        Args:
+          workspace_id (str): The ID of the workspace to upload to.
+          path (str): The path of the file within the workspace.
+          content_type (Optional[str], optional): Ignored, the content type of a file is guessed from its name.
+
+        Returns:
+          UploadSession: The ID of the upload.
+
+        Raises:
+          HTTPException: If the workspace is not found.
+        """
+
+        def create() -> UploadSession:
+            self._resolve(workspace_id, path)
+            session = UploadSession(
+                upload_id=secrets.token_hex(16),
+                name=path,
+                initiated=datetime.now(timezone.utc),
+            )
+            directory = os.path.join(self.root, UPLOADS_DIRECTORY, session.upload_id)
+            os.makedirs(directory)
+
+            def write(partial: str) -> None:
+                with open(partial, "w") as file:
+                    json.dump(
+                        {
+                            "workspaceId": workspace_id,
+                            "name": path,
+                            "initiated": session.initiated.isoformat(),
+                        },
+                        file,
+                    )
+
+            self._replace_with(os.path.join(directory, UPLOAD_SESSION_FILE), write)
+            return session
+
+        return await self._run(create)
+
+    async def upload_part(
+        self,
+        workspace_id: str,
+        path: str,
+        upload_id: str,
+        part_number: int,
+        data: bytes,
+    ) -> UploadPart:
+        """
+        Asynchronously writes one part of a multipart upload, replacing any part
+        sent before with the same number.
+
+        Args:
+          workspace_id (str): The ID of the workspace to upload to.
+          path (str): The path of the file within the workspace.
+          upload_id (str): The ID of the upload.
+          part_number (int): The position of the part in the file, from 1.
+          data (bytes): The content of the part.
+
+        Returns:
+          UploadPart: The entity tag of the part, to complete the upload with.
+
+        Raises:
+          HTTPException: If the upload is not found.
+        """
+
+        def write_part() -> os.stat_result:
+            directory = self._upload_directory(workspace_id, path, upload_id)
+            target = os.path.join(directory, f"part-{part_number:05d}")
+
+            def write(partial: str) -> None:
+                with open(partial, "wb") as file:
+                    file.write(data)
+
+            self._replace_with(target, write)
+            return os.stat(target)
+
+        stat_result = await self._run(write_part)
+        return UploadPart(
+            part_number=part_number,
+            etag=entity_tag(stat_result),
+            size=stat_result.st_size,
+            last_modified=last_modified(stat_result),
+        )
+
+    async def list_parts(
+        self, workspace_id: str, path: str, upload_id: str
+    ) -> list[UploadPart]:
+        """
+        Asynchronously lists the parts written to a multipart upload, so an
+        interrupted upload can be resumed.
+
+        Args:
+          workspace_id (str): The ID of the workspace to upload to.
+          path (str): The path of the file within the workspace.
+          upload_id (str): The ID of the upload.
+
+        Returns:
+          list[UploadPart]: The parts, by part number.
+
+        Raises:
+          HTTPException: If the upload is not found.
+        """
+
+        def list_all() -> list[UploadPart]:
+            directory = self._upload_directory(workspace_id, path, upload_id)
+            parts = []
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if not entry.name.startswith("part-"):
+                        continue
+                    try:
+                        stat_result = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    parts.append(
+                        UploadPart(
+                            part_number=int(entry.name.removeprefix("part-")),
+                            etag=entity_tag(stat_result),
+                            size=stat_result.st_size,
+                            last_modified=last_modified(stat_result),
+                        )
+                    )
+            return sorted(parts, key=lambda part: part.part_number)
+
+        return await self._run(list_all)
+
+    async def complete_upload(
+        self,
+        workspace_id: str,
+        path: str,
+        upload_id: str,
+        parts: Optional[list[CompletedPart]] = None,
+    ) -> UploadResult:
+        """
+        Asynchronously joins the parts of a multipart upload into the file, which
+        is renamed into place once complete.
+
+        Args:
+          workspace_id (str): The ID of the workspace to upload to.
+          path (str): The path of the file within the workspace.
+          upload_id (str): The ID of the upload.
+          parts (Optional[list[CompletedPart]], optional): The parts to join, in order. Defaults to every part sent.
+
+        Returns:
+          UploadResult: The file uploaded and its size.
+
+        Raises:
+          HTTPException: If the upload is not found, or the parts don't match the parts sent.
+
+        Logs:
+          Info: Logs the size and path of the file.
+        """
+        try:
+            selected = select_parts(
+                await self.list_parts(workspace_id, path, upload_id), parts
+            )
+        except ValueError as error:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"400_BAD_REQUEST: {error}",
+            )
+
+        def join() -> int:
+            directory = self._upload_directory(workspace_id, path, upload_id)
+            size = 0
+
+            def write(partial: str) -> None:
+                nonlocal size
+                with open(partial, "wb") as target:
+                    for part in selected:
+                        with open(
+                            os.path.join(directory, f"part-{part.part_number:05d}"),
+                            "rb",
+                        ) as source:
+                            shutil.copyfileobj(source, target)
+                    size = target.tell()
+
+            self._replace_with(self._resolve(workspace_id, path), write)
+            shutil.rmtree(directory, ignore_errors=True)
+            return size
+
+        size = await self._run(join)
+        self.logger.info(
+            f"UPLOADED {len(selected)} part(s) ({humanize.naturalsize(size)}) to {workspace_id}/{path}"
+        )
+        return UploadResult(
+            name=path,
+            filename=os.path.basename(path),
+            status=UploadStatus.UPLOADED,
+            size=size,
+        )
+
+    async def abort_upload(self, workspace_id: str, path: str, upload_id: str) -> None:
+        """
+        Asynchronously abandons a multipart upload, removing the parts written to it.
+
+        Args:
+          workspace_id (str): The ID of the workspace to upload to.
+          path (str): The path of the file within the workspace.
+          upload_id (str): The ID of the upload.
+
+        Raises:
+          HTTPException: If the upload is not found.
+        """
+        await self._run(
+            lambda: shutil.rmtree(
+                self._upload_directory(workspace_id, path, upload_id),
+                ignore_errors=True,
+            )
+        )
+
+    async def list_uploads(
+        self, workspace_id: str, prefix: Optional[str] = None
+    ) -> list[UploadSession]:
+        """
+        Asynchronously lists the multipart uploads in progress in a workspace.
+
+        Args:
+          workspace_id (str): The ID of the workspace.
+          prefix (Optional[str], optional): Only uploads of files whose path starts with this.
+
+        Returns:
+          list[UploadSession]: The uploads, by path.
+        """
+
+        def list_all() -> list[UploadSession]:
+            return sorted(
+                (
+                    UploadSession(
+                        upload_id=os.path.basename(directory),
+                        name=session["name"],
+                        initiated=session["initiated"],
+                    )
+                    for directory, session in self._upload_sessions()
+                    if session is not None
+                    and session["workspaceId"] == workspace_id
+                    and session["name"].startswith(prefix or "")
+                ),
+                key=lambda session: (session.name, session.initiated),
+            )
+
+        return await self._run(list_all)
+
+    async def abort_stale_uploads(self, initiated_before: datetime) -> int:
+        """
+        Asynchronously abandons the multipart uploads of every workspace that were
+        started before a given time.
+
+        Args:
+          initiated_before (datetime): Uploads started before this are aborted.
+
+        Returns:
+          int: The number of uploads aborted.
+        """
+
+        def abort_all() -> int:
+            aborted = 0
+            for directory, session in self._upload_sessions():
+                if session is not None:
+                    initiated = datetime.fromisoformat(session["initiated"])
+                else:
+                    # Left without a session by a failed start
+                    try:
+                        initiated = last_modified(os.stat(directory))
+                    except FileNotFoundError:
+                        continue
+                if initiated < initiated_before:
+                    shutil.rmtree(directory, ignore_errors=True)
+                    aborted += 1
+            return aborted
+
+        return await self._run(abort_all)
+
+    async def create_directory(self, workspace_id: str, path: str) -> None:
+        """
+        Asynchronously creates a directory in the specified workspace.
+
+        Args:
+          workspace_id (str): The ID of the workspace where the directory will be created.
+          path (str): The path of the directory to be created within the workspace.
+        """
+        await self._run(
+            lambda: os.makedirs(self._resolve(workspace_id, path), exist_ok=True)
+        )
+        self.logger.info(f"CREATED {path} in {workspace_id}")
+
+    async def delete_directory(self, workspace_id: str, path: str) -> DeleteResult:
+        """
+        Asynchronously deletes a directory, and all contents within it, from a specified workspace.
+
+        Args:
+          workspace_id (str): The ID of the workspace containing the directory.
+          path (str): The path of the directory within the workspace.
+
+        Returns:
+          DeleteResult: The number of files deleted, and the files that could not be.
+
+        Logs:
+          Info: Logs the number of files deleted from the specified workspace, and the total files to delete
+          Warning: Logs each file that could not be deleted.
+        """
+
+        def delete_tree() -> DeleteResult:
+            result = DeleteResult()
+            workspace = self._workspace(workspace_id)
+            directory = self._resolve(workspace_id, path)
+            for parent, _, filenames in os.walk(directory, topdown=False):
+                for filename in filenames:
+                    # Uploads in flight are renamed into place when they end
+                    if filename.startswith(PARTIAL_PREFIX):
+                        continue
+                    file_path = os.path.join(parent, filename)
+                    try:
+                        os.remove(file_path)
+                    except OSError as error:
+                        name = os.path.relpath(file_path, workspace)
+                        code = errno.errorcode.get(error.errno, type(error).__name__)
+                        self.logger.warning(
+                            f"Failed to delete object '{name}' with error code '{code}'."
+                        )
+                        result.failures.append(
+                            DeleteFailure(name=name, code=code, message=error.strerror)
+                        )
+                        result.failed += 1
+                    else:
+                        result.deleted += 1
+                if parent != workspace:
+                    try:
+                        os.rmdir(parent)
+                    except OSError:
+                        # Still holds the files that could not be deleted
+                        pass
+            return result
+
+        result = await self._run(delete_tree)
+
+        if result.failed != 0:
+            self.logger.warning(
+                f"FAILED to delete {result.failed} object(s) from {path} in {workspace_id}"
+            )
+
+        self.logger.info(
+            f"DELETED {result.deleted} of {result.deleted + result.failed} object(s) from {path} in {workspace_id}."
+        )
+        return result
+
+    async def delete_file(self, workspace_id: str, path: str) -> None:
+        """
+        Asynchronously deletes a file from a specified workspace.
+
+        Args:
+          workspace_id (str): The ID of the workspace containing the file.
+          path (str): The path of the file within the workspace.
+
+        Raises:
+          HTTPException: If the file is not found in the specified workspace.
+
+        Logs:
+          Info: Logs the path of the file deleted from the specified workspace.
+        """
+
+        def delete() -> None:
+            try:
+                os.remove(self._resolve(workspace_id, path))
+            except (FileNotFoundError, IsADirectoryError, NotADirectoryError):
+                raise self._not_found(workspace_id, path)
+
+        await self._run(delete)
+        self.logger.info(f"DELETED {path} from {workspace_id}")
+
+    def _copy(self, source: str, target: str) -> None:
+        # shutil.copyfile copies in the kernel with sendfile where it can
+        self._replace_with(target, lambda partial: shutil.copyfile(source, partial))
+
+    def _move(self, source: str, target: str) -> None:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(source, target)
+
+    async def _transfer_file(
+        self,
+        transfer: Callable[[str, str], None],
+        workspace_id: str,
+        path: str,
+        target_path: str,
+        target_workspace_id: Optional[str],
+    ) -> None:
+        def run() -> None:
+            source = self._resolve(workspace_id, path)
+            if not os.path.isfile(source):
+                raise self._not_found(workspace_id, path)
+            transfer(
+                source, self._resolve(target_workspace_id or workspace_id, target_path)
+            )
+
+        await self._run(run)
+
+    async def copy_file(
+        self,
+        workspace_id: str,
+        path: str,
+        target_path: str,
+        target_workspace_id: Optional[str] = None,
+    ) -> None:
+        """
+        Asynchronously copies a file from one location to another within the same workspace, or to another workspace.
+
+        Args:
+          workspace_id (str): The ID of the workspace containing the source file.
+          path (str): The path of the source file within the workspace.
+          target_path (str): The path where the file should be copied to in the target workspace.
+          target_workspace_id (Optional[str], optional): The ID of the target workspace. If not provided, defaults to the source workspace ID.
+
+        Raises:
+          HTTPException: If the source file is not found in the specified workspace.
+
+        Logs:
+          Info: Logs the source and target paths along with their respective workspace IDs after a successful copy operation.
+        """
+        await self._transfer_file(
+            self._copy, workspace_id, path, target_path, target_workspace_id
+        )
+        self.logger.info(
+            f"Copied {path} in {workspace_id} TO {target_path} in {target_workspace_id or workspace_id}"
+        )
+
+    async def move_file(
+        self,
+        workspace_id: str,
+        path: str,
+        target_path: str,
+        target_workspace_id: Optional[str] = None,
+    ) -> None:
+        """
+        Asynchronously moves a file from one workspace to another with a rename.
+
+        Args:
+          workspace_id (str): The ID of the workspace containing the source file.
+          path (str): The path of the source file within the workspace.
+          target_path (str): The path where the file should be moved to in the target workspace.
+          target_workspace_id (Optional[str], optional): The ID of the target workspace. If not provided, defaults to the source workspace ID.
+
+        Raises:
+          HTTPException: If the source file is not found in the specified workspace.
+
+        Logs:
+          Info: Logs the source and target paths along with their respective workspace IDs after a successful move operation.
+        """
+        await self._transfer_file(
+            self._move, workspace_id, path, target_path, target_workspace_id
+        )
+        self.logger.info(
+            f"Moved {path} in {workspace_id} TO {target_path} in {target_workspace_id or workspace_id}"
+        )
+
+    async def copy_directory(
+        self,
+        workspace_id: str,
+        path: str,
+        target_path: str,
+        target_workspace_id: Optional[str] = None,
+        progress: Optional[Callable[[TransferResult], None]] = None,
+    ) -> TransferResult:
+        """
+        Asynchronously copies a directory and all contents within it, within the same workspace or to another workspace.
+
+        Up to `copy_concurrency` files are copied at once.
+
+        Args:
+          workspace_id (str): The ID of the workspace containing the source directory.
+          path (str): The path of the source directory within the workspace.
+          target_path (str): The path the directory should be copied to in the target workspace.
+          target_workspace_id (Optional[str], optional): The ID of the target workspace. If not provided, defaults to the source workspace ID.
+          progress (Optional[Callable[[TransferResult], None]], optional): Called with the running totals after each file.
+
+        Returns:
+          TransferResult: The number of files and bytes copied, and the files that could not be.
+
+        Raises:
+          HTTPException: If the source directory is not found in the specified workspace.
+
+        Logs:
+          Info: Logs the number of files copied.
+          Warning: Logs each file that could not be copied.
+        """
+        result = await self._transfer_directory(
+            self._copy, workspace_id, path, target_path, target_workspace_id, progress
+        )
+        self.logger.info(
+            f"Copied {result.copied} of {result.copied + result.failed} object(s) from {path} in {workspace_id} TO {target_path} in {target_workspace_id or workspace_id}"
+        )
+        return result
+
+    async def move_directory(
+        self,
+        workspace_id: str,
+        path: str,
+        target_path: str,
+        target_workspace_id: Optional[str] = None,
+        progress: Optional[Callable[[TransferResult], None]] = None,
+    ) -> TransferResult:
+        """
+        Asynchronously moves a directory and all contents within it, renaming each file into place.
+
+        Args:
+          workspace_id (str): The ID of the workspace containing the source directory.
+          path (str): The path of the source directory within the workspace.
+          target_path (str): The path the directory should be moved to in the target workspace.
+          target_workspace_id (Optional[str], optional): The ID of the target workspace. If not provided, defaults to the source workspace ID.
+          progress (Optional[Callable[[TransferResult], None]], optional): Called with the running totals after each file.
+
+        Returns:
+          TransferResult: The number of files moved, and the files that could not be.
+
+        Raises:
+          HTTPException: If the source directory is not found in the specified workspace.
+
+        Logs:
+          Info: Logs the number of files moved.
+          Warning: Logs each file that could not be moved.
+        """
+        result = await self._transfer_directory(
+            self._move, workspace_id, path, target_path, target_workspace_id, progress
+        )
+        result.deleted = result.copied
+
+        def remove_empty_directories() -> None:
+            source = self._resolve(workspace_id, path)
+            for parent, _, _ in os.walk(source, topdown=False):
+                try:
+                    os.rmdir(parent)
+                except OSError:
+                    # Still holds the files that could not be moved
+                    pass
+
+        await self._run(remove_empty_directories)
+        self.logger.info(
+            f"Moved {result.deleted} of {result.copied + result.failed} object(s) from {path} in {workspace_id} TO {target_path} in {target_workspace_id or workspace_id}"
+        )
+        return result
+
+    def _walk_files(
+        self,
+        directory: str,
+        on_directory: Optional[Callable[[str], None]] = None,
+    ) -> Iterator[tuple[str, os.stat_result]]:
+        """
+        Lazily yields the path relative to `directory` and status of every file within it. Blocking.
+
+        `on_directory` is called with the path relative to `directory` of each
+        directory, empty ones included, before the files within it.
+        """
+        for parent, _, filenames in os.walk(directory):
+            if on_directory is not None:
+                on_directory(os.path.relpath(parent, directory))
+            for filename in filenames:
+                if filename.startswith(PARTIAL_PREFIX):
+                    continue
+                file_path = os.path.join(parent, filename)
+                try:
+                    stat_result = os.stat(file_path)
+                except FileNotFoundError:
+                    continue
+                yield os.path.relpath(file_path, directory), stat_result
+
+    async def _transfer_directory(
+        self,
+        transfer: Callable[[str, str], None],
+        workspace_id: str,
+        path: str,
+        target_path: str,
+        target_workspace_id: Optional[str],
+        progress: Optional[Callable[[TransferResult], None]],
+    ) -> TransferResult:
+        target_workspace_id = target_workspace_id or workspace_id
+
+        def resolve() -> tuple[str, str]:
+            source = self._resolve(workspace_id, path)
+            if not os.path.isdir(source):
+                raise self._not_found(workspace_id, path)
+            return source, self._resolve(target_workspace_id, target_path)
+
+        source, target = await self._run(resolve)
+        result = TransferResult()
+        slots = asyncio.Semaphore(self.copy_concurrency)
+
+        def make_directory(name: str) -> None:
+            # Empty directories are recreated too, as the marker objects of the
+            # object storage backends are copied
+            os.makedirs(os.path.normpath(os.path.join(target, name)), exist_ok=True)
+
+        batches = itertools.batched(
+            self._walk_files(source, make_directory), WALK_BATCH_SIZE
+        )
+
+        async def transfer_one(name: str, size: int) -> None:
+            try:
+                await self._run(
+                    transfer, os.path.join(source, name), os.path.join(target, name)
+                )
+            except Exception as error:
+                self.logger.warning(
+                    f"Failed to transfer {name} in {workspace_id}/{path} TO {target_workspace_id}/{target_path}: {error}"
+                )
+                result.failed += 1
+                result.failures.append(
+                    TransferFailure(name=f"{path}/{name}", detail=str(error))
+                )
+            else:
+                result.copied += 1
+                result.bytes_copied += size
+            finally:
+                slots.release()
+            if progress is not None:
+                progress(result)
+
+        try:
+            async with asyncio.TaskGroup() as tasks:
+                while (batch := await self._run(next, batches, None)) is not None:
+                    for name, stat_result in batch:
+                        await slots.acquire()
+                        tasks.create_task(transfer_one(name, stat_result.st_size))
+        except BaseExceptionGroup as error:
+            raise error.exceptions[0]
+        return result
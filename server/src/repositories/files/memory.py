@@ -0,0 +1,772 @@
+import asyncio
+import bisect
+import itertools
+import logging
+import os
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Callable, Optional
+
+import humanize
+from fastapi import HTTPException, UploadFile, status  # TODO: Remove FastAPI dependency
+from src.models.file import (
+    ByteRange,
+    CompletedPart,
+    DeleteResult,
+    DirectoryListingPage,
+    FileDownload,
+    FileMetadata,
+    ObjectMetadata,
+    PresignMethod,
+    PresignedUrl,
+    TransferResult,
+    UploadPart,
+    UploadResult,
+    UploadSession,
+    UploadStatus,
+    directory_entry,
+    file_entry,
+    guess_content_type,
+)
+from src.repositories.files.base import FileRepository
+from src.repositories.files.uploads import select_parts
+
+
+@dataclass
+class StoredObject:
+    data: bytes
+    content_type: str
+    etag: str
+    last_modified: datetime = field(
+        default_factory=lambda: datetime.now(timezone.utc).replace(microsecond=0)
+    )
+
+
+@dataclass
+class InMemoryWorkspace:
+    # Object names are kept sorted, so listings page through them as S3 does
+    names: list[str] = field(default_factory=list)
+    objects: dict[str, StoredObject] = field(default_factory=dict)
+
+    def put(self, name: str, obj: StoredObject) -> None:
+        if name not in self.objects:
+            bisect.insort(self.names, name)
+        self.objects[name] = obj
+
+    def remove(self, name: str) -> bool:
+        if self.objects.pop(name, None) is None:
+            return False
+        del self.names[bisect.bisect_left(self.names, name)]
+        return True
+
+    def names_with_prefix(self, prefix: str) -> list[str]:
+        start = bisect.bisect_left(self.names, prefix)
+        end = start
+        while end < len(self.names) and self.names[end].startswith(prefix):
+            end += 1
+        return self.names[start:end]
+
+
+@dataclass
+class PendingUpload:
+    workspace_id: str
+    name: str
+    content_type: str
+    initiated: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    parts: dict[int, StoredObject] = field(default_factory=dict)
+
+
+class InMemoryStore:
+    """
+    Objects held in process, shared by every request. Workspaces are created on
+    first write.
+    """
+
+    def __init__(self):
+        self.workspaces: dict[str, InMemoryWorkspace] = {}
+        self.versions = itertools.count(1)
+        self.uploads: dict[str, PendingUpload] = {}
+
+    def workspace(self, workspace_id: str) -> InMemoryWorkspace:
+        return self.workspaces.setdefault(workspace_id, InMemoryWorkspace())
+
+    def put(
+        self,
+        workspace_id: str,
+        name: str,
+        data: bytes,
+        content_type: Optional[str] = None,
+    ) -> StoredObject:
+        obj = StoredObject(
+            data=data,
+            content_type=content_type or guess_content_type(name),
+            etag=f'"{next(self.versions):x}"',
+        )
+        self.workspace(workspace_id).put(name, obj)
+        return obj
+
+
+class InMemoryFileRepository(FileRepository):
+    """
+    A storage backend stand-in that keeps objects in memory, with the listing and
+    error semantics of the object storage backends. Every call to the store waits
+    `latency` seconds first, to stand in for the round trip to a remote backend.
+    """
+
+    def __init__(
+        self,
+        store: InMemoryStore,
+        logger: logging.Logger,
+        latency: float = 0.0,
+        download_chunk_size: int = 256 * 1024,
+        copy_concurrency: int = 8,
+    ):
+        self.store = store
+        self.logger = logger
+        self.latency = latency
+        self.download_chunk_size = download_chunk_size
+        self.copy_concurrency = copy_concurrency
+
+    async def _round_trip(self) -> None:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def _workspace(self, workspace_id: str) -> InMemoryWorkspace:
+        # Reads never create a workspace, as they don't create a bucket
+        workspace = self.store.workspaces.get(workspace_id)
+        if workspace is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"404_NOT_FOUND: workspace {workspace_id} not found",
+            )
+        return workspace
+
+    def _get(self, workspace_id: str, path: str) -> StoredObject:
+        workspace = self.store.workspaces.get(workspace_id)
+        obj = workspace.objects.get(path) if workspace is not None else None
+        if obj is None or path.endswith("/"):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"404_NOT_FOUND: {path} not found in {workspace_id}",
+            )
+        return obj
+
+    async def stat(
+        self,
+        workspace_id: str,
+        path: Optional[str] = None,
+        limit: Optional[int] = None,
+        start_after: Optional[str] = None,
+    ) -> DirectoryListingPage:
+        """
+        Asynchronously retrieves one page of the files and directories directly
+        within a path of a specified workspace.
+
+        Args:
+          workspace_id (str): The ID of the workspace.
+          path (Optional[str], optional): The path within the workspace. Defaults to "".
+          limit (Optional[int], optional): The maximum number of entries to return. Defaults to all of them.
+          start_after (Optional[str], optional): Only return entries after this object name, as returned in `next_start_after`.
+
+        Returns:
+          DirectoryListingPage: The entries in the directory, and where the next page starts.
+
+        Raises:
+          HTTPException: If the workspace is not found.
+        """
+        await self._round_trip()
+        prefix = f"{path}/" if path else ""
+        workspace = self._workspace(workspace_id)
+        names, objects = workspace.names, workspace.objects
+        index = bisect.bisect_right(names, max(prefix, start_after or ""))
+        entries = []
+        while index < len(names) and names[index].startswith(prefix):
+            name = names[index]
+            separator = name.find("/", len(prefix))
+            if separator >= 0:
+                # Roll nested objects up into one directory, and skip past them
+                key = name[: separator + 1]
+                index = bisect.bisect_left(names, key[:-1] + "0")
+                if start_after is not None and key <= start_after:
+                    continue
+                entry = directory_entry(key[:-1])
+            else:
+                key = name
+                index += 1
+                obj = objects[name]
+                entry = file_entry(
+                    name,
+                    len(obj.data),
+                    obj.last_modified,
+                    content_type=obj.content_type,
+                )
+            if limit is not None and len(entries) == limit:
+                return DirectoryListingPage(entries=entries, next_start_after=last_key)
+            entries.append(entry)
+            last_key = key
+        return DirectoryListingPage(entries=entries)
+
+    async def download_file(
+        self,
+        workspace_id: str,
+        path: str,
+        byte_range: Optional[ByteRange] = None,
+    ) -> FileDownload:
+        """
+        Asynchronously opens a file in a specified workspace for streaming.
+
+        Args:
+          workspace_id (str): The ID of the workspace containing the file.
+          path (str): The path of the file within the workspace.
+          byte_range (Optional[ByteRange], optional): The range of bytes to download. Defaults to the whole file.
+
+        Returns:
+          FileDownload: The file metadata and a stream of its content.
+
+        Raises:
+          HTTPException: If the file is not found, or the byte range cannot be satisfied.
+        """
+        await self._round_trip()
+        obj = self._get(workspace_id, path)
+        size = len(obj.data)
+        match byte_range:
+            case None:
+                start, end = 0, size - 1
+            case ByteRange(start=None, end=suffix):
+                start, end = max(size - suffix, 0), size - 1
+            case ByteRange(start=start, end=end):
+                end = size - 1 if end is None else min(end, size - 1)
+        if byte_range is not None and start > end:
+            raise HTTPException(
+                status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                detail=f"416_REQUESTED_RANGE_NOT_SATISFIABLE: {path} in {workspace_id}",
+                headers={"Content-Range": f"bytes */{size}"},
+            )
+
+        async def content() -> AsyncIterator[bytes]:
+            data = memoryview(obj.data)
+            for offset in range(start, end + 1, self.download_chunk_size):
+                yield bytes(
+                    data[offset : min(offset + self.download_chunk_size, end + 1)]
+                )
+
+        return FileDownload(
+            filename=os.path.basename(path),
+            content_type=obj.content_type,
+            content=content(),
+            content_length=max(end - start + 1, 0),
+            size=size,
+            content_range=(start, end) if byte_range is not None else None,
+            etag=obj.etag,
+            last_modified=obj.last_modified,
+        )
+
+    async def head_file(self, workspace_id: str, path: str) -> FileMetadata:
+        """
+        Asynchronously retrieves the metadata of a file, without its content.
+
+        Args:
+          workspace_id (str): The ID of the workspace containing the file.
+          path (str): The path of the file within the workspace.
+
+        Returns:
+          FileMetadata: The size, content type and validators of the file.
+
+        Raises:
+          HTTPException: If the file is not found.
+        """
+        await self._round_trip()
+        obj = self._get(workspace_id, path)
+        return FileMetadata(
+            filename=os.path.basename(path),
+            content_type=obj.content_type,
+            size=len(obj.data),
+            etag=obj.etag,
+            last_modified=obj.last_modified,
+        )
+
+    async def presign_url(
+        self,
+        workspace_id: str,
+        path: str,
+        method: PresignMethod,
+        expires: timedelta,
+    ) -> PresignedUrl:
+        """
+        Presigned URLs are not supported, every file is served by this service.
+
+        Raises:
+          HTTPException: Always.
+        """
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="501_NOT_IMPLEMENTED: the memory storage backend does not support presigned URLs",
+        )
+
+    async def walk(
+        self, workspace_id: str, path: Optional[str] = None
+    ) -> AsyncIterator[list[ObjectMetadata]]:
+        """
+        Asynchronously lists every file within a path of a workspace, in batches.
+
+        Args:
+          workspace_id (str): The ID of the workspace.
+          path (Optional[str], optional): The path within the workspace. Defaults to "".
+
+        Returns:
+          AsyncIterator[list[ObjectMetadata]]: Batches of up to 1000 files.
+
+        Raises:
+          HTTPException: If the workspace is not found.
+        """
+        workspace = self._workspace(workspace_id)
+        names = workspace.names_with_prefix(f"{path}/" if path else "")
+        for batch in itertools.batched(names, 1000):
+            await self._round_trip()
+            batch = [
+                (name, obj)
+                for name in batch
+                if not name.endswith("/")
+                and (obj := workspace.objects.get(name)) is not None
+            ]
+            yield [
+                ObjectMetadata(
+                    name=name,
+                    size=len(obj.data),
+                    last_modified=obj.last_modified,
+                    etag=obj.etag,
+                    content_type=obj.content_type,
+                )
+                for name, obj in batch
+            ]
+
+    async def upload_file(
+        self,
+        workspace_id: str,
+        files: list[UploadFile],
+        path: Optional[str] = "",
+    ) -> list[UploadResult]:
+        """
+        Asynchronously uploads files to a specified workspace.
+
+        Args:
+          workspace_id (str): The ID of the workspace where the files will be uploaded.
+          files (list[UploadFile]): A list of files to be uploaded.
+          path (Optional[str], optional): The path within the workspace where the files will be uploaded. Defaults to "".
+
+        Returns:
+          list[UploadResult]: The outcome of each upload, in the order the files were given.
+
+        Logs:
+          Info: Logs the filename, size, and upload path for each uploaded file.
+        """
+
+        async def upload(file: UploadFile) -> UploadResult:
+            upload_path = os.path.join(path, file.filename) if path else file.filename
+            data = await file.read()
+            await self._round_trip()
+            self.store.put(workspace_id, upload_path, data, file.content_type)
+            self.logger.info(
+                f"UPLOADED {file.filename} ({humanize.naturalsize(len(data))}) to {workspace_id}/{upload_path}"
+            )
+            return UploadResult(
+                name=upload_path,
+                filename=file.filename,
+                status=UploadStatus.UPLOADED,
+                size=len(data),
+            )
+
+        return await asyncio.gather(*(upload(file) for file in files))
+
+    def _pending(self, workspace_id: str, path: str, upload_id: str) -> PendingUpload:
+        upload = self.store.uploads.get(upload_id)
+        if upload is None or (upload.workspace_id, upload.name) != (workspace_id, path):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"404_NOT_FOUND: upload {upload_id} of {path} not found in {workspace_id}",
+            )
+        return upload
+
+    async def create_upload(
+        self, workspace_id: str, path: str, content_type: Optional[str] = None
+    ) -> UploadSession:
+        """
+        Asynchronously starts a multipart upload of a file.
+
+        Args:
+          workspace_id (str): The ID of the workspace to upload to.
+          path (str): The path of the file within the workspace.
+          content_type (Optional[str], optional): The content type of the file. Defaults to a guess from its name.
+
+        Returns:
+          UploadSession: The ID of the upload.
+        """
+        await self._round_trip()
+        upload_id = f"{next(self.store.versions):x}"
+        upload = self.store.uploads[upload_id] = PendingUpload(
+            workspace_id, path, content_type or guess_content_type(path)
+        )
+        return UploadSession(upload_id=upload_id, name=path, initiated=upload.initiated)
+
+    async def upload_part(
+        self,
+        workspace_id: str,
+        path: str,
+        upload_id: str,
+        part_number: int,
+        data: bytes,
+    ) -> UploadPart:
+        """
+        Asynchronously stores one part of a multipart upload, replacing any part
+        sent before with the same number.
+
+        Args:
+          workspace_id (str): The ID of the workspace to upload to.
+          path (str): The path of the file within the workspace.
+          upload_id (str): The ID of the upload.
+          part_number (int): The position of the part in the file, from 1.
+          data (bytes): The content of the part.
+
+        Returns:
+          UploadPart: The entity tag of the part, to complete the upload with.
+
+        Raises:
+          HTTPException: If the upload is not found.
+        """
+        await self._round_trip()
+        upload = self._pending(workspace_id, path, upload_id)
+        part = upload.parts[part_number] = StoredObject(
+            data=data,
+            content_type=upload.content_type,
+            etag=f'"{next(self.store.versions):x}"',
+        )
+        return UploadPart(part_number=part_number, etag=part.etag, size=len(data))
+
+    async def list_parts(
+        self, workspace_id: str, path: str, upload_id: str
+    ) -> list[UploadPart]:
+        """
+        Asynchronously lists the parts sent to a multipart upload.
+
+        Args:
+          workspace_id (str): The ID of the workspace to upload to.
+          path (str): The path of the file within the workspace.
+          upload_id (str): The ID of the upload.
+
+        Returns:
+          list[UploadPart]: The parts, by part number.
+
+        Raises:
+          HTTPException: If the upload is not found.
+        """
+        await self._round_trip()
+        upload = self._pending(workspace_id, path, upload_id)
+        return [
+            UploadPart(
+                part_number=part_number,
+                etag=part.etag,
+                size=len(part.data),
+                last_modified=part.last_modified,
+            )
+            for part_number, part in sorted(upload.parts.items())
+        ]
+
+    async def complete_upload(
+        self,
+        workspace_id: str,
+        path: str,
+        upload_id: str,
+        parts: Optional[list[CompletedPart]] = None,
+    ) -> UploadResult:
+        """
+        Asynchronously joins the parts of a multipart upload into the file.
+
+        Args:
+          workspace_id (str): The ID of the workspace to upload to.
+          path (str): The path of the file within the workspace.
+          upload_id (str): The ID of the upload.
+          parts (Optional[list[CompletedPart]], optional): The parts to join, in order. Defaults to every part sent.
+
+        Returns:
+          UploadResult: The file uploaded and its size.
+
+        Raises:
+          HTTPException: If the upload is not found, or the parts don't match the parts sent.
+        """
+        try:
+            selected = select_parts(
+                await self.list_parts(workspace_id, path, upload_id), parts
+            )
+        except ValueError as error:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"400_BAD_REQUEST: {error}",
+            )
+        upload = self.store.uploads.pop(upload_id)
+        data = b"".join(upload.parts[part.part_number].data for part in selected)
+        self.store.put(workspace_id, path, data, upload.content_type)
+        self.logger.info(
+            f"UPLOADED {len(selected)} part(s) ({humanize.naturalsize(len(data))}) to {workspace_id}/{path}"
+        )
+        return UploadResult(
+            name=path,
+            filename=os.path.basename(path),
+            status=UploadStatus.UPLOADED,
+            size=len(data),
+        )
+
+    async def abort_upload(self, workspace_id: str, path: str, upload_id: str) -> None:
+        """
+        Asynchronously abandons a multipart upload, removing the parts sent to it.
+
+        Args:
+          workspace_id (str): The ID of the workspace to upload to.
+          path (str): The path of the file within the workspace.
+          upload_id (str): The ID of the upload.
+
+        Raises:
+          HTTPException: If the upload is not found.
+        """
+        await self._round_trip()
+        self._pending(workspace_id, path, upload_id)
+        del self.store.uploads[upload_id]
+
+    async def list_uploads(
+        self, workspace_id: str, prefix: Optional[str] = None
+    ) -> list[UploadSession]:
+        """
+        Asynchronously lists the multipart uploads in progress in a workspace.
+
+        Args:
+          workspace_id (str): The ID of the workspace.
+          prefix (Optional[str], optional): Only uploads of files whose path starts with this.
+
+        Returns:
+          list[UploadSession]: The uploads, by path.
+        """
+        await self._round_trip()
+        return sorted(
+            (
+                UploadSession(
+                    upload_id=upload_id, name=upload.name, initiated=upload.initiated
+                )
+                for upload_id, upload in self.store.uploads.items()
+                if upload.workspace_id == workspace_id
+                and upload.name.startswith(prefix or "")
+            ),
+            key=lambda session: (session.name, session.initiated),
+        )
+
+    async def abort_stale_uploads(self, initiated_before: datetime) -> int:
+        """
+        Asynchronously abandons the multipart uploads of every workspace that were
+        started before a given time.
+
+        Args:
+          initiated_before (datetime): Uploads started before this are aborted.
+
+        Returns:
+          int: The number of uploads aborted.
+        """
+        await self._round_trip()
+        stale = [
+            upload_id
+            for upload_id, upload in self.store.uploads.items()
+            if upload.initiated < initiated_before
+        ]
+        for upload_id in stale:
+            del self.store.uploads[upload_id]
+        return len(stale)
+
+    async def create_directory(self, workspace_id: str, path: str) -> None:
+        """
+        Asynchronously creates a directory in the specified workspace.
+
+        Args:
+          workspace_id (str): The ID of the workspace where the directory will be created.
+          path (str): The path of the directory to be created within the workspace.
+        """
+        await self._round_trip()
+        self.store.put(workspace_id, path + "/", b"", "application/octet-stream")
+
+    async def delete_directory(self, workspace_id: str, path: str) -> DeleteResult:
+        """
+        Asynchronously deletes a directory, and all contents within it, from a specified workspace.
+
+        Objects are removed in batches of up to 1000, one round trip each.
+
+        Args:
+          workspace_id (str): The ID of the workspace containing the directory.
+          path (str): The path of the directory within the workspace.
+
+        Returns:
+          DeleteResult: The number of objects deleted.
+        """
+        workspace = self._workspace(workspace_id)
+        result = DeleteResult()
+        for batch in itertools.batched(workspace.names_with_prefix(path + "/"), 1000):
+            await self._round_trip()
+            result.deleted += sum(workspace.remove(name) for name in batch)
+        self.logger.info(
+            f"DELETED {result.deleted} of {result.deleted} object(s) from {path} in {workspace_id}."
+        )
+        return result
+
+    async def delete_file(self, workspace_id: str, path: str) -> None:
+        """
+        Asynchronously deletes a file from a specified workspace.
+
+        Args:
+          workspace_id (str): The ID of the workspace containing the file.
+          path (str): The path of the file within the workspace.
+
+        Raises:
+          HTTPException: If the file is not found in the specified workspace.
+        """
+        await self._round_trip()
+        self._get(workspace_id, path)
+        self.store.workspace(workspace_id).remove(path)
+        self.logger.info(f"DELETED {path} from {workspace_id}")
+
+    async def copy_file(
+        self,
+        workspace_id: str,
+        path: str,
+        target_path: str,
+        target_workspace_id: Optional[str] = None,
+    ) -> None:
+        """
+        Asynchronously copies a file from one location to another within the same workspace, or to another workspace.
+
+        Args:
+          workspace_id (str): The ID of the workspace containing the source file.
+          path (str): The path of the source file within the workspace.
+          target_path (str): The path where the file should be copied to in the target workspace.
+          target_workspace_id (Optional[str], optional): The ID of the target workspace. If not provided, defaults to the source workspace ID.
+
+        Raises:
+          HTTPException: If the source file is not found in the specified workspace.
+        """
+        await self._round_trip()
+        obj = self._get(workspace_id, path)
+        self.store.put(
+            target_workspace_id or workspace_id, target_path, obj.data, obj.content_type
+        )
+
+    async def move_file(
+        self,
+        workspace_id: str,
+        path: str,
+        target_path: str,
+        target_workspace_id: Optional[str] = None,
+    ) -> None:
+        """
+        Asynchronously moves a file from one workspace to another - by cp then rm
+
+        Args:
+          workspace_id (str): The ID of the workspace containing the source file.
+          path (str): The path of the source file within the workspace.
+          target_path (str): The path where the file should be moved to in the target workspace.
+          target_workspace_id (Optional[str], optional): The ID of the target workspace. If not provided, defaults to the source workspace ID.
+
+        Raises:
+          HTTPException: If the source file is not found in the specified workspace.
+        """
+        await self.copy_file(workspace_id, path, target_path, target_workspace_id)
+        await self._round_trip()
+        self.store.workspace(workspace_id).remove(path)
+
+    async def copy_directory(
+        self,
+        workspace_id: str,
+        path: str,
+        target_path: str,
+        target_workspace_id: Optional[str] = None,
+        progress: Optional[Callable[[TransferResult], None]] = None,
+    ) -> TransferResult:
+        """
+        Asynchronously copies a directory and all contents within it, with up to
+        `copy_concurrency` copies in flight at once.
+
+        Args:
+          workspace_id (str): The ID of the workspace containing the source directory.
+          path (str): The path of the source directory within the workspace.
+          target_path (str): The path the directory should be copied to in the target workspace.
+          target_workspace_id (Optional[str], optional): The ID of the target workspace. If not provided, defaults to the source workspace ID.
+          progress (Optional[Callable[[TransferResult], None]], optional): Called with the running totals after each object.
+
+        Returns:
+          TransferResult: The number of objects and bytes copied.
+        """
+        return await self._copy_directory(
+            workspace_id, path, target_path, target_workspace_id, progress, False
+        )
+
+    async def move_directory(
+        self,
+        workspace_id: str,
+        path: str,
+        target_path: str,
+        target_workspace_id: Optional[str] = None,
+        progress: Optional[Callable[[TransferResult], None]] = None,
+    ) -> TransferResult:
+        """
+        Asynchronously moves a directory and all contents within it - by cp then rm
+
+        Args:
+          workspace_id (str): The ID of the workspace containing the source directory.
+          path (str): The path of the source directory within the workspace.
+          target_path (str): The path the directory should be moved to in the target workspace.
+          target_workspace_id (Optional[str], optional): The ID of the target workspace. If not provided, defaults to the source workspace ID.
+          progress (Optional[Callable[[TransferResult], None]], optional): Called with the running totals after each object.
+
+        Returns:
+          TransferResult: The number of objects copied and deleted.
+        """
+        return await self._copy_directory(
+            workspace_id, path, target_path, target_workspace_id, progress, True
+        )
+
+    async def _copy_directory(
+        self,
+        workspace_id: str,
+        path: str,
+        target_path: str,
+        target_workspace_id: Optional[str],
+        progress: Optional[Callable[[TransferResult], None]],
+        remove_source: bool,
+    ) -> TransferResult:
+        target_workspace_id = target_workspace_id or workspace_id
+        workspace = self._workspace(workspace_id)
+        names = workspace.names_with_prefix(path + "/")
+        if not names:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"404_NOT_FOUND: {path} not found in {workspace_id}",
+            )
+        result = TransferResult()
+        slots = asyncio.Semaphore(self.copy_concurrency)
+
+        async def copy(name: str) -> None:
+            async with slots:
+                await self._round_trip()
+                obj = workspace.objects.get(name)
+                if obj is None:
+                    return
+                self.store.put(
+                    target_workspace_id,
+                    f"{target_path}/{name[len(path) + 1 :]}",
+                    obj.data,
+                    obj.content_type,
+                )
+                result.copied += 1
+                result.bytes_copied += len(obj.data)
+            if progress is not None:
+                progress(result)
+
+        await asyncio.gather(*(copy(name) for name in names))
+        if remove_source:
+            for batch in itertools.batched(names, 1000):
+                await self._round_trip()
+                result.deleted += sum(workspace.remove(name) for name in batch)
+        return result
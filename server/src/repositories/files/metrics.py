@@ -0,0 +1,218 @@
+import time
+from datetime import datetime, timedelta
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+from fastapi import UploadFile  # TODO: Remove FastAPI dependency
+from src.metrics import (
+    STORAGE_BYTES_RECEIVED,
+    STORAGE_BYTES_SENT,
+    STORAGE_OPERATION_DURATION,
+)
+from src.profiling import backend_phase
+from src.models.file import (
+    ByteRange,
+    CompletedPart,
+    DeleteResult,
+    DirectoryListingPage,
+    FileDownload,
+    FileMetadata,
+    PresignMethod,
+    PresignedUrl,
+    TransferResult,
+    UploadPart,
+    UploadResult,
+    UploadSession,
+    UploadStatus,
+)
+from src.repositories.files.base import FileRepository
+from src.repositories.files.forwarding import ForwardingFileRepository
+
+
+class InstrumentedFileRepository(ForwardingFileRepository):
+    """
+    Records the latency and outcome of every call to a file repository, and the
+    bytes uploaded and downloaded per workspace.
+    """
+
+    def __init__(self, repository: FileRepository, backend: str):
+        super().__init__(repository)
+        self.backend = backend
+
+    @contextmanager
+    def _measure(self, operation: str) -> Iterator[None]:
+        outcome = "error"
+        start = time.perf_counter()
+        try:
+            with backend_phase():
+                yield
+            outcome = "ok"
+        finally:
+            STORAGE_OPERATION_DURATION.labels(self.backend, operation, outcome).observe(
+                time.perf_counter() - start
+            )
+
+    async def stat(
+        self,
+        workspace_id: str,
+        path: Optional[str] = None,
+        limit: Optional[int] = None,
+        start_after: Optional[str] = None,
+    ) -> DirectoryListingPage:
+        with self._measure("stat"):
+            return await super().stat(workspace_id, path, limit, start_after)
+
+    async def download_file(
+        self,
+        workspace_id: str,
+        path: str,
+        byte_range: Optional[ByteRange] = None,
+    ) -> FileDownload:
+        with self._measure("download_file"):
+            download = await super().download_file(workspace_id, path, byte_range)
+        STORAGE_BYTES_SENT.labels(workspace_id).inc(download.content_length)
+        return download
+
+    async def head_file(self, workspace_id: str, path: str) -> FileMetadata:
+        with self._measure("head_file"):
+            return await super().head_file(workspace_id, path)
+
+    async def presign_url(
+        self,
+        workspace_id: str,
+        path: str,
+        method: PresignMethod,
+        expires: timedelta,
+    ) -> PresignedUrl:
+        with self._measure("presign_url"):
+            return await super().presign_url(workspace_id, path, method, expires)
+
+    async def upload_file(
+        self,
+        workspace_id: str,
+        files: list[UploadFile],
+        path: Optional[str] = "",
+    ) -> list[UploadResult]:
+        with self._measure("upload_file"):
+            results = await super().upload_file(workspace_id, files, path)
+        STORAGE_BYTES_RECEIVED.labels(workspace_id).inc(
+            sum(
+                result.size or 0
+                for result in results
+                if result.status == UploadStatus.UPLOADED
+            )
+        )
+        return results
+
+    async def create_upload(
+        self, workspace_id: str, path: str, content_type: Optional[str] = None
+    ) -> UploadSession:
+        with self._measure("create_upload"):
+            return await super().create_upload(workspace_id, path, content_type)
+
+    async def upload_part(
+        self,
+        workspace_id: str,
+        path: str,
+        upload_id: str,
+        part_number: int,
+        data: bytes,
+    ) -> UploadPart:
+        with self._measure("upload_part"):
+            part = await super().upload_part(
+                workspace_id, path, upload_id, part_number, data
+            )
+        STORAGE_BYTES_RECEIVED.labels(workspace_id).inc(len(data))
+        return part
+
+    async def list_parts(
+        self, workspace_id: str, path: str, upload_id: str
+    ) -> list[UploadPart]:
+        with self._measure("list_parts"):
+            return await super().list_parts(workspace_id, path, upload_id)
+
+    async def complete_upload(
+        self,
+        workspace_id: str,
+        path: str,
+        upload_id: str,
+        parts: Optional[list[CompletedPart]] = None,
+    ) -> UploadResult:
+        with self._measure("complete_upload"):
+            return await super().complete_upload(workspace_id, path, upload_id, parts)
+
+    async def abort_upload(self, workspace_id: str, path: str, upload_id: str) -> None:
+        with self._measure("abort_upload"):
+            return await super().abort_upload(workspace_id, path, upload_id)
+
+    async def list_uploads(
+        self, workspace_id: str, prefix: Optional[str] = None
+    ) -> list[UploadSession]:
+        with self._measure("list_uploads"):
+            return await super().list_uploads(workspace_id, prefix)
+
+    async def abort_stale_uploads(self, initiated_before: datetime) -> int:
+        with self._measure("abort_stale_uploads"):
+            return await super().abort_stale_uploads(initiated_before)
+
+    async def create_directory(self, workspace_id: str, path: str) -> None:
+        with self._measure("create_directory"):
+            return await super().create_directory(workspace_id, path)
+
+    async def delete_directory(self, workspace_id: str, path: str) -> DeleteResult:
+        with self._measure("delete_directory"):
+            return await super().delete_directory(workspace_id, path)
+
+    async def delete_file(self, workspace_id: str, path: str) -> None:
+        with self._measure("delete_file"):
+            return await super().delete_file(workspace_id, path)
+
+    async def copy_file(
+        self,
+        workspace_id: str,
+        path: str,
+        target_path: str,
+        target_workspace_id: Optional[str] = None,
+    ) -> None:
+        with self._measure("copy_file"):
+            return await super().copy_file(
+                workspace_id, path, target_path, target_workspace_id
+            )
+
+    async def move_file(
+        self,
+        workspace_id: str,
+        path: str,
+        target_path: str,
+        target_workspace_id: Optional[str] = None,
+    ) -> None:
+        with self._measure("move_file"):
+            return await super().move_file(
+                workspace_id, path, target_path, target_workspace_id
+            )
+
+    async def copy_directory(
+        self,
+        workspace_id: str,
+        path: str,
+        target_path: str,
+        target_workspace_id: Optional[str] = None,
+        progress: Optional[Callable[[TransferResult], None]] = None,
+    ) -> TransferResult:
+        with self._measure("copy_directory"):
+            return await super().copy_directory(
+                workspace_id, path, target_path, target_workspace_id, progress
+            )
+
+    async def move_directory(
+        self,
+        workspace_id: str,
+        path: str,
+        target_path: str,
+        target_workspace_id: Optional[str] = None,
+        progress: Optional[Callable[[TransferResult], None]] = None,
+    ) -> TransferResult:
+        with self._measure("move_directory"):
+            return await super().move_directory(
+                workspace_id, path, target_path, target_workspace_id, progress
+            )
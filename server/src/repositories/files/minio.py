@@ -1,15 +1,73 @@
+import asyncio
+import functools
 import io
+import itertools
 import logging
 import os
-from typing import Optional
+import re
+import threading
+from concurrent.futures import Executor
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from typing import (
+    Any,
+    AsyncIterator,
+    BinaryIO,
+    Callable,
+    Iterator,
+    Optional,
+    TypeVar,
+)
 
 import humanize
 from fastapi import HTTPException, UploadFile, status  # TODO: Remove FastAPI dependency
 from minio import Minio
-from minio.commonconfig import CopySource
+from minio.commonconfig import ComposeSource, CopySource
+from minio.datatypes import Object, Part
+from minio.deleteobjects import DeleteObject
 from minio.error import S3Error
-from src.models.file import DirectoryListing, directory_listing_from_object
+from src.models.file import (
+    ByteRange,
+    CompletedPart,
+    DeleteFailure,
+    DeleteResult,
+    DirectoryListingPage,
+    FileDownload,
+    FileMetadata,
+    ObjectMetadata,
+    PresignMethod,
+    PresignedUrl,
+    TransferFailure,
+    TransferResult,
+    UploadPart,
+    UploadResult,
+    UploadSession,
+    UploadStatus,
+    directory_listing_from_object,
+    guess_content_type,
+)
+from src import profiling
 from src.repositories.files.base import FileRepository
+from src.repositories.files.uploads import select_parts
+
+T = TypeVar("T")
+
+# The most keys S3 accepts in a single DeleteObjects request
+MAX_DELETE_BATCH_SIZE = 1000
+
+# The largest object S3 copies in a single CopyObject request
+MAX_COPY_OBJECT_SIZE = 5 * 1024 * 1024 * 1024
+
+# The headers of an object that are set again on an object composed from it
+COMPOSED_HEADERS = (
+    "cache-control",
+    "content-disposition",
+    "content-encoding",
+    "content-language",
+    "content-type",
+)
+
+CONTENT_RANGE_PATTERN = re.compile(r"bytes (?P<start>\d+)-(?P<end>\d+)/(?P<size>\d+)")
 
 
 class MinioFileRepository(FileRepository):
@@ -17,104 +75,714 @@ class MinioFileRepository(FileRepository):
         self,
         client: Minio,
         logger: logging.Logger,
+        executor: Optional[Executor] = None,
+        download_chunk_size: int = 256 * 1024,
+        upload_part_size: int = 16 * 1024 * 1024,
+        upload_parallelism: int = 4,
+        upload_concurrency: int = 8,
+        delete_concurrency: int = 4,
+        copy_concurrency: int = 8,
+        presign_client: Optional[Minio] = None,
     ):
         self.logger = logger
         self.client = client
+        # Signs URLs for the host clients reach the storage at, when it isn't the
+        # one this service uses
+        self.presign_client = presign_client or client
+        self.executor = executor
+        self.download_chunk_size = download_chunk_size
+        self.upload_part_size = upload_part_size
+        self.upload_parallelism = upload_parallelism
+        self.upload_concurrency = upload_concurrency
+        self.delete_concurrency = delete_concurrency
+        self.copy_concurrency = copy_concurrency
+
+    async def _run(self, func: Callable[..., T], /, *args: Any, **kwargs: Any) -> T:
+        """
+        Runs a blocking MinIO client call on the repository executor so that the
+        event loop is free to serve other requests while the call is in flight.
+
+        Args:
+          func (Callable): The blocking function to call.
+          *args: Positional arguments passed to the function.
+          **kwargs: Keyword arguments passed to the function.
+
+        Returns:
+          The return value of the function.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, profiling.bind(functools.partial(func, *args, **kwargs))
+        )
 
     async def stat(
-        self, workspace_id: str, path: Optional[str] = None
-    ) -> list[DirectoryListing]:
+        self,
+        workspace_id: str,
+        path: Optional[str] = None,
+        limit: Optional[int] = None,
+        start_after: Optional[str] = None,
+    ) -> DirectoryListingPage:
         """
-        Asynchronously retrieves the status of files in a specified workspace.
+        Asynchronously retrieves one page of the files and directories directly
+        within a path of a specified workspace.
+
+        Objects are listed with a `/` delimiter, so nested objects are rolled up into
+        a single directory entry and only the requested page is fetched.
 
         Args:
           workspace_id (str): The ID of the workspace.
           path (Optional[str], optional): The path within the workspace. Defaults to "".
+          limit (Optional[int], optional): The maximum number of entries to return. Defaults to all of them.
+          start_after (Optional[str], optional): Only return entries after this object name, as returned in `next_start_after`.
 
         Returns:
-          list[File]: A list of File objects representing the files in the workspace.
+          DirectoryListingPage: The entries in the directory, and where the next page starts.
 
         Raises:
-          HTTPException: If the specified path is not found in the workspace.
+          S3Error: If the workspace is not found.
         """
+        prefix = f"{path}/" if path else None
 
-        objects = list(
-            self.client.list_objects(
-                workspace_id, prefix=f"{path}/" if path is not None else None
+        def list_page() -> list[Object]:
+            # The listing is lazy, each page of keys is requested while iterating
+            objects = self.client._list_objects(
+                workspace_id,
+                delimiter="/",
+                encoding_type="url",
+                max_keys=min(limit + 1, 1000) if limit is not None else None,
+                prefix=prefix,
+                start_after=start_after,
             )
+            page = []
+            for obj in objects:
+                # A directory named by start_after is listed again when keys
+                # nested within it sort after it
+                if obj.object_name == prefix or (
+                    start_after is not None and obj.object_name <= start_after
+                ):
+                    continue
+                page.append(obj)
+                if limit is not None and len(page) > limit:
+                    break
+            return page
+
+        objects = await self._run(list_page)
+        next_start_after = None
+        if limit is not None and len(objects) > limit:
+            objects = objects[:limit]
+            next_start_after = objects[-1].object_name
+        return DirectoryListingPage(
+            entries=[directory_listing_from_object(obj) for obj in objects],
+            next_start_after=next_start_after,
         )
-        return [
-            directory_listing_from_object(obj)
-            for obj in objects
-            if obj.object_name != f"{path}/"
-        ]
 
         # -- for a later date --
-        # TODO: as well a listing of the files in the directory, we should also list
-        #       the folders within the directory
-        # TODO: Return a union list when listing i.e list[File|Folder] to tell the
-        #       client what folders exist in the current path
-        # TODO: Use the path option to filter files in a specific path of the bucket
-
         # TODO: Check user has read permission for workspace
 
     async def download_file(
-        self, workspace_id: str, path: str
-    ) -> tuple[str, bytes, str]:
+        self,
+        workspace_id: str,
+        path: str,
+        byte_range: Optional[ByteRange] = None,
+    ) -> FileDownload:
         """
-        Asynchronously downloads a file from a specified workspace.
+        Asynchronously opens a file in a specified workspace for streaming.
+
+        The object is read in chunks of `download_chunk_size` bytes as the
+        content is iterated, so only one chunk is held in memory at a time.
 
         Args:
           workspace_id (str): The ID of the workspace containing the file.
           path (str): The path of the file within the workspace.
+          byte_range (Optional[ByteRange], optional): The range of bytes to download. Defaults to the whole file.
 
         Returns:
-          tuple: A tuple containing the filename, file content, and content type.
+          FileDownload: The file metadata and a stream of its content.
 
         Raises:
-          HTTPException: If the file is not found in the specified workspace.
+          HTTPException: If the byte range cannot be satisfied.
+          S3Error: If the file is not found in the specified workspace.
         """
+        match byte_range:
+            case None:
+                kwargs = {}
+            case ByteRange(start=None, end=suffix):
+                kwargs = {"request_headers": {"Range": f"bytes=-{suffix}"}}
+            case ByteRange(start=start, end=None):
+                kwargs = {"offset": start}
+            case ByteRange(start=start, end=end):
+                kwargs = {"offset": start, "length": end - start + 1}
+
+        try:
+            response = await self._run(
+                self.client.get_object, workspace_id, path, **kwargs
+            )
+        except S3Error as error:
+            if error.code != "InvalidRange":
+                raise
+            file_object = await self._run(self.client.stat_object, workspace_id, path)
+            raise HTTPException(
+                status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                detail=f"416_REQUESTED_RANGE_NOT_SATISFIABLE: {path} in {workspace_id}",
+                headers={"Content-Range": f"bytes */{file_object.size}"},
+            )
+
+        def release() -> None:
+            response.close()
+            response.release_conn()
+
+        async def content() -> AsyncIterator[bytes]:
+            chunks = response.stream(self.download_chunk_size)
+            try:
+                while (chunk := await self._run(next, chunks, None)) is not None:
+                    yield chunk
+            finally:
+                release()
+
+        headers = response.headers
+        content_length = int(headers.get("Content-Length", 0))
+        size = content_length
+        content_range = None
+        if match := CONTENT_RANGE_PATTERN.match(headers.get("Content-Range", "")):
+            content_range = (int(match["start"]), int(match["end"]))
+            size = int(match["size"])
+
+        last_modified = headers.get("Last-Modified")
+        return FileDownload(
+            filename=os.path.basename(path),
+            content_type=headers.get("Content-Type") or "application/octet-stream",
+            content=content(),
+            content_length=content_length,
+            size=size,
+            content_range=content_range,
+            etag=headers.get("ETag"),
+            last_modified=(
+                parsedate_to_datetime(last_modified) if last_modified else None
+            ),
+            release=release,
+        )
+
+    async def head_file(self, workspace_id: str, path: str) -> FileMetadata:
+        """
+        Asynchronously retrieves the metadata of a file, without its content.
+
+        Args:
+          workspace_id (str): The ID of the workspace containing the file.
+          path (str): The path of the file within the workspace.
+
+        Returns:
+          FileMetadata: The size, content type and validators of the file.
+
+        Raises:
+          S3Error: If the file is not found in the specified workspace.
+        """
+        file_object = await self._run(self.client.stat_object, workspace_id, path)
+        return FileMetadata(
+            filename=os.path.basename(path),
+            content_type=file_object.content_type or "application/octet-stream",
+            size=file_object.size,
+            # Quoted as in the ETag header of a download
+            etag=f'"{file_object.etag}"' if file_object.etag else None,
+            last_modified=file_object.last_modified,
+        )
+
+    async def presign_url(
+        self,
+        workspace_id: str,
+        path: str,
+        method: PresignMethod,
+        expires: timedelta,
+    ) -> PresignedUrl:
+        """
+        Asynchronously signs a URL to download or upload a file directly from or to
+        the storage backend.
+
+        Downloads through the URL are sent as attachments, as they are from this
+        service.
+
+        Args:
+          workspace_id (str): The ID of the workspace containing the file.
+          path (str): The path of the file within the workspace.
+          method (PresignMethod): GET to download the file, PUT to upload it.
+          expires (timedelta): How long the URL can be used for.
+
+        Returns:
+          PresignedUrl: The signed URL and when it expires.
+        """
+        expires_at = datetime.now(timezone.utc) + expires
+        match method:
+            case PresignMethod.GET:
+                url = await self._run(
+                    self.presign_client.presigned_get_object,
+                    workspace_id,
+                    path,
+                    expires=expires,
+                    response_headers={
+                        "response-content-disposition": f"attachment; filename={os.path.basename(path)}"
+                    },
+                )
+            case PresignMethod.PUT:
+                url = await self._run(
+                    self.presign_client.presigned_put_object,
+                    workspace_id,
+                    path,
+                    expires=expires,
+                )
+        return PresignedUrl(method=method, url=url, expires_at=expires_at)
+
+    async def walk(
+        self, workspace_id: str, path: Optional[str] = None
+    ) -> AsyncIterator[list[ObjectMetadata]]:
+        """
+        Asynchronously lists every file within a path of a workspace, in batches.
+
+        Objects are listed recursively, and each page of keys is only requested
+        when the batch it fills is consumed.
+
+        Args:
+          workspace_id (str): The ID of the workspace.
+          path (Optional[str], optional): The path within the workspace. Defaults to "".
 
-        file_object = self.client.stat_object(workspace_id, path)
-        response = self.client.get_object(workspace_id, path)
-        file_content = b"".join(chunk for chunk in response.stream())
-        filename = os.path.basename(path)
+        Returns:
+          AsyncIterator[list[ObjectMetadata]]: Batches of up to 1000 files.
 
-        return (filename, file_content, file_object.content_type)
+        Raises:
+          S3Error: If the workspace is not found.
+        """
+        batches = itertools.batched(
+            self.client.list_objects(
+                workspace_id, prefix=f"{path}/" if path else None, recursive=True
+            ),
+            MAX_DELETE_BATCH_SIZE,
+        )
+        while (batch := await self._run(next, batches, None)) is not None:
+            yield [
+                ObjectMetadata(
+                    name=obj.object_name,
+                    size=obj.size or 0,
+                    last_modified=obj.last_modified,
+                    # Quoted as in the ETag header of a download
+                    etag=f'"{obj.etag}"' if obj.etag else None,
+                    content_type=obj.content_type,
+                )
+                for obj in batch
+                if not obj.object_name.endswith("/")
+            ]
 
     async def upload_file(
         self,
         workspace_id: str,
         files: list[UploadFile],
         path: Optional[str] = "",
-    ) -> None:
+    ) -> list[UploadResult]:
         """
         Asynchronously uploads files to a specified workspace.
 
+        Up to `upload_concurrency` files are uploaded at once. A file that fails to
+        upload is reported in the results and does not stop the other uploads.
+
         Args:
           workspace_id (str): The ID of the workspace where the files will be uploaded.
           files (list[UploadFile]): A list of files to be uploaded.
           path (Optional[str], optional): The path within the workspace where the files will be uploaded. Defaults to "".
 
+        Returns:
+          list[UploadResult]: The outcome of each upload, in the order the files were given.
+
         Logs:
           Info: Logs the filename, size, and upload path for each uploaded file.
+          Warning: Logs the filename, upload path and error for each failed upload.
         """
-        for file in files:
+        slots = asyncio.Semaphore(self.upload_concurrency)
+
+        async def upload(file: UploadFile) -> UploadResult:
             upload_path = os.path.join(path, file.filename) if path else file.filename
+            async with slots:
+                try:
+                    size = await self._put_stream(
+                        workspace_id,
+                        upload_path,
+                        file.file,
+                        content_type=file.content_type or "application/octet-stream",
+                        length=file.size,
+                    )
+                except Exception as error:
+                    self.logger.warning(
+                        f"FAILED to upload {file.filename} to {workspace_id}/{upload_path}: {error}"
+                    )
+                    return UploadResult(
+                        name=upload_path,
+                        filename=file.filename,
+                        status=UploadStatus.FAILED,
+                        detail=str(error),
+                    )
+
+            self.logger.info(
+                f"UPLOADED {file.filename} ({humanize.naturalsize(size)}) to {workspace_id}/{upload_path}"
+            )
+            return UploadResult(
+                name=upload_path,
+                filename=file.filename,
+                status=UploadStatus.UPLOADED,
+                size=size,
+            )
+
+        return await asyncio.gather(*(upload(file) for file in files))
+
+    async def _put_stream(
+        self,
+        workspace_id: str,
+        object_name: str,
+        stream: BinaryIO,
+        content_type: str,
+        length: Optional[int] = None,
+    ) -> int:
+        """
+        Asynchronously streams a file object into the workspace.
+
+        Files larger than `upload_part_size` are sent as a multipart upload, with up
+        to `upload_parallelism` parts in flight at once. A part is only read from the
+        stream by a free worker, so at most `upload_part_size * upload_parallelism`
+        bytes are held in memory regardless of the size of the file.
+        `Minio.put_object` reads ahead of its upload threads without a bound, which
+        is why the multipart upload is driven from here.
 
-            file_stream = io.BytesIO(await file.read())
+        Args:
+          workspace_id (str): The ID of the workspace to upload to.
+          object_name (str): The path of the object within the workspace.
+          stream (BinaryIO): The file object to read the content from.
+          content_type (str): The content type of the object.
+          length (Optional[int], optional): The size of the file, if known up front.
 
-            self.client.put_object(
+        Returns:
+          int: The number of bytes uploaded.
+        """
+        if length is not None and length <= self.upload_part_size:
+            await self._run(
+                self.client.put_object,
                 workspace_id,
-                upload_path,
-                file_stream,
-                length=file.size,
-                content_type=file.content_type,
+                object_name,
+                stream,
+                length=length,
+                content_type=content_type,
             )
+            return length
 
-            self.logger.info(
-                f"UPLOADED {file.filename} ({humanize.naturalsize(file.size)}) to {workspace_id}/{upload_path}"
+        upload_id = await self._run(
+            self.client._create_multipart_upload,
+            workspace_id,
+            object_name,
+            {"Content-Type": content_type},
+        )
+        read_lock = threading.Lock()
+        part_numbers = itertools.count(1)
+
+        def upload_next_part() -> Optional[tuple[Part, int]]:
+            # Parts are read and numbered in order, then uploaded in parallel.
+            # The part never leaves the worker thread, so it is released as
+            # soon as it has been sent.
+            with read_lock:
+                data = stream.read(self.upload_part_size)
+                part_number = next(part_numbers)
+            if not data and part_number > 1:
+                return None
+            etag = self.client._upload_part(
+                workspace_id, object_name, data, None, upload_id, part_number
             )
+            return Part(part_number, etag), len(data)
+
+        async def upload_parts() -> list[tuple[Part, int]]:
+            uploaded = []
+            while (result := await self._run(upload_next_part)) is not None:
+                uploaded.append(result)
+            return uploaded
+
+        try:
+            async with asyncio.TaskGroup() as tasks:
+                workers = [
+                    tasks.create_task(upload_parts())
+                    for _ in range(self.upload_parallelism)
+                ]
+            uploaded = sorted(
+                (result for worker in workers for result in worker.result()),
+                key=lambda result: result[0].part_number,
+            )
+            await self._run(
+                self.client._complete_multipart_upload,
+                workspace_id,
+                object_name,
+                upload_id,
+                [part for part, _ in uploaded],
+            )
+        except BaseException as error:
+            await asyncio.shield(
+                self._run(
+                    self.client._abort_multipart_upload,
+                    workspace_id,
+                    object_name,
+                    upload_id,
+                )
+            )
+            if isinstance(error, BaseExceptionGroup):
+                raise error.exceptions[0]
+            raise
+        return sum(size for _, size in uploaded)
+
+    async def create_upload(
+        self, workspace_id: str, path: str, content_type: Optional[str] = None
+    ) -> UploadSession:
+        """
+        Asynchronously starts a multipart upload of a file. Parts can then be sent
+        in any order, in parallel, and again if they fail.
+
+        Args:
+          workspace_id (str): The ID of the workspace to upload to.
+          path (str): The path of the file within the workspace.
+          content_type (Optional[str], optional): The content type of the file. Defaults to a guess from its name.
+
+        Returns:
+          UploadSession: The ID of the upload.
+
+        Raises:
+          S3Error: If the workspace is not found.
+        """
+        upload_id = await self._run(
+            self.client._create_multipart_upload,
+            workspace_id,
+            path,
+            {"Content-Type": content_type or guess_content_type(path)},
+        )
+        return UploadSession(
+            upload_id=upload_id, name=path, initiated=datetime.now(timezone.utc)
+        )
+
+    async def upload_part(
+        self,
+        workspace_id: str,
+        path: str,
+        upload_id: str,
+        part_number: int,
+        data: bytes,
+    ) -> UploadPart:
+        """
+        Asynchronously sends one part of a multipart upload, replacing any part
+        sent before with the same number.
+
+        Args:
+          workspace_id (str): The ID of the workspace to upload to.
+          path (str): The path of the file within the workspace.
+          upload_id (str): The ID of the upload.
+          part_number (int): The position of the part in the file, from 1.
+          data (bytes): The content of the part.
+
+        Returns:
+          UploadPart: The entity tag of the part, to complete the upload with.
+
+        Raises:
+          S3Error: If the upload is not found.
+        """
+        etag = await self._run(
+            self.client._upload_part,
+            workspace_id,
+            path,
+            data,
+            None,
+            upload_id,
+            part_number,
+        )
+        return UploadPart(part_number=part_number, etag=f'"{etag}"', size=len(data))
+
+    async def list_parts(
+        self, workspace_id: str, path: str, upload_id: str
+    ) -> list[UploadPart]:
+        """
+        Asynchronously lists the parts sent to a multipart upload, so an interrupted
+        upload can be resumed.
+
+        Args:
+          workspace_id (str): The ID of the workspace to upload to.
+          path (str): The path of the file within the workspace.
+          upload_id (str): The ID of the upload.
+
+        Returns:
+          list[UploadPart]: The parts, by part number.
+
+        Raises:
+          S3Error: If the upload is not found.
+        """
+
+        def list_all() -> list[Part]:
+            parts, marker = [], None
+            while True:
+                result = self.client._list_parts(
+                    workspace_id, path, upload_id, part_number_marker=marker
+                )
+                parts += result.parts
+                if not result.is_truncated or not result.parts:
+                    return parts
+                marker = str(result.parts[-1].part_number)
+
+        return [
+            UploadPart(
+                part_number=part.part_number,
+                etag=f'"{part.etag}"',
+                size=part.size,
+                last_modified=part.last_modified,
+            )
+            for part in await self._run(list_all)
+        ]
+
+    async def complete_upload(
+        self,
+        workspace_id: str,
+        path: str,
+        upload_id: str,
+        parts: Optional[list[CompletedPart]] = None,
+    ) -> UploadResult:
+        """
+        Asynchronously joins the parts of a multipart upload into the file.
+
+        Args:
+          workspace_id (str): The ID of the workspace to upload to.
+          path (str): The path of the file within the workspace.
+          upload_id (str): The ID of the upload.
+          parts (Optional[list[CompletedPart]], optional): The parts to join, in order. Defaults to every part sent.
+
+        Returns:
+          UploadResult: The file uploaded and its size.
+
+        Raises:
+          HTTPException: If the parts don't match the parts sent.
+          S3Error: If the upload is not found, or the parts are rejected.
+
+        Logs:
+          Info: Logs the size and path of the file.
+        """
+        try:
+            selected = select_parts(
+                await self.list_parts(workspace_id, path, upload_id), parts
+            )
+        except ValueError as error:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"400_BAD_REQUEST: {error}",
+            )
+        await self._run(
+            self.client._complete_multipart_upload,
+            workspace_id,
+            path,
+            upload_id,
+            [Part(part.part_number, part.etag.strip('"')) for part in selected],
+        )
+        size = sum(part.size or 0 for part in selected)
+        self.logger.info(
+            f"UPLOADED {len(selected)} part(s) ({humanize.naturalsize(size)}) to {workspace_id}/{path}"
+        )
+        return UploadResult(
+            name=path,
+            filename=os.path.basename(path),
+            status=UploadStatus.UPLOADED,
+            size=size,
+        )
+
+    async def abort_upload(self, workspace_id: str, path: str, upload_id: str) -> None:
+        """
+        Asynchronously abandons a multipart upload, removing the parts sent to it.
+
+        Args:
+          workspace_id (str): The ID of the workspace to upload to.
+          path (str): The path of the file within the workspace.
+          upload_id (str): The ID of the upload.
+
+        Raises:
+          S3Error: If the upload is not found.
+        """
+        await self._run(
+            self.client._abort_multipart_upload, workspace_id, path, upload_id
+        )
+
+    def _list_uploads(
+        self, workspace_id: str, prefix: Optional[str] = None
+    ) -> Iterator[UploadSession]:
+        """
+        Lazily lists the multipart uploads in progress in a workspace. Blocking.
+        """
+        key_marker = upload_id_marker = None
+        while True:
+            result = self.client._list_multipart_uploads(
+                workspace_id,
+                prefix=prefix,
+                key_marker=key_marker,
+                upload_id_marker=upload_id_marker,
+            )
+            for upload in result.uploads:
+                yield UploadSession(
+                    upload_id=upload.upload_id,
+                    name=upload.object_name,
+                    initiated=upload.initiated_time or datetime.now(timezone.utc),
+                )
+            if not result.is_truncated or not result.uploads:
+                return
+            key_marker = result.uploads[-1].object_name
+            upload_id_marker = result.uploads[-1].upload_id
+
+    async def list_uploads(
+        self, workspace_id: str, prefix: Optional[str] = None
+    ) -> list[UploadSession]:
+        """
+        Asynchronously lists the multipart uploads in progress in a workspace.
+
+        Args:
+          workspace_id (str): The ID of the workspace.
+          prefix (Optional[str], optional): Only uploads of files whose path starts with this.
+
+        Returns:
+          list[UploadSession]: The uploads, by path.
+
+        Raises:
+          S3Error: If the workspace is not found.
+        """
+        return await self._run(lambda: list(self._list_uploads(workspace_id, prefix)))
+
+    async def abort_stale_uploads(self, initiated_before: datetime) -> int:
+        """
+        Asynchronously abandons the multipart uploads of every workspace that were
+        started before a given time.
+
+        Args:
+          initiated_before (datetime): Uploads started before this are aborted.
+
+        Returns:
+          int: The number of uploads aborted.
+
+        Logs:
+          Warning: Logs each workspace whose uploads could not be listed.
+        """
+        aborted = 0
+        for bucket in await self._run(self.client.list_buckets):
+            try:
+                stale = await self._run(
+                    lambda: [
+                        upload
+                        for upload in self._list_uploads(bucket.name)
+                        if upload.initiated < initiated_before
+                    ]
+                )
+            except S3Error as error:
+                self.logger.warning(
+                    f"FAILED to list the uploads of {bucket.name}: {error}"
+                )
+                continue
+            for upload in stale:
+                try:
+                    await self.abort_upload(bucket.name, upload.name, upload.upload_id)
+                except S3Error as error:
+                    # Completed or aborted since it was listed
+                    if error.code != "NoSuchUpload":
+                        raise
+                    continue
+                aborted += 1
+        return aborted
 
     async def create_directory(self, workspace_id: str, path: str) -> None:
         """
@@ -129,7 +797,8 @@ class MinioFileRepository(FileRepository):
         """
         empty_data = bytes()
         data_stream = io.BytesIO(empty_data)
-        self.client.put_object(
+        await self._run(
+            self.client.put_object,
             workspace_id,
             path + "/",
             data=data_stream,
@@ -137,46 +806,99 @@ class MinioFileRepository(FileRepository):
         )
         return {"message": f"CREATED {path} in {workspace_id}"}
 
-    async def delete_directory(self, workspace_id: str, path: str) -> None:
+    async def delete_directory(self, workspace_id: str, path: str) -> DeleteResult:
         """
         Asynchronously deletes a directory and all contents within it from a workspace.
 
+        The contents are listed lazily and removed in batches of up to 1000 objects,
+        with up to `delete_concurrency` batches being removed at once. Only the
+        batches in flight are held in memory.
+
         Args:
-          workspace_id (str): The ID of the workspace containing the source file.
-          path (str): The path of the source file within the workspace.
+          workspace_id (str): The ID of the workspace containing the directory.
+          path (str): The path of the directory within the workspace.
+
+        Returns:
+          DeleteResult: The number of objects deleted, and the objects that could not be.
 
         Logs:
           Info: Logs the number of objects deleted from the specified workspace, and the total objects to delete
+          Warning: Logs each object that could not be deleted.
         """
-        errors_count: int = 0
-
-        objects = list(self.client.list_objects(workspace_id, prefix=path + "/"))
-
-        # Fix DeleteObject undefined - comes from parent?
-        errors = self.client.remove_objects(
+        result = await self._delete_objects(
             workspace_id,
-            [
-                self.client.remove_object(workspace_id, obj.object_name)
-                for obj in objects
-            ],
+            (
+                obj.object_name
+                for obj in self.client.list_objects(
+                    workspace_id, prefix=path + "/", recursive=True
+                )
+            ),
         )
 
-        self.logger.info(f"Added {len(objects)} objects to be removed")
-
-        for error in errors:
-            errors_count += 1
+        if result.failed != 0:
             self.logger.warning(
-                f"Failed to delete object '{error.name}' with error code '{error.code}'."
-            )
-
-        if errors_count != 0:
-            self.logger.warning(
-                f"FAILED to delete {errors_count} object(s) from {path} in {workspace_id}"
+                f"FAILED to delete {result.failed} object(s) from {path} in {workspace_id}"
             )
 
         self.logger.info(
-            f"DELETED {len(objects) - errors_count} of {len(objects)} object(s) from {path} in {workspace_id}."
+            f"DELETED {result.deleted} of {result.deleted + result.failed} object(s) from {path} in {workspace_id}."
         )
+        return result
+
+    async def _delete_objects(
+        self, workspace_id: str, names: Iterator[str]
+    ) -> DeleteResult:
+        """
+        Asynchronously deletes objects in batches of up to 1000, with up to
+        `delete_concurrency` batches being removed at once.
+
+        Args:
+          workspace_id (str): The ID of the workspace containing the objects.
+          names (Iterator[str]): The names of the objects, consumed lazily on the executor.
+
+        Returns:
+          DeleteResult: The number of objects deleted, and the objects that could not be.
+        """
+        result = DeleteResult()
+        slots = asyncio.Semaphore(self.delete_concurrency)
+        batches = itertools.batched(names, MAX_DELETE_BATCH_SIZE)
+
+        async def delete_batch(batch: tuple[str, ...]) -> None:
+            try:
+                errors = await self._run(
+                    lambda: list(
+                        self.client.remove_objects(
+                            workspace_id, [DeleteObject(name) for name in batch]
+                        )
+                    )
+                )
+            finally:
+                slots.release()
+            for error in errors:
+                self.logger.warning(
+                    f"Failed to delete object '{error.name}' with error code '{error.code}'."
+                )
+                result.failures.append(
+                    DeleteFailure(
+                        name=error.name, code=error.code, message=error.message
+                    )
+                )
+            result.deleted += len(batch) - len(errors)
+            result.failed += len(errors)
+
+        try:
+            async with asyncio.TaskGroup() as tasks:
+                while True:
+                    await slots.acquire()
+                    # Taking the next batch may request the next page of a listing
+                    batch = await self._run(next, batches, None)
+                    if batch is None:
+                        slots.release()
+                        break
+                    tasks.create_task(delete_batch(batch))
+        except BaseExceptionGroup as error:
+            raise error.exceptions[0]
+        return result
 
     async def delete_file(self, workspace_id: str, path: str) -> None:
         """
@@ -194,7 +916,7 @@ class MinioFileRepository(FileRepository):
         """
         try:
             # Check if the file exists
-            self.client.stat_object(workspace_id, path)
+            await self._run(self.client.stat_object, workspace_id, path)
         except S3Error:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -202,7 +924,7 @@ class MinioFileRepository(FileRepository):
             )
 
         # Perform the deletion
-        self.client.remove_object(workspace_id, path)
+        await self._run(self.client.remove_object, workspace_id, path)
         self.logger.info(f"DELETED {path} from {workspace_id}")
 
         # -- for a later date --
@@ -237,7 +959,9 @@ class MinioFileRepository(FileRepository):
         )
         try:
             source = CopySource(workspace_id, path)
-            self.client.copy_object(target_workspace_id, target_path, source)
+            await self._run(
+                self.client.copy_object, target_workspace_id, target_path, source
+            )
 
         except S3Error:
             raise HTTPException(
@@ -275,7 +999,186 @@ class MinioFileRepository(FileRepository):
         )
 
         await self.copy_file(workspace_id, path, target_path, target_workspace_id)
-        await self.delete_file(workspace_id, path)
+        # The copy succeeded, so the source exists and needs no further check
+        await self._run(self.client.remove_object, workspace_id, path)
         self.logger.info(
             f"Moved {path} in {workspace_id} TO {target_path} in {target_workspace_id}"
         )
+
+    async def copy_directory(
+        self,
+        workspace_id: str,
+        path: str,
+        target_path: str,
+        target_workspace_id: Optional[str] = None,
+        progress: Optional[Callable[[TransferResult], None]] = None,
+    ) -> TransferResult:
+        """
+        Asynchronously copies a directory and all contents within it, within the same workspace or to another workspace.
+
+        Objects are copied by the storage backend, with up to `copy_concurrency`
+        copies in flight at once. Objects too large for a single copy are copied in
+        parts with `compose_object`, with the content type and user metadata of
+        the source set on the copy.
+
+        Args:
+          workspace_id (str): The ID of the workspace containing the source directory.
+          path (str): The path of the source directory within the workspace.
+          target_path (str): The path the directory should be copied to in the target workspace.
+          target_workspace_id (Optional[str], optional): The ID of the target workspace. If not provided, defaults to the source workspace ID.
+          progress (Optional[Callable[[TransferResult], None]], optional): Called with the running totals after each object.
+
+        Returns:
+          TransferResult: The number of objects and bytes copied, and the objects that could not be.
+
+        Raises:
+          HTTPException: If the source directory is not found in the specified workspace.
+
+        Logs:
+          Info: Logs the number of objects copied.
+          Warning: Logs each object that could not be copied.
+        """
+        result = await self._copy_directory(
+            workspace_id, path, target_path, target_workspace_id, progress
+        )
+        self.logger.info(
+            f"Copied {result.copied} of {result.copied + result.failed} object(s) from {path} in {workspace_id} TO {target_path} in {target_workspace_id or workspace_id}"
+        )
+        return result
+
+    async def move_directory(
+        self,
+        workspace_id: str,
+        path: str,
+        target_path: str,
+        target_workspace_id: Optional[str] = None,
+        progress: Optional[Callable[[TransferResult], None]] = None,
+    ) -> TransferResult:
+        """
+        Asynchronously moves a directory and all contents within it - by cp then rm
+
+        Only the objects that were copied are removed from the source directory.
+
+        Args:
+          workspace_id (str): The ID of the workspace containing the source directory.
+          path (str): The path of the source directory within the workspace.
+          target_path (str): The path the directory should be moved to in the target workspace.
+          target_workspace_id (Optional[str], optional): The ID of the target workspace. If not provided, defaults to the source workspace ID.
+          progress (Optional[Callable[[TransferResult], None]], optional): Called with the running totals after each object.
+
+        Returns:
+          TransferResult: The number of objects copied and deleted, and the objects that could not be.
+
+        Raises:
+          HTTPException: If the source directory is not found in the specified workspace.
+
+        Logs:
+          Info: Logs the number of objects moved.
+          Warning: Logs each object that could not be copied or deleted.
+        """
+        copied: list[str] = []
+        result = await self._copy_directory(
+            workspace_id, path, target_path, target_workspace_id, progress, copied
+        )
+        deleted = await self._delete_objects(workspace_id, iter(copied))
+        result.deleted = deleted.deleted
+        result.failed += deleted.failed
+        result.failures += [
+            TransferFailure(name=failure.name, detail=failure.message or failure.code)
+            for failure in deleted.failures
+        ]
+        self.logger.info(
+            f"Moved {result.deleted} of {result.copied + result.failed} object(s) from {path} in {workspace_id} TO {target_path} in {target_workspace_id or workspace_id}"
+        )
+        return result
+
+    async def _copy_directory(
+        self,
+        workspace_id: str,
+        path: str,
+        target_path: str,
+        target_workspace_id: Optional[str],
+        progress: Optional[Callable[[TransferResult], None]],
+        copied: Optional[list[str]] = None,
+    ) -> TransferResult:
+        target_workspace_id = target_workspace_id or workspace_id
+        result = TransferResult()
+        slots = asyncio.Semaphore(self.copy_concurrency)
+        # The root of a workspace has no directory marker and no leading slash
+        prefix = f"{path}/" if path else ""
+        target_prefix = f"{target_path}/" if target_path else ""
+        batches = itertools.batched(
+            self.client.list_objects(workspace_id, prefix=prefix, recursive=True),
+            MAX_DELETE_BATCH_SIZE,
+        )
+
+        async def copy(obj: Object) -> None:
+            target_name = target_prefix + obj.object_name[len(prefix) :]
+            if not target_name:
+                # The marker of a directory copied to the root, which has none,
+                # is still removed by a move
+                if copied is not None:
+                    copied.append(obj.object_name)
+                slots.release()
+                return
+            try:
+                if obj.size is not None and obj.size > MAX_COPY_OBJECT_SIZE:
+                    # Unlike a copy, a composed object doesn't keep the content
+                    # type and user metadata of its source, so they are set again
+                    source = await self._run(
+                        self.client.stat_object, workspace_id, obj.object_name
+                    )
+                    await self._run(
+                        self.client.compose_object,
+                        target_workspace_id,
+                        target_name,
+                        [ComposeSource(workspace_id, obj.object_name)],
+                        metadata={
+                            key: value
+                            for key, value in (source.metadata or {}).items()
+                            if key.lower() in COMPOSED_HEADERS
+                            or key.lower().startswith("x-amz-meta-")
+                        },
+                    )
+                else:
+                    await self._run(
+                        self.client.copy_object,
+                        target_workspace_id,
+                        target_name,
+                        CopySource(workspace_id, obj.object_name),
+                    )
+            except Exception as error:
+                self.logger.warning(
+                    f"Failed to copy object '{obj.object_name}' in {workspace_id} TO {target_name} in {target_workspace_id}: {error}"
+                )
+                result.failed += 1
+                result.failures.append(
+                    TransferFailure(name=obj.object_name, detail=str(error))
+                )
+            else:
+                result.copied += 1
+                result.bytes_copied += obj.size or 0
+                if copied is not None:
+                    copied.append(obj.object_name)
+            finally:
+                slots.release()
+            if progress is not None:
+                progress(result)
+
+        # Neither an object within the directory nor its marker, as `path/`
+        if (batch := await self._run(next, batches, None)) is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"404_NOT_FOUND: {path} not found in {workspace_id}",
+            )
+        try:
+            async with asyncio.TaskGroup() as tasks:
+                while batch is not None:
+                    for obj in batch:
+                        await slots.acquire()
+                        tasks.create_task(copy(obj))
+                    # Taking the next batch requests the next page of keys
+                    batch = await self._run(next, batches, None)
+        except BaseExceptionGroup as error:
+            raise error.exceptions[0]
+        return result
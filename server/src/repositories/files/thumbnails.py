@@ -0,0 +1,408 @@
+import asyncio
+import io
+import logging
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Callable, Optional, Union
+
+from fastapi import HTTPException, UploadFile  # TODO: Remove FastAPI dependency
+from minio.error import S3Error
+from starlette.datastructures import Headers
+from src.models.file import (
+    CompletedPart,
+    DeleteResult,
+    FileDownload,
+    FileMetadata,
+    TransferResult,
+    UploadResult,
+    UploadStatus,
+    guess_content_type,
+)
+from src.repositories.files.base import FileRepository
+from src.repositories.files.cache import normalize_path
+from src.repositories.files.forwarding import ForwardingFileRepository
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Optional, thumbnails can't be enabled without it
+    Image = None
+
+Render = Callable[[bytes, int, str], bytes]
+
+
+def render_thumbnail(data: bytes, size: int, image_format: str) -> bytes:
+    """Scale an image down to fit in a square, in the orientation it is shown in
+
+    Runs in a worker process, so errors are raised as ValueError, which always
+    pickles back to the caller.
+
+    Args:
+        data: The encoded image.
+        size: The largest width and height of the thumbnail, in pixels.
+        image_format: The Pillow format to encode the thumbnail in, as WEBP.
+
+    Returns:
+        The encoded thumbnail.
+
+    Raises:
+        ValueError: If the image can't be decoded.
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            # JPEG is decoded straight to a smaller scale, which is much faster
+            image.draft("RGB", (size, size))
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((size, size))
+            has_alpha = "A" in image.getbands() or "transparency" in image.info
+            if image_format.upper() == "JPEG" or not has_alpha:
+                image = image.convert("RGB")
+            elif image.mode != "RGBA":
+                image = image.convert("RGBA")
+            output = io.BytesIO()
+            image.save(output, format=image_format)
+    except (OSError, Image.DecompressionBombError) as error:
+        raise ValueError(f"cannot render a thumbnail: {error}") from None
+    return output.getvalue()
+
+
+def create_render_executor(workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """Create the process pool thumbnails are rendered in
+
+    Workers are started from a fork server rather than forked from the service,
+    which holds threads and open connections. Each worker process of the service
+    has a pool of its own, so by default the cores available are shared between
+    the `WEB_CONCURRENCY` worker processes uvicorn is started with.
+
+    Args:
+        workers: The number of processes. Defaults to this process's share of the
+            cores available.
+
+    Returns:
+        The process pool.
+
+    Raises:
+        Exception: If Pillow is not installed.
+    """
+    if Image is None:
+        raise Exception("Thumbnails need Pillow, install the thumbnails extra")
+    if workers is None:
+        processes = int(os.environ.get("WEB_CONCURRENCY") or 1)
+        workers = max(1, os.process_cpu_count() // max(1, processes))
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("forkserver"),
+    )
+
+
+def may_have_thumbnails(path: str, content_type: Optional[str] = None) -> bool:
+    """
+    Whether a file may have thumbnails, from its name and the content type it was
+    written with. Files of an unknown type may be images stored without an
+    extension, so they may have thumbnails too.
+    """
+    content_types = {guess_content_type(path), content_type or ""}
+    return any(
+        candidate.startswith("image/") or candidate == "application/octet-stream"
+        for candidate in content_types
+    )
+
+
+def source_version(metadata: Union[FileMetadata, FileDownload]) -> str:
+    """The version of a file thumbnails are kept for, its entity tag unquoted"""
+    if metadata.etag is not None:
+        return metadata.etag.removeprefix("W/").strip('"')
+    modified = int(metadata.last_modified.timestamp()) if metadata.last_modified else 0
+    return f"{metadata.size:x}-{modified:x}"
+
+
+class Thumbnails:
+    """
+    Renders thumbnails of images in a process pool, and keeps them in a workspace
+    of their own, named by the source workspace, path, version and size:
+    `{workspace_id}/{path}/{version}/{size}.{format}`.
+
+    A changed source has a new version, so its old thumbnails are never served.
+    They are removed once the first thumbnail of the new version is stored, or
+    when the source is written through a `ThumbnailInvalidatingFileRepository`.
+    Renders of the same thumbnail requested at once are shared.
+    """
+
+    def __init__(
+        self,
+        executor: Executor,
+        workspace_id: str,
+        logger: logging.Logger,
+        image_format: str = "WEBP",
+        render: Render = render_thumbnail,
+    ):
+        self.executor = executor
+        self.workspace_id = workspace_id
+        self.logger = logger
+        self.image_format = image_format.upper()
+        self.render = render
+        self._rendering: dict[str, asyncio.Task[tuple[bytes, str]]] = {}
+
+    @property
+    def content_type(self) -> str:
+        return f"image/{self.image_format.lower()}"
+
+    def directory(self, workspace_id: str, path: str) -> str:
+        """The directory holding every version of the thumbnails of a file"""
+        return f"{workspace_id}/{normalize_path(path)}"
+
+    def name(self, workspace_id: str, path: str, version: str, size: int) -> str:
+        return (
+            f"{self.directory(workspace_id, path)}/{version}/"
+            f"{size}.{self.image_format.lower()}"
+        )
+
+    async def _read(self, repository: FileRepository, name: str) -> Optional[bytes]:
+        try:
+            download = await repository.download_file(self.workspace_id, name)
+        except (S3Error, HTTPException):
+            return None
+        try:
+            return b"".join([chunk async for chunk in download.content])
+        finally:
+            download.release()
+
+    async def get(
+        self,
+        repository: FileRepository,
+        workspace_id: str,
+        path: str,
+        metadata: FileMetadata,
+        size: int,
+    ) -> tuple[bytes, str]:
+        """
+        Asynchronously gets the thumbnail of a file, rendering it if it isn't
+        stored yet.
+
+        The file may change after its metadata was read, in which case the
+        thumbnail is of the version it was rendered from, which is returned.
+
+        Args:
+          repository (FileRepository): The repository holding the file and the thumbnails.
+          workspace_id (str): The ID of the workspace containing the file.
+          path (str): The path of the file within the workspace.
+          metadata (FileMetadata): The current metadata of the file.
+          size (int): The largest width and height of the thumbnail, in pixels.
+
+        Returns:
+          tuple[bytes, str]: The encoded thumbnail, and the version of the file it is of.
+
+        Raises:
+          S3Error: If the file is not found in the specified workspace.
+          ValueError: If the file can't be rendered.
+        """
+        version = source_version(metadata)
+        name = self.name(workspace_id, path, version, size)
+        if (thumbnail := await self._read(repository, name)) is not None:
+            return thumbnail, version
+        task = self._rendering.get(name)
+        if task is None:
+            task = asyncio.create_task(
+                self._render(repository, workspace_id, path, version, name, size)
+            )
+            self._rendering[name] = task
+            task.add_done_callback(lambda _: self._rendering.pop(name, None))
+        # A request that goes away doesn't cancel the render for the others
+        return await asyncio.shield(task)
+
+    async def _render(
+        self,
+        repository: FileRepository,
+        workspace_id: str,
+        path: str,
+        version: str,
+        name: str,
+        size: int,
+    ) -> tuple[bytes, str]:
+        download = await repository.download_file(workspace_id, path)
+        try:
+            data = b"".join([chunk async for chunk in download.content])
+        finally:
+            download.release()
+        rendered = source_version(download) if download.etag is not None else version
+        loop = asyncio.get_running_loop()
+        thumbnail = await loop.run_in_executor(
+            self.executor, self.render, data, size, self.image_format
+        )
+        if rendered != version:
+            # Rendered from a newer version than the one asked for, which may
+            # already have thumbnails of its own
+            return thumbnail, rendered
+        try:
+            await self._store(repository, workspace_id, path, version, name, thumbnail)
+        except Exception as error:
+            self.logger.warning(f"FAILED to store thumbnail {name}: {error}")
+        return thumbnail, version
+
+    async def _store(
+        self,
+        repository: FileRepository,
+        workspace_id: str,
+        path: str,
+        version: str,
+        name: str,
+        thumbnail: bytes,
+    ) -> None:
+        directory, filename = name.rsplit("/", 1)
+        [result] = await repository.upload_file(
+            self.workspace_id,
+            [
+                UploadFile(
+                    io.BytesIO(thumbnail),
+                    size=len(thumbnail),
+                    filename=filename,
+                    headers=Headers({"content-type": self.content_type}),
+                )
+            ],
+            directory,
+        )
+        if result.status != UploadStatus.UPLOADED:
+            raise Exception(result.detail)
+        # Thumbnails of the versions the file had before
+        current = f"{self.directory(workspace_id, path)}/{version}"
+        page = await repository.stat(
+            self.workspace_id, self.directory(workspace_id, path)
+        )
+        for entry in page.entries:
+            if entry["type"] == "directory" and entry["path"] != current:
+                await repository.delete_directory(self.workspace_id, entry["path"])
+
+
+class ThumbnailInvalidatingFileRepository(ForwardingFileRepository):
+    """
+    Removes the thumbnails of files as they are replaced, moved or deleted
+    through this repository, so that they don't outlive their source.
+
+    Only the thumbnails of files that may be images are removed, and those of
+    directories. Removing thumbnails never fails a write, the ones left behind
+    are never served, as their version no longer matches.
+    """
+
+    def __init__(self, repository: FileRepository, thumbnails: Thumbnails):
+        super().__init__(repository)
+        self.thumbnails = thumbnails
+
+    async def _invalidate(self, workspace_id: str, path: str) -> None:
+        # The thumbnails of thumbnails are never rendered
+        if workspace_id == self.thumbnails.workspace_id:
+            return
+        directory = self.thumbnails.directory(workspace_id, path)
+        try:
+            await self.repository.delete_directory(
+                self.thumbnails.workspace_id, directory
+            )
+        except Exception as error:
+            self.thumbnails.logger.warning(
+                f"FAILED to remove thumbnails {directory}: {error}"
+            )
+
+    async def upload_file(
+        self,
+        workspace_id: str,
+        files: list[UploadFile],
+        path: Optional[str] = "",
+    ) -> list[UploadResult]:
+        results = await self.repository.upload_file(workspace_id, files, path)
+        # The results are in the order the files were given
+        await asyncio.gather(
+            *(
+                self._invalidate(workspace_id, result.name)
+                for file, result in zip(files, results)
+                if result.status == UploadStatus.UPLOADED
+                and may_have_thumbnails(result.name, file.content_type)
+            )
+        )
+        return results
+
+    async def complete_upload(
+        self,
+        workspace_id: str,
+        path: str,
+        upload_id: str,
+        parts: Optional[list[CompletedPart]] = None,
+    ) -> UploadResult:
+        result = await self.repository.complete_upload(
+            workspace_id, path, upload_id, parts
+        )
+        if may_have_thumbnails(result.name):
+            await self._invalidate(workspace_id, result.name)
+        return result
+
+    async def delete_directory(self, workspace_id: str, path: str) -> DeleteResult:
+        result = await self.repository.delete_directory(workspace_id, path)
+        await self._invalidate(workspace_id, path)
+        return result
+
+    async def delete_file(self, workspace_id: str, path: str) -> None:
+        await self.repository.delete_file(workspace_id, path)
+        if may_have_thumbnails(path):
+            await self._invalidate(workspace_id, path)
+
+    async def copy_file(
+        self,
+        workspace_id: str,
+        path: str,
+        target_path: str,
+        target_workspace_id: Optional[str] = None,
+    ) -> None:
+        await self.repository.copy_file(
+            workspace_id, path, target_path, target_workspace_id
+        )
+        if may_have_thumbnails(target_path):
+            await self._invalidate(target_workspace_id or workspace_id, target_path)
+
+    async def move_file(
+        self,
+        workspace_id: str,
+        path: str,
+        target_path: str,
+        target_workspace_id: Optional[str] = None,
+    ) -> None:
+        await self.repository.move_file(
+            workspace_id, path, target_path, target_workspace_id
+        )
+        # Moved as is, so the source and target may both be images
+        if may_have_thumbnails(path) or may_have_thumbnails(target_path):
+            await asyncio.gather(
+                self._invalidate(workspace_id, path),
+                self._invalidate(target_workspace_id or workspace_id, target_path),
+            )
+
+    async def copy_directory(
+        self,
+        workspace_id: str,
+        path: str,
+        target_path: str,
+        target_workspace_id: Optional[str] = None,
+        progress: Optional[Callable[[TransferResult], None]] = None,
+    ) -> TransferResult:
+        try:
+            return await self.repository.copy_directory(
+                workspace_id, path, target_path, target_workspace_id, progress
+            )
+        finally:
+            # Some of the files may have been copied before a failure
+            await self._invalidate(target_workspace_id or workspace_id, target_path)
+
+    async def move_directory(
+        self,
+        workspace_id: str,
+        path: str,
+        target_path: str,
+        target_workspace_id: Optional[str] = None,
+        progress: Optional[Callable[[TransferResult], None]] = None,
+    ) -> TransferResult:
+        try:
+            return await self.repository.move_directory(
+                workspace_id, path, target_path, target_workspace_id, progress
+            )
+        finally:
+            await asyncio.gather(
+                self._invalidate(workspace_id, path),
+                self._invalidate(target_workspace_id or workspace_id, target_path),
+            )
@@ -0,0 +1,71 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional
+
+from src.models.file import CompletedPart, UploadPart
+from src.repositories.files.base import FileRepository
+
+# S3 numbers the parts of a multipart upload from 1 to 10000
+MAX_PART_NUMBER = 10000
+
+
+def select_parts(
+    uploaded: list[UploadPart], parts: Optional[list[CompletedPart]] = None
+) -> list[UploadPart]:
+    """Choose the parts an upload is completed with, checked as S3 checks them
+
+    Args:
+        uploaded: The parts sent to the upload, by part number.
+        parts: The parts to complete the upload with, in ascending order of part
+            number. Defaults to every part sent.
+
+    Returns:
+        The chosen parts.
+
+    Raises:
+        ValueError: If no part is chosen, or a part was not sent with that
+            entity tag, or the parts are out of order.
+    """
+    if parts is None:
+        selected = uploaded
+    else:
+        by_number = {part.part_number: part for part in uploaded}
+        selected = []
+        for part in parts:
+            match = by_number.get(part.part_number)
+            if match is None or match.etag.strip('"') != part.etag.strip('"'):
+                raise ValueError(f"part {part.part_number} was not uploaded")
+            if selected and part.part_number <= selected[-1].part_number:
+                raise ValueError("parts must be in ascending order of part number")
+            selected.append(match)
+    if not selected:
+        raise ValueError("an upload needs at least one part")
+    return selected
+
+
+async def abort_stale_uploads_periodically(
+    repository: Callable[[], FileRepository],
+    interval: float,
+    max_age: float,
+    logger: logging.Logger,
+) -> None:
+    """Abort the uploads left unfinished for longer than `max_age` seconds, every
+    `interval` seconds, so their parts don't hold storage forever
+
+    Args:
+        repository: Creates the repository to abort the uploads with.
+        interval: Seconds between sweeps.
+        max_age: Seconds after which an unfinished upload is aborted.
+        logger: The logger to report the sweeps to.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        initiated_before = datetime.now(timezone.utc) - timedelta(seconds=max_age)
+        try:
+            aborted = await repository().abort_stale_uploads(initiated_before)
+        except Exception as error:
+            logger.warning(f"FAILED to abort stale uploads: {error}")
+            continue
+        if aborted:
+            logger.info(f"ABORTED {aborted} stale upload(s)")
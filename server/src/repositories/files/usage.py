@@ -0,0 +1,41 @@
+from typing import Optional
+
+from src.models.file import Directory, DirectoryUsage
+from src.repositories.files.base import FileRepository
+
+
+async def directory_usage(
+    repository: FileRepository, workspace_id: str, path: Optional[str] = None
+) -> DirectoryUsage:
+    """Total the size and number of the files within a directory, and within each
+    of its subdirectories, by walking it once
+
+    Args:
+        repository: The repository to walk the directory with.
+        workspace_id: The ID of the workspace.
+        path: The path of the directory. Defaults to the workspace root.
+
+    Returns:
+        DirectoryUsage: The totals of the directory and its subdirectories.
+    """
+    path = (path or "").strip("/")
+    prefix = f"{path}/" if path else ""
+    usage = DirectoryUsage(path=path)
+    directories: dict[str, Directory] = {}
+    async for batch in repository.walk(workspace_id, path or None):
+        for file in batch:
+            usage.size += file.size
+            usage.count += 1
+            separator = file.name.find("/", len(prefix))
+            if separator < 0:
+                continue
+            name = file.name[len(prefix) : separator]
+            directory = directories.get(name)
+            if directory is None:
+                directory = directories[name] = Directory(
+                    name=name, path=prefix + name, size=0, count=0
+                )
+            directory.size += file.size
+            directory.count += 1
+    usage.directories = sorted(directories.values(), key=lambda entry: entry.name)
+    return usage
@@ -0,0 +1,130 @@
+import asyncio
+import logging
+
+from fastapi import APIRouter, HTTPException, Response, status
+from minio.error import S3Error
+from src.configuration import ConfigurationDependency
+from src.models.batch import (
+    BatchOperation,
+    BatchOperationResult,
+    BatchOperationStatus,
+    BatchRequest,
+    CopyOperation,
+    DeleteOperation,
+    MoveOperation,
+)
+from src.repositories.files.base import FileRepository
+from src.repositories.files.fastapi import FileRepositoryDependency
+from src.repositories.logger import LoggerDependency
+
+router = APIRouter()
+
+
+async def run_operation(
+    file_repository: FileRepository,
+    workspace_id: str,
+    operation: BatchOperation,
+    logger: logging.Logger,
+) -> BatchOperationResult:
+    """Run a single batch operation, capturing its outcome
+
+    Args:
+        file_repository: The repository to run the operation against.
+        workspace_id: The ID of the workspace the batch was sent to.
+        operation: The operation to run.
+        logger: Logs unexpected errors, which are not sent to the client.
+
+    Returns:
+        The outcome of the operation, with the status code the equivalent
+        single-operation route would have responded with.
+    """
+    try:
+        match operation:
+            case DeleteOperation(path=path):
+                await file_repository.delete_file(workspace_id, path)
+            case CopyOperation(
+                path=path,
+                target_path=target_path,
+                target_workspace_id=target_workspace_id,
+            ):
+                await file_repository.copy_file(
+                    workspace_id, path, target_path, target_workspace_id
+                )
+            case MoveOperation(
+                path=path,
+                target_path=target_path,
+                target_workspace_id=target_workspace_id,
+            ):
+                await file_repository.move_file(
+                    workspace_id, path, target_path, target_workspace_id
+                )
+    except HTTPException as error:
+        status_code, detail = error.status_code, str(error.detail)
+    except S3Error as error:
+        status_code, detail = status.HTTP_404_NOT_FOUND, error.message
+    except Exception:
+        logger.exception(
+            f"FAILED batch operation {operation.op.value} of {operation.path} in {workspace_id}"
+        )
+        status_code, detail = (
+            status.HTTP_500_INTERNAL_SERVER_ERROR,
+            "500_INTERNAL_SERVER_ERROR: the operation failed",
+        )
+    else:
+        return BatchOperationResult(
+            op=operation.op,
+            path=operation.path,
+            status=BatchOperationStatus.SUCCEEDED,
+            status_code=status.HTTP_204_NO_CONTENT,
+        )
+    return BatchOperationResult(
+        op=operation.op,
+        path=operation.path,
+        status=BatchOperationStatus.FAILED,
+        status_code=status_code,
+        detail=detail,
+    )
+
+
+@router.post(
+    "/workspaces/{workspace_id}/batch",
+    summary="Run a batch of operations",
+    description="Deletes, copies and moves files in the specified workspace, running up to a configured number of operations at once. Returns the outcome of each operation in the order they were sent, with a 207 status if any of them failed.",
+    responses={
+        status.HTTP_207_MULTI_STATUS: {
+            "model": list[BatchOperationResult],
+            "description": "Some of the operations failed",
+        }
+    },
+)
+async def batch(
+    file_repository: FileRepositoryDependency,
+    configuration: ConfigurationDependency,
+    logger: LoggerDependency,
+    response: Response,
+    workspace_id: str,
+    request: BatchRequest,
+) -> list[BatchOperationResult]:
+    if len(request.operations) > configuration.batch.max_operations:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"A batch may contain at most {configuration.batch.max_operations} operations",
+        )
+    slots = asyncio.Semaphore(configuration.batch.concurrency)
+
+    async def run(operation: BatchOperation) -> BatchOperationResult:
+        async with slots:
+            return await run_operation(file_repository, workspace_id, operation, logger)
+
+    results = await asyncio.gather(
+        *(run(operation) for operation in request.operations)
+    )
+    succeeded = sum(
+        result.status == BatchOperationStatus.SUCCEEDED for result in results
+    )
+    logger.info(
+        f"Ran {succeeded} of {len(results)} batch operation(s) in {workspace_id}"
+    )
+    if succeeded != len(results):
+        response.status_code = status.HTTP_207_MULTI_STATUS
+    return results
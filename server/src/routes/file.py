@@ -1,101 +1,568 @@
-import http
-from typing import Optional
+import asyncio
+import re
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Annotated, AsyncIterator, Awaitable, Callable, Optional
 
 from fastapi import (
     APIRouter,
+    Header,
     HTTPException,
+    Query,
+    Request,
     Response,
     UploadFile,
     status,
 )
+from fastapi.responses import JSONResponse, StreamingResponse
 from minio.error import S3Error
-from src.models.file import DirectoryListing
+from starlette.background import BackgroundTask
+from starlette.types import Receive, Scope, Send
+from src.models.file import (
+    ByteRange,
+    DeleteResult,
+    DirectoryListing,
+    DirectoryListingPage,
+    DirectoryUsage,
+    FileDownload,
+    PresignMethod,
+    PresignedUrl,
+    TransferResult,
+    UploadResult,
+    UploadStatus,
+    directory_listing_etag,
+    directory_listing_json,
+)
+from src import profiling
+from src.configuration import ConfigurationDependency
+from src.repositories.files.archive import zip_directory
+from src.repositories.files.base import FileRepository
 from src.repositories.files.fastapi import FileRepositoryDependency
+from src.repositories.files.usage import directory_usage
 from src.repositories.logger import LoggerDependency
 
 router = APIRouter()
 
+RANGE_PATTERN = re.compile(r"bytes=(?P<start>\d*)-(?P<end>\d*)")
+
+MAX_PAGE_SIZE = 10000
+
+NEXT_PAGE_HEADER = "X-Next-Start-After"
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Seconds between progress lines while a directory is copied or moved
+PROGRESS_INTERVAL = 1.0
+
 
 @router.get(
     "/workspaces/{workspace_id}/stat",
     summary="List workspace root",
-    description="Returns a list of files and directories in the root of the workspace.",
+    description="Returns a list of files and directories in the root of the workspace. When there are more than `limit` entries, the `X-Next-Start-After` header holds the `start_after` value for the next page. Each page carries an `ETag`, and a 304 is returned when it matches `If-None-Match`.",
+    response_model=list[DirectoryListing],
 )
 @router.get(
     "/workspaces/{workspace_id}/stat/{path:path}",
     summary="List directory",
-    description="Returns a list of files and directories in the specified directory.",
+    description="Returns a list of files and directories in the specified directory. When there are more than `limit` entries, the `X-Next-Start-After` header holds the `start_after` value for the next page. Each page carries an `ETag`, and a 304 is returned when it matches `If-None-Match`.",
+    response_model=list[DirectoryListing],
 )
 async def stat(
+    request: Request,
     file_repository: FileRepositoryDependency,
     workspace_id: str,
     path: Optional[str] = None,
-) -> list[DirectoryListing]:
+    limit: Annotated[Optional[int], Query(gt=0, le=MAX_PAGE_SIZE)] = None,
+    start_after: Optional[str] = None,
+    sizes: Annotated[
+        bool,
+        Query(
+            description="Add the total `size` and `count` of files to directories. Without the metadata index, the directory is walked, and the totals are kept in the listing cache when it is enabled."
+        ),
+    ] = False,
+    if_none_match: Annotated[Optional[str], Header()] = None,
+):
     try:
-        return await file_repository.stat(workspace_id, path)
+        page = await file_repository.stat(
+            workspace_id, path, limit=limit, start_after=start_after
+        )
+        if sizes:
+            usage = await get_directory_usage(
+                request, file_repository, workspace_id, path
+            )
+            page = with_directory_sizes(page, usage)
     except S3Error:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"404_NOT_FOUND: {path} not found in {workspace_id}",
         )
+    headers = {"ETag": directory_listing_etag(page)}
+    if page.next_start_after is not None:
+        headers[NEXT_PAGE_HEADER] = page.next_start_after
+    if is_not_modified(if_none_match, None, headers["ETag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    # The entries are typed dicts already in the response shape, so they are
+    # serialized directly by pydantic-core rather than validated again against
+    # the response model
+    return StreamingResponse(
+        profiling.bind_iterator(directory_listing_json(page.entries)),
+        media_type="application/json",
+        headers=headers,
+    )
+
+
+async def get_directory_usage(
+    request: Request,
+    file_repository: FileRepository,
+    workspace_id: str,
+    path: Optional[str],
+) -> DirectoryUsage:
+    """Total a directory and its subdirectories from the metadata index when it is
+    enabled, or else from a single walk of the directory, kept in the listing
+    cache when it is enabled"""
+    index = getattr(request.app.state, "metadata_index", None)
+    if index is not None:
+        await index.ensure(workspace_id, file_repository)
+        return await index.usage(workspace_id, path)
+    cache = getattr(request.app.state, "listing_cache", None)
+    if cache is None:
+        return await directory_usage(file_repository, workspace_id, path)
+    if (usage := cache.get_usage(workspace_id, path)) is not None:
+        return usage
+    epoch = cache.epoch
+    usage = await directory_usage(file_repository, workspace_id, path)
+    cache.put_usage(workspace_id, path, usage, epoch)
+    return usage
+
+
+def with_directory_sizes(
+    page: DirectoryListingPage, usage: DirectoryUsage
+) -> DirectoryListingPage:
+    """Add the totals of each directory to its entry in a page of listings
+
+    Entries may be shared with the listing cache, so the directories are copied
+    rather than updated in place.
+    """
+    totals = {directory.name: directory for directory in usage.directories}
+    entries = []
+    for entry in page.entries:
+        if entry["type"] == "directory":
+            total = totals.get(entry["name"])
+            entry = {
+                **entry,
+                "size": total.size if total is not None else 0,
+                "count": total.count if total is not None else 0,
+            }
+        entries.append(entry)
+    return DirectoryListingPage(entries=entries, next_start_after=page.next_start_after)
+
+
+@router.get(
+    "/workspaces/{workspace_id}/du",
+    summary="Total workspace usage",
+    description="Returns the total size and number of the files in the workspace, and in each directory at its root. Totals come from the metadata index when it is enabled, or else from a walk of the directory, kept in the listing cache when it is enabled.",
+    response_model=DirectoryUsage,
+)
+@router.get(
+    "/workspaces/{workspace_id}/du/{path:path}",
+    summary="Total directory usage",
+    description="Returns the total size and number of the files in the specified directory, and in each of its subdirectories. Totals come from the metadata index when it is enabled, or else from a walk of the directory, kept in the listing cache when it is enabled.",
+    response_model=DirectoryUsage,
+)
+async def du(
+    request: Request,
+    file_repository: FileRepositoryDependency,
+    workspace_id: str,
+    path: Optional[str] = None,
+):
+    try:
+        return await get_directory_usage(request, file_repository, workspace_id, path)
+    except S3Error:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"404_NOT_FOUND: {path} not found in {workspace_id}",
+        )
+
+
+@router.get(
+    "/workspaces/{workspace_id}/archive",
+    summary="Download workspace as ZIP",
+    description="Downloads every file in the workspace as a ZIP archive, built as it is sent.",
+    response_class=StreamingResponse,
+)
+@router.get(
+    "/workspaces/{workspace_id}/archive/{path:path}",
+    summary="Download directory as ZIP",
+    description="Downloads every file in the specified directory, and its subdirectories, as a ZIP archive built as it is sent. Paths in the archive are relative to the directory.",
+    response_class=StreamingResponse,
+)
+async def download_archive(
+    file_repository: FileRepositoryDependency,
+    configuration: ConfigurationDependency,
+    workspace_id: str,
+    path: Optional[str] = None,
+):
+    chunks = zip_directory(
+        file_repository,
+        workspace_id,
+        path,
+        read_ahead_files=configuration.archive.read_ahead_files,
+        read_ahead_bytes=configuration.archive.read_ahead_bytes,
+    )
+    try:
+        # Opens the first file, so a missing workspace is a 404 rather than a
+        # broken archive
+        first = await anext(chunks)
+    except S3Error:
+        await chunks.aclose()
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"404_NOT_FOUND: {path} not found in {workspace_id}",
+        )
+
+    async def content() -> AsyncIterator[bytes]:
+        try:
+            yield first
+            async for chunk in chunks:
+                yield chunk
+        finally:
+            await chunks.aclose()
+
+    filename = (path or "").strip("/").rsplit("/", 1)[-1] or workspace_id
+    return StreamingResponse(
+        content(),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename={filename}.zip"},
+    )
+
+
+def is_not_modified(
+    if_none_match: Optional[str],
+    if_modified_since: Optional[str],
+    etag: Optional[str],
+    last_modified: Optional[datetime] = None,
+) -> bool:
+    """Evaluate the If-None-Match and If-Modified-Since preconditions of a GET
+
+    As in RFC 9110, If-None-Match uses the weak comparison and takes precedence,
+    and If-Modified-Since is only evaluated without it.
+
+    Args:
+        if_none_match: The value of the If-None-Match header.
+        if_modified_since: The value of the If-Modified-Since header.
+        etag: The entity tag of the current representation.
+        last_modified: The modification time of the current representation.
+
+    Returns:
+        True if a 304 Not Modified response should be sent instead.
+    """
+    if if_none_match is not None:
+        if etag is None:
+            return False
+        if if_none_match.strip() == "*":
+            return True
+        opaque_tag = etag.removeprefix("W/")
+        return any(
+            tag.strip().removeprefix("W/") == opaque_tag
+            for tag in if_none_match.split(",")
+        )
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    # HTTP dates have a resolution of one second
+    return last_modified.replace(microsecond=0) <= since
+
+
+def validator_headers(
+    etag: Optional[str], last_modified: Optional[datetime]
+) -> dict[str, str]:
+    headers = {}
+    if etag is not None:
+        headers["ETag"] = etag
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+    return headers
+
+
+def parse_range_header(header: Optional[str]) -> Optional[ByteRange]:
+    """Parse a single `bytes` range from a Range header
+
+    Multiple ranges and malformed headers are ignored, in which case the whole
+    file is served as allowed by RFC 9110.
+
+    Args:
+        header: The value of the Range header.
+
+    Returns:
+        The requested byte range, or None to serve the whole file.
+    """
+    if header is None or not (match := RANGE_PATTERN.fullmatch(header.strip())):
+        return None
+    start = int(match["start"]) if match["start"] else None
+    end = int(match["end"]) if match["end"] else None
+    if start is None and end is None:
+        return None
+    if start is not None and end is not None and end < start:
+        return None
+    return ByteRange(start, end)
+
+
+def if_range_matches(if_range: str, download: FileDownload) -> bool:
+    """Check whether an If-Range validator still matches the file
+
+    Args:
+        if_range: The value of the If-Range header, an entity tag or HTTP date.
+        download: The file that is being downloaded.
+
+    Returns:
+        True if the range can be served, False if the whole file must be sent.
+    """
+    if if_range.startswith(("W/", '"')):
+        # Weak entity tags never match an If-Range header
+        return not if_range.startswith("W/") and if_range == download.etag
+    try:
+        return download.last_modified == parsedate_to_datetime(if_range)
+    except (TypeError, ValueError):
+        return False
+
+
+class FileDownloadResponse(StreamingResponse):
+    """
+    Streams the content of a download. A whole file on local disk is instead
+    handed to the server with the ASGI pathsend extension, where the server
+    supports it, so it is sent by the server (with `sendfile`) without passing
+    through Python.
+    """
+
+    def __init__(self, download: FileDownload, **kwargs):
+        super().__init__(download.content, **kwargs)
+        self.file_path = download.file_path
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            self.file_path is None
+            or self.status_code != status.HTTP_200_OK
+            or "http.response.pathsend" not in scope.get("extensions", {})
+        ):
+            return await super().__call__(scope, receive, send)
+        await send(
+            {
+                "type": "http.response.start",
+                "status": self.status_code,
+                "headers": self.raw_headers,
+            }
+        )
+        await send({"type": "http.response.pathsend", "path": self.file_path})
+        if self.background is not None:
+            await self.background()
 
 
 @router.get(
     "/workspaces/{workspace_id}/download/{path:path}",
     summary="Download file",
-    description="Downloads the specified file from the specified workspace.",
+    description="Downloads the specified file from the specified workspace. A single byte range can be requested with the Range header. Responses carry `ETag` and `Last-Modified` validators, and a 304 is returned when the `If-None-Match` or `If-Modified-Since` headers show the client already has the file.",
+    responses={
+        status.HTTP_206_PARTIAL_CONTENT: {"description": "Partial Content"},
+        status.HTTP_304_NOT_MODIFIED: {"description": "Not Modified"},
+        status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE: {
+            "description": "Range Not Satisfiable"
+        },
+    },
 )
 async def download_file(
-    file_repository: FileRepositoryDependency, workspace_id: str, path: str
+    file_repository: FileRepositoryDependency,
+    workspace_id: str,
+    path: str,
+    range: Annotated[Optional[str], Header()] = None,
+    if_range: Annotated[Optional[str], Header()] = None,
+    if_none_match: Annotated[Optional[str], Header()] = None,
+    if_modified_since: Annotated[Optional[str], Header()] = None,
 ):
     if not path:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"404_NOT_FOUND: {path} not found in {workspace_id}",
         )
+    byte_range = parse_range_header(range)
     try:
-        filename, file_content, content_type = await file_repository.download_file(
-            workspace_id, path
+        if if_none_match is not None or if_modified_since is not None:
+            # Revalidating only needs the metadata, the content is not opened
+            # unless the file changed
+            metadata = await file_repository.head_file(workspace_id, path)
+            if is_not_modified(
+                if_none_match, if_modified_since, metadata.etag, metadata.last_modified
+            ):
+                return Response(
+                    status_code=status.HTTP_304_NOT_MODIFIED,
+                    headers=validator_headers(metadata.etag, metadata.last_modified),
+                )
+        download = await file_repository.download_file(workspace_id, path, byte_range)
+        if (
+            download.content_range is not None
+            and if_range is not None
+            and not if_range_matches(if_range, download)
+        ):
+            # The file changed since the client fetched the first part of it
+            download.release()
+            download = await file_repository.download_file(workspace_id, path)
+    except S3Error:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"404_NOT_FOUND: {path} not found in {workspace_id}",
+        )
+
+    headers = {
+        "Content-Disposition": f"attachment; filename={download.filename}",
+        "Content-Length": str(download.content_length),
+        "Accept-Ranges": "bytes",
+        **validator_headers(download.etag, download.last_modified),
+    }
+    status_code = status.HTTP_200_OK
+    if download.content_range is not None:
+        start, end = download.content_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{download.size}"
+        status_code = status.HTTP_206_PARTIAL_CONTENT
+
+    return FileDownloadResponse(
+        download,
+        status_code=status_code,
+        media_type=download.content_type,
+        headers=headers,
+        background=BackgroundTask(download.release),
+    )
+
+
+@router.head(
+    "/workspaces/{workspace_id}/download/{path:path}",
+    summary="Get file metadata",
+    description="Returns the headers of a download of the specified file, without its content.",
+    responses={status.HTTP_304_NOT_MODIFIED: {"description": "Not Modified"}},
+)
+async def head_file(
+    file_repository: FileRepositoryDependency,
+    workspace_id: str,
+    path: str,
+    if_none_match: Annotated[Optional[str], Header()] = None,
+    if_modified_since: Annotated[Optional[str], Header()] = None,
+):
+    if not path:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"404_NOT_FOUND: {path} not found in {workspace_id}",
         )
+    try:
+        metadata = await file_repository.head_file(workspace_id, path)
+    except S3Error:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"404_NOT_FOUND: {path} not found in {workspace_id}",
+        )
+
+    headers = validator_headers(metadata.etag, metadata.last_modified)
+    if is_not_modified(
+        if_none_match, if_modified_since, metadata.etag, metadata.last_modified
+    ):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(
+        media_type=metadata.content_type,
+        headers={
+            "Content-Disposition": f"attachment; filename={metadata.filename}",
+            "Content-Length": str(metadata.size),
+            "Accept-Ranges": "bytes",
+            **headers,
+        },
+    )
+
+
+# S3 does not accept presigned URLs valid for more than a week
+MAX_PRESIGN_EXPIRY = 7 * 24 * 3600
 
-        return Response(
-            content=file_content,
-            media_type=content_type,
-            headers={"Content-Disposition": f"attachment; filename={filename}"},
+
+@router.get(
+    "/workspaces/{workspace_id}/presign/{path:path}",
+    summary="Presign file URL",
+    description="Returns a short-lived URL to download (`GET`) or upload (`PUT`) the specified file directly from or to the storage backend, so its content does not pass through this service. A `GET` URL is only issued for a file that exists. Files uploaded through a `PUT` URL appear in cached listings once they expire, and in search once the metadata index is reconciled. Returns a 501 when the storage backend does not support presigned URLs.",
+    responses={
+        status.HTTP_501_NOT_IMPLEMENTED: {"description": "Not Implemented"},
+    },
+)
+async def presign_url(
+    file_repository: FileRepositoryDependency,
+    response: Response,
+    workspace_id: str,
+    path: str,
+    method: PresignMethod = PresignMethod.GET,
+    expires_in: Annotated[
+        int,
+        Query(gt=0, le=MAX_PRESIGN_EXPIRY, description="Seconds the URL is valid for"),
+    ] = 900,
+) -> PresignedUrl:
+    if not path or path.endswith("/"):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"404_NOT_FOUND: {path} not found in {workspace_id}",
+        )
+    try:
+        if method == PresignMethod.GET:
+            await file_repository.head_file(workspace_id, path)
+        presigned = await file_repository.presign_url(
+            workspace_id, path, method, timedelta(seconds=expires_in)
         )
     except S3Error:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"404_NOT_FOUND: {path} not found in {workspace_id}",
         )
+    # The URL grants access on its own, so it is not kept by caches along the way
+    response.headers["Cache-Control"] = "no-store"
+    return presigned
 
 
 @router.post(
     "/workspaces/{workspace_id}/upload",
-    status_code=status.HTTP_204_NO_CONTENT,
     summary="",
     description="",
+    responses={
+        status.HTTP_207_MULTI_STATUS: {
+            "model": list[UploadResult],
+            "description": "Some of the files failed to upload",
+        }
+    },
 )
 @router.post(
     "/workspaces/{workspace_id}/upload/{path:path}",
-    status_code=status.HTTP_204_NO_CONTENT,
     summary="Upload a file",
-    description="Upload a file (BLOB) to the specified workspace and path.",
+    description="Upload files (BLOBs) to the specified workspace and path. Returns the outcome of each upload, with a 207 status if any of them failed.",
+    responses={
+        status.HTTP_207_MULTI_STATUS: {
+            "model": list[UploadResult],
+            "description": "Some of the files failed to upload",
+        }
+    },
 )
 async def upload_file(
     file_repository: FileRepositoryDependency,
     logger: LoggerDependency,
+    response: Response,
     workspace_id: str,
     files: list[UploadFile],
     path: Optional[str] = "",
-):
-    await file_repository.upload_file(
+) -> list[UploadResult]:
+    results = await file_repository.upload_file(
         workspace_id,
         files,
         path,
     )
-    logger.info(f"Uploaded {len(files)} file(s) to {workspace_id}/{path}")
-    return http.HTTPStatus.OK
+    uploaded = sum(result.status == UploadStatus.UPLOADED for result in results)
+    logger.info(f"Uploaded {uploaded} of {len(files)} file(s) to {workspace_id}/{path}")
+    if uploaded != len(results):
+        response.status_code = status.HTTP_207_MULTI_STATUS
+    return results
 
 
 @router.post(
@@ -112,14 +579,25 @@ async def create_directory(
 
 @router.delete(
     "/workspaces/{workspace_id}/directory/{path:path}",
-    status_code=status.HTTP_204_NO_CONTENT,
     summary="Delete directory",
-    description="DESTRUCTIVE ACTION - Remove a directory and all of its contents - DESTRUCTIVE ACTION",
+    description="DESTRUCTIVE ACTION - Remove a directory and all of its contents - DESTRUCTIVE ACTION. Returns the number of objects deleted, with a 207 status if any of them could not be.",
+    responses={
+        status.HTTP_207_MULTI_STATUS: {
+            "model": DeleteResult,
+            "description": "Some of the contents could not be deleted",
+        }
+    },
 )
 async def delete_directory(
-    file_repository: FileRepositoryDependency, workspace_id: str, path: str
-):
-    await file_repository.delete_directory(workspace_id, path)
+    file_repository: FileRepositoryDependency,
+    response: Response,
+    workspace_id: str,
+    path: str,
+) -> DeleteResult:
+    result = await file_repository.delete_directory(workspace_id, path)
+    if result.failed != 0:
+        response.status_code = status.HTTP_207_MULTI_STATUS
+    return result
 
 
 @router.delete(
@@ -134,11 +612,101 @@ async def delete_file(
     await file_repository.delete_file(workspace_id, path)
 
 
+def transfer_responses(action: str) -> dict:
+    return {
+        status.HTTP_200_OK: {
+            "model": TransferResult,
+            "description": f"The directory was {action}",
+            "content": {NDJSON_MEDIA_TYPE: {}},
+        },
+        status.HTTP_207_MULTI_STATUS: {
+            "model": TransferResult,
+            "description": f"Some of the contents could not be {action}",
+        },
+    }
+
+
+def check_transfer_target(
+    workspace_id: str,
+    path: str,
+    target_path: str,
+    target_workspace_id: Optional[str],
+) -> None:
+    source, target = path.strip("/"), target_path.strip("/")
+    if (target_workspace_id or workspace_id) == workspace_id and (
+        target == source or target.startswith(source + "/")
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cannot copy a directory into itself",
+        )
+
+
+async def transfer_progress(
+    transfer: Callable[[Callable[[TransferResult], None]], Awaitable[TransferResult]],
+) -> AsyncIterator[bytes]:
+    """Run a directory transfer, yielding its running totals as NDJSON
+
+    Args:
+        transfer: Starts the transfer, given a callback for its running totals.
+
+    Yields:
+        A line with the totals at most every `PROGRESS_INTERVAL` seconds, and
+        a final line with `done` set once the transfer has finished.
+    """
+    latest = TransferResult()
+
+    def progress(result: TransferResult) -> None:
+        nonlocal latest
+        latest = result
+
+    task = asyncio.create_task(transfer(progress))
+    try:
+        while True:
+            done, _ = await asyncio.wait([task], timeout=PROGRESS_INTERVAL)
+            if done:
+                break
+            yield latest.model_dump_json(by_alias=True).encode() + b"\n"
+        result = task.result()
+        result.done = True
+        yield result.model_dump_json(by_alias=True).encode() + b"\n"
+    finally:
+        # The client went away, stop issuing copies on its behalf
+        task.cancel()
+
+
+async def transfer_response(
+    transfer: Callable[[Callable[[TransferResult], None]], Awaitable[TransferResult]],
+    accept: Optional[str],
+    workspace_id: str,
+    path: str,
+) -> Response:
+    if accept is not None and NDJSON_MEDIA_TYPE in accept:
+        return StreamingResponse(
+            transfer_progress(transfer), media_type=NDJSON_MEDIA_TYPE
+        )
+    try:
+        result = await transfer(None)
+    except S3Error:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"404_NOT_FOUND: {path} not found in {workspace_id}",
+        )
+    result.done = True
+    return JSONResponse(
+        result.model_dump(mode="json", by_alias=True),
+        status_code=(
+            status.HTTP_207_MULTI_STATUS if result.failed != 0 else status.HTTP_200_OK
+        ),
+    )
+
+
 @router.put(
     "/workspaces/{workspace_id}/cp/{path:path}",
     status_code=status.HTTP_204_NO_CONTENT,
-    summary="Copy a file",
-    description="Copies a file from to another path, in the specified workspace.",
+    summary="Copy a file or directory",
+    description="Copies a file to another path, in the specified workspace. With `recursive`, copies a directory and all of its contents on the storage backend and returns the number of objects copied, with a 207 status if any of them could not be. Send `Accept: application/x-ndjson` to receive the running totals as they change.",
+    responses=transfer_responses("copied"),
 )
 async def copy_file(
     file_repository: FileRepositoryDependency,
@@ -146,7 +714,19 @@ async def copy_file(
     path: str,
     target_path: str,
     target_workspace_id: Optional[str] = None,
+    recursive: bool = False,
+    accept: Annotated[Optional[str], Header()] = None,
 ):
+    if recursive:
+        check_transfer_target(workspace_id, path, target_path, target_workspace_id)
+        return await transfer_response(
+            lambda progress: file_repository.copy_directory(
+                workspace_id, path, target_path, target_workspace_id, progress
+            ),
+            accept,
+            workspace_id,
+            path,
+        )
     await file_repository.copy_file(
         workspace_id, path, target_path, target_workspace_id
     )
@@ -155,8 +735,9 @@ async def copy_file(
 @router.put(
     "/workspaces/{workspace_id}/mv/{path:path}",
     status_code=status.HTTP_204_NO_CONTENT,
-    summary="Move file",
-    description="Move a file to another path, in the specified workspace.",
+    summary="Move a file or directory",
+    description="Move a file to another path, in the specified workspace. With `recursive`, moves a directory and all of its contents on the storage backend and returns the number of objects moved, with a 207 status if any of them could not be. Send `Accept: application/x-ndjson` to receive the running totals as they change.",
+    responses=transfer_responses("moved"),
 )
 async def move_file(
     file_repository: FileRepositoryDependency,
@@ -164,7 +745,19 @@ async def move_file(
     path: str,
     target_path: str,
     target_workspace_id: Optional[str] = None,
+    recursive: bool = False,
+    accept: Annotated[Optional[str], Header()] = None,
 ):
+    if recursive:
+        check_transfer_target(workspace_id, path, target_path, target_workspace_id)
+        return await transfer_response(
+            lambda progress: file_repository.move_directory(
+                workspace_id, path, target_path, target_workspace_id, progress
+            ),
+            accept,
+            workspace_id,
+            path,
+        )
     await file_repository.move_file(
         workspace_id, path, target_path, target_workspace_id
     )
@@ -0,0 +1,77 @@
+from typing import Annotated, Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from minio.error import S3Error
+from src.models.file import DirectoryListing, directory_listing_json
+from src.repositories.files.fastapi import FileRepositoryDependency
+from src.routes.file import MAX_PAGE_SIZE, NEXT_PAGE_HEADER
+
+router = APIRouter()
+
+
+@router.get(
+    "/workspaces/{workspace_id}/search",
+    summary="Search files",
+    description="Returns the files of the workspace matching every given filter, ordered by name, from the metadata index of the workspace. The index is built on the first search of a workspace. Times are in milliseconds since the epoch. When there are more than `limit` matches, the `X-Next-Start-After` header holds the `start_after` value for the next page.",
+    response_model=list[DirectoryListing],
+)
+async def search(
+    request: Request,
+    file_repository: FileRepositoryDependency,
+    workspace_id: str,
+    path: Annotated[
+        Optional[str], Query(description="Only files within this directory")
+    ] = None,
+    name: Annotated[
+        Optional[str],
+        Query(description="Only files with this text in their path, ignoring case"),
+    ] = None,
+    glob: Annotated[
+        Optional[str],
+        Query(description="Only files whose path matches this pattern, as `*.pdf`"),
+    ] = None,
+    extension: Annotated[
+        Optional[str], Query(description="Only files with this extension")
+    ] = None,
+    min_size: Annotated[Optional[int], Query(ge=0)] = None,
+    max_size: Annotated[Optional[int], Query(ge=0)] = None,
+    modified_after: Annotated[Optional[int], Query(ge=0)] = None,
+    modified_before: Annotated[Optional[int], Query(ge=0)] = None,
+    limit: Annotated[int, Query(gt=0, le=MAX_PAGE_SIZE)] = 100,
+    start_after: Optional[str] = None,
+):
+    index = getattr(request.app.state, "metadata_index", None)
+    if index is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="404_NOT_FOUND: metadata index is disabled",
+        )
+    try:
+        await index.ensure(workspace_id, file_repository)
+    except S3Error:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"404_NOT_FOUND: workspace {workspace_id} not found",
+        )
+    page = await index.search(
+        workspace_id,
+        path=path,
+        name=name,
+        glob=glob,
+        extension=extension,
+        min_size=min_size,
+        max_size=max_size,
+        modified_after=modified_after,
+        modified_before=modified_before,
+        limit=limit,
+        start_after=start_after,
+    )
+    headers = {}
+    if page.next_start_after is not None:
+        headers[NEXT_PAGE_HEADER] = page.next_start_after
+    return StreamingResponse(
+        directory_listing_json(page.entries),
+        media_type="application/json",
+        headers=headers,
+    )
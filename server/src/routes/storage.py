@@ -0,0 +1,75 @@
+from fastapi import (
+    APIRouter,
+    HTTPException,
+    Request,
+    status,
+)
+from src.models.storage import (
+    ConnectionPoolStats,
+    DedupStats,
+    DownloadCacheStats,
+    ListingCacheStats,
+)
+from src.repositories.files.fastapi import get_connection_pool_stats
+
+router = APIRouter()
+
+
+@router.get(
+    "/storage/pool",
+    summary="Storage connection pool",
+    description="Returns the usage of the connection pool shared by all requests to the storage backend.",
+)
+async def connection_pool(request: Request) -> ConnectionPoolStats:
+    client = getattr(request.app.state, "storage_client", None)
+    if client is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="404_NOT_FOUND: storage backend has no connection pool",
+        )
+    return get_connection_pool_stats(client._http)
+
+
+@router.get(
+    "/storage/listing-cache",
+    summary="Directory listing cache",
+    description="Returns the hit, miss and eviction counts of the directory listing cache.",
+)
+async def listing_cache(request: Request) -> ListingCacheStats:
+    cache = getattr(request.app.state, "listing_cache", None)
+    if cache is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="404_NOT_FOUND: directory listing cache is disabled",
+        )
+    return cache.stats()
+
+
+@router.get(
+    "/storage/download-cache",
+    summary="Download cache",
+    description="Returns the size, hit rate and bytes saved of the local disk cache of downloads.",
+)
+async def download_cache(request: Request) -> DownloadCacheStats:
+    cache = getattr(request.app.state, "download_cache", None)
+    if cache is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="404_NOT_FOUND: download cache is disabled",
+        )
+    return cache.stats()
+
+
+@router.get(
+    "/storage/dedup",
+    summary="Upload deduplication",
+    description="Returns the size of the content index, and the hit rate and bytes saved of the uploads deduplicated by this worker process.",
+)
+async def dedup(request: Request) -> DedupStats:
+    index = getattr(request.app.state, "content_index", None)
+    if index is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="404_NOT_FOUND: upload deduplication is disabled",
+        )
+    return await index.stats()
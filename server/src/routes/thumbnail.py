@@ -0,0 +1,81 @@
+from typing import Annotated, Optional
+
+from fastapi import APIRouter, Header, HTTPException, Query, Request, Response, status
+from minio.error import S3Error
+from src.configuration import ConfigurationDependency
+from src.repositories.files.fastapi import FileRepositoryDependency
+from src.repositories.files.thumbnails import source_version
+from src.routes.file import is_not_modified
+
+router = APIRouter()
+
+
+@router.get(
+    "/workspaces/{workspace_id}/thumbnail/{path:path}",
+    summary="Get thumbnail",
+    description="Returns the specified image scaled down to fit in a square of `size` pixels, one of the configured sizes. Thumbnails are rendered once per version of the image and kept in storage. Responses carry an `ETag`, and a 304 is returned when it matches `If-None-Match`.",
+    responses={
+        status.HTTP_304_NOT_MODIFIED: {"description": "Not Modified"},
+        status.HTTP_415_UNSUPPORTED_MEDIA_TYPE: {"description": "Not An Image"},
+    },
+)
+async def get_thumbnail(
+    request: Request,
+    file_repository: FileRepositoryDependency,
+    configuration: ConfigurationDependency,
+    workspace_id: str,
+    path: str,
+    size: Annotated[int, Query(gt=0, description="Width and height in pixels")] = 256,
+    if_none_match: Annotated[Optional[str], Header()] = None,
+):
+    thumbnails = getattr(request.app.state, "thumbnails", None)
+    if thumbnails is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="404_NOT_FOUND: thumbnails are disabled",
+        )
+    if size not in configuration.thumbnails.sizes:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"400_BAD_REQUEST: size must be one of {configuration.thumbnails.sizes}",
+        )
+    try:
+        metadata = await file_repository.head_file(workspace_id, path)
+    except S3Error:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"404_NOT_FOUND: {path} not found in {workspace_id}",
+        )
+    unsupported = HTTPException(
+        status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+        detail=f"415_UNSUPPORTED_MEDIA_TYPE: {path} can't be previewed",
+    )
+    if (
+        not metadata.content_type.startswith("image/")
+        or metadata.size > configuration.thumbnails.max_source_size
+    ):
+        raise unsupported
+
+    etag = f'"{source_version(metadata)}-{size}"'
+    if is_not_modified(if_none_match, None, etag):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag}
+        )
+    try:
+        thumbnail, version = await thumbnails.get(
+            file_repository, workspace_id, path, metadata, size
+        )
+    except S3Error:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"404_NOT_FOUND: {path} not found in {workspace_id}",
+        )
+    except ValueError:
+        raise unsupported
+    # The file may have changed since it was looked up, the tag is of the
+    # version the thumbnail was rendered from
+    return Response(
+        thumbnail,
+        media_type=thumbnails.content_type,
+        headers={"ETag": f'"{version}-{size}"'},
+    )
@@ -0,0 +1,189 @@
+from typing import Annotated, NoReturn, Optional
+
+from fastapi import APIRouter, HTTPException, Path, Query, Request, status
+from minio.error import S3Error
+from src.configuration import ConfigurationDependency
+from src.models.file import (
+    CompleteUploadRequest,
+    UploadPart,
+    UploadResult,
+    UploadSession,
+)
+from src.repositories.files.fastapi import FileRepositoryDependency
+from src.repositories.files.uploads import MAX_PART_NUMBER
+
+router = APIRouter()
+
+# Errors of S3 for parts that can't be joined, rather than a missing upload
+INVALID_PARTS_CODES = {"InvalidPart", "InvalidPartOrder", "EntityTooSmall"}
+
+FilePathQuery = Annotated[str, Query(min_length=1, description="The path of the file")]
+
+
+def raise_upload_error(
+    error: S3Error, workspace_id: str, path: str, upload_id: str
+) -> NoReturn:
+    if error.code in INVALID_PARTS_CODES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"400_BAD_REQUEST: {error.message}",
+        )
+    raise HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail=f"404_NOT_FOUND: upload {upload_id} of {path} not found in {workspace_id}",
+    )
+
+
+async def read_part(request: Request, max_size: int) -> bytes:
+    """Read the body of a request, refusing it as soon as it is too large
+
+    Args:
+        request: The request carrying the part.
+        max_size: The most bytes accepted.
+
+    Returns:
+        The body.
+
+    Raises:
+        HTTPException: If the body is larger than `max_size`.
+    """
+    too_large = HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"A part may be at most {max_size} bytes",
+    )
+    content_length = request.headers.get("Content-Length")
+    if content_length is not None and int(content_length) > max_size:
+        raise too_large
+    chunks, size = [], 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > max_size:
+            raise too_large
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+@router.post(
+    "/workspaces/{workspace_id}/uploads",
+    status_code=status.HTTP_201_CREATED,
+    summary="Start upload",
+    description="Starts a resumable upload of a file to the specified path. Its parts are then sent with `PUT .../parts/{part_number}`, in any order and in parallel, and joined with `POST .../complete`. Uploads left unfinished are aborted after a configured time.",
+)
+async def create_upload(
+    file_repository: FileRepositoryDependency,
+    workspace_id: str,
+    path: FilePathQuery,
+    content_type: Optional[str] = None,
+) -> UploadSession:
+    try:
+        return await file_repository.create_upload(workspace_id, path, content_type)
+    except S3Error:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"404_NOT_FOUND: workspace {workspace_id} not found",
+        )
+
+
+@router.get(
+    "/workspaces/{workspace_id}/uploads",
+    summary="List uploads",
+    description="Returns the unfinished uploads in the specified workspace, so they can be resumed or aborted.",
+)
+async def list_uploads(
+    file_repository: FileRepositoryDependency,
+    workspace_id: str,
+    prefix: Annotated[
+        Optional[str], Query(description="Only uploads of paths starting with this")
+    ] = None,
+) -> list[UploadSession]:
+    try:
+        return await file_repository.list_uploads(workspace_id, prefix)
+    except S3Error:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"404_NOT_FOUND: workspace {workspace_id} not found",
+        )
+
+
+@router.put(
+    "/workspaces/{workspace_id}/uploads/{upload_id}/parts/{part_number}",
+    summary="Upload part",
+    description="Sends one part of an upload as the request body, replacing any part sent before with the same number. Every part but the last must be at least 5 MiB on the MinIO backend. Returns the entity tag of the part.",
+    responses={
+        status.HTTP_413_REQUEST_ENTITY_TOO_LARGE: {"description": "Part Too Large"}
+    },
+)
+async def upload_part(
+    request: Request,
+    file_repository: FileRepositoryDependency,
+    configuration: ConfigurationDependency,
+    workspace_id: str,
+    upload_id: str,
+    part_number: Annotated[int, Path(ge=1, le=MAX_PART_NUMBER)],
+    path: FilePathQuery,
+) -> UploadPart:
+    data = await read_part(request, configuration.upload_sessions.max_part_size)
+    try:
+        return await file_repository.upload_part(
+            workspace_id, path, upload_id, part_number, data
+        )
+    except S3Error as error:
+        raise_upload_error(error, workspace_id, path, upload_id)
+
+
+@router.get(
+    "/workspaces/{workspace_id}/uploads/{upload_id}/parts",
+    summary="List uploaded parts",
+    description="Returns the parts sent to an upload, so an interrupted upload can send only the parts it is missing.",
+)
+async def list_parts(
+    file_repository: FileRepositoryDependency,
+    workspace_id: str,
+    upload_id: str,
+    path: FilePathQuery,
+) -> list[UploadPart]:
+    try:
+        return await file_repository.list_parts(workspace_id, path, upload_id)
+    except S3Error as error:
+        raise_upload_error(error, workspace_id, path, upload_id)
+
+
+@router.post(
+    "/workspaces/{workspace_id}/uploads/{upload_id}/complete",
+    summary="Complete upload",
+    description="Joins the parts of an upload into the file. The parts and their entity tags may be given, in ascending order, and default to every part sent.",
+)
+async def complete_upload(
+    file_repository: FileRepositoryDependency,
+    workspace_id: str,
+    upload_id: str,
+    path: FilePathQuery,
+    request: Optional[CompleteUploadRequest] = None,
+) -> UploadResult:
+    try:
+        return await file_repository.complete_upload(
+            workspace_id,
+            path,
+            upload_id,
+            request.parts if request is not None else None,
+        )
+    except S3Error as error:
+        raise_upload_error(error, workspace_id, path, upload_id)
+
+
+@router.delete(
+    "/workspaces/{workspace_id}/uploads/{upload_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    summary="Abort upload",
+    description="Abandons an upload, removing the parts sent to it.",
+)
+async def abort_upload(
+    file_repository: FileRepositoryDependency,
+    workspace_id: str,
+    upload_id: str,
+    path: FilePathQuery,
+):
+    try:
+        await file_repository.abort_upload(workspace_id, path, upload_id)
+    except S3Error as error:
+        raise_upload_error(error, workspace_id, path, upload_id)
@@ -0,0 +1,87 @@
+import json
+import mimetypes
+from datetime import datetime, timezone
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+from minio.datatypes import Object
+from src.models.file import (
+    Directory,
+    File,
+    directory_entry,
+    directory_listing_from_object,
+    directory_listing_json,
+    file_entry,
+    guess_content_type,
+)
+
+
+@pytest.mark.parametrize(
+    "name",
+    [
+        "report.pdf",
+        "some/path/photo.JPG",
+        "archive.tar.gz",
+        "my.report.v2.csv",
+        "README",
+        ".bashrc",
+        "some.dir/noext",
+        "unknown.zzz",
+    ],
+)
+def test_guess_content_type(name):
+    assert guess_content_type(name) == (
+        mimetypes.guess_file_type(name)[0] or "application/octet-stream"
+    )
+
+
+def test_directory_listing_from_object():
+    last_modified = datetime(2021, 10, 1, 12, tzinfo=timezone.utc)
+    file = directory_listing_from_object(
+        Object("test_workspace_id", "some/path/a.txt", last_modified, size=100)
+    )
+    assert file == File(
+        name="some/path/a.txt",
+        basename="a.txt",
+        path="some/path",
+        content_type="text/plain",
+        size=100,
+        last_modified=last_modified,
+    ).model_dump(by_alias=True)
+    directory = directory_listing_from_object(
+        Object("test_workspace_id", "some/path/subdir/")
+    )
+    assert directory == Directory(name="subdir", path="some/path/subdir").model_dump(
+        by_alias=True
+    )
+
+
+@pytest.mark.parametrize("count", [0, 1, 5, 6])
+def test_directory_listing_json(count):
+    models = [
+        (
+            File(
+                name=f"file-{i}.txt",
+                basename=f"file-{i}.txt",
+                path="",
+                content_type="text/plain",
+                size=i,
+                last_modified=datetime(2021, 10, 1, 12, 0, i, 500, tzinfo=timezone.utc),
+            )
+            if i % 2
+            else Directory(name=f"dir-{i}", path=f"dir-{i}")
+        )
+        for i in range(count)
+    ]
+    entries = [
+        (
+            file_entry(model.name, model.size, model.last_modified, model.content_type)
+            if isinstance(model, File)
+            else directory_entry(model.path)
+        )
+        for model in models
+    ]
+    body = b"".join(directory_listing_json(entries, batch_size=2))
+    assert json.loads(body) == jsonable_encoder(models)
+    body = b"".join(directory_listing_json(models, batch_size=2))
+    assert json.loads(body) == jsonable_encoder(models)
@@ -0,0 +1,68 @@
+import io
+import zipfile
+
+import pytest
+from src.repositories.files.archive import zip_directory
+from src.repositories.files.memory import InMemoryFileRepository, InMemoryStore
+
+
+@pytest.fixture
+def store():
+    store = InMemoryStore()
+    store.put("test_workspace_id", "some/a.txt", b"a" * 10)
+    store.put("test_workspace_id", "some/path/b.bin", bytes(range(256)) * 40)
+    store.put("test_workspace_id", "some/path/empty.txt", b"")
+    store.put("test_workspace_id", "other.txt", b"other")
+    yield store
+
+
+async def read_archive(chunks) -> dict[str, bytes]:
+    data = b"".join([chunk async for chunk in chunks])
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        assert archive.testzip() is None
+        return {name: archive.read(name) for name in archive.namelist()}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("read_ahead_bytes", [1, 1024 * 1024])
+async def test_zip_directory(mocker, store, read_ahead_bytes):
+    repository = InMemoryFileRepository(
+        store, mocker.MagicMock(), download_chunk_size=1000
+    )
+    files = await read_archive(
+        zip_directory(
+            repository,
+            "test_workspace_id",
+            "some",
+            read_ahead_files=2,
+            read_ahead_bytes=read_ahead_bytes,
+        )
+    )
+    assert files == {
+        "a.txt": b"a" * 10,
+        "path/b.bin": bytes(range(256)) * 40,
+        "path/empty.txt": b"",
+    }
+
+    files = await read_archive(zip_directory(repository, "test_workspace_id"))
+    assert sorted(files) == [
+        "other.txt",
+        "some/a.txt",
+        "some/path/b.bin",
+        "some/path/empty.txt",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_zip_directory_bounds_read_ahead(mocker, store):
+    repository = InMemoryFileRepository(
+        store, mocker.MagicMock(), download_chunk_size=100
+    )
+    download_file = mocker.spy(repository, "download_file")
+    chunks = zip_directory(
+        repository, "test_workspace_id", read_ahead_files=1, read_ahead_bytes=200
+    )
+    await anext(chunks)
+    # The file being written, and the one after it
+    assert download_file.call_count <= 2
+    await chunks.aclose()
@@ -0,0 +1,153 @@
+import io
+
+import pytest
+from fastapi import UploadFile
+from src.models.file import Directory, DirectoryListingPage, DirectoryUsage
+from src.repositories.files.base import FileRepository
+from src.repositories.files.cache import (
+    CachingFileRepository,
+    ListingCache,
+    parent_directories,
+)
+
+
+@pytest.fixture
+def mock_file_repository(mocker):
+    repository = mocker.MagicMock(spec=FileRepository)
+    repository.stat = mocker.AsyncMock(
+        side_effect=lambda workspace_id, path, **kwargs: DirectoryListingPage(
+            [Directory(name="subdir", path=f"{path}/subdir")]
+        )
+    )
+    yield repository
+
+
+def test_parent_directories():
+    assert parent_directories("a/b/c.txt") == ["a/b", "a", ""]
+    assert parent_directories("/a/") == [""]
+    assert parent_directories("") == []
+
+
+@pytest.mark.asyncio
+async def test_stat_cached(mock_file_repository):
+    cache = ListingCache(max_entries=10, ttl=60)
+    repository = CachingFileRepository(mock_file_repository, cache)
+    first = await repository.stat("test_workspace_id", "some/path")
+    second = await repository.stat("test_workspace_id", "some/path/")
+    assert first is second
+    mock_file_repository.stat.assert_called_once()
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+@pytest.mark.asyncio
+async def test_stat_pages_cached_separately(mock_file_repository):
+    cache = ListingCache(max_entries=10, ttl=60)
+    repository = CachingFileRepository(mock_file_repository, cache)
+    await repository.stat("test_workspace_id", "a", limit=1)
+    await repository.stat("test_workspace_id", "a", limit=1, start_after="a/b")
+    assert mock_file_repository.stat.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_stat_evicts_least_recently_used(mock_file_repository):
+    cache = ListingCache(max_entries=2, ttl=60)
+    repository = CachingFileRepository(mock_file_repository, cache)
+    await repository.stat("test_workspace_id", "a")
+    await repository.stat("test_workspace_id", "b")
+    await repository.stat("test_workspace_id", "a")
+    await repository.stat("test_workspace_id", "c")
+    assert cache.evictions == 1
+    await repository.stat("test_workspace_id", "a")
+    await repository.stat("test_workspace_id", "b")
+    assert mock_file_repository.stat.call_count == 4
+
+
+@pytest.mark.asyncio
+async def test_stat_expires(mocker, mock_file_repository):
+    now = mocker.patch("src.repositories.files.cache.time.monotonic")
+    now.return_value = 0
+    cache = ListingCache(max_entries=10, ttl=5)
+    repository = CachingFileRepository(mock_file_repository, cache)
+    await repository.stat("test_workspace_id", "a")
+    now.return_value = 6
+    await repository.stat("test_workspace_id", "a")
+    assert cache.expirations == 1
+    assert mock_file_repository.stat.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_upload_invalidates_parents(mock_file_repository):
+    cache = ListingCache(max_entries=10, ttl=60)
+    repository = CachingFileRepository(mock_file_repository, cache)
+    for path in (None, "a", "a/b", "a/b/c", "x"):
+        await repository.stat("test_workspace_id", path)
+    await repository.upload_file(
+        "test_workspace_id",
+        [UploadFile(io.BytesIO(b""), filename="file.txt")],
+        "a/b",
+    )
+    for path in (None, "a", "a/b", "a/b/c", "x"):
+        await repository.stat("test_workspace_id", path)
+    assert cache.invalidations == 3
+    assert mock_file_repository.stat.call_count == 8
+
+
+@pytest.mark.asyncio
+async def test_delete_directory_invalidates_subdirectories(mock_file_repository):
+    cache = ListingCache(max_entries=10, ttl=60)
+    repository = CachingFileRepository(mock_file_repository, cache)
+    for path in ("a", "a/b", "a/b/c", "a/bc", "other"):
+        await repository.stat("test_workspace_id", path)
+    await repository.stat("other_workspace_id", "a/b")
+    await repository.delete_directory("test_workspace_id", "a/b")
+    assert cache.get(("test_workspace_id", "a/b", None, None)) is None
+    assert cache.get(("test_workspace_id", "a/b/c", None, None)) is None
+    assert cache.get(("test_workspace_id", "a", None, None)) is None
+    assert cache.get(("test_workspace_id", "a/bc", None, None)) is not None
+    assert cache.get(("other_workspace_id", "a/b", None, None)) is not None
+
+
+@pytest.mark.asyncio
+async def test_move_invalidates_source_and_target(mock_file_repository):
+    cache = ListingCache(max_entries=10, ttl=60)
+    repository = CachingFileRepository(mock_file_repository, cache)
+    await repository.stat("test_workspace_id", "a")
+    await repository.stat("target_workspace_id", "b")
+    await repository.move_file(
+        "test_workspace_id", "a/f.txt", "b/f.txt", "target_workspace_id"
+    )
+    mock_file_repository.move_file.assert_called_once_with(
+        "test_workspace_id", "a/f.txt", "b/f.txt", "target_workspace_id"
+    )
+    assert cache.get(("test_workspace_id", "a", None, None)) is None
+    assert cache.get(("target_workspace_id", "b", None, None)) is None
+
+
+@pytest.mark.asyncio
+async def test_stat_racing_write_is_not_cached(mocker, mock_file_repository):
+    cache = ListingCache(max_entries=10, ttl=60)
+    repository = CachingFileRepository(mock_file_repository, cache)
+
+    async def stat_during_write(workspace_id, path, **kwargs):
+        cache.invalidate_parents(workspace_id, f"{path}/new.txt")
+        return DirectoryListingPage([])
+
+    mock_file_repository.stat = mocker.AsyncMock(side_effect=stat_during_write)
+    await repository.stat("test_workspace_id", "a")
+    assert cache.stats().entries == 0
+
+
+@pytest.mark.asyncio
+async def test_usage_invalidated_by_writes_below(mock_file_repository):
+    cache = ListingCache(max_entries=10, ttl=60)
+    repository = CachingFileRepository(mock_file_repository, cache)
+    for path in ("", "a", "a/b", "other"):
+        cache.put_usage(
+            "test_workspace_id", path, DirectoryUsage(path=path), cache.epoch
+        )
+    assert cache.get_usage("test_workspace_id", "/a/") is not None
+    await repository.delete_file("test_workspace_id", "a/b/f.txt")
+    assert cache.get_usage("test_workspace_id", "") is None
+    assert cache.get_usage("test_workspace_id", "a") is None
+    assert cache.get_usage("test_workspace_id", "a/b") is None
+    assert cache.get_usage("test_workspace_id", "other") is not None
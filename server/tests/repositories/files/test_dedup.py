@@ -0,0 +1,86 @@
+import io
+
+import pytest
+from fastapi import UploadFile
+from src.models.file import UploadStatus
+from src.repositories.files.dedup import (
+    ContentIndex,
+    DeduplicatingFileRepository,
+    hash_file,
+)
+from src.repositories.files.memory import InMemoryFileRepository, InMemoryStore
+
+
+@pytest.fixture
+def store():
+    store = InMemoryStore()
+    store.workspace("first_workspace_id")
+    store.workspace("second_workspace_id")
+    yield store
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = ContentIndex(str(tmp_path / "content-index.sqlite3"))
+    yield index
+    index.close()
+
+
+@pytest.fixture
+def backend(mocker, store):
+    yield InMemoryFileRepository(store, mocker.MagicMock())
+
+
+@pytest.fixture
+def repository(mocker, backend, index):
+    yield DeduplicatingFileRepository(backend, index, mocker.MagicMock(), min_size=4)
+
+
+async def upload(repository, workspace_id, data, filename="a.bin", path="some"):
+    return await repository.upload_file(
+        workspace_id, [UploadFile(io.BytesIO(data), filename=filename)], path
+    )
+
+
+@pytest.mark.asyncio
+async def test_upload_copies_stored_content(mocker, repository, backend, store, index):
+    upload_file = mocker.spy(backend, "upload_file")
+    copy_file = mocker.spy(backend, "copy_file")
+
+    await upload(repository, "first_workspace_id", b"content")
+    [result] = await upload(repository, "second_workspace_id", b"content", "b.bin")
+    assert result.status == UploadStatus.UPLOADED
+    assert result.size == 7
+    assert upload_file.call_count == 1
+    copy_file.assert_awaited_once_with(
+        "first_workspace_id", "some/a.bin", "some/b.bin", "second_workspace_id"
+    )
+    assert (
+        store.workspace("second_workspace_id").objects["some/b.bin"].data == b"content"
+    )
+
+    # Too small to look up
+    await upload(repository, "second_workspace_id", b"abc", "c.bin")
+    await upload(repository, "first_workspace_id", b"abc", "c.bin")
+    assert upload_file.call_count == 3
+
+    stats = await index.stats()
+    assert (stats.entries, stats.hits, stats.misses) == (2, 1, 1)
+    assert stats.bytes_saved == 7
+
+
+@pytest.mark.asyncio
+async def test_upload_skips_replaced_content(mocker, repository, backend, store, index):
+    copy_file = mocker.spy(backend, "copy_file")
+    await upload(repository, "first_workspace_id", b"content")
+    store.put("first_workspace_id", "some/a.bin", b"changed")
+
+    [result] = await upload(repository, "second_workspace_id", b"content")
+    assert result.status == UploadStatus.UPLOADED
+    copy_file.assert_not_awaited()
+    assert (
+        store.workspace("second_workspace_id").objects["some/a.bin"].data == b"content"
+    )
+    # The replaced file was dropped, and the new one recorded in its place
+    [stored] = await index.lookup(hash_file(io.BytesIO(b"content")), 7)
+    assert (stored.workspace_id, stored.name) == ("second_workspace_id", "some/a.bin")
@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+from src.models.file import ByteRange
+from src.repositories.files.download_cache import (
+    DownloadCache,
+    DownloadCachingFileRepository,
+)
+from src.repositories.files.memory import InMemoryFileRepository, InMemoryStore
+
+
+@pytest.fixture
+def store():
+    store = InMemoryStore()
+    store.put("test_workspace_id", "some/a.txt", b"a" * 10)
+    store.put("test_workspace_id", "some/b.txt", b"b" * 10)
+    store.put("test_workspace_id", "large.bin", bytes(100))
+    yield store
+
+
+@pytest.fixture
+def backend(mocker, store):
+    yield InMemoryFileRepository(store, mocker.MagicMock(), download_chunk_size=4)
+
+
+async def read(repository, path, byte_range=None):
+    download = await repository.download_file("test_workspace_id", path, byte_range)
+    content = b"".join([chunk async for chunk in download.content])
+    download.release()
+    # Let the removal of dropped files finish
+    await asyncio.sleep(0.01)
+    return content
+
+
+@pytest.mark.asyncio
+async def test_download_read_through(mocker, backend, tmp_path):
+    cache = DownloadCache(str(tmp_path), max_bytes=1000, max_file_size=50)
+    repository = DownloadCachingFileRepository(backend, cache, download_chunk_size=4)
+    download_file = mocker.spy(backend, "download_file")
+
+    assert await read(repository, "some/a.txt") == b"a" * 10
+    assert await read(repository, "some/a.txt") == b"a" * 10
+    assert await read(repository, "some/a.txt", ByteRange(8, None)) == b"aa"
+    assert download_file.call_count == 1
+    assert len(list(tmp_path.iterdir())) == 1
+
+    # Too large to cache
+    await read(repository, "large.bin")
+    await read(repository, "large.bin")
+    assert download_file.call_count == 3
+
+    stats = cache.stats()
+    assert (stats.hits, stats.misses) == (2, 1)
+    assert stats.bytes == 10
+    assert stats.bytes_saved == 12
+
+
+@pytest.mark.asyncio
+async def test_download_cache_evicts_least_recently_used(backend, tmp_path):
+    cache = DownloadCache(str(tmp_path), max_bytes=15, max_file_size=15)
+    repository = DownloadCachingFileRepository(backend, cache)
+
+    await read(repository, "some/a.txt")
+    await read(repository, "some/b.txt")
+    assert cache.stats().evictions == 1
+    assert cache.stats().bytes == 10
+    assert len(list(tmp_path.iterdir())) == 1
+
+    await read(repository, "some/b.txt")
+    assert cache.stats().hits == 1
+
+
+@pytest.mark.asyncio
+async def test_download_cache_invalidated_by_writes(store, backend, tmp_path):
+    cache = DownloadCache(str(tmp_path), max_bytes=1000, max_file_size=50)
+    repository = DownloadCachingFileRepository(backend, cache)
+
+    await read(repository, "some/a.txt")
+    await read(repository, "some/b.txt")
+    await repository.delete_file("test_workspace_id", "some/a.txt")
+    assert cache.stats().entries == 1
+
+    # A file replaced behind the cache's back has a new entity tag
+    store.put("test_workspace_id", "some/b.txt", b"new")
+    assert await read(repository, "some/b.txt") == b"new"
+    assert cache.stats().entries == 1
+    assert len(list(tmp_path.iterdir())) == 1
+
+    await repository.delete_directory("test_workspace_id", "some")
+    await asyncio.sleep(0.01)
+    assert cache.stats().entries == 0
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_download_cache_skips_incomplete_downloads(backend, tmp_path):
+    cache = DownloadCache(str(tmp_path), max_bytes=1000, max_file_size=50)
+    repository = DownloadCachingFileRepository(backend, cache, download_chunk_size=4)
+
+    download = await repository.download_file("test_workspace_id", "some/a.txt")
+    assert await anext(download.content) == b"aaaa"
+    await download.content.aclose()
+    await asyncio.sleep(0.01)
+    assert cache.stats().entries == 0
+    assert list(tmp_path.iterdir()) == []
+
+    assert await read(repository, "some/a.txt") == b"a" * 10
+    assert cache.stats().entries == 1
@@ -0,0 +1,190 @@
+import asyncio
+import io
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import UploadFile
+from src.repositories.files.forwarding import ForwardingFileRepository
+from src.repositories.files.index import IndexingFileRepository, MetadataIndex
+from src.repositories.files.memory import (
+    InMemoryFileRepository,
+    InMemoryStore,
+    StoredObject,
+)
+
+
+@pytest.fixture
+def store():
+    store = InMemoryStore()
+    for name, size in [
+        ("docs/", 0),
+        ("docs/Report.PDF", 300),
+        ("docs/notes.txt", 10),
+        ("docs/old/report-2020.pdf", 200),
+        ("images/photo.jpg", 5000),
+        ("readme.md", 20),
+    ]:
+        store.put("test_workspace_id", name, bytes(size))
+    store.workspace("test_workspace_id").put(
+        "docs/old/report-2020.pdf",
+        StoredObject(
+            data=bytes(200),
+            content_type="application/pdf",
+            etag='"old"',
+            last_modified=datetime(2020, 1, 1, tzinfo=timezone.utc),
+        ),
+    )
+    yield store
+
+
+@pytest.fixture
+def index(mocker, tmp_path):
+    index = MetadataIndex(str(tmp_path), mocker.MagicMock())
+    yield index
+    index.close()
+
+
+async def names(index, **filters):
+    page = await index.search("test_workspace_id", **filters)
+    return [entry["name"] for entry in page.entries]
+
+
+@pytest.mark.asyncio
+async def test_search(mocker, store, index):
+    repository = InMemoryFileRepository(store, mocker.MagicMock())
+    assert not index.indexed("test_workspace_id")
+    await index.ensure("test_workspace_id", repository)
+    assert index.indexed("test_workspace_id")
+    assert index.workspaces() == ["test_workspace_id"]
+
+    assert await names(index, name="report") == [
+        "docs/Report.PDF",
+        "docs/old/report-2020.pdf",
+    ]
+    assert await names(index, extension="pdf", path="docs/old") == [
+        "docs/old/report-2020.pdf"
+    ]
+    assert await names(index, glob="*.jpg") == ["images/photo.jpg"]
+    assert await names(index, min_size=100, max_size=300) == [
+        "docs/Report.PDF",
+        "docs/old/report-2020.pdf",
+    ]
+    assert await names(index, modified_before=1600000000000) == [
+        "docs/old/report-2020.pdf"
+    ]
+    assert await names(index, name="_") == []
+
+    page = await index.search("test_workspace_id", limit=2)
+    assert page.next_start_after == "docs/notes.txt"
+    page = await index.search(
+        "test_workspace_id", limit=10, start_after=page.next_start_after
+    )
+    assert [entry["name"] for entry in page.entries] == [
+        "docs/old/report-2020.pdf",
+        "images/photo.jpg",
+        "readme.md",
+    ]
+    assert page.entries[0]["size"] == 200
+    assert page.entries[0]["contentType"] == "application/pdf"
+
+
+@pytest.mark.asyncio
+async def test_index_kept_current(mocker, store, index):
+    backend = InMemoryFileRepository(store, mocker.MagicMock())
+    repository = IndexingFileRepository(backend, index, mocker.MagicMock())
+    await index.ensure("test_workspace_id", backend)
+
+    await repository.upload_file(
+        "test_workspace_id",
+        [UploadFile(io.BytesIO(b"new"), filename="new.pdf")],
+        "docs",
+    )
+    await repository.move_file("test_workspace_id", "readme.md", "docs/readme.md")
+    await repository.delete_directory("test_workspace_id", "docs/old")
+    assert await names(index, path="docs") == [
+        "docs/Report.PDF",
+        "docs/new.pdf",
+        "docs/notes.txt",
+        "docs/readme.md",
+    ]
+
+    await repository.move_directory("test_workspace_id", "docs", "archive")
+    assert await names(index, extension="pdf") == [
+        "archive/Report.PDF",
+        "archive/new.pdf",
+    ]
+
+    # Changes made around the repository are picked up by reconciliation
+    store.workspaces["test_workspace_id"].remove("images/photo.jpg")
+    await index.reconcile("test_workspace_id", backend)
+    assert await names(index, path="images") == []
+
+
+@pytest.mark.asyncio
+async def test_usage(mocker, store, index):
+    await index.ensure(
+        "test_workspace_id", InMemoryFileRepository(store, mocker.MagicMock())
+    )
+    usage = await index.usage("test_workspace_id")
+    assert (usage.size, usage.count) == (5530, 5)
+    assert [
+        (directory.path, directory.size, directory.count)
+        for directory in usage.directories
+    ] == [("docs", 510, 3), ("images", 5000, 1)]
+
+    usage = await index.usage("test_workspace_id", "docs")
+    assert (usage.size, usage.count) == (510, 3)
+    assert [
+        (directory.path, directory.size, directory.count)
+        for directory in usage.directories
+    ] == [("docs/old", 200, 1)]
+
+
+class PausedWalk(ForwardingFileRepository):
+    """Lists every file, then waits before handing the listing over"""
+
+    def __init__(self, repository):
+        super().__init__(repository)
+        self.listed = asyncio.Event()
+        self.resume = asyncio.Event()
+
+    async def walk(self, workspace_id, path=None):
+        batches = [batch async for batch in self.repository.walk(workspace_id, path)]
+        self.listed.set()
+        await self.resume.wait()
+        for batch in batches:
+            yield batch
+
+
+@pytest.mark.asyncio
+async def test_index_kept_current_while_built(mocker, store, index):
+    backend = InMemoryFileRepository(store, mocker.MagicMock())
+    repository = IndexingFileRepository(backend, index, mocker.MagicMock())
+    walk = PausedWalk(backend)
+    build = asyncio.create_task(index.ensure("test_workspace_id", walk))
+    await walk.listed.wait()
+
+    await repository.upload_file(
+        "test_workspace_id",
+        [UploadFile(io.BytesIO(b"new"), filename="new.pdf")],
+        "docs",
+    )
+    await repository.upload_file(
+        "test_workspace_id",
+        [UploadFile(io.BytesIO(b"longer notes"), filename="notes.txt")],
+        "docs",
+    )
+    await repository.delete_file("test_workspace_id", "readme.md")
+    await repository.delete_directory("test_workspace_id", "docs/old")
+    walk.resume.set()
+    await build
+
+    assert await names(index) == [
+        "docs/Report.PDF",
+        "docs/new.pdf",
+        "docs/notes.txt",
+        "images/photo.jpg",
+    ]
+    # Not overwritten by the older listing
+    page = await index.search("test_workspace_id", name="notes")
+    assert page.entries[0]["size"] == 12
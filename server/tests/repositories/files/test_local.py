@@ -0,0 +1,245 @@
+import io
+import os
+
+import pytest
+from fastapi import HTTPException, UploadFile
+from src.models.file import ByteRange, CompletedPart, UploadStatus
+from src.repositories.files.local import (
+    FILE_MODE,
+    PARTIAL_PREFIX,
+    LocalFileRepository,
+)
+
+
+@pytest.fixture
+def repository(mocker, tmp_path):
+    (tmp_path / "test_workspace_id" / "some" / "path").mkdir(parents=True)
+    yield LocalFileRepository(str(tmp_path), mocker.MagicMock())
+
+
+@pytest.mark.asyncio
+async def test_stat_paginated(repository, tmp_path):
+    directory = tmp_path / "test_workspace_id" / "some"
+    (directory / "a.txt").write_bytes(b"a")
+    (directory / "c.txt").write_bytes(b"ccc")
+    (directory / f"{PARTIAL_PREFIX}b.txt").write_bytes(b"b")
+
+    page = await repository.stat("test_workspace_id", "some", limit=2)
+    assert [entry["name"] for entry in page.entries] == ["some/a.txt", "some/c.txt"]
+    assert page.entries[1]["size"] == 3
+    assert page.entries[1]["contentType"] == "text/plain"
+    assert page.next_start_after == "some/c.txt"
+
+    page = await repository.stat(
+        "test_workspace_id", "some", limit=2, start_after=page.next_start_after
+    )
+    assert page.entries == [{"type": "directory", "name": "path", "path": "some/path"}]
+    assert page.next_start_after is None
+
+
+@pytest.mark.asyncio
+async def test_stat_workspace_not_found(repository):
+    with pytest.raises(HTTPException) as error:
+        await repository.stat("../test_workspace_id")
+    assert error.value.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_upload_and_download_range(repository, tmp_path):
+    results = await repository.upload_file(
+        "test_workspace_id",
+        [UploadFile(io.BytesIO(b"hello world"), filename="hello.txt")],
+        "some/new",
+    )
+    assert results[0].status == UploadStatus.UPLOADED
+    assert results[0].size == 11
+    assert os.listdir(tmp_path / "test_workspace_id" / "some" / "new") == ["hello.txt"]
+
+    download = await repository.download_file(
+        "test_workspace_id", "some/new/hello.txt", ByteRange(None, 5)
+    )
+    assert b"".join([chunk async for chunk in download.content]) == b"world"
+    assert download.content_range == (6, 10)
+    assert download.size == 11
+    assert download.file_path == str(
+        tmp_path / "test_workspace_id" / "some" / "new" / "hello.txt"
+    )
+
+    with pytest.raises(HTTPException) as error:
+        await repository.download_file(
+            "test_workspace_id", "some/new/hello.txt", ByteRange(11, None)
+        )
+    assert error.value.status_code == 416
+    assert error.value.headers == {"Content-Range": "bytes */11"}
+
+
+@pytest.mark.asyncio
+async def test_move_directory(repository, tmp_path):
+    directory = tmp_path / "test_workspace_id" / "some" / "path"
+    (directory / "nested" / "empty").mkdir(parents=True)
+    (directory / "a.txt").write_bytes(b"a")
+    (directory / "nested" / "b.txt").write_bytes(b"bb")
+    totals = []
+
+    result = await repository.move_directory(
+        "test_workspace_id",
+        "some/path",
+        "other",
+        progress=lambda result: totals.append(result.copied),
+    )
+    assert result.copied == result.deleted == 2
+    assert result.bytes_copied == 3
+    assert sorted(totals) == [1, 2]
+    assert (
+        tmp_path / "test_workspace_id" / "other" / "nested" / "b.txt"
+    ).read_bytes() == b"bb"
+    assert not directory.exists()
+    assert (tmp_path / "test_workspace_id" / "other" / "nested" / "empty").is_dir()
+
+
+@pytest.mark.asyncio
+async def test_copy_directory(repository, tmp_path):
+    directory = tmp_path / "test_workspace_id" / "some" / "path"
+    (directory / "empty").mkdir()
+    (directory / "a.txt").write_bytes(b"a")
+
+    result = await repository.copy_directory("test_workspace_id", "some/path", "other")
+    assert result.copied == 1
+    assert (tmp_path / "test_workspace_id" / "other" / "a.txt").read_bytes() == b"a"
+    assert (tmp_path / "test_workspace_id" / "other" / "empty").is_dir()
+    assert (directory / "a.txt").exists()
+
+    with pytest.raises(HTTPException) as error:
+        await repository.copy_directory("test_workspace_id", "some/missing", "other")
+    assert error.value.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_delete_directory_keeps_partial_files(repository, tmp_path):
+    directory = tmp_path / "test_workspace_id" / "some" / "path"
+    (directory / "a.txt").write_bytes(b"a")
+    (directory / f"{PARTIAL_PREFIX}upload").write_bytes(b"b")
+
+    result = await repository.delete_directory("test_workspace_id", "some/path")
+    assert result.deleted == 1
+    assert [path.name for path in directory.iterdir()] == [f"{PARTIAL_PREFIX}upload"]
+
+
+@pytest.mark.asyncio
+async def test_delete_file_not_found(repository):
+    with pytest.raises(HTTPException) as error:
+        await repository.delete_file("test_workspace_id", "some/path")
+    assert error.value.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_head_file(repository, tmp_path):
+    (tmp_path / "test_workspace_id" / "some" / "a.txt").write_bytes(b"abc")
+
+    metadata = await repository.head_file("test_workspace_id", "some/a.txt")
+    download = await repository.download_file("test_workspace_id", "some/a.txt")
+    download.release()
+    assert metadata.size == 3
+    assert metadata.content_type == "text/plain"
+    assert (metadata.etag, metadata.last_modified) == (
+        download.etag,
+        download.last_modified,
+    )
+
+    with pytest.raises(HTTPException) as error:
+        await repository.head_file("test_workspace_id", "some/path")
+    assert error.value.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_download_directory_not_found(repository, tmp_path):
+    (tmp_path / "test_workspace_id" / "some" / "dir").mkdir(parents=True)
+
+    with pytest.raises(HTTPException) as error:
+        await repository.download_file("test_workspace_id", "some/dir")
+    assert error.value.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_upload_file_mode(repository, tmp_path):
+    file_path = tmp_path / "test_workspace_id" / "some" / "a.txt"
+
+    await repository.upload_file(
+        "test_workspace_id", [UploadFile(io.BytesIO(b"a"), filename="a.txt")], "some"
+    )
+    assert file_path.stat().st_mode & 0o777 == FILE_MODE
+
+    # A replaced file keeps its mode
+    file_path.chmod(0o640)
+    await repository.upload_file(
+        "test_workspace_id", [UploadFile(io.BytesIO(b"b"), filename="a.txt")], "some"
+    )
+    assert file_path.read_bytes() == b"b"
+    assert file_path.stat().st_mode & 0o777 == 0o640
+
+
+@pytest.mark.asyncio
+async def test_upload_session(repository, tmp_path):
+    session = await repository.create_upload("test_workspace_id", "some/big.bin")
+    # Parts can be sent in any order, and sent again
+    await repository.upload_part(
+        "test_workspace_id", "some/big.bin", session.upload_id, 2, b"world"
+    )
+    await repository.upload_part(
+        "test_workspace_id", "some/big.bin", session.upload_id, 1, b"hullo "
+    )
+    first = await repository.upload_part(
+        "test_workspace_id", "some/big.bin", session.upload_id, 1, b"hello "
+    )
+    parts = await repository.list_parts(
+        "test_workspace_id", "some/big.bin", session.upload_id
+    )
+    assert [(part.part_number, part.size) for part in parts] == [(1, 6), (2, 5)]
+    assert parts[0].etag == first.etag
+    assert await repository.list_uploads("test_workspace_id", "some/") == [session]
+
+    # Parts in flight are not files of the workspace
+    page = await repository.stat("test_workspace_id", "some")
+    assert [entry["path"] for entry in page.entries] == ["some/path"]
+
+    result = await repository.complete_upload(
+        "test_workspace_id", "some/big.bin", session.upload_id
+    )
+    assert result.size == 11
+    assert (tmp_path / "test_workspace_id" / "some" / "big.bin").read_bytes() == (
+        b"hello world"
+    )
+    assert await repository.list_uploads("test_workspace_id") == []
+    with pytest.raises(HTTPException) as error:
+        await repository.list_parts(
+            "test_workspace_id", "some/big.bin", session.upload_id
+        )
+    assert error.value.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_upload_session_aborted(repository):
+    session = await repository.create_upload("test_workspace_id", "a.bin")
+    part = await repository.upload_part(
+        "test_workspace_id", "a.bin", session.upload_id, 1, b"a"
+    )
+    with pytest.raises(HTTPException) as error:
+        await repository.complete_upload(
+            "test_workspace_id",
+            "a.bin",
+            session.upload_id,
+            [CompletedPart(part_number=1, etag='"stale"')],
+        )
+    assert error.value.status_code == 400
+    # The upload is only found under the path it was started for
+    with pytest.raises(HTTPException):
+        await repository.abort_upload("test_workspace_id", "b.bin", session.upload_id)
+
+    stale = await repository.create_upload("test_workspace_id", "b.bin")
+    assert await repository.abort_stale_uploads(stale.initiated) == 1
+    assert [
+        upload.upload_id
+        for upload in await repository.list_uploads("test_workspace_id")
+    ] == [stale.upload_id]
+    await repository.abort_upload("test_workspace_id", "b.bin", stale.upload_id)
+    assert await repository.list_uploads("test_workspace_id") == []
@@ -0,0 +1,76 @@
+import io
+import time
+
+import pytest
+from fastapi import HTTPException, UploadFile
+from src.models.file import ByteRange
+from src.repositories.files.memory import InMemoryFileRepository, InMemoryStore
+
+
+@pytest.fixture
+def store():
+    store = InMemoryStore()
+    for name in [
+        "some/path/",
+        "some/path/a.txt",
+        "some/path/nested/b.txt",
+        "some/path/nested/c.txt",
+        "some/path/z.txt",
+        "some/pathology.txt",
+    ]:
+        store.put("test_workspace_id", name, b"data")
+    yield store
+
+
+@pytest.mark.asyncio
+async def test_stat_paginated(mocker, store):
+    repository = InMemoryFileRepository(store, mocker.MagicMock())
+    page = await repository.stat("test_workspace_id", "some/path", limit=2)
+    assert [entry["name"] for entry in page.entries] == ["some/path/a.txt", "nested"]
+    assert page.next_start_after == "some/path/nested/"
+
+    page = await repository.stat(
+        "test_workspace_id", "some/path", limit=2, start_after=page.next_start_after
+    )
+    assert [entry["name"] for entry in page.entries] == ["some/path/z.txt"]
+    assert page.next_start_after is None
+
+
+@pytest.mark.asyncio
+async def test_injected_latency(mocker, store):
+    repository = InMemoryFileRepository(store, mocker.MagicMock(), latency=0.05)
+    start = time.perf_counter()
+    await repository.upload_file(
+        "test_workspace_id",
+        [UploadFile(io.BytesIO(b"hello world"), filename="hello.txt")],
+        "other",
+    )
+    download = await repository.download_file(
+        "test_workspace_id", "other/hello.txt", ByteRange(6, None)
+    )
+    assert time.perf_counter() - start >= 0.1
+    assert b"".join([chunk async for chunk in download.content]) == b"world"
+    assert download.content_range == (6, 10)
+
+
+@pytest.mark.asyncio
+async def test_delete_directory(mocker, store):
+    repository = InMemoryFileRepository(store, mocker.MagicMock())
+    result = await repository.delete_directory("test_workspace_id", "some/path")
+    assert result.deleted == 5
+    assert store.workspace("test_workspace_id").names == ["some/pathology.txt"]
+    with pytest.raises(HTTPException) as error:
+        await repository.delete_file("test_workspace_id", "some/path/a.txt")
+    assert error.value.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_workspace_not_found(mocker, store):
+    repository = InMemoryFileRepository(store, mocker.MagicMock())
+    with pytest.raises(HTTPException) as error:
+        await repository.stat("missing_workspace_id")
+    assert error.value.status_code == 404
+    with pytest.raises(HTTPException) as error:
+        [batch async for batch in repository.walk("missing_workspace_id")]
+    assert error.value.status_code == 404
+    assert list(store.workspaces) == ["test_workspace_id"]
@@ -0,0 +1,55 @@
+import io
+
+import pytest
+from fastapi import HTTPException, UploadFile
+from prometheus_client import REGISTRY
+from src.repositories.files.memory import InMemoryFileRepository, InMemoryStore
+from src.repositories.files.metrics import InstrumentedFileRepository
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+@pytest.mark.asyncio
+async def test_records_operations_and_bytes(mocker):
+    repository = InstrumentedFileRepository(
+        InMemoryFileRepository(InMemoryStore(), mocker.MagicMock()), "test_backend"
+    )
+    operation = "filemanager_storage_operation_duration_seconds_count"
+    ok_uploads = sample(
+        operation, backend="test_backend", operation="upload_file", outcome="ok"
+    )
+    failed_deletes = sample(
+        operation, backend="test_backend", operation="delete_file", outcome="error"
+    )
+    received = sample(
+        "filemanager_storage_bytes_received_total", workspace="metrics_ws"
+    )
+    sent = sample("filemanager_storage_bytes_sent_total", workspace="metrics_ws")
+
+    await repository.upload_file(
+        "metrics_ws", [UploadFile(io.BytesIO(b"hello world"), filename="hello.txt")]
+    )
+    await repository.download_file("metrics_ws", "hello.txt")
+    with pytest.raises(HTTPException):
+        await repository.delete_file("metrics_ws", "missing.txt")
+
+    assert (
+        sample(operation, backend="test_backend", operation="upload_file", outcome="ok")
+        == ok_uploads + 1
+    )
+    assert (
+        sample(
+            operation, backend="test_backend", operation="delete_file", outcome="error"
+        )
+        == failed_deletes + 1
+    )
+    assert (
+        sample("filemanager_storage_bytes_received_total", workspace="metrics_ws")
+        == received + 11
+    )
+    assert (
+        sample("filemanager_storage_bytes_sent_total", workspace="metrics_ws")
+        == sent + 11
+    )
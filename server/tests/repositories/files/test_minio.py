@@ -1,8 +1,24 @@
+import io
+import threading
+import time
+import tracemalloc
+import urllib.parse
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
 import pytest
+from fastapi import HTTPException, UploadFile
 from minio import Minio
-from minio.datatypes import Object
+from minio.datatypes import Bucket, Object, Part
+from minio.deleteobjects import DeleteError
 from minio.error import S3Error
-from src.models.file import directory_listing_from_object
+from src.models.file import (
+    ByteRange,
+    PresignMethod,
+    UploadStatus,
+    directory_listing_from_object,
+)
 from src.repositories.files.minio import MinioFileRepository
 
 
@@ -31,17 +47,23 @@ async def test_stat_successful(
             last_modified="2021-10-01T12:00:00Z",
         ),
     ]
-    test_client.list_objects = mocker.MagicMock(return_value=mock_response)
+    test_client._list_objects = mocker.MagicMock(return_value=iter(mock_response))
     repository = MinioFileRepository(test_client, None)
     response = await repository.stat("test_workspace_id", "some/path")
-    test_client.list_objects.assert_called_once_with(
-        "test_workspace_id", prefix="some/path/"
+    test_client._list_objects.assert_called_once_with(
+        "test_workspace_id",
+        delimiter="/",
+        encoding_type="url",
+        max_keys=None,
+        prefix="some/path/",
+        start_after=None,
     )
-    assert response == [
+    assert response.entries == [
         directory_listing_from_object(obj)
         for obj in mock_response
         if obj.object_name != "some/path/"
     ]
+    assert response.next_start_after is None
 
 
 @pytest.mark.asyncio
@@ -49,7 +71,7 @@ async def test_stat_failure(
     mocker,
     test_client,
 ):
-    test_client.list_objects = mocker.MagicMock(
+    test_client._list_objects = mocker.MagicMock(
         side_effect=S3Error(
             None,
             None,
@@ -62,6 +84,446 @@ async def test_stat_failure(
     repository = MinioFileRepository(test_client, None)
     with pytest.raises(S3Error):
         await repository.stat("test_workspace_id", "some/path")
-        test_client.list_objects.assert_called_once_with(
-            "test_workspace_id", prefix="some/path/"
+        test_client._list_objects.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_download_file_range(
+    mocker,
+    test_client,
+):
+    mock_response = mocker.MagicMock()
+    mock_response.headers = {
+        "Content-Type": "text/plain",
+        "Content-Length": "5",
+        "Content-Range": "bytes 5-9/10",
+        "ETag": '"abc"',
+        "Last-Modified": "Fri, 01 Oct 2021 12:00:00 GMT",
+    }
+    mock_response.stream = mocker.MagicMock(return_value=iter([b"567", b"89"]))
+    test_client.get_object = mocker.MagicMock(return_value=mock_response)
+    repository = MinioFileRepository(test_client, None, download_chunk_size=3)
+    download = await repository.download_file(
+        "test_workspace_id", "some/path/test_file.txt", ByteRange(5, 9)
+    )
+    test_client.get_object.assert_called_once_with(
+        "test_workspace_id", "some/path/test_file.txt", offset=5, length=5
+    )
+    test_client.stat_object.assert_not_called()
+    assert download.filename == "test_file.txt"
+    assert download.content_range == (5, 9)
+    assert download.size == 10
+    assert download.etag == '"abc"'
+    assert [chunk async for chunk in download.content] == [b"567", b"89"]
+    mock_response.stream.assert_called_once_with(3)
+    mock_response.release_conn.assert_called()
+
+
+@pytest.mark.asyncio
+async def test_download_file_suffix_range(
+    mocker,
+    test_client,
+):
+    test_client.get_object = mocker.MagicMock()
+    test_client.get_object.return_value.headers = {}
+    repository = MinioFileRepository(test_client, None)
+    await repository.download_file(
+        "test_workspace_id", "test_file.txt", ByteRange(None, 500)
+    )
+    test_client.get_object.assert_called_once_with(
+        "test_workspace_id",
+        "test_file.txt",
+        request_headers={"Range": "bytes=-500"},
+    )
+
+
+@pytest.mark.asyncio
+async def test_stat_paginated(
+    mocker,
+    test_client,
+):
+    names = ["a/b/", "a/c.txt", "a/d/", "a/e.txt"]
+    mock_response = [
+        Object(
+            bucket_name="test_workspace_id",
+            object_name=name,
+            size=1,
+            last_modified="2021-10-01T12:00:00Z",
+            content_type="text/plain",
+        )
+        for name in names
+    ]
+    # Keys nested in the directory named by start_after roll up into it again
+    test_client._list_objects = mocker.MagicMock(
+        return_value=iter([mock_response[0], *mock_response[1:]])
+    )
+    repository = MinioFileRepository(test_client, None)
+    response = await repository.stat(
+        "test_workspace_id", "a", limit=2, start_after="a/b/"
+    )
+    test_client._list_objects.assert_called_once_with(
+        "test_workspace_id",
+        delimiter="/",
+        encoding_type="url",
+        max_keys=3,
+        prefix="a/",
+        start_after="a/b/",
+    )
+    assert [entry["name"] for entry in response.entries] == ["a/c.txt", "d"]
+    assert response.next_start_after == "a/d/"
+
+
+class ZeroStream(io.RawIOBase):
+    """A readable stream of zeros that is never held in memory as a whole"""
+
+    def __init__(self, size: int):
+        self.remaining = size
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        size = self.remaining if size < 0 else min(size, self.remaining)
+        self.remaining -= size
+        return bytes(size)
+
+
+class MultipartClient:
+    """Records multipart calls without keeping the uploaded parts alive"""
+
+    def __init__(self):
+        self.parts: list[tuple[int, int]] = []
+        self.completed: list[Part] | None = None
+        self.aborted = False
+
+    def _create_multipart_upload(self, bucket_name, object_name, headers):
+        return "upload-id"
+
+    def _upload_part(self, bucket_name, object_name, data, headers, upload_id, n):
+        time.sleep(0.01)
+        self.parts.append((n, len(data)))
+        return f"etag-{n}"
+
+    def _complete_multipart_upload(self, bucket_name, object_name, upload_id, parts):
+        self.completed = parts
+
+    def _abort_multipart_upload(self, bucket_name, object_name, upload_id):
+        self.aborted = True
+
+
+@pytest.mark.asyncio
+async def test_upload_file_small(
+    mocker,
+    test_client,
+):
+    repository = MinioFileRepository(test_client, mocker.MagicMock())
+    await repository.upload_file(
+        "test_workspace_id",
+        [UploadFile(io.BytesIO(b"hello"), size=5, filename="test_file.txt")],
+        "some/path",
+    )
+    test_client.put_object.assert_called_once_with(
+        "test_workspace_id",
+        "some/path/test_file.txt",
+        mocker.ANY,
+        length=5,
+        content_type="application/octet-stream",
+    )
+    test_client._create_multipart_upload.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_upload_file_multipart_bounded_memory(mocker):
+    part_size = 5 * 1024 * 1024
+    parallelism = 2
+    size = 12 * part_size + 123
+    client = MultipartClient()
+    repository = MinioFileRepository(
+        client,
+        mocker.MagicMock(),
+        upload_part_size=part_size,
+        upload_parallelism=parallelism,
+    )
+    tracemalloc.start()
+    try:
+        await repository.upload_file(
+            "test_workspace_id",
+            [UploadFile(ZeroStream(size), filename="large.bin")],
+        )
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert sorted(client.parts) == [(n, part_size) for n in range(1, 13)] + [(13, 123)]
+    assert [part.part_number for part in client.completed] == list(range(1, 14))
+    assert not client.aborted
+    assert peak < parallelism * part_size + 1024 * 1024
+
+
+@pytest.mark.asyncio
+async def test_upload_file_multipart_aborts_on_failure(mocker):
+    client = MultipartClient()
+    client._upload_part = mocker.MagicMock(
+        side_effect=S3Error(None, None, None, None, None, None)
+    )
+    repository = MinioFileRepository(
+        client, mocker.MagicMock(), upload_part_size=5 * 1024 * 1024
+    )
+    [result] = await repository.upload_file(
+        "test_workspace_id",
+        [UploadFile(ZeroStream(6 * 1024 * 1024), filename="large.bin")],
+    )
+    assert result.status == UploadStatus.FAILED
+    assert client.aborted
+    assert client.completed is None
+
+
+@pytest.mark.asyncio
+async def test_upload_file_concurrent_partial_failure(
+    mocker,
+    test_client,
+):
+    in_flight = 0
+    max_in_flight = 0
+    lock = threading.Lock()
+
+    def put_object(bucket_name, object_name, data, length, content_type):
+        nonlocal in_flight, max_in_flight
+        with lock:
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+        time.sleep(0.05)
+        with lock:
+            in_flight -= 1
+        if object_name == "file-3.txt":
+            raise S3Error(None, None, None, None, None, None)
+
+    test_client.put_object = mocker.MagicMock(side_effect=put_object)
+    repository = MinioFileRepository(
+        test_client,
+        mocker.MagicMock(),
+        ThreadPoolExecutor(max_workers=8),
+        upload_concurrency=3,
+    )
+    results = await repository.upload_file(
+        "test_workspace_id",
+        [
+            UploadFile(io.BytesIO(b"hello"), size=5, filename=f"file-{i}.txt")
+            for i in range(10)
+        ],
+    )
+    assert [result.name for result in results] == [f"file-{i}.txt" for i in range(10)]
+    assert [result.status for result in results] == [UploadStatus.UPLOADED] * 3 + [
+        UploadStatus.FAILED
+    ] + [UploadStatus.UPLOADED] * 6
+    assert max_in_flight == 3
+
+
+@pytest.mark.asyncio
+async def test_delete_directory_batched(
+    mocker,
+    test_client,
+):
+    count = 2500
+    test_client.list_objects = mocker.MagicMock(
+        return_value=(
+            Object(bucket_name="test_workspace_id", object_name=f"some/path/{i}")
+            for i in range(count)
+        )
+    )
+    batches = []
+
+    def remove_objects(bucket_name, delete_object_list):
+        batches.append([obj.name for obj in delete_object_list])
+        if len(batches) == 2:
+            return iter(
+                [DeleteError("AccessDenied", "Access Denied", "some/path/1500", None)]
+            )
+        return iter([])
+
+    test_client.remove_objects = mocker.MagicMock(side_effect=remove_objects)
+    repository = MinioFileRepository(test_client, mocker.MagicMock())
+    result = await repository.delete_directory("test_workspace_id", "some/path")
+    test_client.list_objects.assert_called_once_with(
+        "test_workspace_id", prefix="some/path/", recursive=True
+    )
+    test_client.remove_object.assert_not_called()
+    assert sorted(len(batch) for batch in batches) == [500, 1000, 1000]
+    assert sorted(name for batch in batches for name in batch) == sorted(
+        f"some/path/{i}" for i in range(count)
+    )
+    assert result.deleted == count - 1
+    assert result.failed == 1
+    assert result.failures[0].name == "some/path/1500"
+    assert result.failures[0].code == "AccessDenied"
+
+
+@pytest.mark.asyncio
+async def test_move_directory_copies_then_deletes(
+    mocker,
+    test_client,
+):
+    test_client.list_objects = mocker.MagicMock(
+        return_value=iter(
+            [
+                Object("test_workspace_id", "some/path/a.txt", size=10),
+                Object("test_workspace_id", "some/path/nested/b.txt", size=20),
+                Object("test_workspace_id", "some/path/big.bin", size=6 * 1024**3),
+                Object("test_workspace_id", "some/path/broken.txt", size=5),
+            ]
+        )
+    )
+
+    def copy_object(bucket_name, object_name, source):
+        if source.object_name == "some/path/broken.txt":
+            raise S3Error("AccessDenied", "Access Denied", None, None, None, None)
+
+    test_client.copy_object = mocker.MagicMock(side_effect=copy_object)
+    test_client.stat_object = mocker.MagicMock(
+        return_value=Object(
+            "test_workspace_id",
+            "some/path/big.bin",
+            metadata={
+                "Content-Type": "application/x-tar",
+                "X-Amz-Meta-Owner": "someone",
+                "ETag": '"abc"',
+            },
         )
+    )
+    test_client.remove_objects = mocker.MagicMock(return_value=iter([]))
+    totals = []
+    repository = MinioFileRepository(test_client, mocker.MagicMock())
+    result = await repository.move_directory(
+        "test_workspace_id",
+        "some/path",
+        "other",
+        "target_workspace_id",
+        progress=lambda result: totals.append(result.copied + result.failed),
+    )
+    assert sorted(call.args[1] for call in test_client.copy_object.call_args_list) == [
+        "other/a.txt",
+        "other/broken.txt",
+        "other/nested/b.txt",
+    ]
+    test_client.compose_object.assert_called_once()
+    assert test_client.compose_object.call_args.args[:2] == (
+        "target_workspace_id",
+        "other/big.bin",
+    )
+    assert test_client.compose_object.call_args.kwargs["metadata"] == {
+        "Content-Type": "application/x-tar",
+        "X-Amz-Meta-Owner": "someone",
+    }
+    deleted = [obj.name for obj in test_client.remove_objects.call_args.args[1]]
+    assert sorted(deleted) == [
+        "some/path/a.txt",
+        "some/path/big.bin",
+        "some/path/nested/b.txt",
+    ]
+    assert totals == [1, 2, 3, 4]
+    assert result.copied == 3
+    assert result.deleted == 3
+    assert result.bytes_copied == 30 + 6 * 1024**3
+    assert result.failed == 1
+    assert result.failures[0].name == "some/path/broken.txt"
+
+
+@pytest.mark.asyncio
+async def test_presign_url(test_client):
+    presign_client = Minio(
+        "files.example.com", "access", "secret", secure=True, region="us-east-1"
+    )
+    repository = MinioFileRepository(test_client, None, presign_client=presign_client)
+
+    presigned = await repository.presign_url(
+        "test_workspace_id", "some/path/a.txt", PresignMethod.GET, timedelta(minutes=5)
+    )
+    url = urllib.parse.urlsplit(presigned.url)
+    query = urllib.parse.parse_qs(url.query)
+    assert url.netloc == "files.example.com"
+    assert url.path == "/test_workspace_id/some/path/a.txt"
+    assert query["X-Amz-Expires"] == ["300"]
+    assert query["response-content-disposition"] == ["attachment; filename=a.txt"]
+
+    presigned = await repository.presign_url(
+        "test_workspace_id", "some/path/b.txt", PresignMethod.PUT, timedelta(hours=1)
+    )
+    assert presigned.method == PresignMethod.PUT
+    assert "X-Amz-Signature=" in presigned.url
+    # Signed locally, the storage backend is never called
+    assert test_client.mock_calls == []
+
+
+@pytest.mark.asyncio
+async def test_complete_upload(mocker, test_client):
+    test_client._list_parts = mocker.MagicMock(
+        side_effect=[
+            mocker.MagicMock(
+                parts=[Part(1, "a", size=5 * 1024 * 1024)], is_truncated=True
+            ),
+            mocker.MagicMock(parts=[Part(2, "b", size=10)], is_truncated=False),
+        ]
+    )
+    repository = MinioFileRepository(test_client, mocker.MagicMock())
+    result = await repository.complete_upload(
+        "test_workspace_id", "some/big.bin", "upload"
+    )
+    assert test_client._list_parts.call_args.kwargs == {"part_number_marker": "1"}
+    test_client._complete_multipart_upload.assert_called_once_with(
+        "test_workspace_id", "some/big.bin", "upload", [Part(1, "a"), Part(2, "b")]
+    )
+    assert result.size == 5 * 1024 * 1024 + 10
+
+
+@pytest.mark.asyncio
+async def test_abort_stale_uploads(mocker, test_client):
+    now = datetime.now(timezone.utc)
+    test_client.list_buckets.return_value = [Bucket("test_workspace_id", None)]
+    test_client._list_multipart_uploads.return_value = mocker.MagicMock(
+        uploads=[
+            mocker.MagicMock(
+                object_name="old.bin",
+                upload_id="old",
+                initiated_time=now - timedelta(days=2),
+            ),
+            mocker.MagicMock(
+                object_name="new.bin", upload_id="new", initiated_time=now
+            ),
+        ],
+        is_truncated=False,
+    )
+    repository = MinioFileRepository(test_client, mocker.MagicMock())
+    assert await repository.abort_stale_uploads(now - timedelta(days=1)) == 1
+    test_client._abort_multipart_upload.assert_called_once_with(
+        "test_workspace_id", "old.bin", "old"
+    )
+
+
+@pytest.mark.asyncio
+async def test_copy_directory_not_found(mocker, test_client):
+    test_client.list_objects = mocker.MagicMock(return_value=iter([]))
+    repository = MinioFileRepository(test_client, mocker.MagicMock())
+    with pytest.raises(HTTPException) as error:
+        await repository.copy_directory("test_workspace_id", "some/path", "other")
+    assert error.value.status_code == 404
+    test_client.copy_object.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_copy_directory_to_root(mocker, test_client):
+    test_client.list_objects = mocker.MagicMock(
+        return_value=iter(
+            [
+                Object("test_workspace_id", "some/path/", size=0),
+                Object("test_workspace_id", "some/path/a.txt", size=10),
+            ]
+        )
+    )
+    repository = MinioFileRepository(test_client, mocker.MagicMock())
+    result = await repository.copy_directory(
+        "test_workspace_id", "some/path", "", "target_workspace_id"
+    )
+    assert sorted(call.args[1] for call in test_client.copy_object.call_args_list) == [
+        "a.txt"
+    ]
+    assert result.copied == 1
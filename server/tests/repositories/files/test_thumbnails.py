@@ -0,0 +1,156 @@
+import asyncio
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi import UploadFile
+from src.repositories.files.memory import InMemoryFileRepository, InMemoryStore
+from src.repositories.files.thumbnails import (
+    ThumbnailInvalidatingFileRepository,
+    Thumbnails,
+    may_have_thumbnails,
+    render_thumbnail,
+)
+
+
+def render(data, size, image_format):
+    return f"{image_format}:{size}:".encode() + data
+
+
+@pytest.fixture
+def store():
+    store = InMemoryStore()
+    store.put("test_workspace_id", "some/a.png", b"first")
+    store.workspace("thumbnails")
+    yield store
+
+
+@pytest.fixture
+def thumbnails(mocker):
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        yield Thumbnails(
+            executor, "thumbnails", mocker.MagicMock(), render=mocker.Mock(wraps=render)
+        )
+
+
+async def get(thumbnails, repository, size=64):
+    metadata = await repository.head_file("test_workspace_id", "some/a.png")
+    thumbnail, _ = await thumbnails.get(
+        repository, "test_workspace_id", "some/a.png", metadata, size
+    )
+    return thumbnail
+
+
+@pytest.mark.asyncio
+async def test_thumbnails_are_stored(mocker, store, thumbnails):
+    repository = InMemoryFileRepository(store, mocker.MagicMock())
+    results = await asyncio.gather(*(get(thumbnails, repository) for _ in range(3)))
+    assert results == [b"WEBP:64:first"] * 3
+    assert await get(thumbnails, repository) == b"WEBP:64:first"
+    assert thumbnails.render.call_count == 1
+
+    etag = store.workspace("test_workspace_id").objects["some/a.png"].etag.strip('"')
+    stored = store.workspace("thumbnails").objects
+    assert list(stored) == [f"test_workspace_id/some/a.png/{etag}/64.webp"]
+    assert stored[f"test_workspace_id/some/a.png/{etag}/64.webp"].content_type == (
+        "image/webp"
+    )
+
+
+@pytest.mark.asyncio
+async def test_stale_thumbnails_are_removed(mocker, store, thumbnails):
+    repository = InMemoryFileRepository(store, mocker.MagicMock())
+    await get(thumbnails, repository, 64)
+    await get(thumbnails, repository, 128)
+    store.put("test_workspace_id", "some/a.png", b"second")
+
+    assert await get(thumbnails, repository, 64) == b"WEBP:64:second"
+    etag = store.workspace("test_workspace_id").objects["some/a.png"].etag.strip('"')
+    assert store.workspace("thumbnails").names == [
+        f"test_workspace_id/some/a.png/{etag}/64.webp"
+    ]
+
+
+@pytest.mark.asyncio
+async def test_thumbnails_are_removed_with_their_source(mocker, store, thumbnails):
+    store.put("test_workspace_id", "some/b.png", b"other")
+    repository = ThumbnailInvalidatingFileRepository(
+        InMemoryFileRepository(store, mocker.MagicMock()), thumbnails
+    )
+    await get(thumbnails, repository)
+    await repository.upload_file(
+        "test_workspace_id",
+        [UploadFile(io.BytesIO(b"second"), filename="a.png")],
+        "some",
+    )
+    assert store.workspace("thumbnails").names == []
+
+    await get(thumbnails, repository)
+    await repository.move_file("test_workspace_id", "some/a.png", "moved/a.png")
+    assert store.workspace("thumbnails").names == []
+
+    await repository.copy_file("test_workspace_id", "moved/a.png", "some/a.png")
+    await get(thumbnails, repository)
+    await repository.delete_directory("test_workspace_id", "some")
+    assert store.workspace("thumbnails").names == []
+    assert store.workspace("test_workspace_id").names == ["moved/a.png"]
+
+
+@pytest.mark.asyncio
+async def test_thumbnails_of_other_files_are_not_removed(mocker, store, thumbnails):
+    backend = InMemoryFileRepository(store, mocker.MagicMock())
+    repository = ThumbnailInvalidatingFileRepository(backend, thumbnails)
+    delete_directory = mocker.spy(backend, "delete_directory")
+    await repository.upload_file(
+        "test_workspace_id",
+        [
+            UploadFile(io.BytesIO(b"text"), filename="a.txt"),
+            UploadFile(io.BytesIO(b"other"), filename="b.png"),
+        ],
+        "some",
+    )
+    assert [call.args for call in delete_directory.call_args_list] == [
+        ("thumbnails", "test_workspace_id/some/b.png")
+    ]
+
+    delete_directory.reset_mock()
+    await repository.delete_file("test_workspace_id", "some/a.txt")
+    delete_directory.assert_not_called()
+
+
+def test_may_have_thumbnails():
+    assert may_have_thumbnails("some/a.png")
+    assert may_have_thumbnails("some/a.txt", "image/png")
+    assert may_have_thumbnails("some/image")
+    assert not may_have_thumbnails("some/a.txt")
+    assert not may_have_thumbnails("some/a.txt", "text/plain")
+
+
+@pytest.mark.asyncio
+async def test_thumbnail_of_changed_source(mocker, store, thumbnails):
+    repository = InMemoryFileRepository(store, mocker.MagicMock())
+    metadata = await repository.head_file("test_workspace_id", "some/a.png")
+    store.put("test_workspace_id", "some/a.png", b"second")
+
+    thumbnail, version = await thumbnails.get(
+        repository, "test_workspace_id", "some/a.png", metadata, 64
+    )
+    etag = store.workspace("test_workspace_id").objects["some/a.png"].etag.strip('"')
+    assert (thumbnail, version) == (b"WEBP:64:second", etag)
+    # Not stored under the version that was asked for
+    assert store.workspace("thumbnails").names == []
+
+
+def test_render_thumbnail():
+    Image = pytest.importorskip("PIL.Image")
+    source = io.BytesIO()
+    Image.new("RGBA", (400, 200), (255, 0, 0, 128)).save(source, format="PNG")
+
+    thumbnail = render_thumbnail(source.getvalue(), 100, "WEBP")
+    with Image.open(io.BytesIO(thumbnail)) as image:
+        assert image.format == "WEBP"
+        assert image.size == (100, 50)
+        assert image.mode == "RGBA"
+
+    with pytest.raises(ValueError):
+        render_thumbnail(b"not an image", 100, "WEBP")
@@ -1,12 +1,64 @@
+import asyncio
+import io
+import json
+import os
+import time
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
 import pytest
+import urllib3
+from httpx import ASGITransport, AsyncClient
 from fastapi.testclient import TestClient
-from fastapi import status
+from fastapi import HTTPException, status
+from starlette.applications import Starlette
+from starlette.datastructures import Headers
+from starlette.middleware import Middleware
+from starlette.responses import StreamingResponse
+from starlette.routing import Route
+from src.compression import Compression, CompressionMiddleware, negotiate_encoding
 from src.main import app
-from src.repositories.files.fastapi import get_file_repository
+from src.profiling import classify
+from src.configuration import (
+    BatchConfiguration,
+    CompressionConfiguration,
+    Configuration,
+    DedupConfiguration,
+    MinioStorageBackendConfiguration,
+    ProfilingConfiguration,
+    ThumbnailConfiguration,
+    UploadSessionConfiguration,
+    get_configuration,
+)
+from src.repositories.files.fastapi import (
+    get_connection_pool_stats,
+    get_file_repository,
+)
 from src.repositories.files.base import FileRepository
+from src.repositories.files.cache import CachingFileRepository, ListingCache
+from src.repositories.files.index import MetadataIndex
+from src.repositories.files.memory import InMemoryFileRepository, InMemoryStore
+from src.repositories.files.metrics import InstrumentedFileRepository
+from src.repositories.files.minio import MinioFileRepository
+from src.repositories.files.thumbnails import Thumbnails
+from minio import Minio
 from minio.error import S3Error
-from src.models.file import File, Directory
-from datetime import datetime
+from src.models.file import (
+    ByteRange,
+    DirectoryListingPage,
+    File,
+    FileDownload,
+    FileMetadata,
+    PresignMethod,
+    PresignedUrl,
+    Directory,
+    TransferResult,
+    UploadResult,
+    UploadStatus,
+)
+from src.routes.file import parse_range_header, transfer_progress
+from datetime import datetime, timedelta, timezone
 from fastapi.encoders import jsonable_encoder
 
 
@@ -39,7 +91,9 @@ def test_stat_successful(mocker, test_client):
             path="some/path",
         ),
     ]
-    mock_file_repository.stat = mocker.AsyncMock(return_value=mock_response)
+    mock_file_repository.stat = mocker.AsyncMock(
+        return_value=DirectoryListingPage(mock_response)
+    )
     app.dependency_overrides[get_file_repository] = lambda: mock_file_repository
     response = test_client.get(
         "/workspaces/test_workspace_id/stat/some/path",
@@ -47,9 +101,36 @@ def test_stat_successful(mocker, test_client):
     mock_file_repository.stat.assert_called_once_with(
         "test_workspace_id",
         "some/path",
+        limit=None,
+        start_after=None,
     )
     assert response.status_code == status.HTTP_200_OK
     assert response.json() == jsonable_encoder(mock_response)
+    assert "X-Next-Start-After" not in response.headers
+
+
+def test_stat_paginated(mocker, test_client):
+    mock_file_repository = mocker.MagicMock(
+        spec=FileRepository,
+    )
+    mock_response = [Directory(name="c", path="a/b/c")]
+    mock_file_repository.stat = mocker.AsyncMock(
+        return_value=DirectoryListingPage(mock_response, next_start_after="a/b/c/")
+    )
+    app.dependency_overrides[get_file_repository] = lambda: mock_file_repository
+    response = test_client.get(
+        "/workspaces/test_workspace_id/stat/a/b",
+        params={"limit": 1, "start_after": "a/b/a.txt"},
+    )
+    mock_file_repository.stat.assert_called_once_with(
+        "test_workspace_id",
+        "a/b",
+        limit=1,
+        start_after="a/b/a.txt",
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == jsonable_encoder(mock_response)
+    assert response.headers["X-Next-Start-After"] == "a/b/c/"
 
 
 def test_stat_failure(mocker, test_client):
@@ -66,8 +147,942 @@ def test_stat_failure(mocker, test_client):
     mock_file_repository.stat.assert_called_once_with(
         "test_workspace_id",
         "some/path",
+        limit=None,
+        start_after=None,
     )
     assert response.status_code == status.HTTP_404_NOT_FOUND
     assert response.json() == {
         "detail": "404_NOT_FOUND: some/path not found in test_workspace_id"
     }
+
+
+@pytest.mark.asyncio
+async def test_stat_concurrent_requests_do_not_serialize(mocker):
+    delay = 0.2
+    concurrency = 10
+
+    def slow_list_objects(*args, **kwargs):
+        time.sleep(delay)
+        return iter([])
+
+    mock_client = mocker.MagicMock(spec=Minio)
+    mock_client._list_objects = mocker.MagicMock(side_effect=slow_list_objects)
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    app.dependency_overrides[get_file_repository] = lambda: MinioFileRepository(
+        mock_client, None, executor
+    )
+    try:
+        async with AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://test"
+        ) as client:
+            start = time.perf_counter()
+            responses = await asyncio.gather(
+                *(
+                    client.get(f"/workspaces/test_workspace_id/stat/path/{i}")
+                    for i in range(concurrency)
+                )
+            )
+            elapsed = time.perf_counter() - start
+    finally:
+        app.dependency_overrides = {}
+        executor.shutdown()
+
+    assert all(r.status_code == status.HTTP_200_OK for r in responses)
+    assert mock_client._list_objects.call_count == concurrency
+    # Serialized requests would take at least delay * concurrency
+    assert elapsed < delay * concurrency / 2
+
+
+def test_lifespan_shares_storage_client(mocker):
+    mocker.patch(
+        "src.main.get_configuration",
+        return_value=Configuration(
+            storage_backend=MinioStorageBackendConfiguration(
+                endpoint="127.0.0.1:9000", max_connections=4
+            )
+        ),
+    )
+    with TestClient(app) as client:
+        storage_client = app.state.storage_client
+        clear = mocker.spy(storage_client._http, "clear")
+        response = client.get("/storage/pool")
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == {"maxConnectionsPerHost": 4, "hosts": []}
+        assert app.state.storage_client is storage_client
+        response = client.get("/storage/listing-cache")
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+    clear.assert_called_once()
+
+
+def test_dedup_stats(mocker, tmp_path):
+    mocker.patch(
+        "src.main.get_configuration",
+        return_value=Configuration(
+            storage_backend=MinioStorageBackendConfiguration(endpoint="127.0.0.1:9000"),
+            dedup=DedupConfiguration(
+                enabled=True, database=str(tmp_path / "content-index.sqlite3")
+            ),
+        ),
+    )
+    with TestClient(app) as client:
+        response = client.get("/storage/dedup")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {
+        "entries": 0,
+        "hits": 0,
+        "misses": 0,
+        "hitRate": 0.0,
+        "bytesSaved": 0,
+    }
+    app.state.content_index = None
+
+
+def test_connection_pool_stats():
+    http_client = urllib3.PoolManager(maxsize=4)
+    pool = http_client.connection_from_host("127.0.0.1", 9000, "http")
+    connection = pool._get_conn()
+    pool._put_conn(pool._get_conn())
+    stats = get_connection_pool_stats(http_client)
+    pool._put_conn(connection)
+    assert stats.max_connections_per_host == 4
+    assert len(stats.hosts) == 1
+    assert stats.hosts[0].host == "127.0.0.1"
+    assert stats.hosts[0].in_use == 1
+    assert stats.hosts[0].idle == 1
+
+
+def file_download(content: bytes, **kwargs) -> FileDownload:
+    async def stream():
+        yield content
+
+    return FileDownload(
+        filename="test_file.txt",
+        content_type="text/plain",
+        content=stream(),
+        content_length=len(content),
+        **{"size": len(content), **kwargs},
+    )
+
+
+def test_download_range(mocker, test_client):
+    mock_file_repository = mocker.MagicMock(spec=FileRepository)
+    mock_file_repository.download_file = mocker.AsyncMock(
+        return_value=file_download(
+            b"56789", size=10, content_range=(5, 9), etag='"abc"'
+        )
+    )
+    app.dependency_overrides[get_file_repository] = lambda: mock_file_repository
+    response = test_client.get(
+        "/workspaces/test_workspace_id/download/some/path/test_file.txt",
+        headers={"Range": "bytes=5-", "If-Range": '"abc"'},
+    )
+    mock_file_repository.download_file.assert_called_once_with(
+        "test_workspace_id", "some/path/test_file.txt", ByteRange(5, None)
+    )
+    assert response.status_code == status.HTTP_206_PARTIAL_CONTENT
+    assert response.headers["Content-Range"] == "bytes 5-9/10"
+    assert response.headers["ETag"] == '"abc"'
+    assert response.content == b"56789"
+
+
+def test_download_if_range_mismatch(mocker, test_client):
+    mock_file_repository = mocker.MagicMock(spec=FileRepository)
+    mock_file_repository.download_file = mocker.AsyncMock(
+        side_effect=[
+            file_download(b"56789", size=10, content_range=(5, 9), etag='"new"'),
+            file_download(b"0123456789", etag='"new"'),
+        ]
+    )
+    app.dependency_overrides[get_file_repository] = lambda: mock_file_repository
+    response = test_client.get(
+        "/workspaces/test_workspace_id/download/test_file.txt",
+        headers={"Range": "bytes=5-", "If-Range": '"old"'},
+    )
+    assert mock_file_repository.download_file.call_args_list[1] == mocker.call(
+        "test_workspace_id", "test_file.txt"
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert "Content-Range" not in response.headers
+    assert response.content == b"0123456789"
+
+
+def test_download_not_modified(mocker, test_client):
+    mock_file_repository = mocker.MagicMock(spec=FileRepository)
+    mock_file_repository.head_file = mocker.AsyncMock(
+        return_value=FileMetadata(
+            filename="test_file.txt",
+            content_type="text/plain",
+            size=10,
+            etag='"abc"',
+            last_modified=datetime(2024, 1, 1, tzinfo=timezone.utc),
+        )
+    )
+    app.dependency_overrides[get_file_repository] = lambda: mock_file_repository
+    for headers in [
+        {"If-None-Match": 'W/"other", "abc"'},
+        {"If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT"},
+    ]:
+        response = test_client.get(
+            "/workspaces/test_workspace_id/download/test_file.txt", headers=headers
+        )
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response.headers["ETag"] == '"abc"'
+        assert response.headers["Last-Modified"] == "Mon, 01 Jan 2024 00:00:00 GMT"
+        assert response.content == b""
+    mock_file_repository.download_file.assert_not_called()
+
+
+def test_download_modified(mocker, test_client):
+    mock_file_repository = mocker.MagicMock(spec=FileRepository)
+    mock_file_repository.head_file = mocker.AsyncMock(
+        return_value=FileMetadata(
+            filename="test_file.txt", content_type="text/plain", size=5, etag='"new"'
+        )
+    )
+    mock_file_repository.download_file = mocker.AsyncMock(
+        return_value=file_download(b"01234", etag='"new"')
+    )
+    app.dependency_overrides[get_file_repository] = lambda: mock_file_repository
+    response = test_client.get(
+        "/workspaces/test_workspace_id/download/test_file.txt",
+        headers={"If-None-Match": '"old"'},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["ETag"] == '"new"'
+    assert response.content == b"01234"
+
+
+def test_head_file(mocker, test_client):
+    store = InMemoryStore()
+    obj = store.put("test_workspace_id", "some/test_file.txt", b"hello", "text/plain")
+    app.dependency_overrides[get_file_repository] = lambda: InMemoryFileRepository(
+        store, mocker.MagicMock()
+    )
+    response = test_client.head(
+        "/workspaces/test_workspace_id/download/some/test_file.txt"
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["Content-Length"] == "5"
+    assert response.headers["Content-Type"].startswith("text/plain")
+    assert response.headers["ETag"] == obj.etag
+    assert response.content == b""
+
+    response = test_client.head(
+        "/workspaces/test_workspace_id/download/some/test_file.txt",
+        headers={"If-None-Match": obj.etag},
+    )
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    response = test_client.head("/workspaces/test_workspace_id/download/some/missing")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_stat_not_modified(mocker, test_client):
+    mock_file_repository = mocker.MagicMock(spec=FileRepository)
+    mock_file_repository.stat = mocker.AsyncMock(
+        return_value=DirectoryListingPage([Directory(name="b", path="a/b")])
+    )
+    app.dependency_overrides[get_file_repository] = lambda: mock_file_repository
+    response = test_client.get("/workspaces/test_workspace_id/stat/a")
+    assert response.status_code == status.HTTP_200_OK
+    etag = response.headers["ETag"]
+
+    response = test_client.get(
+        "/workspaces/test_workspace_id/stat/a", headers={"If-None-Match": etag}
+    )
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.content == b""
+
+    mock_file_repository.stat.return_value = DirectoryListingPage(
+        [Directory(name="c", path="a/c")]
+    )
+    response = test_client.get(
+        "/workspaces/test_workspace_id/stat/a", headers={"If-None-Match": etag}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["ETag"] != etag
+
+
+@pytest.mark.parametrize(
+    "header,expected",
+    [
+        ("bytes=0-99", ByteRange(0, 99)),
+        ("bytes=100-", ByteRange(100, None)),
+        ("bytes=-500", ByteRange(None, 500)),
+        ("bytes=0-1,5-6", None),
+        ("bytes=9-1", None),
+        ("items=0-1", None),
+        (None, None),
+    ],
+)
+def test_parse_range_header(header, expected):
+    assert parse_range_header(header) == expected
+
+
+def test_upload_partial_failure(mocker, test_client):
+    mock_file_repository = mocker.MagicMock(spec=FileRepository)
+    mock_file_repository.upload_file = mocker.AsyncMock(
+        return_value=[
+            UploadResult(
+                name="some/path/a.txt",
+                filename="a.txt",
+                status=UploadStatus.UPLOADED,
+                size=1,
+            ),
+            UploadResult(
+                name="some/path/b.txt",
+                filename="b.txt",
+                status=UploadStatus.FAILED,
+                detail="error",
+            ),
+        ]
+    )
+    app.dependency_overrides[get_file_repository] = lambda: mock_file_repository
+    response = test_client.post(
+        "/workspaces/test_workspace_id/upload/some/path",
+        files=[("files", ("a.txt", b"a")), ("files", ("b.txt", b"b"))],
+    )
+    assert response.status_code == status.HTTP_207_MULTI_STATUS
+    assert [result["status"] for result in response.json()] == ["uploaded", "failed"]
+
+
+def test_copy_directory_progress(mocker, test_client):
+    async def copy_directory(
+        workspace_id, path, target_path, target_workspace_id, progress
+    ):
+        result = TransferResult()
+        for name in ["some/path/a.txt", "some/path/b.txt"]:
+            await asyncio.sleep(0.02)
+            result.copied += 1
+            result.bytes_copied += 1
+            progress(result)
+        return result
+
+    mocker.patch("src.routes.file.PROGRESS_INTERVAL", 0.01)
+    mock_file_repository = mocker.MagicMock(spec=FileRepository)
+    mock_file_repository.copy_directory = mocker.AsyncMock(side_effect=copy_directory)
+    app.dependency_overrides[get_file_repository] = lambda: mock_file_repository
+    response = test_client.put(
+        "/workspaces/test_workspace_id/cp/some/path",
+        params={"target_path": "other", "recursive": True},
+        headers={"Accept": "application/x-ndjson"},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert len(lines) > 1
+    assert lines[-1] == {
+        "copied": 2,
+        "bytesCopied": 2,
+        "deleted": 0,
+        "failed": 0,
+        "failures": [],
+        "done": True,
+    }
+    assert not any(line["done"] for line in lines[:-1])
+
+
+def test_move_directory_into_itself(mocker, test_client):
+    mock_file_repository = mocker.MagicMock(spec=FileRepository)
+    app.dependency_overrides[get_file_repository] = lambda: mock_file_repository
+    response = test_client.put(
+        "/workspaces/test_workspace_id/mv/some/path",
+        params={"target_path": "some/path/inner", "recursive": True},
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    mock_file_repository.move_directory.assert_not_called()
+
+
+def test_copy_directory_not_found(mocker, test_client):
+    mock_file_repository = mocker.MagicMock(spec=FileRepository)
+    mock_file_repository.copy_directory = mocker.AsyncMock(
+        side_effect=S3Error("NoSuchBucket", "Not found", None, None, None, None)
+    )
+    app.dependency_overrides[get_file_repository] = lambda: mock_file_repository
+    response = test_client.put(
+        "/workspaces/test_workspace_id/cp/some/path",
+        params={"target_path": "other", "recursive": True},
+    )
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_batch_operations(mocker, test_client):
+    running = 0
+    peak = 0
+
+    async def delete_file(workspace_id, path):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        if path == "missing.txt":
+            raise HTTPException(status_code=404, detail="File not found")
+
+    mock_file_repository = mocker.MagicMock(spec=FileRepository)
+    mock_file_repository.delete_file = mocker.AsyncMock(side_effect=delete_file)
+    mock_file_repository.move_file = mocker.AsyncMock(
+        side_effect=S3Error("NoSuchKey", "Not found", None, None, None, None)
+    )
+    mock_file_repository.copy_file = mocker.AsyncMock(
+        side_effect=[None, RuntimeError("connection to 10.0.0.1 refused")]
+    )
+    app.dependency_overrides[get_file_repository] = lambda: mock_file_repository
+    app.dependency_overrides[get_configuration] = lambda: Configuration(
+        storage_backend=MinioStorageBackendConfiguration(endpoint="127.0.0.1:9000"),
+        batch=BatchConfiguration(concurrency=4),
+    )
+    operations = [{"op": "delete", "path": f"{i}.txt"} for i in range(10)]
+    operations += [
+        {"op": "delete", "path": "missing.txt"},
+        {"op": "copy", "path": "a.txt", "targetPath": "b.txt"},
+        {"op": "move", "path": "c.txt", "targetPath": "d.txt"},
+        {"op": "copy", "path": "e.txt", "targetPath": "f.txt"},
+    ]
+    response = test_client.post(
+        "/workspaces/test_workspace_id/batch", json={"operations": operations}
+    )
+    assert response.status_code == status.HTTP_207_MULTI_STATUS
+    results = response.json()
+    assert [result["path"] for result in results] == [
+        operation["path"] for operation in operations
+    ]
+    assert [result["statusCode"] for result in results[-4:]] == [404, 204, 404, 500]
+    assert all(result["status"] == "succeeded" for result in results[:10])
+    # Unexpected errors are logged, not sent
+    assert "10.0.0.1" not in results[-1]["detail"]
+    mock_file_repository.copy_file.assert_any_await(
+        "test_workspace_id", "a.txt", "b.txt", None
+    )
+    assert 1 < peak <= 4
+
+    response = test_client.post(
+        "/workspaces/test_workspace_id/batch",
+        json={"operations": [{"op": "delete", "path": "a.txt"}] * 10001},
+    )
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+@pytest.mark.asyncio
+async def test_download_local_file_with_pathsend(mocker, tmp_path):
+    (tmp_path / "file.txt").write_bytes(b"hello")
+    mock_file_repository = mocker.MagicMock(spec=FileRepository)
+    release = mocker.MagicMock()
+    mock_file_repository.download_file = mocker.AsyncMock(
+        return_value=FileDownload(
+            filename="file.txt",
+            content_type="text/plain",
+            content=mocker.MagicMock(),
+            content_length=5,
+            size=5,
+            release=release,
+            file_path=str(tmp_path / "file.txt"),
+        )
+    )
+    app.dependency_overrides[get_file_repository] = lambda: mock_file_repository
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await app(
+        {
+            "type": "http",
+            "asgi": {"version": "3.0", "spec_version": "2.4"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": "/workspaces/test_workspace_id/download/file.txt",
+            "raw_path": b"/workspaces/test_workspace_id/download/file.txt",
+            "query_string": b"",
+            "root_path": "",
+            "headers": [],
+            "server": ("testserver", 80),
+            "client": ("testclient", 50000),
+            "extensions": {"http.response.pathsend": {}},
+        },
+        receive,
+        send,
+    )
+    app.dependency_overrides = {}
+    assert messages[0]["status"] == status.HTTP_200_OK
+    assert messages[1] == {
+        "type": "http.response.pathsend",
+        "path": str(tmp_path / "file.txt"),
+    }
+    release.assert_called_once()
+
+
+def test_metrics(mocker, test_client):
+    mock_file_repository = mocker.MagicMock(spec=FileRepository)
+    mock_file_repository.stat = mocker.AsyncMock(
+        return_value=DirectoryListingPage(entries=[])
+    )
+    app.dependency_overrides[get_file_repository] = lambda: mock_file_repository
+    test_client.get("/workspaces/test_workspace_id/stat/some/path")
+    response = test_client.get("/metrics")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["Content-Type"].startswith("text/plain")
+    assert (
+        'filemanager_http_request_duration_seconds_count{method="GET",route="/workspaces/{workspace_id}/stat/{path:path}",status="200"}'
+        in response.text
+    )
+    assert 'filemanager_http_requests_in_flight{method="GET"} 1.0' in response.text
+
+
+def test_search(mocker, test_client, tmp_path):
+    store = InMemoryStore()
+    store.put("test_workspace_id", "some/path/a.txt", b"a")
+    store.put("test_workspace_id", "some/path/b.pdf", b"b")
+    app.dependency_overrides[get_file_repository] = lambda: InMemoryFileRepository(
+        store, mocker.MagicMock()
+    )
+    response = test_client.get("/workspaces/test_workspace_id/search")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    app.state.metadata_index = MetadataIndex(str(tmp_path), mocker.MagicMock())
+    try:
+        response = test_client.get(
+            "/workspaces/test_workspace_id/search",
+            params={"extension": "pdf", "path": "some"},
+        )
+    finally:
+        app.state.metadata_index.close()
+        app.state.metadata_index = None
+    assert response.status_code == status.HTTP_200_OK
+    assert [entry["name"] for entry in response.json()] == ["some/path/b.pdf"]
+
+
+def test_directory_usage(mocker, test_client):
+    store = InMemoryStore()
+    store.put("test_workspace_id", "some/a.txt", b"a")
+    store.put("test_workspace_id", "some/path/b.txt", b"bb")
+    store.put("test_workspace_id", "some/path/deeper/c.txt", b"ccc")
+    store.put("test_workspace_id", "some/other/d.txt", b"dddd")
+    app.dependency_overrides[get_file_repository] = lambda: InMemoryFileRepository(
+        store, mocker.MagicMock()
+    )
+    response = test_client.get("/workspaces/test_workspace_id/du/some")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {
+        "path": "some",
+        "size": 10,
+        "count": 4,
+        "directories": [
+            {
+                "type": "directory",
+                "name": "other",
+                "path": "some/other",
+                "size": 4,
+                "count": 1,
+            },
+            {
+                "type": "directory",
+                "name": "path",
+                "path": "some/path",
+                "size": 5,
+                "count": 2,
+            },
+        ],
+    }
+
+    response = test_client.get(
+        "/workspaces/test_workspace_id/stat/some", params={"sizes": True}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    directories = [entry for entry in response.json() if entry["type"] == "directory"]
+    assert [
+        (entry["name"], entry["size"], entry["count"]) for entry in directories
+    ] == [
+        ("other", 4, 1),
+        ("path", 5, 2),
+    ]
+
+
+def test_directory_usage_cached(mocker, test_client):
+    store = InMemoryStore()
+    store.put("test_workspace_id", "some/path/a.txt", b"a")
+    repository = InMemoryFileRepository(store, mocker.MagicMock())
+    walk = mocker.spy(repository, "walk")
+    app.state.listing_cache = ListingCache(max_entries=10, ttl=60)
+    app.dependency_overrides[get_file_repository] = lambda: CachingFileRepository(
+        repository, app.state.listing_cache
+    )
+    try:
+        url = "/workspaces/test_workspace_id/du/some"
+        assert test_client.get(url).json()["size"] == 1
+        assert test_client.get(url).json()["size"] == 1
+        assert walk.call_count == 1
+        # Writes below the directory drop its totals
+        test_client.post(
+            "/workspaces/test_workspace_id/upload/some/path",
+            files=[("files", ("b.txt", b"bb"))],
+        )
+        assert test_client.get(url).json()["size"] == 3
+        assert walk.call_count == 2
+    finally:
+        app.state.listing_cache = None
+
+
+def test_download_archive(mocker, test_client):
+    store = InMemoryStore()
+    store.put("test_workspace_id", "some/path/a.txt", b"a")
+    store.put("test_workspace_id", "some/path/deeper/b.txt", b"bb")
+    app.dependency_overrides[get_file_repository] = lambda: InMemoryFileRepository(
+        store, mocker.MagicMock()
+    )
+    app.dependency_overrides[get_configuration] = lambda: Configuration(
+        storage_backend=MinioStorageBackendConfiguration(endpoint="127.0.0.1:9000"),
+    )
+    response = test_client.get("/workspaces/test_workspace_id/archive/some/path")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["Content-Type"] == "application/zip"
+    assert response.headers["Content-Disposition"] == "attachment; filename=path.zip"
+    with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+        assert archive.namelist() == ["a.txt", "deeper/b.txt"]
+        assert archive.read("deeper/b.txt") == b"bb"
+
+
+def test_download_archive_not_found(mocker, test_client):
+    mock_file_repository = mocker.MagicMock(spec=FileRepository)
+
+    async def walk(workspace_id, path=None):
+        raise S3Error("NoSuchBucket", "Not found", None, None, None, None)
+        yield
+
+    mock_file_repository.walk = walk
+    app.dependency_overrides[get_file_repository] = lambda: mock_file_repository
+    app.dependency_overrides[get_configuration] = lambda: Configuration(
+        storage_backend=MinioStorageBackendConfiguration(endpoint="127.0.0.1:9000"),
+    )
+    response = test_client.get("/workspaces/missing/archive")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_presign_url(mocker, test_client):
+    mock_file_repository = mocker.MagicMock(spec=FileRepository)
+    mock_file_repository.head_file = mocker.AsyncMock(
+        side_effect=S3Error("NoSuchKey", "Not found", None, None, None, None)
+    )
+    mock_file_repository.presign_url = mocker.AsyncMock(
+        return_value=PresignedUrl(
+            method=PresignMethod.PUT,
+            url="https://files.example.com/test_workspace_id/a.txt?X-Amz-Signature=0",
+            expires_at=datetime(2030, 1, 1, tzinfo=timezone.utc),
+        )
+    )
+    app.dependency_overrides[get_file_repository] = lambda: mock_file_repository
+
+    response = test_client.get("/workspaces/test_workspace_id/presign/a.txt")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    mock_file_repository.presign_url.assert_not_called()
+
+    response = test_client.get(
+        "/workspaces/test_workspace_id/presign/a.txt",
+        params={"method": "PUT", "expires_in": 60},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["Cache-Control"] == "no-store"
+    assert response.json()["method"] == "PUT"
+    assert response.json()["expiresAt"] == "2030-01-01T00:00:00Z"
+    mock_file_repository.presign_url.assert_called_once_with(
+        "test_workspace_id", "a.txt", PresignMethod.PUT, timedelta(seconds=60)
+    )
+
+    app.dependency_overrides[get_file_repository] = lambda: InMemoryFileRepository(
+        InMemoryStore(), mocker.MagicMock()
+    )
+    response = test_client.get(
+        "/workspaces/test_workspace_id/presign/a.txt", params={"method": "PUT"}
+    )
+    assert response.status_code == status.HTTP_501_NOT_IMPLEMENTED
+
+
+def test_upload_session(mocker, test_client):
+    store = InMemoryStore()
+    app.dependency_overrides[get_file_repository] = lambda: InMemoryFileRepository(
+        store, mocker.MagicMock()
+    )
+    app.dependency_overrides[get_configuration] = lambda: Configuration(
+        storage_backend=MinioStorageBackendConfiguration(endpoint="127.0.0.1:9000"),
+        upload_sessions=UploadSessionConfiguration(max_part_size=8),
+    )
+    response = test_client.post(
+        "/workspaces/test_workspace_id/uploads", params={"path": "some/a.txt"}
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+    upload_id = response.json()["uploadId"]
+    parts_url = f"/workspaces/test_workspace_id/uploads/{upload_id}/parts"
+    params = {"path": "some/a.txt"}
+
+    response = test_client.put(f"{parts_url}/2", params=params, content=b"world")
+    assert response.status_code == status.HTTP_200_OK
+    response = test_client.put(f"{parts_url}/1", params=params, content=b"hello ")
+    assert response.status_code == status.HTTP_200_OK
+    response = test_client.put(f"{parts_url}/3", params=params, content=b"too large")
+    assert response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    response = test_client.get(parts_url, params=params)
+    assert [part["partNumber"] for part in response.json()] == [1, 2]
+
+    response = test_client.post(
+        f"/workspaces/test_workspace_id/uploads/{upload_id}/complete",
+        params=params,
+        json={"parts": response.json()},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["size"] == 11
+    assert store.workspace("test_workspace_id").objects["some/a.txt"].data == (
+        b"hello world"
+    )
+    response = test_client.delete(
+        f"/workspaces/test_workspace_id/uploads/{upload_id}", params=params
+    )
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_profile_on_demand(mocker, test_client, tmp_path):
+    store = InMemoryStore()
+    store.put("test_workspace_id", "some/path/a.txt", b"a")
+    app.dependency_overrides[get_file_repository] = lambda: (
+        InstrumentedFileRepository(
+            InMemoryFileRepository(store, mocker.MagicMock(), latency=0.05), "memory"
+        )
+    )
+    app.state.profiling = ProfilingConfiguration(
+        secret="admin", directory=str(tmp_path), interval_seconds=0.001
+    )
+    try:
+        response = test_client.get(
+            "/workspaces/test_workspace_id/stat/some/path",
+            headers={"X-Profile": "wrong"},
+        )
+        assert "X-Profile-Id" not in response.headers
+        response = test_client.get(
+            "/workspaces/test_workspace_id/stat/some/path",
+            headers={"X-Profile": "admin"},
+        )
+    finally:
+        app.state.profiling = None
+    assert response.status_code == status.HTTP_200_OK
+    profile_id = response.headers["X-Profile-Id"]
+    [summary_path] = tmp_path.glob(f"*-{profile_id}.json")
+    summary = json.loads(summary_path.read_text())
+    assert summary["route"] == "/workspaces/{workspace_id}/stat/{path:path}"
+    assert summary["backend_wait_seconds"] >= 0.05
+    assert set(summary["phase_seconds"]) == {
+        "backend",
+        "model_building",
+        "serialization",
+        "other",
+    }
+    assert summary_path.with_suffix(".folded").exists()
+
+
+def test_classify_backend_frames():
+    files = os.path.join("server", "src", "repositories", "files")
+    assert classify("stat", os.path.join(files, "minio.py")) == "backend"
+    assert (
+        classify("urlopen", os.path.join(os.sep, "urllib3", "poolmanager.py"))
+        == "backend"
+    )
+    # Work this service does around the backend
+    assert classify("write", os.path.join(files, "archive.py")) is None
+    assert classify("get", os.path.join(files, "thumbnails.py")) is None
+
+
+@pytest.mark.parametrize(
+    "header,expected",
+    [
+        (None, None),
+        ("gzip", "gzip"),
+        ("br, gzip;q=0.5", "gzip"),
+        ("gzip;q=0", None),
+        ("*", "zstd"),
+        ("gzip, zstd", "zstd"),
+        ("zstd;q=0.5, gzip", "gzip"),
+        ("identity", None),
+    ],
+)
+def test_negotiate_encoding(header, expected):
+    assert negotiate_encoding(header, ["zstd", "gzip"]) == expected
+
+
+def test_compression(mocker, test_client):
+    store = InMemoryStore()
+    store.put("test_workspace_id", "some/a.csv", b"a,b,c\n" * 1000)
+    store.put("test_workspace_id", "some/b.png", bytes(10000))
+    store.put("test_workspace_id", "some/c.txt", b"small")
+    app.dependency_overrides[get_file_repository] = lambda: InMemoryFileRepository(
+        store, mocker.MagicMock()
+    )
+    app.state.compression = Compression(CompressionConfiguration(enabled=True))
+    try:
+        responses = [
+            test_client.get(
+                "/workspaces/test_workspace_id/download/some/a.csv",
+                headers={"Accept-Encoding": "gzip"},
+            )
+            for _ in range(2)
+        ]
+        image = test_client.get(
+            "/workspaces/test_workspace_id/download/some/b.png",
+            headers={"Accept-Encoding": "gzip"},
+        )
+        small = test_client.get(
+            "/workspaces/test_workspace_id/download/some/c.txt",
+            headers={"Accept-Encoding": "gzip"},
+        )
+        listing = test_client.get(
+            "/workspaces/test_workspace_id/stat/some",
+            headers={"Accept-Encoding": "gzip"},
+        )
+        revalidated = [
+            test_client.get(
+                f"/workspaces/test_workspace_id/{url}",
+                headers={
+                    "Accept-Encoding": "gzip",
+                    "If-None-Match": response.headers["ETag"],
+                },
+            )
+            for url, response in [
+                ("download/some/a.csv", responses[0]),
+                ("stat/some", listing),
+                ("download/some/b.png", image),
+            ]
+        ]
+        variants = app.state.compression.variants
+    finally:
+        app.state.compression = None
+
+    etag = store.workspace("test_workspace_id").objects["some/a.csv"].etag
+    for response in responses:
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert response.headers["Vary"] == "Accept-Encoding"
+        assert response.headers["ETag"] == f"W/{etag}"
+        assert response.content == b"a,b,c\n" * 1000
+    # The second response is the compressed body cached by the first
+    assert "Content-Length" not in responses[0].headers
+    assert int(responses[1].headers["Content-Length"]) < 1000
+    assert (variants.hits, variants.misses) == (1, 1)
+    assert "Content-Encoding" not in image.headers
+    assert image.content == bytes(10000)
+    assert "Content-Encoding" not in small.headers
+    assert small.headers["Vary"] == "Accept-Encoding"
+    assert listing.headers["Content-Encoding"] == "gzip"
+    assert len(listing.json()) == 3
+    assert [response.status_code for response in revalidated] == [304] * 3
+    assert [response.headers.get("Vary") for response in revalidated] == [
+        "Accept-Encoding",
+        "Accept-Encoding",
+        None,
+    ]
+
+
+@pytest.mark.asyncio
+async def test_compression_streams_progress(mocker):
+    mocker.patch("src.routes.file.PROGRESS_INTERVAL", 0.01)
+    received = []
+    first_line = asyncio.Event()
+
+    async def transfer(progress):
+        result = TransferResult(copied=1)
+        progress(result)
+        # The transfer only ends once the client has read a line of progress
+        await asyncio.wait_for(first_line.wait(), 5)
+        return result
+
+    async def endpoint(request):
+        return StreamingResponse(
+            transfer_progress(transfer), media_type="application/x-ndjson"
+        )
+
+    streaming_app = Starlette(
+        routes=[Route("/progress", endpoint)],
+        middleware=[Middleware(CompressionMiddleware)],
+    )
+    streaming_app.state.compression = Compression(
+        CompressionConfiguration(enabled=True, min_size=0)
+    )
+    decompressor = zlib.decompressobj(31)
+    headers = {}
+
+    async def receive():
+        await asyncio.Event().wait()
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            headers.update(Headers(raw=message["headers"]))
+        elif message["type"] == "http.response.body":
+            received.append(decompressor.decompress(message.get("body", b"")))
+            if b"\n" in b"".join(received):
+                first_line.set()
+
+    await streaming_app(
+        {
+            "type": "http",
+            "asgi": {"version": "3.0", "spec_version": "2.4"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": "/progress",
+            "raw_path": b"/progress",
+            "query_string": b"",
+            "root_path": "",
+            "headers": [(b"accept-encoding", b"gzip")],
+            "server": ("testserver", 80),
+            "client": ("testclient", 50000),
+        },
+        receive,
+        send,
+    )
+    assert headers["content-encoding"] == "gzip"
+    lines = [json.loads(line) for line in b"".join(received).splitlines()]
+    assert lines[-1]["done"]
+    assert not any(line["done"] for line in lines[:-1])
+
+
+def render_thumbnail(data, size, image_format):
+    return f"{size}:".encode() + data
+
+
+def test_thumbnail(mocker, test_client):
+    store = InMemoryStore()
+    store.put("test_workspace_id", "some/a.png", b"image")
+    store.put("test_workspace_id", "some/b.txt", b"text")
+    app.dependency_overrides[get_file_repository] = lambda: InMemoryFileRepository(
+        store, mocker.MagicMock()
+    )
+    app.dependency_overrides[get_configuration] = lambda: Configuration(
+        storage_backend=MinioStorageBackendConfiguration(endpoint="127.0.0.1:9000"),
+        thumbnails=ThumbnailConfiguration(enabled=True, sizes=[64]),
+    )
+    url = "/workspaces/test_workspace_id/thumbnail/some"
+    response = test_client.get(f"{url}/a.png", params={"size": 64})
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        app.state.thumbnails = Thumbnails(
+            executor, "thumbnails", mocker.MagicMock(), render=render_thumbnail
+        )
+        try:
+            response = test_client.get(f"{url}/a.png", params={"size": 64})
+            revalidated = test_client.get(
+                f"{url}/a.png",
+                params={"size": 64},
+                headers={"If-None-Match": response.headers["ETag"]},
+            )
+            wrong_size = test_client.get(f"{url}/a.png", params={"size": 100})
+            not_image = test_client.get(f"{url}/b.txt", params={"size": 64})
+            missing = test_client.get(f"{url}/c.png", params={"size": 64})
+        finally:
+            app.state.thumbnails = None
+    assert response.status_code == status.HTTP_200_OK
+    assert response.content == b"64:image"
+    assert response.headers["Content-Type"] == "image/webp"
+    assert revalidated.status_code == status.HTTP_304_NOT_MODIFIED
+    assert wrong_size.status_code == status.HTTP_400_BAD_REQUEST
+    assert not_image.status_code == status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+    assert missing.status_code == status.HTTP_404_NOT_FOUND